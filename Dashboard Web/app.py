@@ -1,37 +1,372 @@
-from flask import Flask, render_template, request, jsonify
-# File con la logica (il Project Work) chiamato "simulatore.py"
-from simulatore import main_controller 
+import os
+import sys
+
+from flask import Flask, Response, g, render_template, request, stream_with_context
+
+# I moduli di calcolo stanno nella radice del progetto, una cartella sopra la dashboard: la aggiungo
+# al percorso di import, così il server parte da qualunque cartella ("python 'Dashboard Web/app.py'")
+CARTELLA_PROGETTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CARTELLA_PROGETTO not in sys.path:
+    sys.path.insert(0, CARTELLA_PROGETTO)
+
+# File con la logica (il Project Work): Simulatore.py
+from Simulatore import CacheLRU, ErrorePayload, simula_validato, confronta_politiche, crea_lotti_da_payload, nuovo_seed, valida_payload
+from sweep_scenari import itera_batch, itera_sweep, valida_sweep
+from coda_job import CodaJob, CodaPiena
+import hashlib
 import json
+import metriche
+import threading
+import time
 
 app = Flask(__name__)
 
+# Latenza delle richieste HTTP per rotta, metodo e codice di stato (vedi la rotta /metrics).
+# Per le risposte in streaming misura il tempo fino all'invio delle intestazioni.
+DURATA_RICHIESTE = metriche.REGISTRO.istogramma(
+    "timpe_richiesta_http_secondi", "Latenza delle richieste HTTP", ("rotta", "metodo", "stato")
+)
+
+@app.before_request
+def avvia_cronometro():
+    if metriche.attive():
+        g.inizio_richiesta = time.perf_counter()
+
+@app.after_request
+def registra_latenza(risposta):
+    inizio = g.pop('inizio_richiesta', None)
+    if inizio is not None:
+        rotta = request.url_rule.rule if request.url_rule else 'sconosciuta'
+        DURATA_RICHIESTE.osserva(time.perf_counter() - inizio, rotta, request.method, risposta.status_code)
+    return risposta
+
 # | ROTTA 1: LA HOMEPAGE (Il Sito Web) |
 @app.route('/')
 def home():
     # Cerca il file index.html nella cartella 'templates'
     return render_template('index.html')
 
+# Cartella dei buffer delle centraline IoT (vedi ingestione_iot.py). Se non è configurata,
+# il meteo continua a essere simulato e NumPy non viene nemmeno importato.
+CARTELLA_IOT = os.environ.get('TIMPE_CARTELLA_IOT')
+_rete_stazioni = None
+_lock_stazioni = threading.Lock()
+
+def trend_stazioni():
+    """
+    Trend stagionale corrente delle centraline, letto in O(1) dagli aggregati dei buffer.
+    """
+    global _rete_stazioni
+    if not CARTELLA_IOT:
+        raise ErrorePayload("nessuna centralina configurata (variabile TIMPE_CARTELLA_IOT)", "meteo")
+    with _lock_stazioni:
+        if _rete_stazioni is None:
+            from ingestione_iot import ReteStazioni
+            _rete_stazioni = ReteStazioni(CARTELLA_IOT)
+        _rete_stazioni.carica_stazioni()
+        try:
+            trend = _rete_stazioni.trend_stagionale()
+        except ValueError as e:
+            raise ErrorePayload(str(e), "meteo") from None
+    if trend["rischio_patogeni"] is None:
+        raise ErrorePayload("le centraline non hanno ancora letture di temperatura", "meteo")
+    return trend
+
+def risposta_json(dati, stato = 200):
+    """
+    Serializzo una sola volta, in forma compatta (niente indentazione: la legge il browser, non una persona).
+    """
+    return Response(json.dumps(dati, separators=(",", ":")), status=stato, mimetype="application/json")
+
+def payload_richiesta():
+    """
+    Leggo il corpo della richiesta come dizionario; se manca o non è JSON sollevo ErrorePayload.
+    """
+    dati = request.get_json(silent=True)
+    if dati is None:
+        raise ErrorePayload("corpo della richiesta assente o non in formato JSON")
+    # "meteo": "stazioni" -> uso il trend misurato dalle centraline al posto di quello simulato
+    if isinstance(dati, dict) and dati.get('meteo') == 'stazioni':
+        dati = dict(dati, meteo=trend_stazioni())
+    return dati
+
+# - CACHE DELLE RISPOSTE E COALESCENZA DELLE RICHIESTE -
+# Quando la dashboard viene condivisa arrivano raffiche di POST identici. Le risposte deterministiche
+# (seed esplicito, oppure modalità analitica) vengono memorizzate per impronta del payload validato
+# (numeri già convertiti e default applicati, chiavi ordinate), con LRU, dimensione massima e TTL.
+# Le richieste identiche che arrivano mentre la prima è ancora in calcolo non la ripetono: aspettano
+# il suo risultato (coalescenza). Ogni risposta 200 porta un ETag (impronta del corpo): con
+# If-None-Match uguale rispondo 304 senza corpo. Gli esiti sono contati in /metrics.
+# Esami: Tecnologie Web (INF01IV) - Algoritmi e strutture dati (INF01I)
+DIMENSIONE_CACHE_RISPOSTE = int(os.environ.get('TIMPE_CACHE_RISPOSTE', 256))   # Risposte conservate
+TTL_CACHE_RISPOSTE = float(os.environ.get('TIMPE_TTL_CACHE_RISPOSTE', 300))     # Secondi di validità
+LIMITE_BYTE_RISPOSTA = 2 * 1024 * 1024   # Le risposte più grandi (es. migliaia di lotti) non vengono conservate
+
+CACHE_RISPOSTE = CacheLRU(DIMENSIONE_CACHE_RISPOSTE, TTL_CACHE_RISPOSTE)
+ESITI_CACHE_RISPOSTE = metriche.REGISTRO.contatore(
+    "timpe_cache_risposte_total", "Esiti della cache delle risposte HTTP (hit, miss, coalescenza, non_cacheabile, non_modificato)", ("rotta", "esito")
+)
+_calcoli_in_corso = {}
+_lock_calcoli = threading.Lock()
+
+class CalcoloInCorso:
+    """
+    Calcolo di una risposta già avviato da un'altra richiesta: chi arriva dopo aspetta l'evento.
+    """
+    __slots__ = ("pronto", "risposta")
+
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.risposta = None
+
+def chiave_risposta(rotta, dati):
+    """
+    Impronta canonica (chiavi ordinate, JSON compatto) della rotta e del payload validato.
+    """
+    testo = json.dumps([rotta, dati], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(testo.encode("utf-8"), digest_size=16).hexdigest()
+
+def calcola_risposta(calcola):
+    """
+    Esegue il calcolo e restituisce (stato, corpo, etag): gli errori diventano risposte, così
+    anche le richieste in attesa ricevono lo stesso esito.
+    """
+    try:
+        stato, corpo = 200, json.dumps(calcola(), separators=(",", ":"))
+    except ErrorePayload as e:
+        stato, corpo = 400, json.dumps(e.come_dizionario())
+    except Exception as e:
+        stato, corpo = 500, json.dumps({"errore": str(e)})
+    etag = '"' + hashlib.blake2b(corpo.encode("utf-8"), digest_size=16).hexdigest() + '"' if stato == 200 else None
+    return stato, corpo, etag
+
+def risposta_in_cache(rotta, chiave, calcola):
+    """
+    Risposta dalla cache, oppure calcolata una sola volta anche con più richieste identiche concorrenti.
+    """
+    voce, esito = CACHE_RISPOSTE.leggi(chiave), "hit"
+    if voce is None:
+        with _lock_calcoli:
+            # Ricontrollo sotto lock: il calcolo potrebbe essere appena terminato
+            voce = CACHE_RISPOSTE.leggi(chiave)
+            calcolo = _calcoli_in_corso.get(chiave) if voce is None else None
+            primo = voce is None and calcolo is None
+            if primo:
+                calcolo = _calcoli_in_corso[chiave] = CalcoloInCorso()
+        if primo:
+            esito = "miss"
+            try:
+                voce = calcola_risposta(calcola)
+                if voce[0] == 200 and len(voce[1]) <= LIMITE_BYTE_RISPOSTA:
+                    CACHE_RISPOSTE.scrivi(chiave, voce)
+            finally:
+                calcolo.risposta = voce
+                with _lock_calcoli:
+                    del _calcoli_in_corso[chiave]
+                calcolo.pronto.set()
+        elif voce is None:
+            esito = "coalescenza"
+            calcolo.pronto.wait()
+            voce = calcolo.risposta
+
+    stato, corpo, etag = voce
+    if etag is not None and request.if_none_match.contains_weak(etag.strip('"')):
+        ESITI_CACHE_RISPOSTE.incrementa(1, rotta, "non_modificato")
+        risposta = Response(status=304)
+    else:
+        ESITI_CACHE_RISPOSTE.incrementa(1, rotta, esito)
+        risposta = Response(corpo, status=stato, mimetype="application/json")
+    if etag is not None:
+        risposta.headers['ETag'] = etag
+    risposta.headers['X-Cache'] = esito.upper()
+    return risposta
+
+def risposta_deterministica(dati):
+    """
+    Solo le risposte riproducibili si possono riusare: seed esplicito oppure modalità analitica.
+    """
+    return dati['seed'] is not None or dati['modalita'] == 'analitica'
+
 # | ROTTA 2: L'API (Il Cervello) |
 @app.route('/api/simula', methods=['POST'])
 def api_simula():
     try:
-        # 1. Ricevo i dati dal sito web (in formato JSON)
-        dati_dal_frontend = request.get_json()
-        
-        # 2. Converto l'oggetto in stringa
-        json_string = json.dumps(dati_dal_frontend)
-        
-        # 3. Chiamo la funzione di simulazione e passo il "json" come modalità e la stringa dati
-        risposta_json_str = main_controller('json', json_string)
-        
-        # 4. Restituisco il risultato al sito web
-        return jsonify(json.loads(risposta_json_str))
-        
+        # Passo direttamente il dizionario ricevuto al simulatore: nessun passaggio intermedio in stringa JSON.
+        # Valido una sola volta: il payload validato serve anche per la chiave della cache
+        dati = valida_payload(payload_richiesta())
+        if not risposta_deterministica(dati):
+            ESITI_CACHE_RISPOSTE.incrementa(1, '/api/simula', "non_cacheabile")
+            risposta = risposta_json(simula_validato(dati))
+            risposta.headers['X-Cache'] = "NON_CACHEABILE"
+            return risposta
+        return risposta_in_cache('/api/simula', chiave_risposta('/api/simula', dati), lambda: simula_validato(dati))
+
+    except ErrorePayload as e:
+        # Errore nei dati inviati dal client
+        return risposta_json(e.come_dizionario(), 400)
     except Exception as e:
-        return jsonify({"errore": str(e)}), 500
+        return risposta_json({"errore": str(e)}, 500)
+
+# | ROTTA 3: CONFRONTO DELLE POLITICHE DI ALLOCAZIONE |
+@app.route('/api/confronta_politiche', methods=['POST'])
+def api_confronta_politiche():
+    try:
+        # Stesso payload di /api/simula; "politiche" (opzionale) limita il confronto ad alcune politiche
+        dati = valida_payload(payload_richiesta())
+        seed = nuovo_seed() if dati['seed'] is None else dati['seed']
+
+        confronto = confronta_politiche(
+            crea_lotti_da_payload(dati['lotti']),
+            dati['ore_budget'],
+            seed,
+            dati.get('politiche'),
+            dati['obiettivo_allocazione'],
+            usa_cache = dati['seed'] is not None
+        )
+        return risposta_json(confronto)
+
+    except ErrorePayload as e:
+        return risposta_json(e.come_dizionario(), 400)
+    except Exception as e:
+        return risposta_json({"errore": str(e)}, 500)
+
+# | ROTTA 4: TREND METEO DELLE CENTRALINE |
+@app.route('/api/meteo', methods=['GET'])
+def api_meteo():
+    try:
+        return risposta_json(trend_stazioni())
+    except ErrorePayload as e:
+        return risposta_json(e.come_dizionario(), 404)
+
+# | ROTTA 5: BATCH DI SCENARI IN STREAMING (NDJSON) |
+def righe_ndjson(richiesta):
+    """
+    Generatore delle righe di input di un corpo NDJSON, letto a pezzi dal socket: il batch
+    non viene mai caricato tutto in memoria. Le righe vuote vengono saltate.
+    """
+    for riga in richiesta.stream:
+        riga = riga.strip()
+        if riga:
+            yield riga
+
+@app.route('/api/simula/batch', methods=['POST'])
+def api_simula_batch():
+    """
+    Esegue molti scenari in una sola richiesta HTTP e restituisce una riga JSON per scenario
+    (application/x-ndjson) appena il relativo blocco è stato calcolato dal pool di processi.
+    Formati di ingresso:
+      - corpo NDJSON (Content-Type: application/x-ndjson): un payload per riga, letto in streaming
+      - JSON con lista di payload: [payload, ...] oppure {"scenari": [...], "riepilogo": true}.
+        Il corpo JSON viene letto tutto in memoria prima di iniziare: per batch molto grandi usare NDJSON
+      - JSON con griglia: {"base": payload, "griglia": {parametro: [valori]}}. Payload base e forma
+        della griglia vengono controllati prima di rispondere: un errore arriva come 400
+    Le righe arrivano in ordine di completamento e riportano l'indice dello scenario; l'ultima
+    riga è {"fine": true, ...} con il conteggio degli scenari e degli errori.
+    """
+    riepilogo = request.args.get('riepilogo', '').lower() in ('1', 'true', 'si')
+
+    if request.mimetype == 'application/x-ndjson':
+        scenari = itera_batch(righe_ndjson(request), riepilogo)
+    else:
+        dati = request.get_json(silent=True)
+        if isinstance(dati, dict) and 'griglia' in dati:
+            try:
+                valida_sweep(dati.get('base', {}), dati['griglia'])
+            except ErrorePayload as e:
+                return risposta_json(e.come_dizionario(), 400)
+            scenari = itera_sweep(dati.get('base', {}), dati['griglia'])
+        elif isinstance(dati, (list, dict)):
+            lista = dati if isinstance(dati, list) else dati.get('scenari', [])
+            riepilogo = riepilogo or (isinstance(dati, dict) and bool(dati.get('riepilogo')))
+            scenari = itera_batch(lista, riepilogo)
+        else:
+            return risposta_json(ErrorePayload("atteso un corpo JSON (lista di payload o griglia) o NDJSON").come_dizionario(), 400)
+
+    def genera():
+        n_scenari, n_errori = 0, 0
+        for riga in scenari:
+            n_scenari += 1
+            n_errori += 'errore' in riga
+            yield json.dumps(riga, separators=(",", ":")) + "\n"
+        yield json.dumps({"fine": True, "scenari": n_scenari, "errori": n_errori}, separators=(",", ":")) + "\n"
+
+    # Il generatore viene consumato mentre la risposta viene inviata: il pool calcola nuovi blocchi
+    # solo quando il client legge (backpressure), e la memoria del server resta costante
+    return Response(stream_with_context(genera()), mimetype='application/x-ndjson')
+
+# | ROTTA 6: METRICHE PER PROMETHEUS |
+@app.route('/metrics', methods=['GET'])
+def api_metriche():
+    # Con TIMPE_METRICHE=0 la strumentazione è spenta e non c'è nulla da esporre
+    if not metriche.attive():
+        return Response("metriche disattivate (TIMPE_METRICHE=0)\n", status=404, mimetype="text/plain")
+    return Response(metriche.REGISTRO.esporta_prometheus(), mimetype="text/plain; version=0.0.4")
+
+# | ROTTA 7: OTTIMIZZAZIONE DI CONCIME E TRATTAMENTO PER LOTTO |
+@app.route('/api/ottimizza', methods=['POST'])
+def api_ottimizza():
+    try:
+        # Stesso payload di /api/simula, più la sezione opzionale "ottimizzazione" (vedi ottimizzatore.py)
+        dati = valida_payload(payload_richiesta())
+        seed = nuovo_seed() if dati['seed'] is None else dati['seed']
+
+        # NumPy viene importato solo quando l'ottimizzatore viene usato
+        from ottimizzatore import ottimizza_da_payload
+        return risposta_json(ottimizza_da_payload(dati, seed))
+
+    except ErrorePayload as e:
+        return risposta_json(e.come_dizionario(), 400)
+    except Exception as e:
+        return risposta_json({"errore": str(e)}, 500)
+
+# | ROTTA 8: JOB IN BACKGROUND PER I CALCOLI LUNGHI |
+# Sweep, batch, ottimizzazioni e simulazioni pesanti vanno in coda (vedi coda_job.py) invece di
+# occupare la richiesta: la risposta arriva subito con l'ID del job da interrogare.
+CODA_JOB = CodaJob()
+
+@app.route('/api/jobs', methods=['POST'])
+def api_invia_job():
+    try:
+        dati = request.get_json(silent=True)
+        if not isinstance(dati, dict):
+            raise ErrorePayload("atteso un oggetto JSON {\"tipo\": ..., \"payload\": ...}")
+        payload = dati.get('payload')
+        if dati.get('tipo') in ('simula', 'ottimizza') and isinstance(payload, dict) and payload.get('meteo') == 'stazioni':
+            payload = dict(payload, meteo=trend_stazioni())
+        job = CODA_JOB.invia(dati.get('tipo'), payload)
+    except ErrorePayload as e:
+        return risposta_json(e.come_dizionario(), 400)
+    except CodaPiena as e:
+        risposta = risposta_json({"errore": str(e)}, 429)
+        risposta.headers['Retry-After'] = "5"
+        return risposta
+
+    risposta = risposta_json(job.come_dizionario(), 202)
+    risposta.headers['Location'] = f"/api/jobs/{job.id}"
+    return risposta
+
+@app.route('/api/jobs', methods=['GET'])
+def api_elenco_job():
+    # Elenco senza i risultati, che possono essere grandi: si leggono job per job
+    return risposta_json({"in_coda": CODA_JOB.in_coda(), "job": [j.come_dizionario(con_risultato=False) for j in CODA_JOB.elenco()]})
+
+@app.route('/api/jobs/<id_job>', methods=['GET'])
+def api_stato_job(id_job):
+    job = CODA_JOB.leggi(id_job)
+    if job is None:
+        return risposta_json({"errore": "job inesistente o scaduto", "campo": None}, 404)
+    return risposta_json(job.come_dizionario())
+
+@app.route('/api/jobs/<id_job>', methods=['DELETE'])
+def api_annulla_job(id_job):
+    job = CODA_JOB.annulla(id_job)
+    if job is None:
+        return risposta_json({"errore": "job inesistente o scaduto", "campo": None}, 404)
+    return risposta_json(job.come_dizionario(con_risultato=False), 202 if job.stato == "in_esecuzione" else 200)
 
 if __name__ == '__main__':
     # Avvia il server in locale sulla porta 5000
     print("// SERVER TIMPE SMART VINEYARD AVVIATO //")
     print("Apri il browser su: http://localhost:5000")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Un thread per richiesta: il polling dei job e le simulazioni interattive non si aspettano a vicenda
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
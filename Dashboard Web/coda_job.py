@@ -0,0 +1,282 @@
+# - CODA DEI JOB DI CALCOLO LUNGHI -
+# Le simulazioni pesanti (molti scenari, sweep, ottimizzazione, grandi inventari) non vengono più
+# eseguite dentro la richiesta HTTP: POST /api/jobs mette il lavoro in coda e risponde subito con
+# l'ID del job, GET /api/jobs/<id> ne riporta stato, avanzamento e (alla fine) il risultato.
+#
+#   - un numero limitato di thread coordinatori (MAX_JOB_ATTIVI) esegue i job in ordine di arrivo;
+#     il calcolo vero e proprio (simula, batch, sweep) avviene nel pool di processi condiviso di
+#     sweep_scenari (lo stesso delle rotte sincrone), così il processo del server resta libero per
+#     le richieste interattive di /api/simula e nessun job crea processi propri;
+#   - la coda ha una profondità massima (MAX_JOB_IN_CODA): oltre, la richiesta riceve 429;
+#   - un job in coda si annulla subito; uno in esecuzione si ferma al primo scenario completato
+#     dopo l'annullamento (i blocchi non ancora partiti vengono cancellati). Un calcolo singolo
+#     (simula, ottimizza) già partito arriva alla fine, ma il risultato viene scartato;
+#   - i job terminati restano consultabili per TTL_JOB secondi, poi vengono dimenticati.
+#
+# Tipi di job ("payload" è il corpo che si invierebbe alla rotta sincrona corrispondente):
+#   "simula"     -> payload di /api/simula
+#   "ottimizza"  -> payload di /api/ottimizza
+#   "batch"      -> lista di payload, oppure {"scenari": [...], "riepilogo": true}
+#   "sweep"      -> {"base": payload, "griglia": {...}, "ordina_per": "totale_bottiglie", "decrescente": true}
+# Esami: Sistemi Operativi (INF01III) - Tecnologie Web (INF01IV) - Ingegneria del Software (INGINF06)
+
+from collections import OrderedDict, deque
+import os
+import threading
+import time
+import uuid
+
+from Simulatore import ErrorePayload, nuovo_seed, simula_validato, valida_payload
+from sweep_scenari import esegui_in_pool, itera_batch, itera_sweep, ordina_tabella, valida_sweep
+import metriche
+
+TIPI_JOB = ("simula", "ottimizza", "batch", "sweep")
+
+MAX_JOB_ATTIVI = int(os.environ.get('TIMPE_JOB_ATTIVI', 2))       # Job eseguiti contemporaneamente
+MAX_JOB_IN_CODA = int(os.environ.get('TIMPE_JOB_IN_CODA', 16))    # Job in attesa oltre i quali rispondo 429
+TTL_JOB = float(os.environ.get('TIMPE_TTL_JOB', 900))             # Secondi di conservazione dei job terminati
+# Quota del pool condiviso usata da ogni job batch o sweep: ne lascio uno libero per il server
+PROCESSI_PER_JOB = int(os.environ.get('TIMPE_PROCESSI_JOB', max(1, (os.cpu_count() or 1) - 1)))
+LIMITE_SCENARI_JOB = 10_000   # I risultati restano in memoria fino alla scadenza: limito la dimensione dei job
+
+ESITI_JOB = metriche.REGISTRO.contatore(
+    "timpe_job_total", "Job per tipo ed esito (accettato, rifiutato, completato, errore, annullato, scaduto)", ("tipo", "esito")
+)
+DURATA_JOB = metriche.REGISTRO.istogramma(
+    "timpe_job_durata_secondi", "Durata dell'esecuzione dei job", ("tipo",), limiti=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600)
+)
+
+
+class CodaPiena(Exception):
+    """
+    La coda ha già MAX_JOB_IN_CODA job in attesa: il client deve riprovare più tardi.
+    """
+
+
+class Job:
+    """
+    Un lavoro in coda: stato, avanzamento (scenari completati su totale) e risultato.
+    """
+    __slots__ = ("id", "tipo", "payload", "stato", "creato", "avviato", "terminato", "completati", "totale",
+                 "risultato", "errore", "annullato", "_fine")
+
+    def __init__(self, tipo, payload, totale):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.payload = payload
+        self.stato = "in_coda"
+        self.creato = time.time()
+        self.avviato = None
+        self.terminato = None
+        self.completati = 0
+        self.totale = totale
+        self.risultato = None
+        self.errore = None
+        self.annullato = threading.Event()
+        self._fine = None   # Istante (monotono) di fine, per la scadenza
+
+    def termina(self, stato):
+        self.stato = stato
+        self.terminato = time.time()
+        self._fine = time.monotonic()
+        self.payload = None
+
+    def come_dizionario(self, con_risultato = True):
+        dati = {
+            "id": self.id,
+            "tipo": self.tipo,
+            "stato": self.stato,
+            "creato": round(self.creato, 3),
+            "avviato": None if self.avviato is None else round(self.avviato, 3),
+            "terminato": None if self.terminato is None else round(self.terminato, 3),
+            "progresso": {
+                "completati": self.completati,
+                "totale": self.totale,
+                "percentuale": round(100.0 * self.completati / self.totale, 1) if self.totale else 0.0,
+            },
+        }
+        if self.errore is not None:
+            dati["errore"] = self.errore
+        if con_risultato and self.stato == "completato":
+            dati["risultato"] = self.risultato
+        return dati
+
+
+def prepara_job(tipo, payload):
+    """
+    Controllo il job prima di accettarlo, così gli errori nei dati arrivano subito come 400.
+    Restituisce il numero di passi (scenari) su cui misurare l'avanzamento.
+    """
+    if tipo not in TIPI_JOB:
+        raise ErrorePayload(f"tipo di job sconosciuto {tipo!r} (ammessi: {', '.join(TIPI_JOB)})", "tipo")
+
+    if tipo in ("simula", "ottimizza"):
+        valida_payload(payload)
+        return 1
+    if tipo == "batch":
+        scenari = payload.get("scenari") if isinstance(payload, dict) else payload
+        if not isinstance(scenari, list):
+            raise ErrorePayload("attesa una lista di payload (oppure {\"scenari\": [...]})", "payload")
+        totale = len(scenari)
+    else:
+        if not isinstance(payload, dict):
+            raise ErrorePayload("atteso un oggetto con \"base\" e \"griglia\"", "payload")
+        try:
+            totale = valida_sweep(payload.get("base", {}), payload.get("griglia"),
+                                  payload.get("ordina_per", "totale_bottiglie"), payload.get("decrescente", True))
+        except ErrorePayload as e:
+            raise ErrorePayload(e.messaggio, f"payload.{e.campo}") from None
+    if totale > LIMITE_SCENARI_JOB:
+        raise ErrorePayload(f"al più {LIMITE_SCENARI_JOB} scenari per job", "payload")
+    return totale
+
+
+class CodaJob:
+    """
+    Coda dei job con un pool limitato di thread coordinatori, profondità massima e scadenza
+    dei risultati. Thread-safe: condivisa tra le richieste concorrenti del server.
+    """
+    def __init__(self, max_attivi = MAX_JOB_ATTIVI, max_in_coda = MAX_JOB_IN_CODA, ttl = TTL_JOB, processi_per_job = PROCESSI_PER_JOB):
+        self.max_attivi = max_attivi
+        self.max_in_coda = max_in_coda
+        self.ttl = ttl
+        self.processi_per_job = processi_per_job
+        self._job = OrderedDict()
+        self._coda = deque()
+        self._lock = threading.Lock()
+        self._nuovo_job = threading.Condition(self._lock)
+        self._worker = []
+
+    # - INTERFACCIA USATA DALLE ROTTE -
+    def invia(self, tipo, payload):
+        """
+        Accetta un job e restituisce il Job in coda. Solleva ErrorePayload (dati non validi)
+        oppure CodaPiena.
+        """
+        totale = prepara_job(tipo, payload)
+        with self._lock:
+            self._scadi()
+            if len(self._coda) >= self.max_in_coda:
+                ESITI_JOB.incrementa(1, tipo, "rifiutato")
+                raise CodaPiena(f"coda piena ({self.max_in_coda} job in attesa)")
+            job = Job(tipo, payload, totale)
+            self._job[job.id] = job
+            self._coda.append(job)
+            # I thread coordinatori partono al primo job (il server che non usa la coda non li crea)
+            while len(self._worker) < self.max_attivi:
+                worker = threading.Thread(target=self._lavora, name=f"coda-job-{len(self._worker)}", daemon=True)
+                self._worker.append(worker)
+                worker.start()
+            self._nuovo_job.notify()
+        ESITI_JOB.incrementa(1, tipo, "accettato")
+        return job
+
+    def leggi(self, id_job):
+        with self._lock:
+            self._scadi()
+            return self._job.get(id_job)
+
+    def elenco(self):
+        with self._lock:
+            self._scadi()
+            return list(self._job.values())
+
+    def annulla(self, id_job):
+        """
+        Annulla un job: se è in coda non partirà, se è in esecuzione si ferma appena possibile.
+        Restituisce il job (None se inesistente o scaduto).
+        """
+        with self._lock:
+            self._scadi()
+            job = self._job.get(id_job)
+            if job is None:
+                return None
+            job.annullato.set()
+            if job.stato == "in_coda":
+                self._coda.remove(job)
+                job.termina("annullato")
+                ESITI_JOB.incrementa(1, job.tipo, "annullato")
+            return job
+
+    def in_coda(self):
+        with self._lock:
+            return len(self._coda)
+
+    # - ESECUZIONE -
+    def _scadi(self):
+        # Chiamata con il lock preso: dimentico i job terminati da più di ttl secondi
+        limite = time.monotonic() - self.ttl
+        for job in [j for j in self._job.values() if j._fine is not None and j._fine < limite]:
+            del self._job[job.id]
+            ESITI_JOB.incrementa(1, job.tipo, "scaduto")
+
+    def _lavora(self):
+        while True:
+            with self._nuovo_job:
+                while not self._coda:
+                    self._nuovo_job.wait()
+                job = self._coda.popleft()
+                job.stato = "in_esecuzione"
+                job.avviato = time.time()
+
+            inizio = time.perf_counter()
+            try:
+                risultato = self._esegui(job)
+                stato = "annullato" if job.annullato.is_set() else "completato"
+            except ErrorePayload as e:
+                risultato, stato, job.errore = None, "errore", e.come_dizionario()
+            except Exception as e:
+                risultato, stato, job.errore = None, "errore", {"errore": f"{type(e).__name__}: {e}", "campo": None}
+
+            with self._lock:
+                job.risultato = risultato if stato == "completato" else None
+                job.termina(stato)
+            DURATA_JOB.osserva(time.perf_counter() - inizio, job.tipo)
+            ESITI_JOB.incrementa(1, job.tipo, stato)
+
+    def _raccogli(self, job, righe):
+        """
+        Consumo le righe prodotte dal pool di processi aggiornando l'avanzamento; se il job viene
+        annullato chiudo il generatore, che cancella i blocchi non ancora partiti.
+        """
+        raccolte = []
+        try:
+            for riga in righe:
+                raccolte.append(riga)
+                job.completati += 1
+                if job.annullato.is_set():
+                    return None
+        finally:
+            righe.close()
+        return raccolte
+
+    def _esegui(self, job):
+        payload = job.payload
+        if job.tipo == "ottimizza":
+            # NumPy viene importato solo quando l'ottimizzatore viene usato
+            from ottimizzatore import ottimizza_da_payload
+
+            dati = valida_payload(payload)
+            risultato = ottimizza_da_payload(dati, nuovo_seed() if dati['seed'] is None else dati['seed'])
+            job.completati = 1
+            return risultato
+
+        if job.tipo == "simula":
+            # Una sola chiamata sul pool condiviso; il seed mancante lo estraggo qui (i worker nati
+            # da fork condividono lo stato del generatore) e quella simulazione non va in cache
+            dati = valida_payload(payload)
+            seed = nuovo_seed() if dati['seed'] is None else dati['seed']
+            risultato = esegui_in_pool(simula_validato, dati, seed, None, dati['seed'] is not None)
+            job.completati = 1
+            return risultato
+
+        if job.tipo == "batch":
+            scenari = payload.get("scenari") if isinstance(payload, dict) else payload
+            riepilogo = isinstance(payload, dict) and bool(payload.get("riepilogo"))
+            righe = self._raccogli(job, itera_batch(scenari, riepilogo, self.processi_per_job))
+            return None if righe is None else sorted(righe, key=lambda r: r["indice"])
+
+        righe = self._raccogli(job, itera_sweep(payload.get("base", {}), payload["griglia"], self.processi_per_job))
+        if righe is None:
+            return None
+        return ordina_tabella(righe, payload.get("ordina_per", "totale_bottiglie"), payload.get("decrescente", True))
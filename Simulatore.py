@@ -1,5 +1,13 @@
 import random
 import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from allocatori import ALLOCATORI
+from registro_agronomico import REGISTRO, NomeSconosciuto
+import metriche
 
 # ======================================================================================
 #   🎛️ DASHBOARD DI CONFIGURAZIONE
@@ -53,14 +61,31 @@ JSON_SIMULATO_DAL_WEB = None
 #                     > "Zolfo":   Protezione Base. Se Meteo=ALTO rischio -> Perdita 25% raccolto.
 #                     > "Poltiglia Bordolese": Protezione Totale (Rame). Perdita massima 5% (ho voluto comuqnue lasciare una perdita minima).
 #
-# 5. PARAMETRO GLOBALE
+#    Flussi, cultivar, concimi e trattamenti (con i loro effetti) sono definiti in registro_agronomico.json:
+#    per aggiungerne uno basta modificare quel file. I nomi non presenti nel registro vengono rifiutati.
+#
+# 5. PARAMETRI GLOBALI
 #   - "BUDGET_ORE_TOTALI": (Float) Budget massimo di ore manodopera disponibili per tutta l'azienda nella stagione
+#   - "SEED_SIMULAZIONE": (Intero o None) Seed dei numeri casuali. Con lo stesso seed la simulazione
+#                         produce sempre gli stessi numeri; con None ne viene estratto uno nuovo a ogni esecuzione.
+#   - "POLITICA_ALLOCAZIONE": (Stringa) Come ripartire le ore quando non bastano per tutti i lotti:
+#                 > "greedy":      Taglio netto per priorità e ID (comportamento storico).
+#                 > "frazionaria": Dentro ogni fascia di priorità finanzia prima i lotti più efficienti (bottiglie/ora).
+#                 > "intera":      Come "frazionaria", ma i lotti non frazionabili si lavorano tutti o niente.
+#   - "OBIETTIVO_ALLOCAZIONE": (Stringa) "bottiglie" o "litri": cosa massimizzano le politiche ottime.
 #
 # --------------------------------------------------------------------------------------
 
 # Budget totale delle ore manodopera disponibili per l'intera azienda
 ORE_AZIENDALI_TOTALI = 200.0
 
+# Seed della simulazione (None = stagione casuale diversa a ogni esecuzione)
+SEED_SIMULAZIONE = None
+
+# Politica di ripartizione del budget ore e grandezza da massimizzare
+POLITICA_ALLOCAZIONE = "greedy"
+OBIETTIVO_ALLOCAZIONE = "bottiglie"
+
 # Configurazione lotto 1: Barbera (vino rosso - flusso A)
 LOTTO_1 = {
     "nome": "Barbera",
@@ -105,19 +130,82 @@ LOTTO_3 = {
 # ======================================================================================
 
 
+# - GENERATORI CASUALI RIPRODUCIBILI -
+# Ogni fase stocastica estrae i numeri da uno stream indipendente identificato da (seed, stagione, lotto).
+# Lo stream è "counter-based": l'i-esimo numero è una funzione hash di (chiave, i), senza stato condiviso.
+# In questo modo qualsiasi lotto o stagione può essere ricalcolato da solo e un'esecuzione parallela
+# produce esattamente gli stessi numeri di quella seriale (motore_vettoriale.py usa la stessa funzione).
+# Esami: Calcolo, Probabilità e Statistica (MAT06) - Reti di calcolatori e Cybersecurity (INF01II)
+MASCHERA_64 = (1 << 64) - 1
+INCREMENTO_GOLDEN = 0x9E3779B97F4A7C15
+
+def mescola_64(x):
+    """
+    Funzione di mescolamento SplitMix64: trasforma un intero a 64 bit in un altro ben distribuito.
+    """
+    z = (x + INCREMENTO_GOLDEN) & MASCHERA_64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASCHERA_64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASCHERA_64
+    return z ^ (z >> 31)
+
+def chiave_stream(nome, dominio):
+    """
+    Chiave a 64 bit di uno stream (es. l'ID del lotto). Il 'dominio' separa stream di natura
+    diversa: un lotto chiamato "meteo" non condivide i numeri con la centralina.
+    Anche il tipo fa parte della chiave: i nomi non testuali usano il nome del tipo come sale,
+    così l'ID 1 e l'ID "1" (due lotti distinti anche per l'allocazione) hanno stream diversi.
+    """
+    sale = b"" if isinstance(nome, str) else type(nome).__name__.encode("utf-8")[:16]
+    digest = hashlib.blake2b(str(nome).encode("utf-8"), digest_size=8, salt=sale, person=dominio.encode("utf-8")).digest()
+    return int.from_bytes(digest, "little")
+
+def base_stream(seed, stagione, chiave):
+    """
+    Stato iniziale dello stream per la combinazione (seed, stagione, chiave).
+    """
+    return mescola_64(mescola_64(mescola_64(seed & MASCHERA_64) ^ stagione) ^ chiave)
+
+class StreamCasuale:
+    """
+    Generatore counter-based con la stessa interfaccia del modulo 'random' usata dal simulatore
+    (random, uniform, randint), così può essere passato ai metodi al posto del generatore globale.
+    """
+    __slots__ = ("base", "contatore")
+
+    def __init__(self, seed, stagione, chiave):
+        self.base = base_stream(seed, stagione, chiave)
+        self.contatore = 0
+
+    def random(self):
+        valore = mescola_64((self.base + self.contatore * INCREMENTO_GOLDEN) & MASCHERA_64)
+        self.contatore += 1
+        # Uso i 53 bit alti per ottenere un float uniforme in [0, 1)
+        return (valore >> 11) * (1.0 / 9007199254740992.0)
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+    def randint(self, a, b):
+        return a + int(self.random() * (b - a + 1))
+
+def nuovo_seed():
+    """
+    Estraggo un seed casuale (usato quando l'utente non ne specifica uno).
+    """
+    return random.getrandbits(63)
+
+def crea_stream_meteo(seed, stagione = 0):
+    return StreamCasuale(seed, stagione, chiave_stream("meteo", "meteo"))
+
+def crea_stream_lotto(seed, stagione, id_lotto):
+    return StreamCasuale(seed, stagione, chiave_stream(id_lotto, "lotto"))
+
 # - MODULO SIMULAZIONE SENSORISTICA (IoT) -
 # Esami: Calcolo, Probabilità e Statistica (MAT06) - Reti di calcolatori e Cybersecurity (INF01II)
-def ottieni_dati_meteo_iot():
+def classifica_rischio_patogeni(pioggia_mm, temperatura_media):
     """
-    Simulo, attraverso la generazione di numeri casuali, i dati trasmessi dalla centralina IoT nel vigneto.
-    NOTA: I valori rappresentano il TREND MEDIO STAGIONALE dell'intero ciclo produttivo,
-    non il meteo di un singolo giorno.
+    Logica applicativa: definisco il rischio patogeni su base stagionale (pioggia totale e temperatura media).
     """
-    # Genero valori casuali basati sulle medie della mia zona
-    pioggia_mm = random.randint(150, 600)
-    temperatura_media = random.uniform(18.0, 35.0) 
-    
-    # Logica applicativa: definisco il rischio patogeni su base stagionale
     rischio = "BASSO"
 
     if pioggia_mm > 350 and temperatura_media > 25:
@@ -125,11 +213,45 @@ def ottieni_dati_meteo_iot():
         rischio = "ALTO"
     elif pioggia_mm > 200:
         rischio = "MEDIO"
+
+    return rischio
+
+def estrai_trend_stagionale(rng = None):
+    """
+    Estraggo il trend stagionale grezzo (pioggia totale, temperatura media non arrotondata).
+    'rng' è lo stream da cui estrarre i numeri (se None uso il generatore globale 'random').
+    """
+    rng = random if rng is None else rng
+
+    # Genero valori casuali basati sulle medie della mia zona
+    pioggia_mm = rng.randint(150, 600)
+    temperatura_media = rng.uniform(18.0, 35.0) 
+    return pioggia_mm, temperatura_media
+
+def ottieni_dati_meteo_iot(rng = None):
+    """
+    Simulo, attraverso la generazione di numeri casuali, i dati trasmessi dalla centralina IoT nel vigneto.
+    NOTA: I valori rappresentano il TREND MEDIO STAGIONALE dell'intero ciclo produttivo,
+    non il meteo di un singolo giorno (per la stagione giorno per giorno vedi simulazione_giornaliera.py).
+    'rng' è lo stream da cui estrarre i numeri (se None uso il generatore globale 'random').
+    """
+    pioggia_mm, temperatura_media = estrai_trend_stagionale(rng)
         
     return {
         "pioggia_mm": pioggia_mm,
         "temp_avg": round(temperatura_media, 1),
-        "rischio_patogeni": rischio
+        "rischio_patogeni": classifica_rischio_patogeni(pioggia_mm, temperatura_media)
+    }
+
+def meteo_da_trend(pioggia_mm, temperatura_media):
+    """
+    Costruisco il dizionario meteo a partire da un trend misurato (es. dalle centraline reali,
+    vedi ingestione_iot.py) invece che estratto a caso.
+    """
+    return {
+        "pioggia_mm": pioggia_mm,
+        "temp_avg": round(temperatura_media, 1),
+        "rischio_patogeni": classifica_rischio_patogeni(pioggia_mm, temperatura_media)
     }
 
 # - CLASSE CORE: DIGITAL TWIN DEL VIGNETO -
@@ -147,12 +269,51 @@ class SimulatoreLottoVigneto:
         self.n_piante = numero_piante
         self.ettari = ettari
         
-        # Attributi configurabili
+        # Attributi configurabili (concime, trattamento e tipologia sono validati sul registro
+        # agronomico e convertiti nei loro codici interi: vedi le proprietà sotto)
         self.cap_max_raccolta_q = 0.0
         self.tempo_lavorazione_q = 0.0
         self.concime = "Nessuno"
         self.trattamento = "Nessuno"
 
+        # Vincoli per l'allocazione 'intera': un lotto non frazionabile si lavora tutto o niente,
+        # oppure per un numero intero di quote (es. sotto-appezzamenti)
+        self.frazionabile = None
+        self.quote_intere = 1
+
+        # Modalità per pianta (facoltativa): parametri di eterogeneita_piante.py, None = una resa per lotto
+        self.eterogeneita = None
+
+    # Le tre scelte testuali del lotto: assegnandole salvo anche il codice nel registro agronomico,
+    # così le fasi di calcolo indicizzano le tabelle invece di confrontare stringhe.
+    # Un nome sconosciuto solleva NomeSconosciuto (ValueError) subito, all'assegnazione.
+    @property
+    def tipologia(self):
+        return self._tipologia
+
+    @tipologia.setter
+    def tipologia(self, nome):
+        self.codice_flusso = REGISTRO.codice("flusso", nome)
+        self._tipologia = nome
+
+    @property
+    def concime(self):
+        return self._concime
+
+    @concime.setter
+    def concime(self, nome):
+        self.codice_concime = REGISTRO.codice("concime", nome)
+        self._concime = nome
+
+    @property
+    def trattamento(self):
+        return self._trattamento
+
+    @trattamento.setter
+    def trattamento(self, nome):
+        self.codice_trattamento = REGISTRO.codice("trattamento", nome)
+        self._trattamento = nome
+
     def configura_parametri(self, capacita_giornaliera, tempo_unitario, concime, trattamento, priorita = 2):
         """
         Configuro i vincoli operativi per scenari 'What-If'.
@@ -163,78 +324,80 @@ class SimulatoreLottoVigneto:
         self.trattamento = trattamento
         self.priorita = priorita
 
-    def calcola_resa_agronomica(self, dati_meteo):
+    def calcola_resa_agronomica(self, dati_meteo, rng = None):
         """
         Calcola l'uva prodotta in campo (Input industriale) e applico logiche condizionali per
         modificare dinamicamente la resa in base alle variabili agronomiche in input.
         (concimazione e rischio meteo).
         """
-        # Parto da una distribuzione uniforme per simulare la variabilità naturale di ogni pianta
-        resa_pianta = random.uniform(2.5, 4.5)
-        
-        # Applico i modificatori in base alla strategia di concimazione scelta (Logica condizionale)
-        # Esami: Programmazione 1 (INF01) - Algoritmi e strutture dati (INF01I)
+        rng = random if rng is None else rng
 
-        # Boost Fertilizzanti
-        if self.concime == "Urea": resa_pianta *= 1.25 # +25% Resa
-        elif self.concime == "Zolfato": resa_pianta *= 1.10 # +10% Resa
+        # Parto da una distribuzione uniforme per simulare la variabilità naturale di ogni pianta
+        resa_pianta = rng.uniform(2.5, 4.5)
         
-        # Gestione Rischio Meteo
-        if dati_meteo["rischio_patogeni"] == "ALTO":
-            if self.trattamento == "Nessuno":
-                resa_pianta *= 0.50  # Disastro: Perdita del 50%
-            elif self.trattamento == "Zolfo":
-                resa_pianta *= 0.75  # Protezione parziale: Perdita del 25%
-            elif self.trattamento == "Poltiglia Bordolese":
-                resa_pianta *= 0.95  # Protezione eccellente: Perdita fisiologica solo del 5%
-                
-        elif dati_meteo["rischio_patogeni"] == "MEDIO":
-            # Anche con rischio medio, non trattare porta qualche danno
-            if self.trattamento == "Nessuno":
-                resa_pianta *= 0.85 # Perdita del 15%
+        # Applico i modificatori in base alla strategia di concimazione scelta e al rischio meteo
+        resa_pianta *= self.fattore_concime()
+        resa_pianta *= self.fattore_rischio(dati_meteo["rischio_patogeni"])
              
         return resa_pianta * self.n_piante
 
-    # - FLUSSI PRODUTTIVI DIFFERENZIATI -
-    
-    def simula_flusso_rosso(self, kg_uva):
+    def calcola_resa_per_pianta(self, dati_meteo, rng = None):
         """
-        FLUSSO A: Vinificazione in Rosso.
-        Prevede macerazione lunga (bucce a contatto col mosto).
+        Variante di calcola_resa_agronomica con una resa estratta per ogni pianta, correlata per
+        filare e zona e con esposizione ai patogeni per zona (vedi eterogeneita_piante.py).
+        Restituisce (kg_uva, riepilogo per pianta e per zona).
         """
-        # La resa uva/vino oscilla tra 60% e 70%
-        resa_vino = random.uniform(0.60, 0.70)
-        # La vinaccia oscilla tra 18% e 25%
-        resa_vinaccia = random.uniform(0.18, 0.25)
-        
-        litri_vino = kg_uva * resa_vino
-        kg_vinaccia = kg_uva * resa_vinaccia
-        
-        # Macerazione allunga i tempi di occupazione tino (+20%)
-        tempo_processo = (kg_uva / 100) * self.tempo_lavorazione_q * 1.2
-        return litri_vino, kg_vinaccia, tempo_processo
+        from eterogeneita_piante import resa_per_pianta
+
+        rng = random if rng is None else rng
 
-    def simula_flusso_bianco(self, kg_uva):
+        # Consumo un solo numero dello stream del lotto, al posto di resa_pianta: ne derivo gli
+        # stream delle piante, così le estrazioni successive (vino, vinaccia, imprevisti) non cambiano
+        chiave = int(rng.random() * 9007199254740992.0)
+        return resa_per_pianta(self.n_piante, chiave, self.fattore_concime(),
+                               self.fattore_rischio(dati_meteo["rischio_patogeni"]), **self.eterogeneita)
+
+    def fattore_concime(self):
         """
-        FLUSSO B: Vinificazione in Bianco/Spumante.
-        Prevede pressatura soffice immediata. Vinaccia esce subito.
+        Moltiplicatore di resa dovuto alla concimazione (es. Urea +25%, Zolfato +10%),
+        letto dalla tabella del registro agronomico.
+        Esami: Programmazione 1 (INF01) - Algoritmi e strutture dati (INF01I)
         """
-        # Resa leggermente più alta per i bianchi che oscilla tra 65% e 75%
-        resa_vino = random.uniform(0.65, 0.75)
-        # La vinaccia oscilla tra 12% e 18%
-        resa_vinaccia = random.uniform(0.12, 0.18)
-        
+        return REGISTRO.fattori_concime[self.codice_concime]
+
+    def fattore_rischio(self, rischio_patogeni):
+        """
+        Moltiplicatore di resa dovuto al rischio patogeni, attenuato dal trattamento scelto:
+        matrice [trattamento][rischio] del registro (es. nessun trattamento con rischio ALTO = -50%).
+        """
+        return REGISTRO.perdite[self.codice_trattamento][REGISTRO.codici_rischio[rischio_patogeni]]
+
+    # - FLUSSI PRODUTTIVI DIFFERENZIATI -
+
+    def simula_flusso(self, kg_uva, rng = None):
+        """
+        Vinificazione secondo il flusso della tipologia del lotto, con i parametri del registro:
+        FLUSSO A (Rosso): macerazione lunga, resa 60-70%, vinaccia 18-25%, tempi di cantina +20%.
+        FLUSSO B (Bianco/Spumante): pressatura soffice immediata, resa 65-75%, vinaccia 12-18%.
+        """
+        rng = random if rng is None else rng
+        flusso = self.codice_flusso
+
+        resa_vino = rng.uniform(REGISTRO.resa_vino_min[flusso], REGISTRO.resa_vino_max[flusso])
+        resa_vinaccia = rng.uniform(REGISTRO.resa_vinaccia_min[flusso], REGISTRO.resa_vinaccia_max[flusso])
+
         litri_vino = kg_uva * resa_vino
         kg_vinaccia = kg_uva * resa_vinaccia
-        
-        tempo_processo = (kg_uva / 100) * self.tempo_lavorazione_q
+
+        tempo_processo = (kg_uva / 100) * self.tempo_lavorazione_q * REGISTRO.moltiplicatore_tempo[flusso]
         return litri_vino, kg_vinaccia, tempo_processo
 
 
-    def calcola_tempi_dettagliati(self, kg_uva, ore_lavorazione_cantina):
+    def calcola_tempi_dettagliati(self, kg_uva, ore_lavorazione_cantina, rng = None):
         """
         Restituisce il dettaglio delle ore per ogni fase.
         """
+        rng = random if rng is None else rng
         totale_quintali = kg_uva / 100.0
         
         # Vendemmia (Vincolato da capacità giornaliera)
@@ -244,34 +407,36 @@ class SimulatoreLottoVigneto:
         
         # Gestione (Stimato su ettari)
         # Il tempo può variare del +/- 25% in base all'annata
-        fattore_imprevisti = random.uniform(0.75, 1.25)
+        fattore_imprevisti = rng.uniform(0.75, 1.25)
         ore_gestione = ((self.n_piante * 0.05) + (self.ettari * 20)) * fattore_imprevisti
 
         # Ritorno i 3 valori separati
         return round(ore_vendemmia, 1), round(ore_lavorazione_cantina, 1), round(ore_gestione, 1)
 
-    def esegui_simulazione(self, dati_meteo):
+    def esegui_simulazione(self, dati_meteo, rng = None):
         """
         Metodo Wrapper che esegue l'intera pipeline per il lotto corrente.
+        'rng' è lo stream casuale del lotto: tutte le fasi estraggono da lì, nell'ordine
+        resa pianta -> resa vino -> resa vinaccia -> imprevisti.
         """
-        # Fase Campo
-        kg_uva = self.calcola_resa_agronomica(dati_meteo)
+        # Fase Campo (una resa per lotto, oppure una per pianta)
+        if self.eterogeneita is None:
+            kg_uva, dettaglio_piante = self.calcola_resa_agronomica(dati_meteo, rng), None
+        else:
+            kg_uva, dettaglio_piante = self.calcola_resa_per_pianta(dati_meteo, rng)
         
-        # Fase Cantina
-        if self.tipologia == "Rosso":
-            vino, vinaccia, ore_cantina = self.simula_flusso_rosso(kg_uva)
-        else: 
-            vino, vinaccia, ore_cantina = self.simula_flusso_bianco(kg_uva)
+        # Fase Cantina (flusso scelto dal codice della tipologia)
+        vino, vinaccia, ore_cantina = self.simula_flusso(kg_uva, rng)
 
         # Fase Analisi Tempi
-        t_vend, t_cant, t_gest = self.calcola_tempi_dettagliati(kg_uva, ore_cantina)
+        t_vend, t_cant, t_gest = self.calcola_tempi_dettagliati(kg_uva, ore_cantina, rng)
         ore_totali = t_vend + t_cant + t_gest
         
         # Fase Calcolo Bottiglie
         n_bottiglie = int(vino / 1.5) # Arrotondamento per difetto a intero
 
         # Costruisco il dizionario di risposta
-        return {
+        risultato = {
             "id": self.id,
             "cultivar": self.cultivar,
             "tipologia": self.tipologia,
@@ -295,18 +460,704 @@ class SimulatoreLottoVigneto:
                 }
             }
         }
+        if dettaglio_piante is not None:
+            risultato["output"]["eterogeneita"] = dettaglio_piante
+        return risultato
+
+# - COSTRUZIONE LOTTI DA PAYLOAD -
+def crea_lotto_da_dict(d):
+    """
+    Creo e configuro un lotto partendo dal dizionario ricevuto dal frontend (formato API).
+    """
+    Nuovo = SimulatoreLottoVigneto(d['id'], d['cultivar'], d['tipologia'], int(d['n_piante']), float(d['ettari']))
+    Nuovo.configura_parametri(
+        float(d['config']['capacita_giornaliera']),
+        float(d['config']['tempo_unitario']),
+        d['config']['concime'],
+        d['config']['trattamento'],
+        d.get('priorita', 2)
+    )
+    Nuovo.frazionabile = d.get('frazionabile')
+    Nuovo.quote_intere = int(d.get('quote_intere', 1))
+    Nuovo.eterogeneita = d.get('eterogeneita')
+    return Nuovo
+
+# - VALIDAZIONE DEL PAYLOAD -
+# Controllo il payload una sola volta all'ingresso: dopo la validazione il resto della pipeline
+# lavora su valori già convertiti e non deve più gestire input malformati.
+# Esame: Ingegneria del Software (INGINF06)
+OBIETTIVI_ALLOCAZIONE = ("bottiglie", "litri")
+LIMITE_STAGIONI_PAYLOAD = 100_000   # Stagioni massime per richiesta nella modalità a bande di rischio
+# La politica "intera" risolve una programmazione dinamica per ogni stagione (circa 1 ms per lotto):
+# nelle bande di rischio limito il prodotto lotti x stagioni, le altre politiche sono vettoriali
+LIMITE_LOTTI_STAGIONI_INTERA = 5_000
+# La modalità per pianta genera un valore per ogni vite (circa 15 milioni al secondo): limito le
+# piante del lotto, e con esse il tempo di una richiesta
+LIMITE_PIANTE_ETEROGENEITA = 5_000_000
+MODALITA_SIMULAZIONE = ("stagione", "analitica")
+
+class ErrorePayload(ValueError):
+    """
+    Payload non valido. 'campo' indica dove si trova l'errore (es. "lotti[1].config.concime").
+    """
+    def __init__(self, messaggio, campo = None):
+        super().__init__(messaggio if campo is None else f"{campo}: {messaggio}")
+        self.messaggio = messaggio
+        self.campo = campo
+
+    def come_dizionario(self):
+        return {"errore": self.messaggio, "campo": self.campo}
+
+def _numero(valore, campo, minimo = None, intero = False):
+    """
+    Converto un valore numerico del payload (accetto anche stringhe numeriche, come quelle dei form HTML).
+    Con intero = True un valore con parte decimale (es. 2.7) viene rifiutato, non troncato.
+    """
+    if isinstance(valore, bool):
+        raise ErrorePayload("atteso un numero", campo)
+    try:
+        # Interi e stringhe passano da int() (nessuna perdita di precisione sui seed a 64 bit)
+        numero = int(valore) if intero and isinstance(valore, (int, str)) else float(valore)
+    except (TypeError, ValueError):
+        raise ErrorePayload(f"atteso un numero{' intero' if intero else ''}, ricevuto {valore!r}", campo) from None
+    if numero != numero or numero in (float("inf"), float("-inf")):
+        raise ErrorePayload("atteso un numero finito", campo)
+    if intero and isinstance(numero, float):
+        if not numero.is_integer():
+            raise ErrorePayload(f"atteso un numero intero, ricevuto {valore!r}", campo)
+        numero = int(numero)
+    if minimo is not None and numero < minimo:
+        raise ErrorePayload(f"deve essere almeno {minimo}", campo)
+    return numero
+
+def _valida_eterogeneita(valore, n_piante, campo):
+    """
+    Valido i parametri della modalità per pianta di un lotto ({} o true = tutti i default).
+    """
+    from eterogeneita_piante import LIMITE_ZONE, PARAMETRI_ETEROGENEITA, numero_zone, probabilita_miscela
+
+    if valore is True:
+        valore = {}
+    if not isinstance(valore, dict):
+        raise ErrorePayload(f"atteso un oggetto con {', '.join(PARAMETRI_ETEROGENEITA)}", campo)
+    for chiave in valore:
+        if chiave not in PARAMETRI_ETEROGENEITA:
+            raise ErrorePayload(f"parametro sconosciuto {chiave!r} (ammessi: {', '.join(PARAMETRI_ETEROGENEITA)})", f"{campo}.{chiave}")
+
+    parametri = {**PARAMETRI_ETEROGENEITA, **valore}
+    for chiave in ("piante_per_filare", "filari_per_zona"):
+        parametri[chiave] = _numero(parametri[chiave], f"{campo}.{chiave}", 1, intero = True)
+    for chiave in ("correlazione_filare", "correlazione_zona", "variabilita_esposizione"):
+        parametri[chiave] = _numero(parametri[chiave], f"{campo}.{chiave}", 0)
+        if parametri[chiave] > 1:
+            raise ErrorePayload("deve essere al più 1", f"{campo}.{chiave}")
+    try:
+        probabilita_miscela(parametri["correlazione_filare"], parametri["correlazione_zona"])
+    except ValueError as e:
+        raise ErrorePayload(str(e), f"{campo}.correlazione_filare") from None
+
+    n_zone = numero_zone(n_piante, parametri["piante_per_filare"], parametri["filari_per_zona"])
+    if n_zone > LIMITE_ZONE:
+        raise ErrorePayload(f"al più {LIMITE_ZONE} zone per lotto ({n_zone} con questi valori): aumentare "
+                            "piante_per_filare o filari_per_zona", f"{campo}.filari_per_zona")
+
+    # Esposizione ai patogeni zona per zona (facoltativa): una per zona, nell'ordine dei filari
+    esposizione = parametri["esposizione_zone"]
+    if esposizione is not None:
+        if not isinstance(esposizione, list) or len(esposizione) != n_zone:
+            raise ErrorePayload(f"attesa una lista di {n_zone} valori (uno per zona)", f"{campo}.esposizione_zone")
+        parametri["esposizione_zone"] = [_numero(e, f"{campo}.esposizione_zone[{k}]", 0) for k, e in enumerate(esposizione)]
+    return parametri
+
+def _valida_lotto(d, i):
+    """
+    Valido e normalizzo un singolo lotto del payload.
+    """
+    prefisso = f"lotti[{i}]"
+    if not isinstance(d, dict):
+        raise ErrorePayload("atteso un oggetto", prefisso)
+    for chiave in ("id", "cultivar", "n_piante", "ettari", "config"):
+        if chiave not in d:
+            raise ErrorePayload("campo obbligatorio mancante", f"{prefisso}.{chiave}")
+
+    # Tipologia, concime e trattamento controllati sul registro agronomico. La cultivar è libera:
+    # se è registrata, tipologia e tempo unitario mancanti sono quelli di riferimento, altrimenti
+    # vanno indicati nel payload
+    def nome_registro(categoria, nome, campo):
+        try:
+            return REGISTRO.nome_valido(categoria, nome)
+        except NomeSconosciuto as e:
+            raise ErrorePayload(str(e), f"{prefisso}.{campo}") from None
+
+    config = d["config"]
+    if not isinstance(config, dict):
+        raise ErrorePayload("atteso un oggetto", f"{prefisso}.config")
+    for chiave in ("capacita_giornaliera", "concime", "trattamento"):
+        if chiave not in config:
+            raise ErrorePayload("campo obbligatorio mancante", f"{prefisso}.config.{chiave}")
+
+    cultivar = REGISTRO.riferimento_cultivar(d["cultivar"])
+    if cultivar is None:
+        for campo, presente in (("tipologia", "tipologia" in d), ("config.tempo_unitario", "tempo_unitario" in config)):
+            if not presente:
+                raise ErrorePayload(f"campo obbligatorio per una cultivar non registrata {d['cultivar']!r} "
+                                    f"(registrate: {', '.join(REGISTRO.nomi_cultivar)})", f"{prefisso}.{campo}")
+        cultivar = {}
+    tipologia = nome_registro("flusso", d.get("tipologia", cultivar.get("tipologia")), "tipologia")
+
+    capacita = _numero(config["capacita_giornaliera"], f"{prefisso}.config.capacita_giornaliera")
+    if capacita <= 0:
+        raise ErrorePayload("deve essere maggiore di zero", f"{prefisso}.config.capacita_giornaliera")
+
+    lotto = dict(d)
+    lotto["tipologia"] = tipologia
+    lotto["n_piante"] = _numero(d["n_piante"], f"{prefisso}.n_piante", 0, intero = True)
+    lotto["ettari"] = _numero(d["ettari"], f"{prefisso}.ettari", 0)
+    lotto["priorita"] = _numero(d.get("priorita", 2), f"{prefisso}.priorita", intero = True)
+    lotto["quote_intere"] = _numero(d.get("quote_intere", 1), f"{prefisso}.quote_intere", 1, intero = True)
+    # Un lotto è frazionabile solo se lo dice esplicitamente (default: tutto o niente nella politica 'intera')
+    frazionabile = d.get("frazionabile")
+    if frazionabile is not None and not isinstance(frazionabile, bool):
+        raise ErrorePayload(f"atteso true o false, ricevuto {frazionabile!r}", f"{prefisso}.frazionabile")
+    lotto["frazionabile"] = bool(frazionabile)
+    lotto["config"] = {
+        "capacita_giornaliera": capacita,
+        "tempo_unitario": _numero(config.get("tempo_unitario", cultivar.get("tempo_unitario")), f"{prefisso}.config.tempo_unitario", 0),
+        "concime": nome_registro("concime", config["concime"], "config.concime"),
+        "trattamento": nome_registro("trattamento", config["trattamento"], "config.trattamento"),
+    }
+    if d.get("eterogeneita") not in (None, False):
+        if lotto["n_piante"] > LIMITE_PIANTE_ETEROGENEITA:
+            raise ErrorePayload(f"al più {LIMITE_PIANTE_ETEROGENEITA} piante per lotto nella modalità per pianta", f"{prefisso}.n_piante")
+        lotto["eterogeneita"] = _valida_eterogeneita(d["eterogeneita"], lotto["n_piante"], f"{prefisso}.eterogeneita")
+    else:
+        lotto["eterogeneita"] = None
+    return lotto
+
+def valida_payload(payload):
+    """
+    Valido il payload della simulazione e restituisco un nuovo dizionario normalizzato
+    (numeri convertiti, valori di default applicati). Solleva ErrorePayload al primo errore.
+    """
+    if not isinstance(payload, dict):
+        raise ErrorePayload("il payload deve essere un oggetto JSON")
+
+    seed = payload.get("seed")
+    politica = payload.get("politica_allocazione", POLITICA_ALLOCAZIONE)
+    obiettivo = payload.get("obiettivo_allocazione", OBIETTIVO_ALLOCAZIONE)
+    if politica not in ALLOCATORI:
+        raise ErrorePayload(f"politica sconosciuta {politica!r} (disponibili: {', '.join(ALLOCATORI)})", "politica_allocazione")
+    if obiettivo not in OBIETTIVI_ALLOCAZIONE:
+        raise ErrorePayload(f"obiettivo sconosciuto {obiettivo!r} (ammessi: {', '.join(OBIETTIVI_ALLOCAZIONE)})", "obiettivo_allocazione")
+
+    lotti = payload.get("lotti", [])
+    if not isinstance(lotti, list):
+        raise ErrorePayload("attesa una lista di lotti", "lotti")
+
+    # Meteo misurato (opzionale): {"pioggia_mm": ..., "temp_avg": ...}; senza, viene estratto a caso
+    meteo = payload.get("meteo")
+    if meteo is not None:
+        if not isinstance(meteo, dict):
+            raise ErrorePayload("atteso un oggetto con pioggia_mm e temp_avg", "meteo")
+        meteo = meteo_da_trend(_numero(meteo.get("pioggia_mm"), "meteo.pioggia_mm", 0),
+                               _numero(meteo.get("temp_avg"), "meteo.temp_avg"))
+
+    # Numero di stagioni (opzionale): se presente restituisco le bande di rischio invece di una sola stagione
+    n_stagioni = payload.get("n_stagioni")
+    if n_stagioni is not None:
+        n_stagioni = _numero(n_stagioni, "n_stagioni", 1, intero = True)
+        if n_stagioni > LIMITE_STAGIONI_PAYLOAD:
+            raise ErrorePayload(f"al più {LIMITE_STAGIONI_PAYLOAD} stagioni per richiesta", "n_stagioni")
+
+    # Modalità "analitica": valori attesi e deviazioni standard in forma chiusa, senza campionamento
+    modalita = payload.get("modalita", "stagione")
+    if modalita not in MODALITA_SIMULAZIONE:
+        raise ErrorePayload(f"modalità sconosciuta {modalita!r} (ammesse: {', '.join(MODALITA_SIMULAZIONE)})", "modalita")
+    if modalita == "analitica" and n_stagioni is not None:
+        raise ErrorePayload("n_stagioni non si applica alla modalità analitica", "n_stagioni")
+
+    # Risorse fisiche (opzionale): {"squadre": 2, "presse": 1, "vasche": 4, "ore_pressatura_q": 0.25};
+    # se presente, allo scenario si aggiunge il calendario a eventi discreti (vedi scheduler_eventi.py)
+    risorse = payload.get("risorse")
+    if risorse is not None:
+        from scheduler_eventi import RISORSE
+
+        if not isinstance(risorse, dict):
+            raise ErrorePayload(f"atteso un oggetto con {', '.join(RISORSE)}", "risorse")
+        if modalita == "analitica" or n_stagioni is not None:
+            raise ErrorePayload("il calendario delle risorse si calcola solo sulla singola stagione", "risorse")
+        for chiave in risorse:
+            if chiave not in RISORSE and chiave != "ore_pressatura_q":
+                raise ErrorePayload(f"risorsa sconosciuta {chiave!r} (ammesse: {', '.join(RISORSE)}, ore_pressatura_q)", f"risorse.{chiave}")
+        risorse = {chiave: _numero(valore, f"risorse.{chiave}", 0) if chiave == "ore_pressatura_q"
+                   else _numero(valore, f"risorse.{chiave}", 1, intero = True)
+                   for chiave, valore in risorse.items()}
+
+    # La modalità per pianta esiste solo nel simulatore a oggetti (una stagione alla volta):
+    # bande di rischio e modalità analitica usano il modello con una resa per lotto
+    ore_budget = _numero(payload.get("ore_budget", ORE_AZIENDALI_TOTALI), "ore_budget", 0)
+    seed = None if seed is None else _numero(seed, "seed", intero = True)
+    lotti_validati = [_valida_lotto(d, i) for i, d in enumerate(lotti)]
+    if n_stagioni is not None and politica == "intera" and n_stagioni * len(lotti_validati) > LIMITE_LOTTI_STAGIONI_INTERA:
+        raise ErrorePayload(f"con la politica intera al più {LIMITE_LOTTI_STAGIONI_INTERA} lotti x stagioni per richiesta "
+                            f"(ricevuti {len(lotti_validati)} x {n_stagioni})", "n_stagioni")
+    if modalita == "analitica" or n_stagioni is not None:
+        for i, lotto in enumerate(lotti_validati):
+            if lotto["eterogeneita"] is not None:
+                raise ErrorePayload("la modalità per pianta si calcola solo sulla singola stagione", f"lotti[{i}].eterogeneita")
+
+    return {
+        **payload,
+        "ore_budget": ore_budget,
+        "seed": seed,
+        "politica_allocazione": politica,
+        "obiettivo_allocazione": obiettivo,
+        "meteo": meteo,
+        "n_stagioni": n_stagioni,
+        "modalita": modalita,
+        "risorse": risorse,
+        "lotti": lotti_validati,
+    }
+
+def crea_lotti_da_payload(dati_list):
+    """
+    Converto la lista 'lotti' del payload JSON in oggetti SimulatoreLottoVigneto.
+    """
+    return [crea_lotto_da_dict(d) for d in dati_list]
+
+def ricalcola_lotto(lotto, seed, stagione = 0):
+    """
+    Ricalcolo un singolo lotto per una singola stagione, senza dover rieseguire gli altri:
+    il risultato coincide con quello ottenuto nell'esecuzione completa con lo stesso seed.
+    """
+    meteo = ottieni_dati_meteo_iot(crea_stream_meteo(seed, stagione))
+    return lotto.esegui_simulazione(meteo, crea_stream_lotto(seed, stagione, lotto.id))
+
+# - CACHE DEI RISULTATI SIMULATI -
+# La simulazione stocastica (FASE 2) e l'allocazione del budget sono separate: i risultati grezzi
+# (non ancora tagliati dal budget) vengono memorizzati per (configurazione lotti + seed), così
+# cambiare budget o priorità ripete solo l'allocazione, senza ri-simulare la stagione.
+# Solo gli scenari con seed esplicito possono ripetersi: quelli con seed estratto al momento non
+# vengono memorizzati. Il peso di ogni voce è il numero di lotti (circa 1,3 KB ciascuno), così la
+# memoria occupata resta limitata anche con inventari da centinaia di migliaia di lotti.
+# Esami: Algoritmi e strutture dati (INF01I) - Ingegneria del Software (INGINF06)
+DIMENSIONE_CACHE_SIMULAZIONI = 128   # Numero massimo di scenari simulati conservati
+LOTTI_CACHE_SIMULAZIONI = 50_000     # Lotti complessivi conservati (uno scenario più grande non entra)
+TTL_CACHE_SIMULAZIONI = 600.0        # Secondi di validità di ogni voce
+
+class CacheLRU:
+    """
+    Cache con politica LRU (Least Recently Used), dimensione massima e scadenza (TTL) per voce.
+    Con 'max_peso' limita anche la somma dei pesi delle voci (es. il numero di lotti): una voce
+    più pesante dell'intera cache non viene memorizzata.
+    Thread-safe: può essere condivisa tra le richieste concorrenti del server web.
+    """
+    def __init__(self, max_elementi, ttl_secondi, max_peso = None):
+        self.max_elementi = max_elementi
+        self.ttl_secondi = ttl_secondi
+        self.max_peso = max_peso
+        self._voci = OrderedDict()
+        self._peso = 0
+        self._lock = threading.Lock()
+        self.hit = 0
+        self.miss = 0
+
+    def leggi(self, chiave):
+        """
+        Restituisce il valore associato alla chiave, oppure None se assente o scaduto.
+        """
+        with self._lock:
+            voce = self._voci.get(chiave)
+            if voce is None or time.monotonic() - voce[0] > self.ttl_secondi:
+                if voce is not None:
+                    del self._voci[chiave]
+                    self._peso -= voce[2]
+                self.miss += 1
+                return None
+            self._voci.move_to_end(chiave)
+            self.hit += 1
+            return voce[1]
+
+    def scrivi(self, chiave, valore, peso = 1):
+        """
+        Memorizza la voce; restituisce False se è troppo pesante per la cache.
+        """
+        if self.max_peso is not None and peso > self.max_peso:
+            return False
+        with self._lock:
+            precedente = self._voci.pop(chiave, None)
+            if precedente is not None:
+                self._peso -= precedente[2]
+            self._voci[chiave] = (time.monotonic(), valore, peso)
+            self._peso += peso
+            while len(self._voci) > self.max_elementi or (self.max_peso is not None and self._peso > self.max_peso):
+                self._peso -= self._voci.popitem(last=False)[1][2]
+        return True
+
+    def svuota(self):
+        with self._lock:
+            self._voci.clear()
+            self._peso = 0
+
+    def __len__(self):
+        return len(self._voci)
+
+CACHE_SIMULAZIONI = CacheLRU(DIMENSIONE_CACHE_SIMULAZIONI, TTL_CACHE_SIMULAZIONI, LOTTI_CACHE_SIMULAZIONI)
+
+def chiave_simulazione(lista_lotti, seed, stagione = 0, meteo = None):
+    """
+    Impronta (hash) della configurazione dei lotti, del seed e dell'eventuale meteo misurato.
+    La priorità non ne fa parte: influisce solo sull'allocazione, non sui numeri simulati.
+    """
+    configurazione = [
+        [repr(l.id), l.cultivar, l.tipologia, l.n_piante, l.ettari,
+         l.cap_max_raccolta_q, l.tempo_lavorazione_q, l.concime, l.trattamento, l.eterogeneita]
+        for l in lista_lotti
+    ]
+    testo = json.dumps([seed, stagione, meteo, configurazione], separators=(",", ":"), sort_keys=True)
+    return hashlib.blake2b(testo.encode("utf-8"), digest_size=16).hexdigest()
+
+# - FASE 2: SIMULAZIONE (SENZA BUDGET) -
+def simula_lotti(lista_lotti, seed, stagione = 0, usa_cache = True, meteo = None):
+    """
+    Esegue la simulazione stocastica di tutti i lotti e restituisce (meteo, risultati grezzi),
+    cioè i risultati al 100% prima di qualsiasi taglio di budget. I risultati grezzi non vanno
+    modificati: sono condivisi con la cache (alloca_budget lavora sempre su copie).
+    'meteo' (opzionale) è il trend misurato dalle centraline: se presente non viene estratto a caso.
+    usa_cache va spento quando il seed è stato appena estratto: lo scenario non si ripeterà.
+    """
+    chiave = chiave_simulazione(lista_lotti, seed, stagione, meteo) if usa_cache else None
+    if chiave is not None:
+        in_cache = CACHE_SIMULAZIONI.leggi(chiave)
+        if in_cache is not None:
+            metriche.CACHE_SIMULAZIONI.incrementa(1, "hit")
+            return in_cache
+        metriche.CACHE_SIMULAZIONI.incrementa(1, "miss")
+
+    with metriche.fase("simulazione"):
+        if meteo is None:
+            meteo = ottieni_dati_meteo_iot(crea_stream_meteo(seed, stagione))
+        risultati = []
+
+        # Eseguo la logica su ogni oggetto, ognuno con il proprio stream indipendente
+        for lotto in lista_lotti:
+            res = lotto.esegui_simulazione(meteo, crea_stream_lotto(seed, stagione, lotto.id))
+            risultati.append(res)
+    metriche.LOTTI_SIMULATI.incrementa(len(risultati))
+
+    if chiave is not None:
+        CACHE_SIMULAZIONI.scrivi(chiave, (meteo, risultati), peso = len(risultati))
+    return meteo, risultati
+
+# - ALLOCAZIONE DEL BUDGET ORE -
+def copia_risultato(res, priorita = None):
+    """
+    Copia di un risultato grezzo, abbastanza profonda da poter essere modificata dall'allocazione.
+    """
+    copia = dict(res)
+    copia["input_config"] = dict(res["input_config"])
+    copia["output"] = dict(res["output"])
+    copia["output"]["dettaglio_ore"] = dict(res["output"]["dettaglio_ore"])
+    if priorita is not None:
+        copia["priorita"] = priorita
+    return copia
+
+def richieste_allocazione(risultati, vincoli = None):
+    """
+    Riduco i risultati simulati alle sole informazioni che servono alle politiche di allocazione.
+    'vincoli' (opzionale) è la lista di coppie (frazionabile, quote_intere) dei lotti, nello stesso ordine.
+    """
+    vincoli = vincoli or [(None, 1)] * len(risultati)
+    return [
+        {
+            "id": r.get("id", ""),
+            "priorita": r.get("priorita", 2),
+            "ore": r["output"]["ore_totali"],
+            "bottiglie": r["output"]["n_bottiglie"],
+            "litri": r["output"]["vino_litri"],
+            "frazionabile": frazionabile,
+            "quote": quote,
+        }
+        for r, (frazionabile, quote) in zip(risultati, vincoli)
+    ]
+
+def alloca_budget(risultati_grezzi, budget_ore_disponibile, priorita = None, politica = "greedy", obiettivo = "bottiglie", vincoli = None, **opzioni):
+    """
+    Ripartisce il budget ore sui lotti secondo la politica scelta (vedi allocatori.py, default
+    'greedy': ordine di priorità e ID) e applica il taglio proporzionale di produzione.
+    Restituisce nuovi dizionari: i risultati grezzi restano intatti.
+    'priorita' (opzionale) è la lista delle priorità correnti dei lotti, nello stesso ordine.
+    """
+    if politica not in ALLOCATORI:
+        raise ValueError(f"Politica di allocazione sconosciuta: '{politica}' (disponibili: {', '.join(ALLOCATORI)})")
+
+    with metriche.fase("allocazione"):
+        if priorita is None:
+            risultati = [copia_risultato(r) for r in risultati_grezzi]
+        else:
+            risultati = [copia_risultato(r, p) for r, p in zip(risultati_grezzi, priorita)]
+
+        percentuali = ALLOCATORI[politica](richieste_allocazione(risultati, vincoli), budget_ore_disponibile, obiettivo = obiettivo, **opzioni)
+
+        for res, percentuale in zip(risultati, percentuali):
+
+            # Salvo ore teoriche complete (necessarie al 100%)
+            res["ore_necessarie_100"] = round(res["output"]["ore_totali"], 2)
+
+            # Penalizzazione proporzionale produzione
+            fattore = percentuale / 100.0
+
+            res["output"]["uva_kg"] = round(res["output"]["uva_kg"] * fattore, 2)
+            res["output"]["vino_litri"] = round(res["output"]["vino_litri"] * fattore, 2)
+            res["output"]["vinaccia_kg"] = round(res["output"]["vinaccia_kg"] * fattore, 2)
+            res["output"]["n_bottiglie"] = int(res["output"]["n_bottiglie"] * fattore)
+
+            # Riduco le ore nel dettaglio (ciclo for per evitare errori di arrotondamento multiplo)
+            for k in ["vendemmia", "cantina", "gestione"]:
+                res["output"]["dettaglio_ore"][k] = round(res["output"]["dettaglio_ore"][k] * fattore, 2)
+
+            # Aggiorno il totale ore usato
+            res["output"]["ore_totali"] = round(sum(res["output"]["dettaglio_ore"].values()), 2)
+            res["percentuale_elaborazione"] = round(percentuale, 1)
+
+            # Definisco lo stato testuale
+            if percentuale >= 99.9: res["stato_produzione"] = "Completato"
+            elif percentuale > 0: res["stato_produzione"] = "Parziale"
+            else: res["stato_produzione"] = "Non Avviato"
+
+    # Conto gli esiti (Completato / Parziale / Non Avviato) solo se la strumentazione è attiva
+    if metriche.attive():
+        esiti = {}
+        for res in risultati:
+            esiti[res["stato_produzione"]] = esiti.get(res["stato_produzione"], 0) + 1
+        for stato, n in esiti.items():
+            metriche.ESITI_ALLOCAZIONE.incrementa(n, politica, stato)
+
+    return risultati
+
+def calcola_totali(risultati, budget_ore_disponibile):
+    """
+    Ricalcolo i totali aziendali a partire dai risultati già allocati.
+    """
+    tot_uva = sum(r['output']['uva_kg'] for r in risultati)
+    tot_vino = sum(r['output']['vino_litri'] for r in risultati)
+    tot_vinaccia = sum(r['output']['vinaccia_kg'] for r in risultati)
+    tot_bottiglie = sum(r['output']['n_bottiglie'] for r in risultati)
+    tot_ore_effettive = sum(r['output']['ore_totali'] for r in risultati)
+    tot_ore_teoriche = sum(r['ore_necessarie_100'] for r in risultati)
+
+    return {
+        "budget_iniziale": budget_ore_disponibile,
+        "totale_uva_kg": round(tot_uva, 2),
+        "totale_vino_litri": round(tot_vino, 2),
+        "totale_vinaccia_biomassa_kg": round(tot_vinaccia, 2),
+        "totale_ore_effettive": round(tot_ore_effettive, 2),
+        "totale_ore_necessarie_100": round(tot_ore_teoriche, 2),
+        "totale_bottiglie_1_5L": tot_bottiglie
+    }
+
+# - ESECUZIONE DI UNO SCENARIO -
+def esegui_scenario(lista_lotti, budget_ore_disponibile, seed, usa_cache = True, politica = "greedy", obiettivo = "bottiglie", meteo = None, risorse = None):
+    '''
+    Esegue la simulazione (FASE 2) e l'allocazione del budget ore su una lista di lotti già
+    configurati e restituisce il dizionario finale dei dati. Lavora solo su strutture Python,
+    senza passaggi JSON: è il punto d'ingresso usato anche dallo sweep degli scenari.
+    Se la stessa configurazione è già stata simulata con lo stesso seed, ripeto solo l'allocazione.
+    Con 'risorse' (squadre, presse, vasche) aggiungo il calendario dei lotti avviati sulle risorse fisiche.
+    '''
+    meteo, risultati_grezzi = simula_lotti(lista_lotti, seed, usa_cache = usa_cache, meteo = meteo)
+    risultati = alloca_budget(risultati_grezzi, budget_ore_disponibile, [l.priorita for l in lista_lotti],
+                              politica, obiettivo, vincoli_lotti(lista_lotti))
+
+    # Costruisco il dizionario finale dei dati
+    dati_finali = {
+        "seed": seed,
+        "politica_allocazione": politica,
+        "meteo_rilevato": meteo,
+        "dettaglio_lotti": risultati,
+        "totali_azienda": calcola_totali(risultati, budget_ore_disponibile)
+    }
+    if risorse is not None:
+        dati_finali["calendario_risorse"] = esegui_calendario_risorse(risultati, risorse)
+    return dati_finali
+
+# - SCENARIO SU GRANDI INVENTARI (COLONNE NUMPY) -
+# Da SOGLIA_LOTTI_FLOTTA lotti in su la stagione singola passa da flotta_lotti.LottoFleet: nessun
+# oggetto lotto né dizionario intermedio per lotto, i dizionari di 'dettaglio_lotti' vengono
+# costruiti solo per l'output. Stessi numeri del percorso a oggetti (tests/test_flotta_lotti.py).
+# Non usa la cache dei risultati simulati: già da 1.000 lotti ricalcolare la stagione a colonne
+# costa meno che rileggerla dalla cache e ripetere l'allocazione sui dizionari.
+SOGLIA_LOTTI_FLOTTA = 1_000
+
+def usa_flotta(dati):
+    '''
+    True se lo scenario (payload validato) va calcolato con LottoFleet: stagione singola, senza
+    calendario delle risorse né modalità per pianta, con almeno SOGLIA_LOTTI_FLOTTA lotti.
+    '''
+    return (len(dati["lotti"]) >= SOGLIA_LOTTI_FLOTTA and dati["modalita"] == "stagione" and not dati["n_stagioni"]
+            and dati["risorse"] is None and all(l["eterogeneita"] is None for l in dati["lotti"]))
+
+def esegui_scenario_flotta(lotti, budget_ore_disponibile, seed, politica = "greedy", obiettivo = "bottiglie", meteo = None):
+    '''
+    Come esegui_scenario, per la lista 'lotti' di un payload validato, calcolata a colonne.
+    '''
+    from flotta_lotti import LottoFleet
+
+    with metriche.fase("costruzione_lotti"):
+        flotta = LottoFleet.da_validati(lotti)
+    with metriche.fase("simulazione"):
+        if meteo is None:
+            meteo = ottieni_dati_meteo_iot(crea_stream_meteo(seed))
+        flotta.simula(meteo, seed)
+    metriche.LOTTI_SIMULATI.incrementa(len(flotta))
+    with metriche.fase("allocazione"):
+        flotta.alloca(budget_ore_disponibile, politica, obiettivo)
+    if metriche.attive():
+        for stato, n in flotta.conteggio_stati().items():
+            metriche.ESITI_ALLOCAZIONE.incrementa(n, politica, stato)
+
+    return {
+        "seed": seed,
+        "politica_allocazione": politica,
+        **flotta.come_dati_finali(meteo, budget_ore_disponibile)
+    }
+
+# - CALENDARIO DELLE RISORSE FISICHE -
+def esegui_calendario_risorse(risultati, risorse):
+    '''
+    Calendario a eventi discreti dei lotti avviati su squadre, presse e vasche (vedi scheduler_eventi.py):
+    inizio e fine di ogni lotto, attese in coda e utilizzo delle risorse.
+    '''
+    from scheduler_eventi import pianifica_risorse
+
+    with metriche.fase("calendario_risorse"):
+        return pianifica_risorse(risultati, risorse)
+
+def vincoli_lotti(lista_lotti):
+    """
+    Coppie (frazionabile, quote_intere) dei lotti, usate dalla politica di allocazione 'intera'.
+    """
+    return [(l.frazionabile, l.quote_intere) for l in lista_lotti]
+
+def confronta_politiche(lista_lotti, budget_ore_disponibile, seed, politiche = None, obiettivo = "bottiglie", meteo = None, usa_cache = True):
+    '''
+    Confronta fianco a fianco le politiche di allocazione sulla stessa stagione simulata: la
+    simulazione viene eseguita una sola volta, per ogni politica ripeto solo l'allocazione.
+    Restituisce {politica: {"totali_azienda": ..., "percentuali": {id_lotto: percentuale}}}.
+    '''
+    meteo, risultati_grezzi = simula_lotti(lista_lotti, seed, usa_cache = usa_cache, meteo = meteo)
+    priorita = [l.priorita for l in lista_lotti]
+    vincoli = vincoli_lotti(lista_lotti)
+
+    confronto = {}
+    for politica in politiche or list(ALLOCATORI):
+        risultati = alloca_budget(risultati_grezzi, budget_ore_disponibile, priorita, politica, obiettivo, vincoli)
+        confronto[politica] = {
+            "totali_azienda": calcola_totali(risultati, budget_ore_disponibile),
+            "percentuali": {r["id"]: r["percentuale_elaborazione"] for r in risultati},
+        }
+    return {"seed": seed, "meteo_rilevato": meteo, "obiettivo": obiettivo, "politiche": confronto}
+
+# - BANDE DI RISCHIO SU MOLTE STAGIONI -
+def esegui_bande_rischio(lista_lotti, budget_ore_disponibile, seed, n_stagioni, politica = "greedy", obiettivo = "bottiglie", meteo = None):
+    '''
+    Al posto di una singola stagione estratta a caso, simula n_stagioni stagioni con il motore
+    vettoriale e restituisce le bande P10 / P50 / P90 (statistiche online, vedi statistiche_online.py).
+    NumPy viene importato solo qui, quando la modalità viene richiesta.
+    '''
+    from statistiche_online import bande_rischio
+
+    with metriche.fase("bande_rischio"):
+        return bande_rischio(lista_lotti, budget_ore_disponibile, n_stagioni, seed, politica, obiettivo, meteo)
+
+# - MODALITÀ ANALITICA -
+def esegui_modello_analitico(lista_lotti, budget_ore_disponibile, meteo = None):
+    '''
+    Valori attesi e deviazioni standard in forma chiusa (vedi modello_analitico.py): nessuna
+    estrazione casuale, quindi il seed non serve. Pensata per le anteprime istantanee della dashboard.
+    '''
+    from modello_analitico import modello_analitico
+
+    with metriche.fase("analitica"):
+        return modello_analitico(lista_lotti, budget_ore_disponibile, meteo)
+
+# - API A DIZIONARI -
+def simula(payload, seed = None, meteo = None, usa_cache = True):
+    '''
+    Punto d'ingresso per chi ha già il payload come dizionario (es. il server web): valida il
+    payload, esegue lo scenario e restituisce il dizionario finale dei dati, senza passaggi
+    intermedi in JSON. Solleva ErrorePayload se il payload non è valido.
+    seed: ha precedenza sul campo "seed" del payload; senza seed ne viene estratto uno nuovo.
+    meteo: trend misurato (es. ReteStazioni.trend_stagionale()); ha precedenza sul campo "meteo".
+    usa_cache: False se il seed passato è stato appena estratto (lo scenario non si ripeterà).
+    Con il campo "n_stagioni" restituisce le bande di rischio (vedi esegui_bande_rischio), con
+    "modalita": "analitica" i valori attesi in forma chiusa (vedi esegui_modello_analitico); con
+    "risorse" lo scenario include il calendario su squadre, presse e vasche (vedi esegui_calendario_risorse).
+    '''
+    with metriche.fase("validazione"):
+        try:
+            dati = valida_payload(payload)
+        except ErrorePayload:
+            metriche.ERRORI_PAYLOAD.incrementa(1, "validazione")
+            raise
+    return simula_validato(dati, seed, meteo, usa_cache)
+
+def simula_validato(dati, seed = None, meteo = None, usa_cache = True):
+    '''
+    Come simula, per un payload già restituito da valida_payload: chi lo ha validato per primo
+    (es. la rotta, che ne ricava anche la chiave della cache delle risposte) non lo rivalida.
+    '''
+    metriche.SCENARI_ESEGUITI.incrementa(1, "dizionario")
+    if seed is None:
+        # Seed estratto qui: nessun'altra richiesta potrà ripetere lo scenario, non lo memorizzo
+        usa_cache = usa_cache and dati["seed"] is not None
+        seed = nuovo_seed() if dati["seed"] is None else dati["seed"]
+
+    if usa_flotta(dati):
+        return esegui_scenario_flotta(dati["lotti"], dati["ore_budget"], seed, dati["politica_allocazione"],
+                                      dati["obiettivo_allocazione"], dati["meteo"] if meteo is None else meteo)
+
+    with metriche.fase("costruzione_lotti"):
+        lista_lotti = crea_lotti_da_payload(dati["lotti"])
+
+    if dati["modalita"] == "analitica":
+        return esegui_modello_analitico(lista_lotti, dati["ore_budget"], dati["meteo"] if meteo is None else meteo)
+    if dati["n_stagioni"]:
+        return esegui_bande_rischio(lista_lotti, dati["ore_budget"], seed, dati["n_stagioni"],
+                                    dati["politica_allocazione"], dati["obiettivo_allocazione"],
+                                    dati["meteo"] if meteo is None else meteo)
+
+    return esegui_scenario(
+        lista_lotti,
+        dati["ore_budget"],
+        seed,
+        usa_cache = usa_cache,
+        politica = dati["politica_allocazione"],
+        obiettivo = dati["obiettivo_allocazione"],
+        meteo = dati["meteo"] if meteo is None else meteo,
+        risorse = dati["risorse"]
+    )
 
 # - CONTROLLER PRINCIPALE -
-def main_controller(modalita_input, json_data = None):
+def main_controller(modalita_input, json_data = None, seed = None):
     '''
     Controller principale che gestisce l'intero flusso di simulazione.
     modalita_input: 'manuale' o 'json' per scegliere la fonte dei dati.
     json_data: stringa JSON se modalita_input è 'json'.
+    seed: seed della simulazione (ha precedenza sul campo "seed" del JSON e su SEED_SIMULAZIONE).
     '''
 
     lista_lotti = []
+    lotti_flotta = None   # Lotti validati di un grande inventario, calcolati a colonne (vedi usa_flotta)
     # Inizializzo il budget con il valore globale di default (caso manuale)
     budget_ore_disponibile = ORE_AZIENDALI_TOTALI
+    seed_richiesto = SEED_SIMULAZIONE
+    politica = POLITICA_ALLOCAZIONE
+    obiettivo = OBIETTIVO_ALLOCAZIONE
+    meteo_misurato = None
+    n_stagioni = None
+    modalita_simulazione = "stagione"
+    risorse = None
 
     # - FASE 1: INIZIALIZZAZIONE -
     # Controllo prioritario: Se c'è un JSON valido (e non è None), uso quello (API mode)
@@ -318,26 +1169,32 @@ def main_controller(modalita_input, json_data = None):
 
             # Deserializzazione del payload JSON: trasformo la stringa ricevuta dal frontend in strutture dati manipolabili dal backend Python.
             # Esame: Basi di Dati (INGINF05)
-            payload = json.loads(json_data)
-            
-            # Estraggo il budget dal JSON (con fallback se manca)
-            budget_ore_disponibile = float(payload.get('ore_budget', ORE_AZIENDALI_TOTALI))
-            dati_list = payload.get('lotti', [])
-
-            for d in dati_list:
-                Nuovo = SimulatoreLottoVigneto(d['id'], d['cultivar'], d['tipologia'], int(d['n_piante']), float(d['ettari']))
-                Nuovo.configura_parametri(
-                    float(d['config']['capacita_giornaliera']),
-                    float(d['config']['tempo_unitario']),
-                    d['config']['concime'],
-                    d['config']['trattamento'],
-                    d.get('priorita', 2)
-                )
-                lista_lotti.append(Nuovo)
-
-        except Exception as e:
+            with metriche.fase("parsing"):
+                payload = valida_payload(json.loads(json_data))
+
+        except ErrorePayload as e:
+            # Payload leggibile ma non valido: restituisco l'oggetto errore (con il campo incriminato)
+            metriche.ERRORI_PAYLOAD.incrementa(1, "validazione")
+            return json.dumps(e.come_dizionario())
+        except ValueError as e:
             # Fallback di sicurezza: se il JSON è corrotto, restituisco errore nel log
-            return json.dumps({"error": f"JSON Error: {str(e)}"}), 500
+            metriche.ERRORI_PAYLOAD.incrementa(1, "json")
+            return json.dumps(ErrorePayload(f"JSON non valido: {e}").come_dizionario())
+
+        # Estraggo i parametri dal payload già validato (i default sono applicati dalla validazione)
+        budget_ore_disponibile = payload['ore_budget']
+        seed_richiesto = payload['seed']
+        politica = payload['politica_allocazione']
+        obiettivo = payload['obiettivo_allocazione']
+        meteo_misurato = payload['meteo']
+        n_stagioni = payload['n_stagioni']
+        modalita_simulazione = payload['modalita']
+        risorse = payload['risorse']
+        if usa_flotta(payload):
+            lotti_flotta = payload['lotti']
+        else:
+            with metriche.fase("costruzione_lotti"):
+                lista_lotti = crea_lotti_da_payload(payload['lotti'])
     
     else:
         # Modalità Manuale: Uso i dati definiti nella Dashboard in alto
@@ -357,80 +1214,29 @@ def main_controller(modalita_input, json_data = None):
         lista_lotti.append(crea_lotto_da_config("L03", LOTTO_3))
 
     # - FASE 2: ESECUZIONE -
-    meteo = ottieni_dati_meteo_iot()
-    risultati = []
-    
-    # Eseguo la logica su ogni oggetto
-    for lotto in lista_lotti:   
-        res = lotto.esegui_simulazione(meteo)
-        risultati.append(res)
-
-    # Ordino per priorità e poi per ID lotto, usando LINQ (ma solo per i calcoli e non per il report)
-    risultati_ordinati = sorted(risultati, key=lambda x: (x.get("priorita", 2), x.get("id", "")))
-
-    ore_residue = budget_ore_disponibile
-
-    for res in risultati_ordinati:
-
-        # Ore richieste per completare il lotto (prima della penalizzazione)
-        ore_richieste = res["output"]["ore_totali"]
-
-        # Salvo ore teoriche complete (necessarie al 100%)
-        res["ore_necessarie_100"] = round(ore_richieste, 2)
-
-        percentuale = 0.0
-        if ore_residue <= 0:
-            percentuale = 0.0
-        elif ore_residue >= ore_richieste:
-            percentuale = 100.0
-            ore_residue -= ore_richieste
-        else:
-            percentuale = (ore_residue / ore_richieste) * 100
-            ore_residue = 0
-
-        # Penalizzazione proporzionale produzione
-        fattore = percentuale / 100.0
+    # Il seed esplicito ha la precedenza; senza seed ne estraggo uno nuovo e lo riporto nell'output,
+    # così ogni esecuzione resta riproducibile a posteriori (ma non la memorizzo: non si ripeterà).
+    usa_cache = seed is not None or seed_richiesto is not None
+    if seed is None:
+        seed = nuovo_seed() if seed_richiesto is None else seed_richiesto
 
-        res["output"]["uva_kg"] = round(res["output"]["uva_kg"] * fattore, 2)
-        res["output"]["vino_litri"] = round(res["output"]["vino_litri"] * fattore, 2)
-        res["output"]["vinaccia_kg"] = round(res["output"]["vinaccia_kg"] * fattore, 2)
-        res["output"]["n_bottiglie"] = int(res["output"]["n_bottiglie"] * fattore)
+    metriche.SCENARI_ESEGUITI.incrementa(1, modalita_input)
+    if modalita_simulazione == "analitica":
+        analitico = esegui_modello_analitico(lista_lotti, budget_ore_disponibile, meteo_misurato)
+        with metriche.fase("serializzazione"):
+            return json.dumps(analitico, indent = 4)
+    if n_stagioni:
+        # Modalità a bande di rischio (solo da JSON): nessun report per singola stagione
+        bande = esegui_bande_rischio(lista_lotti, budget_ore_disponibile, seed, n_stagioni, politica, obiettivo, meteo_misurato)
+        with metriche.fase("serializzazione"):
+            return json.dumps(bande, indent = 4)
 
-        # Riduco le ore nel dettaglio (ciclo for per evitare errori di arrotondamento multiplo)
-        for k in ["vendemmia", "cantina", "gestione"]:
-            res["output"]["dettaglio_ore"][k] = round(res["output"]["dettaglio_ore"][k] * fattore, 2)
-
-        # Aggiorno il totale ore usato
-        res["output"]["ore_totali"] = round(sum(res["output"]["dettaglio_ore"].values()), 2)
-        res["percentuale_elaborazione"] = round(percentuale, 1)
-
-        # Definisco lo stato testuale
-        if percentuale >= 99.9: res["stato_produzione"] = "Completato"
-        elif percentuale > 0: res["stato_produzione"] = "Parziale"
-        else: res["stato_produzione"] = "Non Avviato"
-        
-    # Ricalcolo totali aziendali
-    tot_uva = sum(r['output']['uva_kg'] for r in risultati)
-    tot_vino = sum(r['output']['vino_litri'] for r in risultati)
-    tot_vinaccia = sum(r['output']['vinaccia_kg'] for r in risultati)
-    tot_bottiglie = sum(r['output']['n_bottiglie'] for r in risultati)
-    tot_ore_effettive = sum(r['output']['ore_totali'] for r in risultati)
-    tot_ore_teoriche = sum(r['ore_necessarie_100'] for r in risultati)
-
-    # Costruisco il dizionario finale dei dati
-    dati_finali = {
-        "meteo_rilevato": meteo,
-        "dettaglio_lotti": risultati,
-        "totali_azienda": {
-            "budget_iniziale": budget_ore_disponibile,
-            "totale_uva_kg": round(tot_uva, 2),
-            "totale_vino_litri": round(tot_vino, 2),
-            "totale_vinaccia_biomassa_kg": round(tot_vinaccia, 2),
-            "totale_ore_effettive": round(tot_ore_effettive, 2),
-            "totale_ore_necessarie_100": round(tot_ore_teoriche, 2),
-            "totale_bottiglie_1_5L": tot_bottiglie
-        }
-    }
+    if lotti_flotta is not None:
+        dati_finali = esegui_scenario_flotta(lotti_flotta, budget_ore_disponibile, seed, politica, obiettivo, meteo_misurato)
+    else:
+        dati_finali = esegui_scenario(lista_lotti, budget_ore_disponibile, seed, usa_cache = usa_cache, politica = politica, obiettivo = obiettivo, meteo = meteo_misurato, risorse = risorse)
+    meteo = dati_finali["meteo_rilevato"]
+    risultati = dati_finali["dettaglio_lotti"]
 
     # - FASE 3: OUTPUT -
     # Sintetizzo i dati operativi per fornire output decisionali utili alla pianificazione delle risorse aziendali (es. stima bottiglie e ore lavoro).
@@ -441,6 +1247,8 @@ def main_controller(modalita_input, json_data = None):
         print("=" * 45 + "\n")
         print(f"⛅ Trend meteo stagionale: Pioggia {meteo['pioggia_mm']}mm | Rischio: {meteo['rischio_patogeni']}")
         print(f"📈 Ore aziendali disponibili: {budget_ore_disponibile} h")
+        print(f"🎲 Seed simulazione: {seed}")
+        print(f"🧮 Politica allocazione: {politica} (obiettivo: {obiettivo})")
         
         for res in risultati:
             status_icon = "✅" if res['percentuale_elaborazione'] == 100 else "⚠️" if res['percentuale_elaborazione'] > 0 else "⛔"
@@ -477,7 +1285,8 @@ def main_controller(modalita_input, json_data = None):
         print("=" * 45 + "\n")
             
     elif modalita_input == 'json':
-        return json.dumps(dati_finali, indent = 4)
+        with metriche.fase("serializzazione"):
+            return json.dumps(dati_finali, indent = 4)
 
 # - ENTRY POINT -
 if __name__ == "__main__":
@@ -0,0 +1,277 @@
+# - POLITICHE DI ALLOCAZIONE DEL BUDGET ORE -
+# Interfaccia comune: ogni politica riceve la lista delle richieste dei lotti e il budget ore
+# e restituisce la percentuale di lavorazione (0-100) di ciascun lotto, nello stesso ordine.
+#
+# Ogni richiesta è un dizionario con:
+#   "id", "priorita", "ore" (ore necessarie al 100%), "bottiglie", "litri" (produzione al 100%),
+#   "frazionabile" (True/False/None) e "quote" (numero di parti intere in cui il lotto può essere
+#   raccolto, usato dalla politica "intera").
+#
+# Tutte le politiche ordinano i lotti con chiave_ordinamento: (priorità, ID), con gli ID numerici
+# prima di quelli testuali, così anche un inventario con ID misti ha un solo ordine ben definito.
+#
+# Politiche disponibili:
+#   - "greedy":      comportamento storico. Ordine (priorità, ID), i lotti vengono finanziati
+#                    completamente finché le ore bastano, il primo che sfora riceve il residuo.   O(n log n)
+#   - "frazionaria": knapsack frazionario. Dentro ogni fascia di priorità ordino i lotti per
+#                    resa oraria (bottiglie/ora o litri/ora) e finanzio prima i più efficienti.   O(n log n)
+#   - "intera":      knapsack 0/1 (o a quote intere) per i lotti non frazionabili, combinato in
+#                    modo esatto con il riempimento frazionario dei lotti frazionabili.
+#                    Programmazione dinamica pseudo-polinomiale: O(k * B / r) per fascia, con k
+#                    oggetti 0/1 (dopo la scomposizione binaria delle quote), B budget e r la
+#                    risoluzione oraria; r viene aumentata automaticamente per restare entro
+#                    LIMITE_OPERAZIONI_DP celle e LIMITE_PASSI_DP passi di budget (al costo di
+#                    arrotondare per eccesso le ore dei lotti), così il tempo non cresce con B.
+#                    Una fascia di soli lotti frazionabili salta la DP: riempimento frazionario.
+#                    Memoria: un byte per cella per ricostruire la soluzione (al più ~5 MB).
+#
+# Esami: Algoritmi e strutture dati (INF01I) - Ricerca operativa
+
+from bisect import bisect_right
+from itertools import groupby
+from math import ceil
+
+RISOLUZIONE_ORE = 0.1              # Granularità di default (ore) della programmazione dinamica
+LIMITE_OPERAZIONI_DP = 5_000_000   # Celle massime (oggetti x passi di budget) per ogni fascia
+LIMITE_PASSI_DP = 20_000           # Passi di budget massimi per fascia (anche con pochi oggetti)
+
+ALLOCATORI = {}
+
+
+def registra_allocatore(nome):
+    """
+    Decoratore: registra una funzione come politica di allocazione con il nome indicato.
+    Permette di aggiungere nuove politiche senza modificare il simulatore.
+    """
+    def decoratore(funzione):
+        ALLOCATORI[nome] = funzione
+        return funzione
+    return decoratore
+
+
+def chiave_ordinamento(priorita, id_lotto):
+    """
+    Chiave (priorità, ID) con cui tutte le politiche ordinano i lotti. Gli ID numerici vengono
+    prima, in ordine numerico, poi gli altri in ordine di testo: interi e stringhe non si
+    confrontano mai tra loro, e un inventario con ID tutti dello stesso tipo mantiene l'ordine storico.
+    """
+    if isinstance(id_lotto, (int, float)) and not isinstance(id_lotto, bool):
+        return (priorita, 0, id_lotto)
+    return (priorita, 1, str(id_lotto))
+
+
+def _fasce_priorita(richieste, rispetta_priorita):
+    """
+    Raggruppa gli indici delle richieste per fascia di priorità (dalla più alta, cioè il numero
+    più basso). Senza vincolo di priorità c'è un'unica fascia.
+    """
+    indici = sorted(range(len(richieste)), key=lambda i: chiave_ordinamento(richieste[i]["priorita"], richieste[i]["id"]))
+    if not rispetta_priorita:
+        return [indici]
+    return [list(gruppo) for _, gruppo in groupby(indici, key=lambda i: richieste[i]["priorita"])]
+
+
+@registra_allocatore("greedy")
+def alloca_greedy(richieste, budget, **opzioni):
+    """
+    Politica storica di main_controller: taglio netto per priorità e ID.
+    """
+    percentuali = [0.0] * len(richieste)
+    ore_residue = budget
+
+    for i in sorted(range(len(richieste)), key=lambda i: chiave_ordinamento(richieste[i]["priorita"], richieste[i]["id"])):
+        ore_richieste = richieste[i]["ore"]
+        if ore_residue <= 0:
+            percentuali[i] = 0.0
+        elif ore_residue >= ore_richieste:
+            percentuali[i] = 100.0
+            ore_residue -= ore_richieste
+        else:
+            percentuali[i] = (ore_residue / ore_richieste) * 100
+            ore_residue = 0
+
+    return percentuali
+
+
+def _riempimento_frazionario(richieste, indici, obiettivo):
+    """
+    Prepara il riempimento frazionario ottimo di un gruppo di lotti: li ordina per resa oraria
+    decrescente e calcola le somme cumulate di ore e valore. Restituisce (ordine, ore_cumulate,
+    valore_cumulato), con cui il valore ottenibile con h ore si calcola in O(log n).
+    """
+    gratuiti = [i for i in indici if richieste[i]["ore"] <= 0]
+    a_pagamento = [i for i in indici if richieste[i]["ore"] > 0]
+    a_pagamento.sort(key=lambda i: richieste[i][obiettivo] / richieste[i]["ore"], reverse=True)
+
+    ore_cumulate, valore_cumulato = [0.0], [0.0]
+    for i in a_pagamento:
+        ore_cumulate.append(ore_cumulate[-1] + richieste[i]["ore"])
+        valore_cumulato.append(valore_cumulato[-1] + richieste[i][obiettivo])
+    return gratuiti + a_pagamento, ore_cumulate, valore_cumulato
+
+
+def _valore_frazionario(ore_cumulate, valore_cumulato, ore):
+    """
+    Valore massimo del riempimento frazionario con 'ore' disponibili (funzione concava a tratti).
+    """
+    if ore <= 0:
+        return 0.0
+    k = bisect_right(ore_cumulate, ore) - 1
+    if k >= len(ore_cumulate) - 1:
+        return valore_cumulato[-1]
+    pendenza = (valore_cumulato[k + 1] - valore_cumulato[k]) / (ore_cumulate[k + 1] - ore_cumulate[k])
+    return valore_cumulato[k] + (ore - ore_cumulate[k]) * pendenza
+
+
+def _applica_frazionario(richieste, ordine, ore_disponibili, percentuali):
+    """
+    Finanzia i lotti nell'ordine dato finché ci sono ore; restituisce le ore rimaste.
+    """
+    for i in ordine:
+        ore = richieste[i]["ore"]
+        if ore <= 0:
+            percentuali[i] = 100.0
+        elif ore_disponibili >= ore:
+            percentuali[i] = 100.0
+            ore_disponibili -= ore
+        elif ore_disponibili > 0:
+            percentuali[i] = ore_disponibili / ore * 100
+            ore_disponibili = 0.0
+    return ore_disponibili
+
+
+@registra_allocatore("frazionaria")
+def alloca_frazionaria(richieste, budget, obiettivo="bottiglie", rispetta_priorita=True, **opzioni):
+    """
+    Knapsack frazionario per fasce di priorità: ottimo quando ogni lotto può essere lavorato
+    in qualsiasi percentuale (come assume il taglio proporzionale del simulatore).
+    """
+    percentuali = [0.0] * len(richieste)
+    ore_residue = budget
+
+    for fascia in _fasce_priorita(richieste, rispetta_priorita):
+        ordine, _, _ = _riempimento_frazionario(richieste, fascia, obiettivo)
+        ore_residue = _applica_frazionario(richieste, ordine, ore_residue, percentuali)
+
+    return percentuali
+
+
+def _oggetti_interi(richieste, indici):
+    """
+    Scompongo ogni lotto a quote intere in oggetti 0/1 con la scomposizione binaria
+    (1, 2, 4, ... quote): k quote diventano O(log k) oggetti invece di k.
+    Ogni oggetto è (indice_lotto, numero_quote).
+    """
+    oggetti = []
+    for i in indici:
+        quote = max(1, int(richieste[i].get("quote") or 1))
+        dimensione = 1
+        while quote > 0:
+            parte = min(dimensione, quote)
+            oggetti.append((i, parte))
+            quote -= parte
+            dimensione *= 2
+    return oggetti
+
+
+def _knapsack_fascia(richieste, indici, budget, obiettivo, risoluzione):
+    """
+    Ottimo esatto (a meno della discretizzazione delle ore) di una fascia: gli oggetti interi
+    vengono scelti con la programmazione dinamica, il budget che avanzano viene riempito in modo
+    frazionario dai lotti frazionabili. Restituisce {indice: percentuale} e le ore usate.
+    """
+    interi = [i for i in indici if not richieste[i].get("frazionabile")]
+    frazionabili = [i for i in indici if richieste[i].get("frazionabile")]
+    oggetti = _oggetti_interi(richieste, interi)
+    ordine, ore_cumulate, valore_cumulato = _riempimento_frazionario(richieste, frazionabili, obiettivo)
+
+    if not oggetti:
+        # Solo lotti frazionabili: il riempimento frazionario è già l'ottimo, senza DP
+        percentuali = [0.0] * len(richieste)
+        ore_avanzate = _applica_frazionario(richieste, ordine, budget, percentuali)
+        return {i: percentuali[i] for i in frazionabili}, budget - ore_avanzate
+
+    # Discretizzo il budget: le ore degli oggetti sono arrotondate per eccesso, quindi una
+    # soluzione della DP non sfora mai il budget reale. Il numero di passi è limitato sia in
+    # assoluto sia in rapporto agli oggetti: oltre, aumento la risoluzione
+    passi = int(budget / risoluzione + 1e-9)
+    limite_passi = min(LIMITE_PASSI_DP, LIMITE_OPERAZIONI_DP // len(oggetti))
+    if passi > limite_passi:
+        risoluzione = budget / limite_passi
+        passi = int(budget / risoluzione + 1e-9)
+
+    def costo(oggetto):
+        i, parte = oggetto
+        ore = richieste[i]["ore"] * parte / max(1, int(richieste[i].get("quote") or 1))
+        return ceil(ore / risoluzione - 1e-9) if ore > 0 else 0
+
+    def valore(oggetto):
+        i, parte = oggetto
+        return richieste[i][obiettivo] * parte / max(1, int(richieste[i].get("quote") or 1))
+
+    # migliore[b] = valore massimo con al più b passi di budget; scelte[k] = byte delle celle
+    # in cui l'oggetto k è stato preso (serve a ricostruire la soluzione)
+    migliore = [0.0] * (passi + 1)
+    scelte = []
+    for oggetto in oggetti:
+        c, v = costo(oggetto), valore(oggetto)
+        if c > passi:
+            scelte.append(bytes(passi + 1))
+            continue
+        # Aggiornamento 0/1 su tutta la riga in una volta (i candidati usano la riga precedente)
+        candidati = [x + v for x in migliore[:passi + 1 - c]]
+        attuali = migliore[c:]
+        scelte.append(bytes(c) + bytes([a > b for a, b in zip(candidati, attuali)]))
+        migliore[c:] = [a if a > b else b for a, b in zip(candidati, attuali)]
+
+    # Combino con il riempimento frazionario: provo ogni ripartizione del budget
+    passi_migliori, valore_migliore = 0, -1.0
+    for b in range(passi + 1):
+        totale = migliore[b] + _valore_frazionario(ore_cumulate, valore_cumulato, budget - b * risoluzione)
+        if totale > valore_migliore + 1e-9:
+            passi_migliori, valore_migliore = b, totale
+
+    # Ricostruzione della soluzione intera (a ritroso sugli oggetti)
+    quote_prese = {}
+    b = passi_migliori
+    for k in range(len(oggetti) - 1, -1, -1):
+        if scelte[k][b]:
+            i, parte = oggetti[k]
+            quote_prese[i] = quote_prese.get(i, 0) + parte
+            b -= costo(oggetti[k])
+
+    percentuali = {}
+    ore_usate = 0.0
+    for i in interi:
+        quote = max(1, int(richieste[i].get("quote") or 1))
+        frazione = quote_prese.get(i, 0) / quote
+        percentuali[i] = frazione * 100
+        ore_usate += richieste[i]["ore"] * frazione
+
+    parziali = [0.0] * len(richieste)
+    ore_avanzate = _applica_frazionario(richieste, ordine, budget - ore_usate, parziali)
+    for i in frazionabili:
+        percentuali[i] = parziali[i]
+    return percentuali, budget - ore_avanzate
+
+
+@registra_allocatore("intera")
+def alloca_intera(richieste, budget, obiettivo="bottiglie", rispetta_priorita=True, risoluzione_ore=RISOLUZIONE_ORE, **opzioni):
+    """
+    Knapsack 0/1 (o a quote intere) per fasce di priorità: i lotti non frazionabili vengono
+    lavorati al 100% o per niente (oppure per un numero intero di quote), scegliendo la
+    combinazione che massimizza bottiglie o litri nel budget. Le ore che una fascia non riesce
+    a usare passano alla fascia successiva.
+    """
+    percentuali = [0.0] * len(richieste)
+    ore_residue = budget
+
+    for fascia in _fasce_priorita(richieste, rispetta_priorita):
+        if ore_residue <= 0:
+            break
+        risultato, ore_usate = _knapsack_fascia(richieste, fascia, ore_residue, obiettivo, risoluzione_ore)
+        for i, percentuale in risultato.items():
+            percentuali[i] = percentuale
+        ore_residue -= ore_usate
+
+    return percentuali
@@ -0,0 +1,647 @@
+# - BENCHMARK DEL SIMULATORE -
+# Misuro i tempi dei diversi percorsi di calcolo per verificare che le ottimizzazioni
+# portino davvero un vantaggio (e quanto), e per accorgermi se una modifica li peggiora.
+# Uso:
+#   python benchmark.py                               -> esegue tutti i casi e stampa le metriche
+#   python benchmark.py --casi lotto,api --rapido     -> solo alcuni casi, dimensioni ridotte
+#   python benchmark.py --salva base.json             -> salva le metriche come riferimento (baseline)
+#   python benchmark.py --confronta base.json         -> confronta con la baseline e segnala le regressioni
+#                                                        oltre la soglia (--soglia 0.15 = 15%); esce con codice 1
+# Esami: Ingegneria del Software (INGINF06) - Calcolo, Probabilità e Statistica (MAT06)
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+import metriche
+
+from Simulatore import (CACHE_SIMULAZIONI, alloca_budget, crea_lotti_da_payload, crea_stream_lotto, esegui_scenario,
+                        main_controller, ottieni_dati_meteo_iot, simula, simula_lotti, valida_payload)
+
+CULTIVAR_SINTETICHE = [("Barbera", "Rosso", 1.4), ("Aglianico", "Rosso", 1.5), ("Moscato", "Bianco", 1.0)]
+
+
+def genera_lotti_sintetici(n_lotti, seed=0):
+    """
+    Genero un inventario fittizio di n_lotti nel formato del payload API.
+    """
+    rng = random.Random(seed)
+    lotti = []
+    for i in range(n_lotti):
+        cultivar, tipologia, tempo = rng.choice(CULTIVAR_SINTETICHE)
+        lotti.append({
+            "id": f"L{i:06d}",
+            "cultivar": cultivar,
+            "tipologia": tipologia,
+            "n_piante": rng.randint(300, 2000),
+            "ettari": round(rng.uniform(0.1, 1.0), 2),
+            "priorita": rng.randint(1, 3),
+            "config": {
+                "capacita_giornaliera": rng.choice([8.0, 10.0, 12.0, 40.0]),
+                "tempo_unitario": tempo,
+                "concime": rng.choice(["Nessuno", "Zolfato", "Urea"]),
+                "trattamento": rng.choice(["Nessuno", "Zolfo", "Poltiglia Bordolese"]),
+            },
+        })
+    return lotti
+
+
+def cronometra(funzione, *args, **kwargs):
+    """
+    Eseguo la funzione una volta e restituisco (secondi, risultato).
+    """
+    inizio = time.perf_counter()
+    risultato = funzione(*args, **kwargs)
+    return time.perf_counter() - inizio, risultato
+
+
+def bench_montecarlo(n_stagioni=100_000, n_lotti=300, n_stagioni_scalare=200):
+    """
+    Confronto il motore vettoriale con il percorso scalare (un oggetto e un dizionario per lotto).
+    Il percorso scalare viene misurato su poche stagioni ed estrapolato.
+    """
+    from motore_vettoriale import riepiloga_montecarlo
+
+    lista_lotti = crea_lotti_da_payload(genera_lotti_sintetici(n_lotti))
+
+    def percorso_scalare():
+        for _ in range(n_stagioni_scalare):
+            meteo = ottieni_dati_meteo_iot()
+            for lotto in lista_lotti:
+                lotto.esegui_simulazione(meteo)
+
+    t_scalare, _ = cronometra(percorso_scalare)
+    t_scalare_stimato = t_scalare / n_stagioni_scalare * n_stagioni
+    t_vettoriale, _ = cronometra(riepiloga_montecarlo, lista_lotti, n_stagioni, seed=0)
+
+    return {
+        "n_stagioni": n_stagioni,
+        "n_lotti": n_lotti,
+        "scalare_stimato_s": round(t_scalare_stimato, 2),
+        "vettoriale_s": round(t_vettoriale, 2),
+        "accelerazione": round(t_scalare_stimato / t_vettoriale, 1),
+    }
+
+
+def misura_memoria(funzione, *args, **kwargs):
+    """
+    Restituisco (byte ancora allocati alla fine, picco di byte, risultato) usando tracemalloc.
+    """
+    tracemalloc.start()
+    try:
+        risultato = funzione(*args, **kwargs)
+        corrente, picco = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return corrente, picco, risultato
+
+
+def bench_flotta(n_lotti=50_000):
+    """
+    Confronto il percorso a oggetti/dizionari con LottoFleet (quello di main_controller da
+    SOGLIA_LOTTI_FLOTTA lotti in su): memoria trattenuta per lotto dopo simulazione e allocazione,
+    e tempo end-to-end dal JSON in ingresso al JSON in uscita.
+    """
+    from flotta_lotti import LottoFleet
+
+    payload = {"ore_budget": n_lotti * 2.0, "lotti": genera_lotti_sintetici(n_lotti)}
+    json_ingresso = json.dumps(payload)
+    validati = valida_payload(payload)["lotti"]
+
+    def stato_oggetti():
+        # Stato trattenuto dal percorso attuale: oggetti lotto + un dizionario risultato ciascuno
+        meteo = ottieni_dati_meteo_iot()
+        lista_lotti = crea_lotti_da_payload(validati)
+        return lista_lotti, [l.esegui_simulazione(meteo) for l in lista_lotti]
+
+    def stato_flotta():
+        return LottoFleet.da_validati(validati).simula(ottieni_dati_meteo_iot()).alloca(payload["ore_budget"])
+
+    def percorso_oggetti():
+        dati = valida_payload(json.loads(json_ingresso))
+        dati_finali = esegui_scenario(crea_lotti_da_payload(dati["lotti"]), dati["ore_budget"], 0, usa_cache = False)
+        return json.dumps(dati_finali, indent = 4)
+
+    memoria_oggetti, _, _ = misura_memoria(stato_oggetti)
+    memoria_flotta, _, _ = misura_memoria(stato_flotta)
+    t_calcolo_oggetti, _ = cronometra(stato_oggetti)
+    t_calcolo_flotta, _ = cronometra(stato_flotta)
+    t_oggetti, _ = cronometra(percorso_oggetti)
+    t_flotta, _ = cronometra(main_controller, 'json', json_ingresso)
+
+    return {
+        "n_lotti": n_lotti,
+        "byte_per_lotto_oggetti": round(memoria_oggetti / n_lotti),
+        "byte_per_lotto_flotta": round(memoria_flotta / n_lotti),
+        "calcolo_oggetti_s": round(t_calcolo_oggetti, 3),
+        "calcolo_flotta_s": round(t_calcolo_flotta, 3),
+        "end_to_end_oggetti_s": round(t_oggetti, 3),
+        "end_to_end_flotta_s": round(t_flotta, 3),
+    }
+
+
+def cpu_per_richiesta(funzione, ripetizioni):
+    """
+    Tempo CPU medio (secondi di processo, non di orologio) di una chiamata.
+    """
+    funzione()  # Riscaldamento (riempie anche la cache delle simulazioni)
+    inizio = time.process_time()
+    for _ in range(ripetizioni):
+        funzione()
+    return (time.process_time() - inizio) / ripetizioni
+
+
+def bench_api_dizionari(dimensioni=(3, 100, 1000), lotti_per_misura=3000):
+    """
+    CPU per richiesta di /api/simula: percorso a stringhe JSON (dumps -> main_controller -> loads
+    -> jsonify) contro simula(dict) con un'unica serializzazione compatta. Seed fisso: la simulazione
+    è in cache in entrambi i casi, quindi la differenza è solo il costo dei passaggi JSON.
+    """
+    risultati = []
+    for n_lotti in dimensioni:
+        payload = {"ore_budget": n_lotti * 2.0, "seed": 2024, "lotti": genera_lotti_sintetici(n_lotti)}
+
+        def percorso_stringhe():
+            risposta = json.loads(main_controller('json', json.dumps(payload)))
+            return json.dumps(risposta, separators=(",", ":"))
+
+        def percorso_dizionari():
+            return json.dumps(simula(payload), separators=(",", ":"))
+
+        ripetute = max(3, lotti_per_misura // n_lotti)
+        t_stringhe = cpu_per_richiesta(percorso_stringhe, ripetute)
+        t_dizionari = cpu_per_richiesta(percorso_dizionari, ripetute)
+        risultati.append({
+            "n_lotti": n_lotti,
+            "stringhe_ms": round(t_stringhe * 1000, 3),
+            "dizionari_ms": round(t_dizionari * 1000, 3),
+            "risparmio_pct": round((1 - t_dizionari / t_stringhe) * 100, 1),
+        })
+    return risultati
+
+
+def mediana_tempi(funzione, ripetizioni=5):
+    """
+    Mediana dei tempi (secondi) di più esecuzioni: meno sensibile ai disturbi del singolo giro.
+    Il primo giro di riscaldamento non viene contato.
+    """
+    funzione()
+    return statistics.median(cronometra(funzione)[0] for _ in range(ripetizioni))
+
+
+def percentile(valori_ordinati, p):
+    """
+    Percentile p (0-100) di una lista già ordinata, con il metodo del rango più vicino.
+    """
+    indice = max(0, min(len(valori_ordinati) - 1, round(p / 100 * len(valori_ordinati) + 0.5) - 1))
+    return valori_ordinati[indice]
+
+
+def bench_lotto(n_lotti=2_000, ripetizioni=5):
+    """
+    Throughput di esegui_simulazione: lotti simulati al secondo (ognuno con il proprio stream).
+    """
+    lista_lotti = crea_lotti_da_payload(genera_lotti_sintetici(n_lotti))
+    meteo = ottieni_dati_meteo_iot()
+
+    def giro():
+        for lotto in lista_lotti:
+            lotto.esegui_simulazione(meteo, crea_stream_lotto(1, 0, lotto.id))
+
+    t = mediana_tempi(giro, ripetizioni)
+    return {"n_lotti": n_lotti, "lotti_al_s": round(n_lotti / t), "per_lotto_us": round(t / n_lotti * 1e6, 2)}
+
+
+def bench_main_controller(dimensioni=(3, 1_000, 100_000)):
+    """
+    main_controller in modalità JSON, end-to-end (parsing, simulazione, allocazione, JSON indentato).
+    Senza seed nel payload ogni chiamata estrae una stagione nuova, quindi la cache non interviene.
+    """
+    metriche = {}
+    for n_lotti in dimensioni:
+        json_ingresso = json.dumps({"ore_budget": n_lotti * 2.0, "lotti": genera_lotti_sintetici(n_lotti)})
+        ripetizioni = 50 if n_lotti <= 10 else (5 if n_lotti <= 10_000 else 1)
+
+        def giro():
+            main_controller('json', json_ingresso)
+            CACHE_SIMULAZIONI.svuota()  # Non trattengo in memoria inventari enormi tra un giro e l'altro
+
+        metriche[f"lotti_{n_lotti}_s"] = round(mediana_tempi(giro, ripetizioni), 4)
+    return metriche
+
+
+def bench_metriche(n_lotti=3, ripetizioni=2_000):
+    """
+    Costo della strumentazione (metriche.py) su uno scenario piccolo, dove pesa di più:
+    stesso giro con le metriche accese e spente, in microsecondi per scenario.
+    """
+    payload = {"ore_budget": n_lotti * 2.0, "lotti": genera_lotti_sintetici(n_lotti)}
+
+    def giro():
+        for _ in range(ripetizioni):
+            simula(payload)
+        CACHE_SIMULAZIONI.svuota()
+
+    era_attiva = metriche.attive()
+    try:
+        metriche.attiva()
+        t_accese = mediana_tempi(giro, 5) / ripetizioni
+        metriche.disattiva()
+        t_spente = mediana_tempi(giro, 5) / ripetizioni
+    finally:
+        (metriche.attiva if era_attiva else metriche.disattiva)()
+    return {
+        "n_lotti": n_lotti,
+        "accese_us": round(t_accese * 1e6, 2),
+        "spente_us": round(t_spente * 1e6, 2),
+        "sovraccarico_us": round((t_accese - t_spente) * 1e6, 2),
+    }
+
+
+def bench_analitica(dimensioni=(3, 1_000), ripetizioni=200):
+    """
+    Modalità analitica (valori attesi in forma chiusa): tempo per chiamata, senza campionamento.
+    """
+    from modello_analitico import modello_analitico
+
+    metriche = {}
+    for n_lotti in dimensioni:
+        lista_lotti = crea_lotti_da_payload(genera_lotti_sintetici(n_lotti))
+        volte = max(1, ripetizioni * 3 // n_lotti)
+
+        def giro():
+            for _ in range(volte):
+                modello_analitico(lista_lotti)
+
+        metriche[f"lotti_{n_lotti}_us"] = round(mediana_tempi(giro, 5) / volte * 1e6, 1)
+    return metriche
+
+
+def bench_calendario(dimensioni=(100, 5_000), unita_per_100_lotti=(1, 0.2, 1.5)):
+    """
+    Calendario a eventi discreti su squadre, presse e vasche (risultati già allocati), con risorse
+    proporzionate al numero di lotti così le code restano piene per tutta la campagna.
+    """
+    from scheduler_eventi import RISORSE, pianifica_risorse
+
+    metriche = {}
+    for n_lotti in dimensioni:
+        lista_lotti = crea_lotti_da_payload(genera_lotti_sintetici(n_lotti))
+        _, grezzi = simula_lotti(lista_lotti, seed=1, usa_cache=False)
+        risultati = alloca_budget(grezzi, float("inf"))
+        risorse = {nome: max(1, round(n_lotti * quota / 100)) for nome, quota in zip(RISORSE, unita_per_100_lotti)}
+        metriche[f"lotti_{n_lotti}_ms"] = round(mediana_tempi(lambda: pianifica_risorse(risultati, risorse), 3) * 1000, 2)
+    return metriche
+
+
+def bench_inventario(dimensioni=(10_000, 100_000), righe_per_blocco=5_000):
+    """
+    CLI a blocchi sugli inventari JSON Lines (cli_inventario.py, due passate): lotti al secondo e
+    picco di memoria, che deve restare piatto al crescere del file.
+    """
+    import tempfile
+
+    from cli_inventario import elabora_inventario
+
+    metriche = {}
+    with tempfile.TemporaryDirectory() as cartella:
+        for n_lotti in dimensioni:
+            percorso = os.path.join(cartella, f"inventario_{n_lotti}.jsonl")
+            with open(percorso, "w", encoding="utf-8") as f:
+                for inizio in range(0, n_lotti, righe_per_blocco):
+                    blocco = genera_lotti_sintetici(min(righe_per_blocco, n_lotti - inizio), seed=inizio)
+                    f.writelines(json.dumps({**lotto, "id": f"L{inizio + i:07d}"}) + "\n" for i, lotto in enumerate(blocco))
+
+            with open(os.devnull, "w", encoding="utf-8") as uscita:
+                inizio = time.perf_counter()
+                elabora_inventario(percorso, uscita, 40.0 * n_lotti, seed=1, righe_per_blocco=righe_per_blocco)
+                durata = time.perf_counter() - inizio
+                _, picco, _ = misura_memoria(elabora_inventario, percorso, uscita, 40.0 * n_lotti, seed=1,
+                                             righe_per_blocco=righe_per_blocco)
+            metriche[f"lotti_{n_lotti}_lotti_al_s"] = round(n_lotti / durata, 1)
+            metriche[f"lotti_{n_lotti}_picco_mb"] = round(picco / 2**20, 2)
+    return metriche
+
+
+def bench_piante(dimensioni=(200_000, 2_000_000), ripetizioni=3):
+    """
+    Modalità per pianta (eterogeneita_piante.py) con correlazione per filare e zona ed esposizione
+    variabile: piante al secondo e picco di memoria, che dipende dal blocco e non dal lotto.
+    """
+    from eterogeneita_piante import resa_per_pianta
+
+    parametri = {"piante_per_filare": 200, "filari_per_zona": 25, "correlazione_filare": 0.3,
+                 "correlazione_zona": 0.1, "variabilita_esposizione": 0.4}
+    metriche = {}
+    for n_piante in dimensioni:
+        durata = mediana_tempi(lambda: resa_per_pianta(n_piante, 1, 1.1, 0.75, **parametri), ripetizioni)
+        _, picco, _ = misura_memoria(resa_per_pianta, n_piante, 1, 1.1, 0.75, **parametri)
+        metriche[f"piante_{n_piante}_piante_al_s"] = round(n_piante / durata, 1)
+        metriche[f"piante_{n_piante}_picco_mb"] = round(picco / 2**20, 2)
+    return metriche
+
+
+def bench_allocazione(n_lotti=10_000, n_lotti_intera=1_000):
+    """
+    Solo la fase di allocazione del budget (risultati grezzi già simulati), per ogni politica.
+    """
+    metriche = {}
+    for politica, n in (("greedy", n_lotti), ("frazionaria", n_lotti), ("intera", n_lotti_intera)):
+        lista_lotti = crea_lotti_da_payload(genera_lotti_sintetici(n))
+        _, grezzi = simula_lotti(lista_lotti, seed=1, usa_cache=False)
+        budget = sum(r["output"]["ore_totali"] for r in grezzi) * 0.6
+        metriche[f"{politica}_{n}_ms"] = round(mediana_tempi(lambda: alloca_budget(grezzi, budget, politica=politica), 3) * 1000, 2)
+    return metriche
+
+
+def bench_json(n_lotti=1_000, ripetizioni=10):
+    """
+    Costo di codifica (indentata e compatta) e decodifica del risultato di uno scenario.
+    """
+    dati = simula({"seed": 1, "ore_budget": n_lotti * 2.0, "lotti": genera_lotti_sintetici(n_lotti)})
+    indentato = json.dumps(dati, indent=4)
+    compatto = json.dumps(dati, separators=(",", ":"))
+    return {
+        "n_lotti": n_lotti,
+        "dumps_indentato_ms": round(mediana_tempi(lambda: json.dumps(dati, indent=4), ripetizioni) * 1000, 2),
+        "dumps_compatto_ms": round(mediana_tempi(lambda: json.dumps(dati, separators=(",", ":")), ripetizioni) * 1000, 2),
+        "loads_indentato_ms": round(mediana_tempi(lambda: json.loads(indentato), ripetizioni) * 1000, 2),
+        "loads_compatto_ms": round(mediana_tempi(lambda: json.loads(compatto), ripetizioni) * 1000, 2),
+        "byte_indentato": len(indentato),
+        "byte_compatto": len(compatto),
+    }
+
+
+def client_flask():
+    """
+    Client di test dell'app Flask (la cartella della dashboard va aggiunta al percorso di import).
+    """
+    cartella_app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Dashboard Web")
+    if cartella_app not in sys.path:
+        sys.path.insert(0, cartella_app)
+    from app import app
+    return app.test_client()
+
+
+def bench_api(n_thread=8, richieste_per_thread=50, n_lotti=3):
+    """
+    Latenza di POST /api/simula (p50/p95/p99) con più thread che inviano richieste in parallelo,
+    attraverso il client di test di Flask (tutto lo stack WSGI, senza rete).
+    """
+    client_flask()
+    from app import app
+    payload = {"ore_budget": 200, "lotti": genera_lotti_sintetici(n_lotti)}
+    latenze = []
+    lock = threading.Lock()
+
+    def utente():
+        client = app.test_client()
+        proprie = []
+        for _ in range(richieste_per_thread):
+            inizio = time.perf_counter()
+            risposta = client.post("/api/simula", json=payload)
+            proprie.append(time.perf_counter() - inizio)
+            assert risposta.status_code == 200, risposta.data
+        with lock:
+            latenze.extend(proprie)
+
+    inizio = time.perf_counter()
+    utenti = [threading.Thread(target=utente) for _ in range(n_thread)]
+    for t in utenti:
+        t.start()
+    for t in utenti:
+        t.join()
+    durata = time.perf_counter() - inizio
+
+    latenze.sort()
+    return {
+        "n_thread": n_thread,
+        "n_richieste": len(latenze),
+        "p50_ms": round(percentile(latenze, 50) * 1000, 3),
+        "p95_ms": round(percentile(latenze, 95) * 1000, 3),
+        "p99_ms": round(percentile(latenze, 99) * 1000, 3),
+        "richieste_al_s": round(len(latenze) / durata, 1),
+    }
+
+
+def bench_api_cache(n_thread=8, richieste_per_thread=50, n_lotti=40):
+    """
+    POST /api/simula con seed fisso: raffiche di richieste identiche in parallelo (una sola viene
+    calcolata, le altre attendono quella in corso o leggono la cache) e richieste condizionali con
+    If-None-Match (304 senza corpo).
+    """
+    client_flask()
+    from app import app, CACHE_RISPOSTE
+    CACHE_RISPOSTE.svuota()
+    payload = {"ore_budget": 40 * n_lotti, "lotti": genera_lotti_sintetici(n_lotti), "seed": 7}
+    latenze, esiti = [], {}
+    lock = threading.Lock()
+
+    def utente():
+        client = app.test_client()
+        proprie, propri_esiti = [], []
+        for _ in range(richieste_per_thread):
+            inizio = time.perf_counter()
+            risposta = client.post("/api/simula", json=payload)
+            proprie.append(time.perf_counter() - inizio)
+            assert risposta.status_code == 200, risposta.data
+            propri_esiti.append(risposta.headers.get("X-Cache"))
+        with lock:
+            latenze.extend(proprie)
+            for esito in propri_esiti:
+                esiti[esito] = esiti.get(esito, 0) + 1
+
+    inizio = time.perf_counter()
+    utenti = [threading.Thread(target=utente) for _ in range(n_thread)]
+    for t in utenti:
+        t.start()
+    for t in utenti:
+        t.join()
+    durata = time.perf_counter() - inizio
+
+    client = app.test_client()
+    etag = client.post("/api/simula", json=payload).headers["ETag"]
+    condizionali = []
+    for _ in range(richieste_per_thread):
+        inizio = time.perf_counter()
+        risposta = client.post("/api/simula", json=payload, headers={"If-None-Match": etag})
+        condizionali.append(time.perf_counter() - inizio)
+        assert risposta.status_code == 304
+    condizionali.sort()
+
+    latenze.sort()
+    return {
+        "n_richieste": len(latenze),
+        "calcoli": esiti.get("MISS", 0),
+        "coalescenze": esiti.get("COALESCENZA", 0),
+        "p50_ms": round(percentile(latenze, 50) * 1000, 3),
+        "p99_ms": round(percentile(latenze, 99) * 1000, 3),
+        "richieste_al_s": round(len(latenze) / durata, 1),
+        "p50_304_ms": round(percentile(condizionali, 50) * 1000, 3),
+    }
+
+
+def bench_api_job(richieste=100, n_lotti=3, scenari_sweep=200):
+    """
+    Latenza di /api/simula (p50/p99) da sola e mentre uno sweep gira in background come job
+    (POST /api/jobs), più il tempo di completamento del job.
+    """
+    client_flask()
+    from app import CODA_JOB, app
+
+    client = app.test_client()
+    payload = {"ore_budget": 200, "lotti": genera_lotti_sintetici(n_lotti)}
+    griglia = {"ore_budget": [100 + i for i in range(scenari_sweep)]}
+    base = {**payload, "lotti": genera_lotti_sintetici(100), "seed": 1}
+
+    def latenze():
+        valori = []
+        for _ in range(richieste):
+            inizio = time.perf_counter()
+            assert client.post("/api/simula", json=payload).status_code == 200
+            valori.append(time.perf_counter() - inizio)
+        return sorted(valori)
+
+    sole = latenze()
+    inizio_job = time.perf_counter()
+    risposta = client.post("/api/jobs", json={"tipo": "sweep", "payload": {"base": base, "griglia": griglia}})
+    assert risposta.status_code == 202, risposta.data
+    con_job = latenze()
+    while CODA_JOB.leggi(risposta.json["id"]).stato in ("in_coda", "in_esecuzione"):
+        time.sleep(0.01)
+    durata_job = time.perf_counter() - inizio_job
+
+    return {
+        "p50_ms": round(percentile(sole, 50) * 1000, 3),
+        "p99_ms": round(percentile(sole, 99) * 1000, 3),
+        "con_job_p50_ms": round(percentile(con_job, 50) * 1000, 3),
+        "con_job_p99_ms": round(percentile(con_job, 99) * 1000, 3),
+        "job_sweep_s": round(durata_job, 3),
+    }
+
+
+def _appiattisci_api_dizionari(**opzioni):
+    return {f"lotti_{r['n_lotti']}_{k}": v for r in bench_api_dizionari(**opzioni) for k, v in r.items() if k != "n_lotti"}
+
+
+# Casi della suite: nome -> (funzione, opzioni normali, opzioni ridotte per --rapido)
+CASI = {
+    "lotto": (bench_lotto, {}, {"n_lotti": 500}),
+    "main_controller": (bench_main_controller, {}, {"dimensioni": (3, 1_000)}),
+    "analitica": (bench_analitica, {}, {"ripetizioni": 50}),
+    "metriche": (bench_metriche, {}, {"ripetizioni": 500}),
+    "calendario": (bench_calendario, {}, {"dimensioni": (100, 1_000)}),
+    "allocazione": (bench_allocazione, {}, {"n_lotti": 2_000, "n_lotti_intera": 300}),
+    "piante": (bench_piante, {}, {"dimensioni": (20_000, 200_000)}),
+    "inventario": (bench_inventario, {}, {"dimensioni": (2_000, 20_000), "righe_per_blocco": 1_000}),
+    "json": (bench_json, {}, {"n_lotti": 300}),
+    "api": (bench_api, {}, {"n_thread": 4, "richieste_per_thread": 25}),
+    "api_dizionari": (_appiattisci_api_dizionari, {}, {"dimensioni": (3, 100)}),
+    "api_job": (bench_api_job, {}, {"richieste": 50, "scenari_sweep": 50}),
+    "api_cache": (bench_api_cache, {}, {"n_thread": 4, "richieste_per_thread": 25}),
+    "montecarlo": (bench_montecarlo, {}, {"n_stagioni": 10_000, "n_lotti": 100, "n_stagioni_scalare": 50}),
+    "flotta": (bench_flotta, {}, {"n_lotti": 5_000}),
+}
+
+
+def direzione(metrica):
+    """
+    +1 se per la metrica più alto è meglio, -1 se più basso è meglio, 0 se è solo informativa.
+    """
+    if metrica.endswith("_al_s") or metrica in ("accelerazione",) or metrica.endswith("_pct"):
+        return 1
+    if metrica.endswith(("_s", "_ms", "_us")) or metrica.startswith("byte_per_"):
+        return -1
+    return 0
+
+
+def esegui_suite(casi, rapido=False):
+    """
+    Esegue i casi richiesti e restituisce il documento dei risultati (serializzabile in JSON).
+    """
+    risultati = {}
+    for nome in casi:
+        funzione, opzioni, opzioni_rapide = CASI[nome]
+        print(f"▶ {nome} ...", end=" ", flush=True)
+        inizio = time.perf_counter()
+        risultati[nome] = funzione(**(opzioni_rapide if rapido else opzioni))
+        print(f"{time.perf_counter() - inizio:.1f} s")
+
+    return {
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "piattaforma": platform.platform(),
+        "cpu": os.cpu_count(),
+        "rapido": rapido,
+        "casi": risultati,
+    }
+
+
+def confronta(attuale, baseline, soglia):
+    """
+    Confronta le metriche con la baseline. Restituisce le righe (caso, metrica, prima, dopo,
+    variazione relativa, regressione) per le metriche presenti in entrambe.
+    """
+    righe = []
+    for caso, metriche in attuale["casi"].items():
+        riferimento = baseline.get("casi", {}).get(caso, {})
+        for metrica, valore in metriche.items():
+            verso = direzione(metrica)
+            prima = riferimento.get(metrica)
+            if verso == 0 or not isinstance(prima, (int, float)) or not prima:
+                continue
+            variazione = (valore - prima) / abs(prima)
+            righe.append((caso, metrica, prima, valore, variazione, -verso * variazione > soglia))
+    return righe
+
+
+def stampa_risultati(documento):
+    for caso, metriche in documento["casi"].items():
+        print(f"\n{caso}")
+        voci = list(metriche.items())
+        for i, (metrica, valore) in enumerate(voci):
+            print(f" {'└─' if i == len(voci) - 1 else '├─'} {metrica:<28} {valore}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del simulatore e dell'endpoint Flask")
+    parser.add_argument("--casi", default=",".join(CASI), help=f"Casi da eseguire, separati da virgola ({', '.join(CASI)})")
+    parser.add_argument("--rapido", action="store_true", help="Dimensioni ridotte (per un controllo veloce)")
+    parser.add_argument("--salva", metavar="FILE", help="Salva i risultati come baseline JSON")
+    parser.add_argument("--confronta", metavar="FILE", help="Confronta con una baseline JSON salvata in precedenza")
+    parser.add_argument("--soglia", type=float, default=0.15, help="Peggioramento relativo oltre cui segnalare una regressione (default 0.15)")
+    argomenti = parser.parse_args()
+
+    casi = [c.strip() for c in argomenti.casi.split(",") if c.strip()]
+    sconosciuti = [c for c in casi if c not in CASI]
+    if sconosciuti:
+        parser.error(f"casi sconosciuti: {', '.join(sconosciuti)}")
+
+    documento = esegui_suite(casi, argomenti.rapido)
+    stampa_risultati(documento)
+
+    if argomenti.salva:
+        with open(argomenti.salva, "w", encoding="utf-8") as f:
+            json.dump(documento, f, indent=2)
+        print(f"\n💾 Baseline salvata in {argomenti.salva}")
+
+    if argomenti.confronta:
+        with open(argomenti.confronta, encoding="utf-8") as f:
+            baseline = json.load(f)
+        righe = confronta(documento, baseline, argomenti.soglia)
+        regressioni = [r for r in righe if r[5]]
+
+        print(f"\nConfronto con {argomenti.confronta} (soglia {argomenti.soglia:.0%})")
+        for caso, metrica, prima, dopo, variazione, regressione in righe:
+            print(f" {'❌' if regressione else '✅'} {caso}.{metrica:<28} {prima} -> {dopo} ({variazione:+.1%})")
+        if regressioni:
+            print(f"\n⚠️  {len(regressioni)} regressioni oltre la soglia")
+            sys.exit(1)
+        print("\nNessuna regressione oltre la soglia")
@@ -0,0 +1,309 @@
+# - CLI PER GRANDI INVENTARI DI LOTTI (CSV / JSON LINES) -
+# main_controller e la rotta Flask caricano tutto il payload in memoria e costruiscono l'intero
+# dizionario dei risultati prima di stamparlo. Qui l'inventario viene letto a blocchi di righe:
+# ogni blocco viene validato, simulato e allocato, i risultati dei lotti vengono scritti subito
+# (JSONL o CSV) e in memoria restano solo i totali aziendali correnti. La memoria di picco dipende
+# dalla dimensione del blocco, non da quella del file.
+#
+# Allocazione a blocchi (solo politica greedy, ordine priorità e ID):
+#   - prima passata: simulo l'inventario e sommo le ore necessarie di ogni fascia di priorità.
+#     Da quei totali ricavo il budget di ogni fascia: le fasce più prioritarie sono finanziate per
+#     intero, una sola fascia riceve il residuo e le successive restano ferme;
+#   - seconda passata: ripeto la simulazione (gli stream casuali dipendono solo da seed e ID del
+#     lotto, quindi i risultati coincidono) e alloco ogni blocco con il budget della sua fascia.
+# Se l'inventario è ordinato per ID il risultato coincide con main_controller sullo stesso payload;
+# altrimenti cambia solo l'ordine in cui viene servita la fascia che riceve il residuo.
+# Da standard input (o con --una-passata) il file si legge una volta sola: ogni blocco viene
+# allocato con il budget rimasto, quindi la priorità è rispettata solo dentro il blocco.
+#
+# Formati di ingresso:
+#   - JSON Lines: un lotto per riga, nel formato del payload API ({"id": ..., "config": {...}})
+#   - CSV con intestazione: id,cultivar,n_piante,ettari,capacita_giornaliera,concime,trattamento
+#     più le colonne facoltative tipologia, tempo_unitario, priorita, frazionabile, quote_intere
+#
+# Avvio veloce: importa solo il simulatore (libreria standard), niente Flask né NumPy.
+# Esami: Basi di Dati (INGINF05) - Sistemi Operativi (INF01III) - Ingegneria del Software (INGINF06)
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import re
+import sys
+import time
+
+from Simulatore import (ORE_AZIENDALI_TOTALI, ErrorePayload, alloca_budget, crea_lotti_da_payload, crea_stream_meteo,
+                        meteo_da_trend, nuovo_seed, ottieni_dati_meteo_iot, simula_lotti, valida_payload)
+
+RIGHE_PER_BLOCCO = 10_000
+
+# Colonne del CSV: quelle della sezione "config" del payload e quelle del lotto
+CAMPI_CONFIG = ("capacita_giornaliera", "tempo_unitario", "concime", "trattamento")
+VALORI_VERO = ("1", "true", "si", "sì", "vero")
+VALORI_FALSO = ("0", "false", "no", "falso")
+
+# Colonne del CSV dei risultati, nell'ordine
+COLONNE_RISULTATI = ("id", "cultivar", "tipologia", "priorita", "concime", "trattamento", "percentuale_elaborazione",
+                     "stato_produzione", "uva_kg", "vino_litri", "vinaccia_kg", "n_bottiglie", "ore_vendemmia",
+                     "ore_cantina", "ore_gestione", "ore_totali", "ore_necessarie_100")
+
+_INDICE_CAMPO = re.compile(r"lotti\[(\d+)\]\.?(.*)")
+
+
+class ErroreInventario(ValueError):
+    """
+    Riga dell'inventario non leggibile o non valida: il messaggio indica file e numero di riga.
+    """
+
+
+# - LETTURA A BLOCCHI -
+def _lotto_da_riga_csv(riga):
+    """
+    Converto una riga del CSV (valori testuali) nel dizionario del payload API. Le celle vuote
+    vengono omesse, così valgono i default della validazione (es. tipologia della cultivar).
+    """
+    lotto = {chiave: valore for chiave, valore in riga.items() if chiave not in CAMPI_CONFIG and valore not in ("", None)}
+    lotto["config"] = {chiave: riga[chiave] for chiave in CAMPI_CONFIG if riga.get(chiave) not in ("", None)}
+    if "frazionabile" in lotto:
+        # Un valore non riconosciuto resta testo: la validazione lo rifiuta indicando la riga
+        valore = lotto["frazionabile"].strip().lower()
+        lotto["frazionabile"] = True if valore in VALORI_VERO else False if valore in VALORI_FALSO else lotto["frazionabile"]
+    return lotto
+
+
+def leggi_inventario(percorso, formato=None, righe_per_blocco=RIGHE_PER_BLOCCO):
+    """
+    Generatore: legge l'inventario ('-' = standard input) e produce coppie (numeri di riga, lotti)
+    di al più righe_per_blocco lotti, nel formato del payload API (non ancora validati).
+    """
+    formato = formato or ("csv" if percorso.lower().endswith(".csv") else "jsonl")
+    f = sys.stdin if percorso == "-" else open(percorso, "r", encoding="utf-8", newline="")
+    try:
+        if formato == "csv":
+            lettore = csv.DictReader(f)
+            righe = ((lettore.line_num, _lotto_da_riga_csv(riga)) for riga in lettore)
+        else:
+            righe = ((numero, testo) for numero, testo in enumerate(f, 1) if testo.strip())
+
+        while True:
+            blocco = list(itertools.islice(righe, righe_per_blocco))
+            if not blocco:
+                return
+            numeri = [numero for numero, _ in blocco]
+            if formato == "csv":
+                lotti = [lotto for _, lotto in blocco]
+            else:
+                lotti = []
+                for numero, testo in blocco:
+                    try:
+                        lotti.append(json.loads(testo))
+                    except ValueError as e:
+                        raise ErroreInventario(f"{percorso}, riga {numero}: JSON non valido: {e}") from None
+            yield numeri, lotti
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def lotti_validati(percorso, formato=None, righe_per_blocco=RIGHE_PER_BLOCCO):
+    """
+    Generatore: blocchi dell'inventario già validati e convertiti in oggetti SimulatoreLottoVigneto.
+    Un lotto non valido interrompe la lettura con ErroreInventario (file, riga e campo).
+    """
+    for numeri, lotti in leggi_inventario(percorso, formato, righe_per_blocco):
+        try:
+            validati = valida_payload({"lotti": lotti})["lotti"]
+        except ErrorePayload as e:
+            corrispondenza = _INDICE_CAMPO.match(e.campo or "")
+            if corrispondenza is None:
+                raise ErroreInventario(f"{percorso}: {e}") from None
+            riga, campo = numeri[int(corrispondenza.group(1))], corrispondenza.group(2)
+            raise ErroreInventario(f"{percorso}, riga {riga}: {campo + ': ' if campo else ''}{e.messaggio}") from None
+        yield crea_lotti_da_payload(validati)
+
+
+# - TOTALI AZIENDALI CORRENTI -
+class TotaliAzienda:
+    """
+    Somme correnti dei risultati allocati: stessi campi di calcola_totali, più il numero di lotti
+    per esito. Arrotondo solo alla fine, come calcola_totali sull'elenco completo.
+    """
+    CAMPI = (("totale_uva_kg", "uva_kg"), ("totale_vino_litri", "vino_litri"),
+             ("totale_vinaccia_biomassa_kg", "vinaccia_kg"), ("totale_ore_effettive", "ore_totali"))
+
+    def __init__(self):
+        self.somme = {nome: 0.0 for nome, _ in self.CAMPI}
+        self.ore_teoriche = 0.0
+        self.bottiglie = 0
+        self.esiti = {}
+        self.n_lotti = 0
+
+    def aggiungi(self, risultati):
+        for nome, campo in self.CAMPI:
+            self.somme[nome] += sum(r["output"][campo] for r in risultati)
+        self.ore_teoriche += sum(r["ore_necessarie_100"] for r in risultati)
+        self.bottiglie += sum(r["output"]["n_bottiglie"] for r in risultati)
+        for r in risultati:
+            self.esiti[r["stato_produzione"]] = self.esiti.get(r["stato_produzione"], 0) + 1
+        self.n_lotti += len(risultati)
+
+    def riepilogo(self, budget_ore_disponibile):
+        return {
+            "budget_iniziale": budget_ore_disponibile,
+            **{nome: round(valore, 2) for nome, valore in self.somme.items()},
+            "totale_ore_necessarie_100": round(self.ore_teoriche, 2),
+            "totale_bottiglie_1_5L": self.bottiglie,
+            "n_lotti": self.n_lotti,
+            "esiti": self.esiti,
+        }
+
+
+# - ALLOCAZIONE A BLOCCHI -
+def ore_per_priorita(blocchi, seed, meteo):
+    """
+    Prima passata: ore necessarie al 100% di ogni fascia di priorità dell'inventario.
+    """
+    ore = {}
+    for lotti in blocchi:
+        _, grezzi = simula_lotti(lotti, seed, usa_cache=False, meteo=meteo)
+        for lotto, res in zip(lotti, grezzi):
+            ore[lotto.priorita] = ore.get(lotto.priorita, 0.0) + res["output"]["ore_totali"]
+    return ore
+
+
+def budget_per_priorita(ore, budget_ore_disponibile):
+    """
+    Budget di ogni fascia secondo la politica greedy: le fasce che stanno nel budget hanno budget
+    illimitato, la prima che sfora riceve il residuo, le successive zero.
+    """
+    budget, residuo = {}, budget_ore_disponibile
+    for priorita in sorted(ore):
+        budget[priorita] = float("inf") if residuo >= ore[priorita] else residuo
+        residuo = max(0.0, residuo - ore[priorita])
+    return budget
+
+
+def alloca_blocco(lotti, grezzi, budget):
+    """
+    Alloco un blocco di risultati grezzi fascia per fascia con il budget residuo di ciascuna
+    ('budget' viene aggiornato). Restituisce i risultati allocati nell'ordine dei lotti.
+    """
+    fasce = {}
+    for i, lotto in enumerate(lotti):
+        fasce.setdefault(lotto.priorita, []).append(i)
+
+    risultati = [None] * len(lotti)
+    for priorita, indici in fasce.items():
+        allocati = alloca_budget([grezzi[i] for i in indici], budget[priorita], [priorita] * len(indici))
+        for i, res in zip(indici, allocati):
+            risultati[i] = res
+        budget[priorita] = max(0.0, budget[priorita] - sum(grezzi[i]["output"]["ore_totali"] for i in indici))
+    return risultati
+
+
+def riga_risultato(res):
+    """
+    Appiattisco un risultato allocato nelle colonne COLONNE_RISULTATI del CSV.
+    """
+    output, ore = res["output"], res["output"]["dettaglio_ore"]
+    return (res["id"], res["cultivar"], res["tipologia"], res["priorita"], res["input_config"]["concime"],
+            res["input_config"]["trattamento"], res["percentuale_elaborazione"], res["stato_produzione"],
+            output["uva_kg"], output["vino_litri"], output["vinaccia_kg"], output["n_bottiglie"], ore["vendemmia"],
+            ore["cantina"], ore["gestione"], output["ore_totali"], res["ore_necessarie_100"])
+
+
+def elabora_inventario(percorso, uscita, budget_ore_disponibile=ORE_AZIENDALI_TOTALI, seed=None, meteo=None,
+                       formato=None, formato_uscita="jsonl", righe_per_blocco=RIGHE_PER_BLOCCO, una_passata=False):
+    """
+    Simula e alloca l'inventario in 'percorso' scrivendo i risultati dei lotti sul file 'uscita'
+    (già aperto, JSONL o CSV) man mano che ogni blocco è pronto. Restituisce il riepilogo:
+    seed, meteo e totali aziendali.
+    'meteo' (opzionale) è il trend misurato {"pioggia_mm", "temp_avg"}; senza, viene estratto dal seed.
+    """
+    seed = nuovo_seed() if seed is None else seed
+    if meteo is None:
+        meteo = ottieni_dati_meteo_iot(crea_stream_meteo(seed, 0))
+    else:
+        meteo = meteo_da_trend(meteo["pioggia_mm"], meteo["temp_avg"])
+
+    # Con una sola lettura c'è un'unica fascia "virtuale" che consuma il budget in ordine di blocco
+    una_passata = una_passata or percorso == "-"
+    if una_passata:
+        budget = None
+    else:
+        budget = budget_per_priorita(ore_per_priorita(lotti_validati(percorso, formato, righe_per_blocco), seed, meteo),
+                                     budget_ore_disponibile)
+    residuo = budget_ore_disponibile
+
+    scrittore = None
+    if formato_uscita == "csv":
+        scrittore = csv.writer(uscita, lineterminator="\n")
+        scrittore.writerow(COLONNE_RISULTATI)
+
+    totali = TotaliAzienda()
+    for lotti in lotti_validati(percorso, formato, righe_per_blocco):
+        _, grezzi = simula_lotti(lotti, seed, usa_cache=False, meteo=meteo)
+        if una_passata:
+            risultati = alloca_budget(grezzi, residuo, [l.priorita for l in lotti])
+            residuo = max(0.0, residuo - sum(r["output"]["ore_totali"] for r in grezzi))
+        else:
+            risultati = alloca_blocco(lotti, grezzi, budget)
+
+        if scrittore is None:
+            uscita.writelines(json.dumps(r, separators=(",", ":")) + "\n" for r in risultati)
+        else:
+            scrittore.writerows(riga_risultato(r) for r in risultati)
+        totali.aggiungi(risultati)
+
+    return {
+        "seed": seed,
+        "politica_allocazione": "greedy",
+        "allocazione": "una_passata" if una_passata else "due_passate",
+        "meteo_rilevato": meteo,
+        "totali_azienda": totali.riepilogo(budget_ore_disponibile),
+    }
+
+
+# - ENTRY POINT -
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulazione e allocazione di un inventario di lotti letto a blocchi")
+    parser.add_argument("inventario", help="File CSV o JSON Lines dei lotti ('-' = standard input)")
+    parser.add_argument("-o", "--output", default="-", help="File dei risultati per lotto (default: standard output)")
+    parser.add_argument("--formato", choices=("csv", "jsonl"), default=None, help="Formato dell'inventario (default: dall'estensione)")
+    parser.add_argument("--formato-output", choices=("csv", "jsonl"), default=None, help="Formato dei risultati (default: dall'estensione, altrimenti jsonl)")
+    parser.add_argument("--ore-budget", type=float, default=ORE_AZIENDALI_TOTALI, help="Budget ore aziendale")
+    parser.add_argument("--seed", type=int, default=None, help="Seed della simulazione (default: nuovo seed)")
+    parser.add_argument("--pioggia", type=float, default=None, help="Pioggia misurata (mm); richiede --temp")
+    parser.add_argument("--temp", type=float, default=None, help="Temperatura media misurata; richiede --pioggia")
+    parser.add_argument("--righe-per-blocco", type=int, default=RIGHE_PER_BLOCCO, help="Lotti letti e simulati per blocco")
+    parser.add_argument("--una-passata", action="store_true", help="Legge l'inventario una volta sola (priorità rispettata solo nel blocco)")
+    argomenti = parser.parse_args(argv)
+
+    if (argomenti.pioggia is None) != (argomenti.temp is None):
+        parser.error("--pioggia e --temp vanno indicati insieme")
+    meteo = None if argomenti.pioggia is None else {"pioggia_mm": argomenti.pioggia, "temp_avg": argomenti.temp}
+    formato_uscita = argomenti.formato_output or ("csv" if argomenti.output.lower().endswith(".csv") else "jsonl")
+
+    # Il riepilogo va sullo standard output, oppure sullo standard error se lì ci sono già i risultati
+    uscita = sys.stdout if argomenti.output == "-" else open(argomenti.output, "w", encoding="utf-8", newline="")
+    inizio = time.perf_counter()
+    try:
+        riepilogo = elabora_inventario(argomenti.inventario, uscita, argomenti.ore_budget, argomenti.seed, meteo,
+                                       argomenti.formato, formato_uscita, argomenti.righe_per_blocco, argomenti.una_passata)
+    except BrokenPipeError:
+        # Chi legge i risultati (es. head) ha chiuso la pipe: esco senza altri errori in chiusura
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    except (ErroreInventario, OSError) as e:
+        parser.exit(2, f"errore: {e}\n")
+    finally:
+        if uscita is not sys.stdout:
+            uscita.close()
+
+    riepilogo["durata_s"] = round(time.perf_counter() - inizio, 3)
+    print(json.dumps(riepilogo, indent=4), file=sys.stderr if uscita is sys.stdout else sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
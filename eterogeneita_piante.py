@@ -0,0 +1,179 @@
+# - ETEROGENEITÀ PER PIANTA -
+# Nel modello di calcola_resa_agronomica una sola estrazione di resa_pianta vale per tutte le
+# piante del lotto: è il caso limite in cui le piante sono perfettamente correlate. Qui ogni
+# pianta ha la sua resa, con correlazione facoltativa tra piante dello stesso filare e della
+# stessa zona, e ogni zona ha la sua esposizione ai patogeni.
+#
+# Disposizione: le piante sono numerate filare per filare (piante_per_filare per filare) e i
+# filari sono raggruppati in zone (filari_per_zona per zona).
+#
+# Correlazione (modello a miscela): ogni pianta, con probabilità a = sqrt(correlazione_zona),
+# prende il valore estratto per la sua zona; altrimenti, con probabilità b, quello del suo
+# filare; altrimenti il proprio. Ogni valore è uniforme, quindi la resa della singola pianta resta
+# uniforme in RESA_PIANTA e il valore atteso del lotto non cambia. Due piante della stessa zona
+# hanno correlazione a² = correlazione_zona, due dello stesso filare a² + ((1 - a) b)² =
+# correlazione_filare: da qui b. La varianza del lotto è
+#     σ² · (n + coppie_stesso_filare · ρ_filare + coppie_stessa_zona_altro_filare · ρ_zona)
+# con σ² la varianza della resa di una pianta (vedi varianza_attesa).
+#
+# Esposizione ai patogeni: la perdita del trattamento (1 - resa residua del registro) viene
+# moltiplicata, zona per zona, per un fattore di esposizione: quello indicato in esposizione_zone
+# oppure estratto uniforme in [1 - v, 1 + v] (v = variabilita_esposizione, media 1).
+#
+# Numeri casuali: gli stream (piante, filari, zone) derivano da un solo numero dello stream del
+# lotto, estratto al posto di resa_pianta, e sono counter-based come in Simulatore.py. Le piante
+# vengono generate a blocchi di dimensione fissa e ridotte subito (somma, momenti, totale per
+# zona): una tenuta da 2 milioni di piante non diventa mai un unico array.
+# Esami: Calcolo, Probabilità e Statistica (MAT06) - Algoritmi e strutture dati (INF01I)
+
+import math
+
+import numpy as np
+
+from modello_analitico import RESA_PIANTA
+from motore_vettoriale import uniformi
+from Simulatore import MASCHERA_64, chiave_stream, mescola_64
+from statistiche_online import MomentiOnline
+
+PIANTE_PER_BLOCCO = 1 << 16   # Piante generate e ridotte insieme (limita la RAM usata)
+LIMITE_ZONE = 100_000         # Le zone restano tutte in memoria (resa, esposizione, kg): 800 KB per array al limite
+
+# Parametri della modalità per pianta, con i loro default
+PARAMETRI_ETEROGENEITA = {
+    "piante_per_filare": 100,
+    "filari_per_zona": 10,
+    "correlazione_filare": 0.0,
+    "correlazione_zona": 0.0,
+    "variabilita_esposizione": 0.0,
+    "esposizione_zone": None,
+}
+
+# Chiavi dei tre stream derivati dal numero estratto dallo stream del lotto
+_CHIAVI = {dominio: chiave_stream(dominio, "piante") for dominio in ("pianta", "filare", "zona")}
+
+
+def numero_zone(n_piante, piante_per_filare, filari_per_zona):
+    return math.ceil(math.ceil(n_piante / piante_per_filare) / filari_per_zona)
+
+
+def probabilita_miscela(correlazione_filare, correlazione_zona):
+    """
+    Probabilità (a, b) di prendere il valore della zona e, altrimenti, del filare, che danno le
+    correlazioni richieste. Solleva ValueError se la coppia non è ottenibile.
+    """
+    if not 0 <= correlazione_zona <= correlazione_filare <= 1:
+        raise ValueError("servono 0 <= correlazione_zona <= correlazione_filare <= 1")
+    a = math.sqrt(correlazione_zona)
+    resto = math.sqrt(correlazione_filare - correlazione_zona)
+    if resto > 1 - a + 1e-12:
+        raise ValueError(f"con correlazione_zona {correlazione_zona} la correlazione_filare è al più {a * a + (1 - a) ** 2:.4f}")
+    return a, (min(1.0, resto / (1 - a)) if a < 1 else 0.0)
+
+
+def _basi(chiave):
+    return {dominio: np.array([mescola_64((chiave ^ k) & MASCHERA_64)], dtype=np.uint64) for dominio, k in _CHIAVI.items()}
+
+
+def _uniformi_intervallo(base, inizio, fine, passo=1, scarto=0):
+    """
+    Uniformi dei contatori inizio * passo + scarto, ..., (fine - 1) * passo + scarto di uno stream.
+    """
+    return uniformi(base, np.arange(inizio, fine, dtype=np.uint64) * np.uint64(passo) + np.uint64(scarto))
+
+
+def resa_per_pianta(n_piante, chiave, fattore_concime, resa_residua, piante_per_filare=100, filari_per_zona=10,
+                    correlazione_filare=0.0, correlazione_zona=0.0, variabilita_esposizione=0.0,
+                    esposizione_zone=None, blocco=PIANTE_PER_BLOCCO):
+    """
+    Kg d'uva del lotto con una resa per ogni pianta, generate e ridotte a blocchi.
+    'chiave' è il numero (intero a 53 bit) estratto dallo stream del lotto, 'resa_residua' il
+    moltiplicatore del trattamento per il rischio della stagione (registro agronomico).
+    Restituisce (kg_uva, riepilogo) con le statistiche per pianta e per zona; solleva ValueError
+    oltre LIMITE_ZONE zone.
+    """
+    a, b = probabilita_miscela(correlazione_filare, correlazione_zona)
+    soglia_filare = a + (1 - a) * b
+    basi = _basi(chiave)
+    minimo, ampiezza = RESA_PIANTA[0], RESA_PIANTA[1] - RESA_PIANTA[0]
+    piante_per_zona = piante_per_filare * filari_per_zona
+    n_zone = numero_zone(n_piante, piante_per_filare, filari_per_zona)
+    if n_zone > LIMITE_ZONE:
+        raise ValueError(f"al più {LIMITE_ZONE} zone per lotto, richieste {n_zone}")
+
+    # Zone: valore di resa (contatore 2k) ed esposizione (contatore 2k + 1); sono poche, le tengo tutte
+    u_zone = _uniformi_intervallo(basi["zona"], 0, n_zone, 2)
+    if esposizione_zone is None:
+        esposizione = 1.0 + variabilita_esposizione * (2.0 * _uniformi_intervallo(basi["zona"], 0, n_zone, 2, 1) - 1.0)
+    else:
+        esposizione = np.asarray(esposizione_zone, dtype=np.float64)
+    residua_zone = np.clip(1.0 - (1.0 - resa_residua) * esposizione, 0.0, 1.0) * fattore_concime
+
+    kg_zone = np.zeros(n_zone)
+    momenti = MomentiOnline(1)
+    for inizio in range(0, n_piante, blocco):
+        fine = min(inizio + blocco, n_piante)
+        indici = np.arange(inizio, fine, dtype=np.int64)
+        filari, zone = indici // piante_per_filare, indici // piante_per_zona
+
+        # Pianta i: scelta della miscela (contatore 2i) e valore proprio (contatore 2i + 1)
+        scelta = _uniformi_intervallo(basi["pianta"], inizio, fine, 2)
+        u = _uniformi_intervallo(basi["pianta"], inizio, fine, 2, 1)
+        if soglia_filare > 0:
+            primo_filare = int(filari[0])
+            u_filari = _uniformi_intervallo(basi["filare"], primo_filare, int(filari[-1]) + 1)
+            u = np.where(scelta < soglia_filare, u_filari[filari - primo_filare], u)
+            u = np.where(scelta < a, u_zone[zone], u)
+
+        resa = (minimo + ampiezza * u) * residua_zone[zone]
+        momenti.aggiorna(resa)
+        primo_zona = int(zone[0])
+        kg_zone[primo_zona:int(zone[-1]) + 1] += np.bincount(zone - primo_zona, weights=resa)
+
+    kg_uva = float(kg_zone.sum())
+    return kg_uva, {
+        "piante": n_piante,
+        "zone": n_zone,
+        "resa_pianta_media": round(float(momenti.media[0]), 4) if n_piante else 0.0,
+        "resa_pianta_dev_std": round(float(momenti.dev_std()[0]), 4) if n_piante else 0.0,
+        "resa_pianta_min": round(float(momenti.minimo[0]), 4) if n_piante else 0.0,
+        "resa_pianta_max": round(float(momenti.massimo[0]), 4) if n_piante else 0.0,
+        "kg_zona_min": round(float(kg_zone.min()), 2) if n_zone else 0.0,
+        "kg_zona_max": round(float(kg_zone.max()), 2) if n_zone else 0.0,
+    }
+
+
+def varianza_attesa(n_piante, fattore, piante_per_filare=100, filari_per_zona=10, correlazione_filare=0.0,
+                    correlazione_zona=0.0, **_):
+    """
+    Varianza dei kg d'uva del lotto (senza variabilità dell'esposizione): 'fattore' è il prodotto
+    di concime e resa residua. Serve a verificare il modello a miscela.
+    """
+    sigma2 = (RESA_PIANTA[1] - RESA_PIANTA[0]) ** 2 / 12 * fattore ** 2
+    piante_per_zona = piante_per_filare * filari_per_zona
+
+    def coppie(dimensione):
+        # Coppie ordinate di piante distinte nei gruppi consecutivi di 'dimensione' piante
+        pieni, resto = divmod(n_piante, dimensione)
+        return pieni * dimensione * (dimensione - 1) + resto * (resto - 1)
+
+    stesso_filare = coppie(piante_per_filare)
+    stessa_zona = coppie(piante_per_zona) - stesso_filare
+    return sigma2 * (n_piante + stesso_filare * correlazione_filare + stessa_zona * correlazione_zona)
+
+
+if __name__ == "__main__":
+    # Esempio: tenuta da 2 milioni di piante (il confronto con media e varianza teoriche è in
+    # tests/test_eterogeneita_piante.py)
+    import time
+    import tracemalloc
+
+    parametri = {"piante_per_filare": 200, "filari_per_zona": 25, "correlazione_filare": 0.3,
+                 "correlazione_zona": 0.1, "variabilita_esposizione": 0.4}
+    tracemalloc.start()
+    inizio = time.perf_counter()
+    kg, riepilogo = resa_per_pianta(2_000_000, 12345, 1.1, 0.75, **parametri)
+    durata = time.perf_counter() - inizio
+    _, picco = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"2.000.000 piante in {durata:.2f} s ({2_000_000 / durata:,.0f} piante/s), picco {picco / 2**20:.1f} MB")
+    print(f"Uva: {kg:,.0f} kg - {riepilogo}")
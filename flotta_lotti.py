@@ -0,0 +1,319 @@
+# - FLOTTA LOTTI: RAPPRESENTAZIONE COLONNARE (STRUCT-OF-ARRAYS) -
+# Per inventari da decine di migliaia di appezzamenti, un oggetto SimulatoreLottoVigneto
+# e un dizionario annidato per ogni lotto costano soprattutto allocazioni e lookup.
+# Qui ogni parametro (e ogni risultato) è una colonna NumPy tipizzata: il formato a
+# dizionari di main_controller viene prodotto solo quando serve emettere report o JSON.
+# Esami: Basi di Dati (INGINF05) - Algoritmi e strutture dati (INF01I)
+
+import numpy as np
+
+from allocatori import ALLOCATORI, chiave_ordinamento
+from Simulatore import ORE_AZIENDALI_TOTALI, nuovo_seed, valida_payload
+from motore_vettoriale import RISCHI, chiavi_lotti, codici, fattori_concime, parametri_flusso, simula_blocco, tabella_perdite
+
+# Stati di produzione codificati come interi (indice in questa tupla)
+STATI_PRODUZIONE = ("Completato", "Parziale", "Non Avviato")
+
+# Colonne prodotte da simula(): alloca() le riduce sempre a partire da questi valori grezzi
+COLONNE_SIMULATE = ("uva_kg", "vino_litri", "vinaccia_kg", "n_bottiglie", "ore_vendemmia", "ore_cantina",
+                    "ore_gestione", "ore_totali")
+
+
+def _codifica(valori):
+    """
+    Codifica categoriale: restituisce (codici int16, lista delle categorie distinte).
+    """
+    categorie = {}
+    codici = np.fromiter((categorie.setdefault(v, len(categorie)) for v in valori), dtype=np.int16, count=len(valori))
+    return codici, list(categorie)
+
+
+class LottoFleet:
+    """
+    Contenitore array-backed per un inventario di lotti: parametri e risultati sono colonne.
+    """
+    __slots__ = (
+        "id", "cultivar", "tipologia", "concime", "trattamento",
+        "categorie", "n_piante", "ettari", "priorita", "cap_giornaliera", "tempo_unitario",
+        "frazionabile", "quote_intere",
+        "uva_kg", "vino_litri", "vinaccia_kg", "n_bottiglie",
+        "ore_vendemmia", "ore_cantina", "ore_gestione", "ore_totali",
+        "ore_necessarie_100", "percentuale", "stato", "grezzi",
+    )
+
+    def __init__(self, id_lotti, cultivar, tipologia, n_piante, ettari, priorita,
+                 cap_giornaliera, tempo_unitario, concime, trattamento, frazionabile=None, quote_intere=None):
+        """
+        Costruttore a colonne: ogni argomento è una sequenza lunga quanto l'inventario.
+        Le colonne testuali ripetitive (cultivar, tipologia, ...) vengono codificate come interi.
+        frazionabile e quote_intere (facoltativi, default False e 1) servono solo alla politica 'intera'.
+        """
+        # dtype=object: gli ID restano quelli del payload (interi o stringhe), come nel percorso a oggetti
+        self.id = np.asarray(id_lotti, dtype=object)
+        self.categorie = {}
+        for nome, valori in (("cultivar", cultivar), ("tipologia", tipologia), ("concime", concime), ("trattamento", trattamento)):
+            codici, self.categorie[nome] = _codifica(valori)
+            setattr(self, nome, codici)
+
+        self.n_piante = np.asarray(n_piante, dtype=np.int64)
+        self.ettari = np.asarray(ettari, dtype=np.float64)
+        # int64: la validazione accetta qualsiasi intero come priorità, un tipo più stretto lo troncherebbe
+        self.priorita = np.asarray(priorita, dtype=np.int64)
+        self.cap_giornaliera = np.asarray(cap_giornaliera, dtype=np.float64)
+        self.tempo_unitario = np.asarray(tempo_unitario, dtype=np.float64)
+
+        n = len(self.id)
+        self.frazionabile = np.zeros(n, dtype=bool) if frazionabile is None else np.asarray(frazionabile, dtype=bool)
+        self.quote_intere = np.ones(n, dtype=np.int64) if quote_intere is None else np.asarray(quote_intere, dtype=np.int64)
+
+        # Colonne dei risultati: vengono riempite da simula() e alloca()
+        for nome in ("uva_kg", "vino_litri", "vinaccia_kg", "ore_vendemmia", "ore_cantina",
+                     "ore_gestione", "ore_totali", "ore_necessarie_100", "percentuale"):
+            setattr(self, nome, np.zeros(n))
+        self.n_bottiglie = np.zeros(n, dtype=np.int64)
+        self.stato = np.full(n, STATI_PRODUZIONE.index("Non Avviato"), dtype=np.int8)
+        self.grezzi = None   # Risultati di simula() prima dell'allocazione
+
+    @classmethod
+    def da_payload(cls, dati_list):
+        """
+        Costruisco la flotta dalla lista 'lotti' del payload API, senza creare oggetti intermedi.
+        La lista passa prima da valida_payload (ErrorePayload se non è valida), che applica anche
+        i default del registro agronomico (tipologia e tempo unitario della cultivar).
+        """
+        return cls.da_validati(valida_payload({"lotti": dati_list})["lotti"])
+
+    @classmethod
+    def da_validati(cls, lotti):
+        """
+        Come da_payload, per la lista 'lotti' già restituita da valida_payload (non la rivalido).
+        """
+        config = [d['config'] for d in lotti]
+        return cls(
+            [d['id'] for d in lotti],
+            [d['cultivar'] for d in lotti],
+            [d['tipologia'] for d in lotti],
+            [d['n_piante'] for d in lotti],
+            [d['ettari'] for d in lotti],
+            [d['priorita'] for d in lotti],
+            [c['capacita_giornaliera'] for c in config],
+            [c['tempo_unitario'] for c in config],
+            [c['concime'] for c in config],
+            [c['trattamento'] for c in config],
+            [d['frazionabile'] for d in lotti],
+            [d['quote_intere'] for d in lotti],
+        )
+
+    @classmethod
+    def da_lotti(cls, lista_lotti):
+        """
+        Costruisco la flotta da oggetti SimulatoreLottoVigneto già configurati.
+        """
+        return cls(
+            [l.id for l in lista_lotti], [l.cultivar for l in lista_lotti], [l.tipologia for l in lista_lotti],
+            [l.n_piante for l in lista_lotti], [l.ettari for l in lista_lotti], [l.priorita for l in lista_lotti],
+            [l.cap_max_raccolta_q for l in lista_lotti], [l.tempo_lavorazione_q for l in lista_lotti],
+            [l.concime for l in lista_lotti], [l.trattamento for l in lista_lotti],
+            [bool(l.frazionabile) for l in lista_lotti], [l.quote_intere for l in lista_lotti],
+        )
+
+    def __len__(self):
+        return len(self.id)
+
+    def _decodifica(self, nome):
+        """
+        Restituisce la colonna testuale 'nome' come array di stringhe.
+        """
+        return np.asarray(self.categorie[nome], dtype=object)[getattr(self, nome)]
+
+    def colonne_motore(self):
+        """
+        Colonne nel formato atteso da motore_vettoriale.simula_blocco.
+        I lookup sulle stringhe avvengono una volta per categoria, non per lotto.
+        """
+        flusso_categoria = codici("flusso", self.categorie["tipologia"])
+        return {
+            "id": self.id,
+            "chiave": chiavi_lotti(self.id.tolist()),
+            "n_piante": self.n_piante.astype(np.float64),
+            "ettari": self.ettari,
+            "cap_giornaliera": self.cap_giornaliera,
+            "tempo_unitario": self.tempo_unitario,
+            **parametri_flusso(flusso_categoria[self.tipologia]),
+            "fattore_concime": fattori_concime(self.categorie["concime"])[self.concime],
+            "perdite": tabella_perdite(self.categorie["trattamento"])[self.trattamento],
+        }
+
+    def simula(self, dati_meteo, seed=None, stagione=0):
+        """
+        Esegue una stagione per tutta la flotta (equivalente di esegui_simulazione su ogni lotto)
+        e riempie le colonne dei risultati (simula_blocco arrotonda come il percorso a oggetti).
+        Con lo stesso seed ogni lotto estrae gli stessi numeri del percorso a oggetti.
+        """
+        seed = nuovo_seed() if seed is None else seed
+        meteo = {"rischio": np.array([RISCHI.index(dati_meteo["rischio_patogeni"])])}
+        risultati = simula_blocco(self.colonne_motore(), meteo, seed, np.array([stagione], dtype=np.uint64))
+
+        self.grezzi = {nome: risultati[nome][0] for nome in COLONNE_SIMULATE}
+        for nome, colonna in self.grezzi.items():
+            setattr(self, nome, colonna)
+        self.ore_necessarie_100 = np.round(self.grezzi["ore_totali"], 2)
+        return self
+
+    def ordine_allocazione(self):
+        """
+        Indici dei lotti nell'ordine (priorità, ID) di allocatori.chiave_ordinamento. Se gli ID
+        sono tutti numerici o tutti testuali l'ordine coincide con un lexsort sulle colonne.
+        """
+        id_lotti = self.id.tolist()
+        if all(isinstance(id_lotto, str) for id_lotto in id_lotti) or \
+                all(chiave_ordinamento(0, id_lotto)[1] == 0 for id_lotto in id_lotti):
+            return np.lexsort((self.id, self.priorita))
+        priorita = self.priorita.tolist()
+        return np.array(sorted(range(len(id_lotti)), key=lambda i: chiave_ordinamento(priorita[i], id_lotti[i])), dtype=np.int64)
+
+    def percentuali_greedy(self, budget_ore):
+        """
+        Versione vettoriale dell'allocazione greedy di main_controller: ordino per
+        (priorità, ID), finanzio i lotti finché le ore cumulate restano nel budget,
+        il primo lotto che sfora riceve le ore residue, gli altri restano fermi.
+        """
+        ordine = self.ordine_allocazione()
+        ore_richieste = self.grezzi["ore_totali"][ordine]
+        cumulate = np.cumsum(ore_richieste)
+        residue_prima = budget_ore - (cumulate - ore_richieste)
+
+        percentuale = np.zeros(len(self))
+        completi = (cumulate <= budget_ore) & (residue_prima > 0)
+        percentuale[completi] = 100.0
+        parziali = ~completi & (residue_prima > 0)
+        if parziali.any():
+            primo = np.argmax(parziali)
+            percentuale[primo] = residue_prima[primo] / ore_richieste[primo] * 100
+
+        percentuali = np.empty(len(self))
+        percentuali[ordine] = percentuale
+        return percentuali
+
+    def richieste_allocazione(self):
+        """
+        Richieste nel formato di allocatori.py (come Simulatore.richieste_allocazione), dalle colonne grezze.
+        """
+        colonne = zip(self.id.tolist(), self.priorita.tolist(), self.grezzi["ore_totali"].tolist(),
+                      self.grezzi["n_bottiglie"].tolist(), self.grezzi["vino_litri"].tolist(),
+                      self.frazionabile.tolist(), self.quote_intere.tolist())
+        return [{"id": id_lotto, "priorita": priorita, "ore": ore, "bottiglie": bottiglie, "litri": litri,
+                 "frazionabile": frazionabile, "quote": quote}
+                for id_lotto, priorita, ore, bottiglie, litri, frazionabile, quote in colonne]
+
+    def alloca(self, budget_ore, politica="greedy", obiettivo="bottiglie"):
+        """
+        Ripartisce il budget ore con la politica scelta e applica il taglio proporzionale di
+        produzione. La greedy è vettoriale; le altre politiche passano da allocatori.py sulle
+        richieste costruite dalle colonne (il taglio resta vettoriale).
+        Parte sempre dai risultati grezzi di simula(): chiamarla di nuovo (es. con un altro
+        budget) ripete l'allocazione invece di tagliare i valori già ridotti.
+        """
+        if self.grezzi is None:
+            raise ValueError("alloca() richiede prima simula()")
+        if politica not in ALLOCATORI:
+            raise ValueError(f"Politica di allocazione sconosciuta: '{politica}' (disponibili: {', '.join(ALLOCATORI)})")
+        grezzi = self.grezzi
+        if politica == "greedy":
+            self.percentuale = self.percentuali_greedy(budget_ore)
+        else:
+            self.percentuale = np.array(ALLOCATORI[politica](self.richieste_allocazione(), budget_ore, obiettivo=obiettivo),
+                                        dtype=np.float64)
+
+        # Penalizzazione proporzionale produzione (nuovi array: i grezzi restano intatti)
+        fattore = self.percentuale / 100.0
+        self.uva_kg = np.round(grezzi["uva_kg"] * fattore, 2)
+        self.vino_litri = np.round(grezzi["vino_litri"] * fattore, 2)
+        self.vinaccia_kg = np.round(grezzi["vinaccia_kg"] * fattore, 2)
+        self.n_bottiglie = np.floor(grezzi["n_bottiglie"] * fattore).astype(np.int64)
+        self.ore_vendemmia = np.round(grezzi["ore_vendemmia"] * fattore, 2)
+        self.ore_cantina = np.round(grezzi["ore_cantina"] * fattore, 2)
+        self.ore_gestione = np.round(grezzi["ore_gestione"] * fattore, 2)
+        self.ore_totali = np.round(self.ore_vendemmia + self.ore_cantina + self.ore_gestione, 2)
+
+        self.stato = np.where(self.percentuale >= 99.9, 0, np.where(self.percentuale > 0, 1, 2)).astype(np.int8)
+        return self
+
+    def conteggio_stati(self):
+        """
+        Numero di lotti per stato di produzione (solo gli stati presenti).
+        """
+        conteggi = np.bincount(self.stato, minlength=len(STATI_PRODUZIONE)).tolist()
+        return {stato: n for stato, n in zip(STATI_PRODUZIONE, conteggi) if n}
+
+    def totali(self, budget_ore):
+        """
+        Totali aziendali calcolati direttamente sulle colonne.
+        """
+        return {
+            "budget_iniziale": budget_ore,
+            "totale_uva_kg": round(float(self.uva_kg.sum()), 2),
+            "totale_vino_litri": round(float(self.vino_litri.sum()), 2),
+            "totale_vinaccia_biomassa_kg": round(float(self.vinaccia_kg.sum()), 2),
+            "totale_ore_effettive": round(float(self.ore_totali.sum()), 2),
+            "totale_ore_necessarie_100": round(float(self.ore_necessarie_100.sum()), 2),
+            "totale_bottiglie_1_5L": int(self.n_bottiglie.sum()),
+        }
+
+    def itera_dizionari(self):
+        """
+        Generatore: produce un lotto alla volta nel formato di 'dettaglio_lotti'.
+        Le colonne vengono convertite in liste Python una volta sola (molto più veloce
+        che leggere i singoli elementi NumPy).
+        """
+        colonne = {
+            "id": self.id.tolist(),
+            "cultivar": self._decodifica("cultivar").tolist(),
+            "tipologia": self._decodifica("tipologia").tolist(),
+            "concime": self._decodifica("concime").tolist(),
+            "trattamento": self._decodifica("trattamento").tolist(),
+            "stato": np.asarray(STATI_PRODUZIONE, dtype=object)[self.stato].tolist(),
+        }
+        for nome in ("priorita", "cap_giornaliera", "tempo_unitario", "uva_kg", "vino_litri", "vinaccia_kg",
+                     "n_bottiglie", "ore_totali", "ore_vendemmia", "ore_cantina", "ore_gestione",
+                     "ore_necessarie_100", "percentuale"):
+            colonne[nome] = getattr(self, nome).tolist()
+
+        for i in range(len(self)):
+            yield {
+                "id": colonne["id"][i],
+                "cultivar": colonne["cultivar"][i],
+                "tipologia": colonne["tipologia"][i],
+                "priorita": colonne["priorita"][i],
+                "input_config": {
+                    "concime": colonne["concime"][i],
+                    "trattamento": colonne["trattamento"][i],
+                    "cap_giornaliera": colonne["cap_giornaliera"][i],
+                    "tempo_unitario": colonne["tempo_unitario"][i]
+                },
+                "output": {
+                    "uva_kg": colonne["uva_kg"][i],
+                    "vino_litri": colonne["vino_litri"][i],
+                    "vinaccia_kg": colonne["vinaccia_kg"][i],
+                    "n_bottiglie": colonne["n_bottiglie"][i],
+                    "ore_totali": colonne["ore_totali"][i],
+                    "dettaglio_ore": {
+                        "vendemmia": colonne["ore_vendemmia"][i],
+                        "cantina": colonne["ore_cantina"][i],
+                        "gestione": colonne["ore_gestione"][i]
+                    }
+                },
+                "ore_necessarie_100": colonne["ore_necessarie_100"][i],
+                "percentuale_elaborazione": round(colonne["percentuale"][i], 1),
+                "stato_produzione": colonne["stato"][i]
+            }
+
+    def come_dati_finali(self, dati_meteo, budget_ore=ORE_AZIENDALI_TOTALI):
+        """
+        Materializzo il dizionario completo nello stesso formato restituito da main_controller.
+        """
+        return {
+            "meteo_rilevato": dati_meteo,
+            "dettaglio_lotti": list(self.itera_dizionari()),
+            "totali_azienda": self.totali(budget_ore)
+        }
@@ -0,0 +1,411 @@
+# - INGESTIONE DEI DATI DELLE CENTRALINE IoT -
+# Sostituisce lo stub casuale di ottieni_dati_meteo_iot con le letture reali delle stazioni
+# (pioggia e temperatura al minuto). Ogni stazione ha un buffer circolare binario a dimensione
+# fissa, mappato in memoria (np.memmap): la RAM usata non dipende da quanti dati vengono caricati.
+# Nell'intestazione del file tengo gli aggregati stagionali (pioggia totale, somma e numero delle
+# temperature), aggiornati a ogni blocco ingerito: il trend corrente si legge in O(1), senza mai
+# riscandire lo storico.
+# Esami: Reti di calcolatori e Cybersecurity (INF01II) - Basi di Dati (INGINF05) - Algoritmi e strutture dati (INF01I)
+#
+# Formati di ingresso (letti a blocchi di righe):
+#   - CSV, un file per stazione: timestamp,pioggia_mm,temp (riga di intestazione opzionale).
+#     Il timestamp può essere in secondi epoch oppure ISO 8601 ("2025-05-01T06:00:00").
+#   - NDJSON, anche con più stazioni nello stesso file:
+#     {"stazione": "S01", "ts": 1714543200, "pioggia_mm": 0.2, "temp": 18.4}
+# Una temperatura mancante (vuota/NaN) viene esclusa dalla media; una pioggia mancante vale 0.
+# Le letture con timestamp non successivo all'ultimo già ingerito (file ricaricato, righe
+# duplicate o fuori ordine) vengono scartate, così reingerire un file non conta due volte i dati.
+# Una stazione senza letture di temperatura ha temp_avg None e nessun rischio patogeni.
+
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Simulatore import classifica_rischio_patogeni
+
+# Una lettura: timestamp (secondi epoch), pioggia nel minuto (mm), temperatura (°C) -> 16 byte
+DTYPE_LETTURA = np.dtype([("ts", "<i8"), ("pioggia", "<f4"), ("temp", "<f4")])
+
+# Intestazione del file di una stazione (aggregati stagionali e posizione di scrittura)
+DTYPE_INTESTAZIONE = np.dtype([
+    ("magia", "S8"),
+    ("versione_formato", "<u4"),
+    ("capacita", "<u4"),
+    ("sequenza", "<u8"),         # Contatore seqlock: dispari mentre un blocco viene scritto
+    ("scritte", "<u8"),          # Letture scritte in totale (la posizione nel buffer è scritte % capacita)
+    ("inizio_stagione", "<i8"),  # Le letture precedenti non entrano negli aggregati
+    ("ultimo_ts", "<i8"),
+    ("pioggia_totale", "<f8"),
+    ("somma_temp", "<f8"),
+    ("n_temp", "<u8"),
+    ("n_letture", "<u8"),
+])
+DIMENSIONE_INTESTAZIONE = 128
+MAGIA = b"TIMPEIOT"
+VERSIONE_FORMATO = 1
+
+CAPACITA_DEFAULT = 525_600      # Un anno di letture al minuto (~8 MB per stazione)
+RIGHE_PER_BLOCCO = 262_144      # Righe lette e convertite a ogni passo dell'ingestione
+
+
+class BufferStazione:
+    """
+    Buffer circolare mappato in memoria con le letture più recenti di una stazione, più gli
+    aggregati della stagione corrente. Un solo processo scrive; i lettori (es. il server web)
+    possono leggere il trend in qualsiasi momento: il contatore di sequenza evita letture a metà.
+    """
+    __slots__ = ("percorso", "_intestazione", "_letture")
+
+    def __init__(self, percorso, capacita=CAPACITA_DEFAULT, inizio_stagione=0):
+        self.percorso = percorso
+        if not os.path.exists(percorso):
+            self._crea_file(percorso, capacita, inizio_stagione)
+
+        self._intestazione = np.memmap(percorso, dtype=DTYPE_INTESTAZIONE, mode="r+", shape=(1,))
+        if self._intestazione["magia"][0] != MAGIA or self._intestazione["versione_formato"][0] != VERSIONE_FORMATO:
+            raise ValueError(f"{percorso} non è un buffer di stazione valido")
+        self._letture = np.memmap(percorso, dtype=DTYPE_LETTURA, mode="r+", offset=DIMENSIONE_INTESTAZIONE,
+                                  shape=(int(self._intestazione["capacita"][0]),))
+
+    @staticmethod
+    def _crea_file(percorso, capacita, inizio_stagione):
+        intestazione = np.zeros(1, dtype=DTYPE_INTESTAZIONE)
+        intestazione["magia"] = MAGIA
+        intestazione["versione_formato"] = VERSIONE_FORMATO
+        intestazione["capacita"] = capacita
+        intestazione["inizio_stagione"] = inizio_stagione
+        with open(percorso, "wb") as f:
+            f.write(intestazione.tobytes().ljust(DIMENSIONE_INTESTAZIONE, b"\0"))
+            f.truncate(DIMENSIONE_INTESTAZIONE + capacita * DTYPE_LETTURA.itemsize)
+
+    @property
+    def capacita(self):
+        return len(self._letture)
+
+    def aggiungi(self, letture):
+        """
+        Scrive un blocco di letture (array con dtype DTYPE_LETTURA) nel buffer circolare e aggiorna
+        gli aggregati stagionali in modo incrementale. Costo O(blocco), indipendente dallo storico.
+        Scarta le letture con timestamp non successivo a quelli già visti e restituisce quante
+        letture sono state accettate.
+        """
+        if len(letture) == 0:
+            return 0
+        testa = self._intestazione[0]
+        capacita = self.capacita
+
+        # Tengo solo i timestamp strettamente crescenti rispetto all'ultimo ingerito (e alle
+        # letture precedenti dello stesso blocco)
+        ts = letture["ts"]
+        ultimo = int(testa["ultimo_ts"]) if testa["scritte"] else np.iinfo(np.int64).min
+        precedenti = np.maximum.accumulate(np.concatenate(([ultimo], ts[:-1])))
+        nuove = ts > precedenti
+        if not nuove.all():
+            letture = letture[nuove]
+        n = len(letture)
+        if n == 0:
+            return 0
+
+        # Aggregati: solo le letture della stagione corrente
+        stagione = letture[letture["ts"] >= testa["inizio_stagione"]]
+        temperature = stagione["temp"]
+        valide = ~np.isnan(temperature)
+        pioggia = float(np.nansum(stagione["pioggia"], dtype=np.float64))
+        somma_temp = float(temperature[valide].sum(dtype=np.float64))
+
+        # Scrittura circolare: se il blocco è più grande del buffer tengo solo le ultime letture
+        da_scrivere = letture[-capacita:]
+        posizione = int((testa["scritte"] + n - len(da_scrivere)) % capacita)
+        prima_parte = min(len(da_scrivere), capacita - posizione)
+
+        testa["sequenza"] += 1
+        self._letture[posizione:posizione + prima_parte] = da_scrivere[:prima_parte]
+        self._letture[:len(da_scrivere) - prima_parte] = da_scrivere[prima_parte:]
+        testa["scritte"] += n
+        testa["ultimo_ts"] = int(letture["ts"][-1])
+        testa["pioggia_totale"] += pioggia
+        testa["somma_temp"] += somma_temp
+        testa["n_temp"] += int(valide.sum())
+        testa["n_letture"] += len(stagione)
+        testa["sequenza"] += 1
+        return n
+
+    def aggregati(self):
+        """
+        Copia coerente degli aggregati dell'intestazione (riprovo se un blocco è in scrittura).
+        """
+        while True:
+            sequenza = int(self._intestazione["sequenza"][0])
+            copia = self._intestazione[0].copy()
+            if sequenza % 2 == 0 and sequenza == int(self._intestazione["sequenza"][0]):
+                return copia
+            time.sleep(0)
+
+    def trend_stagionale(self):
+        """
+        Trend della stagione corrente nel formato di ottieni_dati_meteo_iot, in O(1).
+        Senza letture di temperatura temp_avg e rischio_patogeni valgono None.
+        """
+        testa = self.aggregati()
+        pioggia = float(testa["pioggia_totale"])
+        temp_media = float(testa["somma_temp"]) / int(testa["n_temp"]) if testa["n_temp"] else None
+        return {
+            "pioggia_mm": round(pioggia, 1),
+            "temp_avg": None if temp_media is None else round(temp_media, 1),
+            "rischio_patogeni": None if temp_media is None else classifica_rischio_patogeni(pioggia, temp_media),
+            "n_letture": int(testa["n_letture"]),
+            "ultimo_ts": int(testa["ultimo_ts"]),
+        }
+
+    def ultime(self, n):
+        """
+        Copia delle ultime n letture ancora presenti nel buffer, dalla più vecchia alla più recente.
+        """
+        scritte = int(self.aggregati()["scritte"])
+        n = min(n, scritte, self.capacita)
+        fine = scritte % self.capacita
+        indici = np.arange(fine - n, fine) % self.capacita
+        return np.array(self._letture[indici])
+
+    def nuova_stagione(self, inizio_stagione):
+        """
+        Apre una nuova stagione: azzera gli aggregati e li ricostruisce (una sola volta) dalle
+        letture ancora nel buffer successive a 'inizio_stagione'.
+        """
+        presenti = self.ultime(self.capacita)
+        presenti = presenti[presenti["ts"] >= inizio_stagione]
+        temperature = presenti["temp"][~np.isnan(presenti["temp"])]
+
+        testa = self._intestazione[0]
+        testa["sequenza"] += 1
+        testa["inizio_stagione"] = inizio_stagione
+        testa["pioggia_totale"] = float(np.nansum(presenti["pioggia"], dtype=np.float64))
+        testa["somma_temp"] = float(temperature.sum(dtype=np.float64))
+        testa["n_temp"] = len(temperature)
+        testa["n_letture"] = len(presenti)
+        testa["sequenza"] += 1
+
+    def salva(self):
+        """
+        Forza la scrittura su disco delle pagine modificate.
+        """
+        self._letture.flush()
+        self._intestazione.flush()
+
+
+def _timestamp(valori):
+    """
+    Converte una sequenza di timestamp (secondi epoch o stringhe ISO 8601) in int64 di secondi.
+    """
+    array = np.asarray(valori)
+    if array.dtype.kind in "iuf":
+        return array.astype(np.int64)
+    if all(isinstance(v, str) for v in valori):
+        return array.astype("datetime64[s]").astype(np.int64)
+    # Formati misti (capita negli NDJSON): converto elemento per elemento
+    return np.array([int(v) if isinstance(v, (int, float)) else np.datetime64(v, "s").astype(np.int64) for v in valori],
+                    dtype=np.int64)
+
+
+def _colonne_csv(righe, colonne):
+    """
+    Converte un blocco di righe CSV in una matrice float64. Il percorso veloce è np.loadtxt;
+    solo se il blocco contiene campi vuoti (sensore senza dato) lo normalizzo con NaN e riprovo.
+    """
+    try:
+        return np.loadtxt(righe, delimiter=",", dtype=np.float64, ndmin=2, usecols=colonne)
+    except ValueError:
+        normalizzate = [",".join(c.strip() or "nan" for c in r.rstrip("\r\n").split(",")) for r in righe]
+        return np.loadtxt(normalizzate, delimiter=",", dtype=np.float64, ndmin=2, usecols=colonne)
+
+
+def leggi_csv(percorso, righe_per_blocco=RIGHE_PER_BLOCCO):
+    """
+    Generatore: legge un CSV timestamp,pioggia_mm,temp a blocchi di righe e produce array DTYPE_LETTURA.
+    """
+    with open(percorso, "r", encoding="utf-8") as f:
+        # Riga di intestazione opzionale (riconosciuta perché inizia con una lettera)
+        prima = f.readline()
+        if prima[:1].isalpha():
+            prima = f.readline()
+        righe = itertools.chain([prima], f)
+
+        # Se il timestamp non è numerico (ISO 8601) lo leggo come testo e lo converto a parte
+        try:
+            float(prima.split(",")[0])
+            timestamp_numerico = True
+        except ValueError:
+            timestamp_numerico = False
+
+        while True:
+            blocco = [r for r in itertools.islice(righe, righe_per_blocco) if r.strip()]
+            if not blocco:
+                return
+            letture = np.empty(len(blocco), dtype=DTYPE_LETTURA)
+            colonne = _colonne_csv(blocco, (0, 1, 2) if timestamp_numerico else (1, 2))
+            if timestamp_numerico:
+                letture["ts"] = colonne[:, 0]
+            else:
+                letture["ts"] = _timestamp([r.split(",", 1)[0].strip() for r in blocco])
+            letture["pioggia"] = np.nan_to_num(colonne[:, -2])
+            letture["temp"] = colonne[:, -1]
+            yield letture
+
+
+def leggi_ndjson(percorso, righe_per_blocco=RIGHE_PER_BLOCCO):
+    """
+    Generatore: legge un file NDJSON a blocchi di righe e produce coppie (stazione, array DTYPE_LETTURA).
+    """
+    with open(percorso, "r", encoding="utf-8") as f:
+        while True:
+            blocco = [json.loads(r) for r in itertools.islice(f, righe_per_blocco) if r.strip()]
+            if not blocco:
+                return
+            per_stazione = {}
+            for lettura in blocco:
+                per_stazione.setdefault(str(lettura["stazione"]), []).append(lettura)
+            for stazione, righe in per_stazione.items():
+                letture = np.empty(len(righe), dtype=DTYPE_LETTURA)
+                letture["ts"] = _timestamp([r["ts"] for r in righe])
+                letture["pioggia"] = [r.get("pioggia_mm") or 0.0 for r in righe]
+                letture["temp"] = [np.nan if r.get("temp") is None else r["temp"] for r in righe]
+                yield stazione, letture
+
+
+class ReteStazioni:
+    """
+    Insieme dei buffer delle stazioni di un'azienda, uno per file nella cartella indicata.
+    """
+    def __init__(self, cartella, capacita=CAPACITA_DEFAULT, inizio_stagione=0):
+        self.cartella = cartella
+        self.capacita = capacita
+        self.inizio_stagione = inizio_stagione
+        self.stazioni = {}
+        os.makedirs(cartella, exist_ok=True)
+        self.carica_stazioni()
+
+    def carica_stazioni(self):
+        """
+        Apre i buffer presenti nella cartella (anche quelli creati nel frattempo da un altro processo).
+        """
+        for nome in sorted(os.listdir(self.cartella)):
+            if nome.endswith(".ring"):
+                self.stazione(nome[:-len(".ring")])
+
+    def stazione(self, nome):
+        """
+        Buffer della stazione (creato al primo utilizzo).
+        """
+        if nome not in self.stazioni:
+            percorso = os.path.join(self.cartella, f"{nome}.ring")
+            self.stazioni[nome] = BufferStazione(percorso, self.capacita, self.inizio_stagione)
+        return self.stazioni[nome]
+
+    def ingerisci_csv(self, percorso, stazione=None, righe_per_blocco=RIGHE_PER_BLOCCO):
+        """
+        Ingerisce un CSV di una stazione (di default il nome del file senza estensione). Restituisce le letture lette.
+        """
+        stazione = stazione or os.path.splitext(os.path.basename(percorso))[0]
+        buffer = self.stazione(stazione)
+        totale = 0
+        for letture in leggi_csv(percorso, righe_per_blocco):
+            buffer.aggiungi(letture)
+            totale += len(letture)
+        return totale
+
+    def ingerisci_ndjson(self, percorso, righe_per_blocco=RIGHE_PER_BLOCCO):
+        totale = 0
+        for stazione, letture in leggi_ndjson(percorso, righe_per_blocco):
+            self.stazione(stazione).aggiungi(letture)
+            totale += len(letture)
+        return totale
+
+    def ingerisci_in_parallelo(self, percorsi, max_worker=None):
+        """
+        Ingerisce più file (CSV di stazioni diverse o NDJSON) su un pool di processi: ogni stazione
+        ha il suo file di buffer, quindi i worker non si contendono nulla. Restituisce le letture totali.
+        Lo stesso file di stazione non deve comparire in due percorsi diversi.
+        """
+        with ProcessPoolExecutor(max_workers=max_worker) as pool:
+            totali = pool.map(_ingerisci_file, itertools.repeat((self.cartella, self.capacita, self.inizio_stagione)), percorsi)
+            totale = sum(totali)
+        # Apro i buffer creati dai worker
+        self.carica_stazioni()
+        return totale
+
+    def trend_stagionale(self, stazioni=None):
+        """
+        Trend aziendale in O(numero di stazioni): la pioggia è la media delle piogge cumulate delle
+        stazioni (i mm sono per unità di superficie), la temperatura è la media di tutte le letture.
+        Restituisce un dizionario utilizzabile come meteo della simulazione (se nessuna stazione ha
+        letture di temperatura, temp_avg e rischio_patogeni valgono None).
+        """
+        aggregati = [self.stazioni[s].aggregati() for s in (stazioni or self.stazioni)]
+        aggregati = [a for a in aggregati if a["n_letture"]]
+        if not aggregati:
+            raise ValueError("Nessuna lettura disponibile per la stagione corrente")
+
+        pioggia = sum(float(a["pioggia_totale"]) for a in aggregati) / len(aggregati)
+        n_temp = sum(int(a["n_temp"]) for a in aggregati)
+        temp_media = sum(float(a["somma_temp"]) for a in aggregati) / n_temp if n_temp else None
+        return {
+            "pioggia_mm": round(pioggia, 1),
+            "temp_avg": None if temp_media is None else round(temp_media, 1),
+            "rischio_patogeni": None if temp_media is None else classifica_rischio_patogeni(pioggia, temp_media),
+            "stazioni": len(aggregati),
+            "n_letture": sum(int(a["n_letture"]) for a in aggregati),
+        }
+
+    def salva(self):
+        for buffer in self.stazioni.values():
+            buffer.salva()
+
+
+def _ingerisci_file(configurazione, percorso):
+    """
+    Lavoro di un processo worker: ingerisce un file nella rete di stazioni della cartella indicata.
+    """
+    rete = ReteStazioni(*configurazione)
+    totale = rete.ingerisci_ndjson(percorso) if percorso.endswith((".ndjson", ".jsonl")) else rete.ingerisci_csv(percorso)
+    rete.salva()
+    return totale
+
+
+if __name__ == "__main__":
+    # Esempio: un anno di letture al minuto per 24 stazioni, generate e ingerite a blocchi
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Ingestione dei file delle centraline IoT")
+    parser.add_argument("file", nargs="*", help="File CSV (uno per stazione) o NDJSON da ingerire")
+    parser.add_argument("--cartella", default=None, help="Cartella dei buffer delle stazioni")
+    parser.add_argument("--stazioni-demo", type=int, default=24, help="Stazioni sintetiche se non si passano file")
+    argomenti = parser.parse_args()
+
+    cartella = argomenti.cartella or tempfile.mkdtemp(prefix="timpe_iot_")
+    rete = ReteStazioni(cartella)
+    inizio = time.perf_counter()
+    totale = 0
+
+    if argomenti.file:
+        totale = rete.ingerisci_in_parallelo(argomenti.file)
+    else:
+        generatore = np.random.default_rng(0)
+        minuti = np.arange(CAPACITA_DEFAULT, dtype=np.int64) * 60 + 1_700_000_000
+        for i in range(argomenti.stazioni_demo):
+            buffer = rete.stazione(f"S{i:02d}")
+            for blocco in np.array_split(minuti, 8):
+                letture = np.empty(len(blocco), dtype=DTYPE_LETTURA)
+                letture["ts"] = blocco
+                letture["pioggia"] = generatore.exponential(0.2, len(blocco)) * (generatore.random(len(blocco)) < 0.004)
+                letture["temp"] = 24 + 8 * np.sin(blocco / 86400 * 2 * np.pi) + generatore.normal(0, 1, len(blocco))
+                buffer.aggiungi(letture)
+                totale += len(letture)
+
+    rete.salva()
+    print(f"Ingerite {totale} letture in {time.perf_counter() - inizio:.2f} s (buffer in {cartella})")
+    print(f"Trend stagionale: {rete.trend_stagionale()}")
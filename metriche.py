@@ -0,0 +1,212 @@
+# - METRICHE DI ESERCIZIO (STRUMENTAZIONE) -
+# Contatori e istogrammi dei tempi per fase, leggeri e thread-safe, esportabili nel formato
+# testuale di Prometheus (vedi la rotta /metrics di app.py). Nessuna dipendenza esterna.
+#
+# La strumentazione si spegne con la variabile d'ambiente TIMPE_METRICHE=0 (oppure disattiva()):
+# da spenta ogni chiamata si ferma al primo controllo di un booleano e fase() restituisce un
+# context manager vuoto condiviso, senza leggere l'orologio né prendere lock.
+# Esami: Ingegneria del Software (INGINF06) - Calcolo, Probabilità e Statistica (MAT06)
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# Limiti superiori (secondi) dei bucket degli istogrammi di latenza
+LIMITI_LATENZA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_attive = os.environ.get("TIMPE_METRICHE", "1").strip().lower() not in ("0", "false", "no", "off")
+_NULLO = nullcontext()
+
+
+def attive():
+    return _attive
+
+
+def attiva():
+    global _attive
+    _attive = True
+
+
+def disattiva():
+    global _attive
+    _attive = False
+
+
+def _valore_etichetta(valore):
+    # Escape richiesto dal formato testuale: backslash, doppi apici e a capo
+    return str(valore).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etichette_testo(nomi, valori, extra=""):
+    coppie = [f'{n}="{_valore_etichetta(v)}"' for n, v in zip(nomi, valori)]
+    if extra:
+        coppie.append(extra)
+    return "{" + ",".join(coppie) + "}" if coppie else ""
+
+
+class Contatore:
+    """
+    Contatore monotono, con etichette opzionali (es. stato="Completato").
+    """
+    tipo = "counter"
+
+    def __init__(self, nome, descrizione, etichette=()):
+        self.nome = nome
+        self.descrizione = descrizione
+        self.etichette = tuple(etichette)
+        self._valori = {}
+        self._lock = threading.Lock()
+
+    def incrementa(self, valore=1, *etichette):
+        if not _attive:
+            return
+        with self._lock:
+            self._valori[etichette] = self._valori.get(etichette, 0) + valore
+
+    def valore(self, *etichette):
+        return self._valori.get(etichette, 0)
+
+    def righe_prometheus(self):
+        with self._lock:
+            voci = sorted(self._valori.items())
+        return [f"{self.nome}{_etichette_testo(self.etichette, chiave)} {valore}" for chiave, valore in voci]
+
+    def azzera(self):
+        with self._lock:
+            self._valori.clear()
+
+
+class Istogramma:
+    """
+    Istogramma a bucket fissi (somma, conteggio e conteggi per bucket), con etichette opzionali.
+    """
+    tipo = "histogram"
+
+    def __init__(self, nome, descrizione, etichette=(), limiti=LIMITI_LATENZA):
+        self.nome = nome
+        self.descrizione = descrizione
+        self.etichette = tuple(etichette)
+        self.limiti = tuple(limiti)
+        self._serie = {}
+        self._lock = threading.Lock()
+
+    def osserva(self, valore, *etichette):
+        if not _attive:
+            return
+        indice = bisect_left(self.limiti, valore)
+        with self._lock:
+            serie = self._serie.get(etichette)
+            if serie is None:
+                # [conteggi per bucket (+Inf in fondo), somma, conteggio]
+                serie = self._serie[etichette] = [[0] * (len(self.limiti) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valore
+            serie[2] += 1
+
+    def conteggio(self, *etichette):
+        serie = self._serie.get(etichette)
+        return serie[2] if serie else 0
+
+    def righe_prometheus(self):
+        with self._lock:
+            voci = sorted((chiave, (list(s[0]), s[1], s[2])) for chiave, s in self._serie.items())
+        righe = []
+        for chiave, (conteggi, somma, conteggio) in voci:
+            cumulato = 0
+            for limite, n in zip(self.limiti + (float("inf"),), conteggi):
+                cumulato += n
+                le = 'le="+Inf"' if limite == float("inf") else f'le="{limite!r}"'
+                righe.append(f"{self.nome}_bucket{_etichette_testo(self.etichette, chiave, le)} {cumulato}")
+            righe.append(f"{self.nome}_sum{_etichette_testo(self.etichette, chiave)} {somma}")
+            righe.append(f"{self.nome}_count{_etichette_testo(self.etichette, chiave)} {conteggio}")
+        return righe
+
+    def azzera(self):
+        with self._lock:
+            self._serie.clear()
+
+
+class _Cronometro:
+    """
+    Context manager che misura la durata del blocco con l'orologio monotono e la registra nell'istogramma.
+    """
+    __slots__ = ("istogramma", "etichette", "inizio")
+
+    def __init__(self, istogramma, etichette):
+        self.istogramma = istogramma
+        self.etichette = etichette
+
+    def __enter__(self):
+        self.inizio = time.perf_counter()
+        return self
+
+    def __exit__(self, *eccezione):
+        self.istogramma.osserva(time.perf_counter() - self.inizio, *self.etichette)
+        return False
+
+
+class Registro:
+    """
+    Insieme delle metriche di un processo, esportabile in formato Prometheus.
+    """
+    def __init__(self):
+        self._metriche = {}
+        self._lock = threading.Lock()
+
+    def _registra(self, classe, nome, *args, **kwargs):
+        with self._lock:
+            if nome not in self._metriche:
+                self._metriche[nome] = classe(nome, *args, **kwargs)
+            return self._metriche[nome]
+
+    def contatore(self, nome, descrizione, etichette=()):
+        return self._registra(Contatore, nome, descrizione, etichette)
+
+    def istogramma(self, nome, descrizione, etichette=(), limiti=LIMITI_LATENZA):
+        return self._registra(Istogramma, nome, descrizione, etichette, limiti)
+
+    def esporta_prometheus(self):
+        """
+        Testo nel formato di esposizione di Prometheus (text/plain; version=0.0.4).
+        """
+        righe = []
+        for metrica in list(self._metriche.values()):
+            righe.append(f"# HELP {metrica.nome} {metrica.descrizione}")
+            righe.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            righe.extend(metrica.righe_prometheus())
+        return "\n".join(righe) + "\n"
+
+    def azzera(self):
+        for metrica in list(self._metriche.values()):
+            metrica.azzera()
+
+
+REGISTRO = Registro()
+
+# Metriche del simulatore (usate da Simulatore.py)
+DURATA_FASI = REGISTRO.istogramma("timpe_fase_secondi", "Durata delle fasi della simulazione", ("fase",))
+LOTTI_SIMULATI = REGISTRO.contatore("timpe_lotti_simulati_total", "Lotti simulati (esclusi quelli serviti dalla cache)")
+SCENARI_ESEGUITI = REGISTRO.contatore("timpe_scenari_total", "Scenari simulati per modalità di ingresso", ("modalita",))
+ESITI_ALLOCAZIONE = REGISTRO.contatore("timpe_esiti_allocazione_total", "Esiti dell'allocazione del budget ore per lotto", ("politica", "stato"))
+CACHE_SIMULAZIONI = REGISTRO.contatore("timpe_cache_simulazioni_total", "Accessi alla cache delle simulazioni", ("esito",))
+ERRORI_PAYLOAD = REGISTRO.contatore("timpe_errori_payload_total", "Payload rifiutati", ("tipo",))
+
+
+def fase(nome):
+    """
+    Cronometra un blocco di codice come fase della simulazione:  with fase("simulazione"): ...
+    """
+    if not _attive:
+        return _NULLO
+    return _Cronometro(DURATA_FASI, (nome,))
+
+
+def cronometro(istogramma, *etichette):
+    """
+    Come fase(), ma su un istogramma e con etichette a scelta.
+    """
+    if not _attive:
+        return _NULLO
+    return _Cronometro(istogramma, etichette)
@@ -0,0 +1,246 @@
+# - MODELLO ANALITICO (VALORI ATTESI IN FORMA CHIUSA) -
+# Tutte le estrazioni casuali del modello sono uniformi e indipendenti (resa per pianta, resa in
+# vino e in vinaccia, fattore imprevisti), e i moltiplicatori di resa sono deterministici una
+# volta nota la classe di rischio meteo. Valore atteso e varianza di ogni uscita si calcolano
+# quindi esattamente, classe per classe, e si pesano con le probabilità delle classi implicite
+# in ottieni_dati_meteo_iot. Nessun campionamento: pochi microsecondi per lotto.
+#
+# Le grandezze sono quelle al 100% (prima del taglio di budget), senza gli arrotondamenti
+# dell'output del simulatore (scarto al più di 0.05 h per fase).
+# Unica eccezione all'esattezza: n_bottiglie = floor(vino / 1.5) è APPROSSIMATO, perché tratto la
+# parte frazionaria di vino / 1.5 come uniforme in [0, 1) e indipendente dal resto (media - 0.5,
+# varianza + 1/12). Lo scarto è al più di qualche decimo di bottiglia, ma non è una forma chiusa.
+# Esami: Calcolo, Probabilità e Statistica (MAT06) - Programmazione 1 (INF01)
+
+from math import sqrt
+
+from registro_agronomico import REGISTRO
+
+RISCHI = ("BASSO", "MEDIO", "ALTO")
+
+# Trend meteo di ottieni_dati_meteo_iot: pioggia intera uniforme in [150, 600], temperatura uniforme in [18, 35]
+PIOGGIA_MIN, PIOGGIA_MAX = 150, 600
+TEMPERATURA_MIN, TEMPERATURA_MAX = 18.0, 35.0
+# Soglie di classifica_rischio_patogeni
+SOGLIA_PIOGGIA_MEDIO, SOGLIA_PIOGGIA_ALTO, SOGLIA_TEMPERATURA_ALTO = 200, 350, 25.0
+
+# Intervalli delle estrazioni uniformi (stessi valori di Simulatore.py; i flussi dal registro agronomico)
+RESA_PIANTA = (2.5, 4.5)
+FATTORE_IMPREVISTI = (0.75, 1.25)
+FLUSSI = tuple(
+    {"resa_vino": (REGISTRO.resa_vino_min[i], REGISTRO.resa_vino_max[i]),
+     "resa_vinaccia": (REGISTRO.resa_vinaccia_min[i], REGISTRO.resa_vinaccia_max[i]),
+     "moltiplicatore_tempo": REGISTRO.moltiplicatore_tempo[i]}
+    for i in range(len(REGISTRO.flussi))
+)
+
+GRANDEZZE = ("uva_kg", "vino_litri", "vinaccia_kg", "n_bottiglie", "ore_vendemmia", "ore_cantina", "ore_gestione", "ore_totali")
+
+
+def probabilita_rischio():
+    """
+    Probabilità esatte delle classi di rischio: con 451 valori di pioggia equiprobabili
+    P(BASSO) = 51/451, P(ALTO) = (250/451) * (10/17), P(MEDIO) = il resto.
+    """
+    valori_pioggia = PIOGGIA_MAX - PIOGGIA_MIN + 1
+    p_basso = (SOGLIA_PIOGGIA_MEDIO - PIOGGIA_MIN + 1) / valori_pioggia
+    p_pioggia_alta = (PIOGGIA_MAX - SOGLIA_PIOGGIA_ALTO) / valori_pioggia
+    p_caldo = (TEMPERATURA_MAX - SOGLIA_TEMPERATURA_ALTO) / (TEMPERATURA_MAX - TEMPERATURA_MIN)
+    p_alto = p_pioggia_alta * p_caldo
+    return {"BASSO": p_basso, "MEDIO": 1.0 - p_basso - p_alto, "ALTO": p_alto}
+
+
+def _momenti_uniforme(a, b):
+    """
+    (E[X], E[X^2]) di X uniforme in [a, b].
+    """
+    return (a + b) / 2, (a * a + a * b + b * b) / 3
+
+
+def _momenti_lineare_a_tratti(a, b, tratti):
+    """
+    (E[g(U)], E[g(U)^2]) con U uniforme in [a, b] e g lineare a tratti: 'tratti' è una lista
+    di (inizio, fine, alfa, beta) con g(u) = alfa + beta * u su [inizio, fine].
+    """
+    if b <= a:
+        alfa, beta = next((al, be) for i, f, al, be in tratti if i <= a <= f)
+        valore = alfa + beta * a
+        return valore, valore * valore
+    primo = secondo = 0.0
+    for inizio, fine, alfa, beta in tratti:
+        inizio, fine = max(inizio, a), min(fine, b)
+        if fine <= inizio:
+            continue
+        d1, d2, d3 = fine - inizio, fine ** 2 - inizio ** 2, fine ** 3 - inizio ** 3
+        primo += alfa * d1 + beta * d2 / 2
+        secondo += alfa * alfa * d1 + alfa * beta * d2 + beta * beta * d3 / 3
+    return primo / (b - a), secondo / (b - a)
+
+
+def _prodotto(m1_x, m2_x, m1_y, m2_y):
+    """
+    Momenti del prodotto di due variabili indipendenti.
+    """
+    return m1_x * m1_y, m2_x * m2_y
+
+
+def momenti_condizionati(lotto, rischio):
+    """
+    (E, E[X^2]) di ogni grandezza del lotto condizionati alla classe di rischio meteo.
+    """
+    flusso = FLUSSI[lotto.codice_flusso]
+    scala = lotto.fattore_concime() * lotto.fattore_rischio(rischio) * lotto.n_piante
+    uva_min, uva_max = RESA_PIANTA[0] * scala, RESA_PIANTA[1] * scala
+
+    momenti = {"uva_kg": _momenti_uniforme(uva_min, uva_max)}
+    momenti["vino_litri"] = _prodotto(*momenti["uva_kg"], *_momenti_uniforme(*flusso["resa_vino"]))
+    momenti["vinaccia_kg"] = _prodotto(*momenti["uva_kg"], *_momenti_uniforme(*flusso["resa_vinaccia"]))
+
+    # Bottiglie = floor(vino / 1.5): approssimo la parte frazionaria come uniforme in [0, 1)
+    # e indipendente da vino / 1.5 (non esatto, vedi l'intestazione del modulo)
+    m1_vino, m2_vino = momenti["vino_litri"]
+    media_bottiglie = max(m1_vino / 1.5 - 0.5, 0.0)
+    varianza_bottiglie = (m2_vino - m1_vino * m1_vino) / 2.25 + (1 / 12 if m1_vino > 0 else 0.0)
+    momenti["n_bottiglie"] = (media_bottiglie, varianza_bottiglie + media_bottiglie ** 2)
+
+    # Vendemmia = 8 * max(uva / (100 * capacità), 1) e cantina = uva / 100 * tempo * moltiplicatore:
+    # entrambe dipendono dalla stessa estrazione, quindi le integro insieme (lineari a tratti in uva)
+    soglia = 100.0 * lotto.cap_max_raccolta_q
+    pendenza_cantina = lotto.tempo_lavorazione_q * flusso["moltiplicatore_tempo"] / 100.0
+    infinito = float("inf")
+    momenti["ore_vendemmia"] = _momenti_lineare_a_tratti(uva_min, uva_max, [(-infinito, soglia, 8.0, 0.0), (soglia, infinito, 0.0, 8.0 / soglia)])
+    momenti["ore_cantina"] = _momenti_lineare_a_tratti(uva_min, uva_max, [(-infinito, infinito, 0.0, pendenza_cantina)])
+    vendemmia_cantina = _momenti_lineare_a_tratti(uva_min, uva_max, [
+        (-infinito, soglia, 8.0, pendenza_cantina),
+        (soglia, infinito, 0.0, 8.0 / soglia + pendenza_cantina),
+    ])
+
+    base_gestione = lotto.n_piante * 0.05 + lotto.ettari * 20
+    m1_imprevisti, m2_imprevisti = _momenti_uniforme(*FATTORE_IMPREVISTI)
+    momenti["ore_gestione"] = (base_gestione * m1_imprevisti, base_gestione ** 2 * m2_imprevisti)
+
+    # Totale = (vendemmia + cantina) + gestione, con la gestione indipendente dal resto
+    m1_vc, m2_vc = vendemmia_cantina
+    m1_g, m2_g = momenti["ore_gestione"]
+    momenti["ore_totali"] = (m1_vc + m1_g, m2_vc + 2 * m1_vc * m1_g + m2_g)
+    return momenti
+
+
+def _media_dev(m1, m2):
+    return {"media": round(m1, 2), "dev_std": round(sqrt(max(m2 - m1 * m1, 0.0)), 2)}
+
+
+def _miscela(per_classe, probabilita):
+    """
+    Momenti non condizionati: E[X] = sum p_r E_r[X] e E[X^2] = sum p_r E_r[X^2].
+    """
+    return {
+        g: (sum(probabilita[r] * per_classe[r][g][0] for r in probabilita),
+            sum(probabilita[r] * per_classe[r][g][1] for r in probabilita))
+        for g in GRANDEZZE
+    }
+
+
+def modello_analitico(lista_lotti, budget_ore_disponibile = None, meteo = None):
+    """
+    Valore atteso e deviazione standard di ogni grandezza, per lotto (anche classe per classe)
+    e per il totale aziendale. Con 'meteo' (trend misurato) la classe di rischio è nota.
+    """
+    probabilita = probabilita_rischio() if meteo is None else {meteo["rischio_patogeni"]: 1.0}
+    probabilita = {r: p for r, p in probabilita.items() if p > 0}
+
+    # Totale aziendale condizionato alla classe: i lotti hanno stream indipendenti, quindi
+    # medie e varianze si sommano; la dipendenza tra lotti passa solo dal meteo comune
+    totali_per_classe = {r: {g: [0.0, 0.0] for g in GRANDEZZE} for r in probabilita}
+    dettaglio_lotti = []
+    for lotto in lista_lotti:
+        per_classe = {r: momenti_condizionati(lotto, r) for r in probabilita}
+        for r, momenti in per_classe.items():
+            for g, (m1, m2) in momenti.items():
+                totali_per_classe[r][g][0] += m1
+                totali_per_classe[r][g][1] += m2 - m1 * m1
+        atteso = _miscela(per_classe, probabilita)
+        dettaglio_lotti.append({
+            "id": lotto.id,
+            "cultivar": lotto.cultivar,
+            "tipologia": lotto.tipologia,
+            "priorita": lotto.priorita,
+            "atteso": {g: _media_dev(*atteso[g]) for g in GRANDEZZE},
+            "per_rischio": {r: {g: _media_dev(*per_classe[r][g]) for g in GRANDEZZE} for r in probabilita},
+        })
+
+    momenti_totali = {r: {g: (m, v + m * m) for g, (m, v) in totali_per_classe[r].items()} for r in probabilita}
+    totali = _miscela(momenti_totali, probabilita)
+    return {
+        "modalita": "analitica",
+        "meteo_rilevato": meteo,
+        "probabilita_rischio": {r: round(p, 6) for r, p in probabilita.items()},
+        "budget_iniziale": budget_ore_disponibile,
+        "dettaglio_lotti": dettaglio_lotti,
+        "totali_azienda": {g: _media_dev(*totali[g]) for g in GRANDEZZE},
+    }
+
+
+def verifica_contro_montecarlo(lista_lotti, n_stagioni = 200_000, seed = 0, soglia_z = 5.0, tolleranza_dev = 0.02):
+    """
+    Confronta il modello analitico con n_stagioni stagioni del motore vettoriale (NumPy).
+    Per ogni lotto e grandezza le medie devono differire meno di soglia_z errori standard e le
+    deviazioni standard meno di tolleranza_dev in relativo; vale lo stesso per le frequenze
+    delle classi di rischio. Restituisce l'elenco delle discrepanze (vuoto se tutto torna).
+    """
+    import numpy as np
+    from motore_vettoriale import simula_montecarlo
+
+    analitico = modello_analitico(lista_lotti)
+    simulato = simula_montecarlo(lista_lotti, n_stagioni, seed)
+    risultati = simulato["risultati"]
+    campioni = {
+        "uva_kg": risultati["uva_kg"], "vino_litri": risultati["vino_litri"], "vinaccia_kg": risultati["vinaccia_kg"],
+        "n_bottiglie": risultati["n_bottiglie"], "ore_vendemmia": risultati["ore_vendemmia"],
+        "ore_cantina": risultati["ore_cantina"], "ore_gestione": risultati["ore_gestione"], "ore_totali": risultati["ore_totali"],
+    }
+
+    discrepanze = []
+
+    def confronta(nome, atteso, valori):
+        media, dev = float(np.mean(valori)), float(np.std(valori))
+        errore_standard = max(atteso["dev_std"], 1e-9) / sqrt(len(valori))
+        # Le statistiche analitiche sono arrotondate al centesimo: tengo conto dell'arrotondamento
+        if abs(media - atteso["media"]) > soglia_z * errore_standard + 0.005:
+            discrepanze.append(f"{nome}: media {media:.4f} contro {atteso['media']}")
+        if abs(dev - atteso["dev_std"]) > tolleranza_dev * max(atteso["dev_std"], 1e-9) + 0.005:
+            discrepanze.append(f"{nome}: dev. std {dev:.4f} contro {atteso['dev_std']}")
+
+    for i, lotto in enumerate(analitico["dettaglio_lotti"]):
+        for g in GRANDEZZE:
+            confronta(f"{lotto['id']}.{g}", lotto["atteso"][g], campioni[g][:, i])
+    for g in GRANDEZZE:
+        confronta(f"totali.{g}", analitico["totali_azienda"][g], campioni[g].sum(axis=1))
+
+    frequenze = np.bincount(simulato["meteo"]["rischio"], minlength=len(RISCHI)) / n_stagioni
+    for r, frequenza in zip(RISCHI, frequenze):
+        p = analitico["probabilita_rischio"].get(r, 0.0)
+        if abs(frequenza - p) > soglia_z * sqrt(p * (1 - p) / n_stagioni) + 1e-6:
+            discrepanze.append(f"P({r}): frequenza {frequenza:.5f} contro {p:.5f}")
+    return discrepanze
+
+
+if __name__ == "__main__":
+    # Tempo di una chiamata sui lotti aziendali (il confronto col Monte Carlo è in tests/test_modello_analitico.py)
+    import time
+
+    from Simulatore import LOTTO_1, LOTTO_2, LOTTO_3, SimulatoreLottoVigneto
+
+    def lotto_da_config(id_lotto, conf):
+        lotto = SimulatoreLottoVigneto(id_lotto, conf["nome"], conf["tipo"], conf["piante"], conf["ettari"])
+        lotto.configura_parametri(conf["capacita_raccolta"], conf["tempo_lavorazione"], conf["concime"], conf["trattamento"], conf["priorita"])
+        return lotto
+
+    aziendali = [lotto_da_config("L01", LOTTO_1), lotto_da_config("L02", LOTTO_2), lotto_da_config("L03", LOTTO_3)]
+    ripetizioni = 2_000
+    inizio = time.perf_counter()
+    for _ in range(ripetizioni):
+        modello_analitico(aziendali)
+    durata = (time.perf_counter() - inizio) / ripetizioni
+    print(f"Modello analitico, 3 lotti: {durata * 1e6:.1f} µs per chiamata")
+    print(modello_analitico(aziendali)["totali_azienda"])
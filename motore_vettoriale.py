@@ -0,0 +1,284 @@
+# - MOTORE MONTE CARLO VETTORIALE -
+# Esegue N stagioni x M lotti in un'unica chiamata usando array NumPy, al posto di
+# ripetere l'intera pipeline (oggetti + dizionari) migliaia di volte in Python.
+# Il modello è lo stesso di Simulatore.py: cambiano solo la forma dei dati e la velocità.
+# Esami: Calcolo, Probabilità e Statistica (MAT06) - Algoritmi e strutture dati (INF01I)
+
+import numpy as np
+
+from Simulatore import INCREMENTO_GOLDEN, MASCHERA_64, chiave_stream, crea_lotti_da_payload, mescola_64, nuovo_seed
+# RISCHI è la codifica numerica del rischio patogeni (indice di colonna nelle tabelle delle perdite)
+from registro_agronomico import REGISTRO, RISCHI
+
+# Tabelle del registro agronomico come array, indicizzate dai codici interi di flusso, concime e trattamento
+RESA_VINO_MIN = np.array(REGISTRO.resa_vino_min, dtype=np.float64)
+RESA_VINO_MAX = np.array(REGISTRO.resa_vino_max, dtype=np.float64)
+RESA_VINACCIA_MIN = np.array(REGISTRO.resa_vinaccia_min, dtype=np.float64)
+RESA_VINACCIA_MAX = np.array(REGISTRO.resa_vinaccia_max, dtype=np.float64)
+MOLTIPLICATORI_TEMPO = np.array(REGISTRO.moltiplicatore_tempo, dtype=np.float64)
+MOLTIPLICATORI_CONCIME = np.array(REGISTRO.fattori_concime, dtype=np.float64)
+# Matrice (trattamenti, 3): resa residua per classe di rischio (BASSO, MEDIO, ALTO)
+PERDITE_TRATTAMENTO = np.array(REGISTRO.perdite, dtype=np.float64).reshape(-1, len(RISCHI))
+
+# Dimensione di default del blocco di stagioni elaborate insieme (limita la RAM usata)
+BLOCCO_STAGIONI = 2048
+
+# Costanti di SplitMix64 come uint64, per replicare in forma vettoriale gli stream di Simulatore.py
+_GOLDEN = np.uint64(INCREMENTO_GOLDEN)
+_MOLTIPLICATORE_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MOLTIPLICATORE_2 = np.uint64(0x94D049BB133111EB)
+_CHIAVE_METEO = np.array([chiave_stream("meteo", "meteo")], dtype=np.uint64)
+
+
+def _mescola_64(x):
+    """
+    mescola_64 di Simulatore.py applicata elemento per elemento (l'aritmetica uint64 fa da modulo 2^64).
+    """
+    z = x + _GOLDEN
+    z = (z ^ (z >> np.uint64(30))) * _MOLTIPLICATORE_1
+    z = (z ^ (z >> np.uint64(27))) * _MOLTIPLICATORE_2
+    return z ^ (z >> np.uint64(31))
+
+
+def basi_stream(seed, stagioni, chiavi):
+    """
+    Stato iniziale degli stream per ogni coppia (stagione, chiave): matrice (len(stagioni), len(chiavi)).
+    Coincide con base_stream di Simulatore.py.
+    """
+    seme = np.uint64(mescola_64(seed & MASCHERA_64))
+    per_stagione = _mescola_64(seme ^ np.asarray(stagioni, dtype=np.uint64))
+    return _mescola_64(per_stagione[:, None] ^ np.asarray(chiavi, dtype=np.uint64)[None, :])
+
+
+def uniformi(basi, contatore):
+    """
+    Il numero 'contatore'-esimo di ciascuno stream, come float uniforme in [0, 1)
+    (equivalente a StreamCasuale.random chiamato contatore + 1 volte).
+    'contatore' può essere anche un array di contatori, combinato con 'basi' per broadcasting.
+    """
+    if np.ndim(contatore):
+        passo = np.asarray(contatore, dtype=np.uint64) * _GOLDEN
+    else:
+        passo = np.uint64((contatore * INCREMENTO_GOLDEN) & MASCHERA_64)
+    valori = _mescola_64(basi + passo)
+    return (valori >> np.uint64(11)).astype(np.float64) * (1.0 / 9007199254740992.0)
+
+
+def parametri_flusso(codici_flusso):
+    """
+    Colonne dei flussi di cantina (Rosso = macerazione, Bianco = pressatura, ...) a partire
+    dai codici di flusso dei lotti: un gather sulle tabelle del registro.
+    """
+    codici = np.asarray(codici_flusso, dtype=np.intp)
+    return {
+        "resa_vino_min": RESA_VINO_MIN[codici],
+        "resa_vino_max": RESA_VINO_MAX[codici],
+        "resa_vinaccia_min": RESA_VINACCIA_MIN[codici],
+        "resa_vinaccia_max": RESA_VINACCIA_MAX[codici],
+        "moltiplicatore_tempo": MOLTIPLICATORI_TEMPO[codici],
+    }
+
+
+def codici(categoria, nomi):
+    """
+    Codici del registro per una sequenza di nomi (solleva NomeSconosciuto sui nomi non registrati).
+    """
+    return np.fromiter((REGISTRO.codice(categoria, n) for n in nomi), dtype=np.intp, count=len(nomi))
+
+
+def fattori_concime(nomi):
+    """
+    Moltiplicatore di resa per ogni nome di concime.
+    """
+    return MOLTIPLICATORI_CONCIME[codici("concime", nomi)]
+
+
+def tabella_perdite(nomi):
+    """
+    Matrice (len(nomi), 3) con la resa residua per classe di rischio di ogni trattamento.
+    """
+    return PERDITE_TRATTAMENTO[codici("trattamento", nomi)]
+
+
+def chiavi_lotti(id_lotti):
+    """
+    Chiavi degli stream casuali dei lotti (una per ID, come in crea_stream_lotto).
+    """
+    return np.fromiter((chiave_stream(i, "lotto") for i in id_lotti), dtype=np.uint64, count=len(id_lotti))
+
+
+def colonne_da_lotti(lista_lotti):
+    """
+    Trasformo la lista di oggetti SimulatoreLottoVigneto in colonne NumPy (una per parametro),
+    pronte per il calcolo vettoriale. I parametri agronomici arrivano dai codici già risolti nei lotti.
+    """
+    return {
+        "id": [l.id for l in lista_lotti],
+        "chiave": chiavi_lotti([l.id for l in lista_lotti]),
+        "n_piante": np.array([l.n_piante for l in lista_lotti], dtype=np.float64),
+        "ettari": np.array([l.ettari for l in lista_lotti], dtype=np.float64),
+        "cap_giornaliera": np.array([l.cap_max_raccolta_q for l in lista_lotti], dtype=np.float64),
+        "tempo_unitario": np.array([l.tempo_lavorazione_q for l in lista_lotti], dtype=np.float64),
+        **parametri_flusso([l.codice_flusso for l in lista_lotti]),
+        "fattore_concime": MOLTIPLICATORI_CONCIME[[l.codice_concime for l in lista_lotti]],
+        # Matrice (M, 3): resa residua del lotto per ciascuna classe di rischio
+        "perdite": PERDITE_TRATTAMENTO[[l.codice_trattamento for l in lista_lotti]],
+    }
+
+
+def campiona_meteo(seed, stagioni):
+    """
+    Versione vettoriale di ottieni_dati_meteo_iot: un trend stagionale per ogni stagione richiesta.
+    Il rischio è codificato come indice in RISCHI (0 = BASSO, 1 = MEDIO, 2 = ALTO).
+    """
+    basi = basi_stream(seed, stagioni, _CHIAVE_METEO)[:, 0]
+    pioggia = 150 + (uniformi(basi, 0) * (600 - 150 + 1)).astype(np.int64)
+    temperatura = 18.0 + (35.0 - 18.0) * uniformi(basi, 1)
+
+    rischio = np.where(pioggia > 200, 1, 0)
+    rischio[(pioggia > 350) & (temperatura > 25)] = 2
+    return {"pioggia_mm": pioggia, "temp_avg": temperatura, "rischio": rischio}
+
+
+def simula_blocco(colonne, meteo, seed, stagioni):
+    """
+    Esegue la pipeline completa (campo, cantina, tempi, bottiglie) su un blocco di stagioni.
+    Ogni array restituito ha forma (n_stagioni, n_lotti). I numeri casuali di ogni lotto
+    provengono dal suo stream (seed, stagione, ID), nello stesso ordine di esegui_simulazione.
+    """
+    basi = basi_stream(seed, stagioni, colonne["chiave"])
+
+    # Fase Campo (calcola_resa_agronomica)
+    resa_pianta = 2.5 + (4.5 - 2.5) * uniformi(basi, 0)
+    resa_pianta *= colonne["fattore_concime"]
+    resa_pianta *= colonne["perdite"][:, meteo["rischio"]].T
+    kg_uva = resa_pianta * colonne["n_piante"]
+
+    # Fase Cantina (simula_flusso)
+    resa_vino = colonne["resa_vino_min"] + (colonne["resa_vino_max"] - colonne["resa_vino_min"]) * uniformi(basi, 1)
+    resa_vinaccia = colonne["resa_vinaccia_min"] + (colonne["resa_vinaccia_max"] - colonne["resa_vinaccia_min"]) * uniformi(basi, 2)
+    litri_vino = kg_uva * resa_vino
+    kg_vinaccia = kg_uva * resa_vinaccia
+    ore_cantina = (kg_uva / 100) * colonne["tempo_unitario"] * colonne["moltiplicatore_tempo"]
+
+    # Fase Analisi Tempi (calcola_tempi_dettagliati)
+    giorni_raccolta = np.maximum((kg_uva / 100.0) / colonne["cap_giornaliera"], 1.0)
+    ore_vendemmia = giorni_raccolta * 8.0
+    fattore_imprevisti = 0.75 + (1.25 - 0.75) * uniformi(basi, 3)
+    ore_gestione = ((colonne["n_piante"] * 0.05) + (colonne["ettari"] * 20)) * fattore_imprevisti
+
+    # Stessi arrotondamenti di esegui_simulazione: le fasi a 0,1 h e il totale come somma delle
+    # fasi arrotondate, così i due motori si confrontano campo per campo
+    ore_vendemmia = np.round(ore_vendemmia, 1)
+    ore_cantina = np.round(ore_cantina, 1)
+    ore_gestione = np.round(ore_gestione, 1)
+    return {
+        "uva_kg": np.round(kg_uva, 2),
+        "vino_litri": np.round(litri_vino, 2),
+        "vinaccia_kg": np.round(kg_vinaccia, 2),
+        "n_bottiglie": np.floor(litri_vino / 1.5).astype(np.int64),
+        "ore_vendemmia": ore_vendemmia,
+        "ore_cantina": ore_cantina,
+        "ore_gestione": ore_gestione,
+        "ore_totali": np.round(ore_vendemmia + ore_cantina + ore_gestione, 1),
+    }
+
+
+def itera_blocchi_montecarlo(lista_lotti, n_stagioni, seed, blocco=BLOCCO_STAGIONI, stagione_iniziale=0):
+    """
+    Generatore: produce i risultati a blocchi di stagioni, così la memoria resta limitata
+    anche con centinaia di migliaia di stagioni. Ogni elemento è (meteo, risultati).
+    Le stagioni sono numerate da 'stagione_iniziale': ogni blocco (o stagione) può quindi
+    essere ricalcolato da solo, anche su un altro processo, con risultati identici.
+    """
+    colonne = colonne_da_lotti(lista_lotti)
+
+    for inizio in range(stagione_iniziale, stagione_iniziale + n_stagioni, blocco):
+        stagioni = np.arange(inizio, min(inizio + blocco, stagione_iniziale + n_stagioni), dtype=np.uint64)
+        meteo = campiona_meteo(seed, stagioni)
+        yield meteo, simula_blocco(colonne, meteo, seed, stagioni)
+
+
+def simula_montecarlo(lista_lotti, n_stagioni, seed=None, blocco=BLOCCO_STAGIONI, stagione_iniziale=0):
+    """
+    Esegue n_stagioni simulazioni per tutti i lotti e restituisce gli array completi
+    (forma (n_stagioni, n_lotti)). Per volumi molto grandi usare riepiloga_montecarlo.
+    """
+    seed = nuovo_seed() if seed is None else seed
+    blocchi = list(itera_blocchi_montecarlo(lista_lotti, n_stagioni, seed, blocco, stagione_iniziale))
+    meteo = {k: np.concatenate([m[k] for m, _ in blocchi]) for k in ("pioggia_mm", "temp_avg", "rischio")}
+    risultati = {k: np.concatenate([r[k] for _, r in blocchi]) for k in blocchi[0][1]} if blocchi else {}
+
+    return {"seed": seed, "id_lotti": [l.id for l in lista_lotti], "meteo": meteo, "risultati": risultati}
+
+
+def riepiloga_montecarlo(lista_lotti, n_stagioni, seed=None, blocco=BLOCCO_STAGIONI, percentili=(10, 50, 90)):
+    """
+    Esegue la simulazione a blocchi accumulando solo somme e somme dei quadrati per lotto,
+    senza tenere in memoria i singoli campioni. Per i totali aziendali (un valore per stagione)
+    conservo invece la serie completa per calcolarne i percentili.
+    """
+    if n_stagioni <= 0:
+        raise ValueError("n_stagioni deve essere positivo")
+    seed = nuovo_seed() if seed is None else seed
+
+    metriche = ("uva_kg", "vino_litri", "vinaccia_kg", "n_bottiglie", "ore_totali")
+    n_lotti = len(lista_lotti)
+
+    somme = {k: np.zeros(n_lotti) for k in metriche}
+    quadrati = {k: np.zeros(n_lotti) for k in metriche}
+    minimi = {k: np.full(n_lotti, np.inf) for k in metriche}
+    massimi = {k: np.full(n_lotti, -np.inf) for k in metriche}
+    totali = {k: [] for k in metriche}
+    conteggio_rischi = np.zeros(len(RISCHI), dtype=np.int64)
+
+    for meteo, risultati in itera_blocchi_montecarlo(lista_lotti, n_stagioni, seed, blocco):
+        conteggio_rischi += np.bincount(meteo["rischio"], minlength=len(RISCHI))
+        for k in metriche:
+            valori = risultati[k]
+            somme[k] += valori.sum(axis=0)
+            quadrati[k] += np.square(valori, dtype=np.float64).sum(axis=0)
+            np.minimum(minimi[k], valori.min(axis=0), out=minimi[k])
+            np.maximum(massimi[k], valori.max(axis=0), out=massimi[k])
+            totali[k].append(valori.sum(axis=1))
+
+    dettaglio_lotti = []
+    for i, lotto in enumerate(lista_lotti):
+        statistiche = {}
+        for k in metriche:
+            media = somme[k][i] / n_stagioni
+            varianza = max(quadrati[k][i] / n_stagioni - media * media, 0.0)
+            statistiche[k] = {
+                "media": round(float(media), 2),
+                "dev_std": round(float(np.sqrt(varianza)), 2),
+                "min": round(float(minimi[k][i]), 2),
+                "max": round(float(massimi[k][i]), 2),
+            }
+        dettaglio_lotti.append({"id": lotto.id, "cultivar": lotto.cultivar, "tipologia": lotto.tipologia, "statistiche": statistiche})
+
+    totali_azienda = {}
+    for k in metriche:
+        serie = np.concatenate(totali[k])
+        totali_azienda[k] = {
+            "media": round(float(serie.mean()), 2),
+            "dev_std": round(float(serie.std()), 2),
+            **{f"p{p}": round(float(v), 2) for p, v in zip(percentili, np.percentile(serie, percentili))},
+        }
+
+    return {
+        "seed": seed,
+        "n_stagioni": n_stagioni,
+        "frequenza_rischio": {r: round(int(c) / n_stagioni, 4) for r, c in zip(RISCHI, conteggio_rischi)},
+        "dettaglio_lotti": dettaglio_lotti,
+        "totali_azienda": totali_azienda,
+    }
+
+
+def simula_montecarlo_da_payload(payload, n_stagioni, seed=None, riepilogo=True):
+    """
+    Scorciatoia per il formato API: accetta lo stesso dizionario di /api/simula.
+    """
+    lista_lotti = crea_lotti_da_payload(payload.get("lotti", []))
+    if riepilogo:
+        return riepiloga_montecarlo(lista_lotti, n_stagioni, seed)
+    return simula_montecarlo(lista_lotti, n_stagioni, seed)
@@ -0,0 +1,367 @@
+# - OTTIMIZZATORE AGRONOMICO (CONCIME / TRATTAMENTO PER LOTTO) -
+# Invece di provare a mano le combinazioni di concime e trattamento (ed eventualmente capacità di
+# raccolta) di ogni lotto, cerco la scelta che massimizza il valore atteso dell'obiettivo
+# (bottiglie o litri) con le ore attese entro il budget e, se richiesto, un vincolo di rischio:
+# il percentile basso (default P10) del totale aziendale sulle stagioni simulate non deve
+# scendere sotto una soglia.
+#
+# Il risultato di un lotto dipende solo dalla sua configurazione e dal meteo della stagione, che
+# è comune a tutti: valuto quindi ogni coppia (lotto, opzione) una volta sola, con il motore
+# vettoriale su n_stagioni stagioni condivise, e memorizzo il vettore dei risultati per stagione
+# (CACHE_VALUTAZIONI, riusata anche tra chiamate successive). Le opzioni dello stesso lotto usano
+# lo stesso stream casuale (numeri casuali comuni), quindi si confrontano senza rumore.
+# Le valutazioni mancanti vengono calcolate a blocchi di lotti su un pool di processi.
+#
+# La ricerca non enumera le combinazioni (sarebbero opzioni^lotti):
+#   1. rilassamento lagrangiano del budget: per un prezzo λ dell'ora ogni lotto sceglie da solo
+#      l'opzione che massimizza valore - λ * ore; λ si trova per bisezione (O(L * K) per passo);
+#   2. ricerca locale: cambio l'opzione di un lotto alla volta finché migliora (prima il rispetto
+#      dei vincoli, poi il valore atteso), sfruttando le ore residue e correggendo il vincolo di rischio.
+# Esami: Ricerca operativa - Calcolo, Probabilità e Statistica (MAT06) - Algoritmi e strutture dati (INF01I)
+
+import os
+from itertools import product
+
+import numpy as np
+
+from motore_vettoriale import RISCHI, campiona_meteo, colonne_da_lotti, simula_blocco
+from registro_agronomico import REGISTRO, NomeSconosciuto
+from Simulatore import CacheLRU, ErrorePayload, OBIETTIVI_ALLOCAZIONE, SimulatoreLottoVigneto, crea_lotti_da_payload, nuovo_seed
+
+N_STAGIONI_OTTIMIZZAZIONE = 512     # Stagioni condivise su cui valuto ogni opzione
+LIMITE_STAGIONI_OTTIMIZZAZIONE = 4096
+PERCENTILE_RISCHIO = 10
+LOTTI_PER_BLOCCO = 16               # Lotti valutati insieme da un worker (limita la RAM di simula_blocco)
+SOGLIA_POOL = 2000                  # Sotto queste valutazioni mancanti il pool di processi non conviene
+MAX_PASSI_RICERCA = 20
+ITERAZIONI_BISEZIONE = 60
+
+# Grandezza del motore vettoriale massimizzata per ogni obiettivo di OBIETTIVI_ALLOCAZIONE
+GRANDEZZE_OBIETTIVO = {"bottiglie": "n_bottiglie", "litri": "vino_litri"}
+
+# Vettori per stagione delle coppie (lotto, opzione) già valutate: ogni voce pesa le sue n_stagioni
+# (4 byte ciascuna, float32), quindi la cache resta sotto i ~40 MB qualunque sia n_stagioni
+STAGIONI_CACHE_VALUTAZIONI = 10_000_000
+CACHE_VALUTAZIONI = CacheLRU(20_000, 3600.0, STAGIONI_CACHE_VALUTAZIONI)
+
+
+def opzioni_ricerca(concimi=None, trattamenti=None, capacita=None):
+    """
+    Griglia delle opzioni di ogni lotto: tuple (concime, trattamento, capacita_giornaliera).
+    Default: tutti i concimi e trattamenti del registro; capacita None = quella attuale del lotto.
+    """
+    concimi = tuple(concimi or REGISTRO.concimi)
+    trattamenti = tuple(trattamenti or REGISTRO.trattamenti)
+    for nome in concimi:
+        REGISTRO.nome_valido("concime", nome)
+    for nome in trattamenti:
+        REGISTRO.nome_valido("trattamento", nome)
+    return list(product(concimi, trattamenti, tuple(capacita) if capacita else (None,)))
+
+
+def _variante(lotto, opzione):
+    """
+    Copia del lotto con l'opzione applicata (stesso ID, quindi stesso stream casuale).
+    """
+    concime, trattamento, capacita = opzione
+    copia = SimulatoreLottoVigneto(lotto.id, lotto.cultivar, lotto.tipologia, lotto.n_piante, lotto.ettari)
+    copia.configura_parametri(lotto.cap_max_raccolta_q if capacita is None else capacita,
+                              lotto.tempo_lavorazione_q, concime, trattamento, lotto.priorita)
+    return copia
+
+
+def _chiave_valutazione(lotto, opzione, seed, n_stagioni, obiettivo, meteo):
+    meteo = None if meteo is None else (meteo["pioggia_mm"], meteo["temp_avg"], meteo["rischio_patogeni"])
+    return (repr(lotto.id), lotto.tipologia, lotto.n_piante, lotto.ettari, lotto.cap_max_raccolta_q,
+            lotto.tempo_lavorazione_q, opzione, seed, n_stagioni, obiettivo, meteo)
+
+
+def _meteo_stagioni(seed, n_stagioni, meteo):
+    stagioni = np.arange(n_stagioni, dtype=np.uint64)
+    if meteo is None:
+        return stagioni, campiona_meteo(seed, stagioni)
+    return stagioni, {
+        "pioggia_mm": np.full(n_stagioni, meteo["pioggia_mm"]),
+        "temp_avg": np.full(n_stagioni, meteo["temp_avg"]),
+        "rischio": np.full(n_stagioni, RISCHI.index(meteo["rischio_patogeni"])),
+    }
+
+
+def valuta_blocco(seed, n_stagioni, obiettivo, meteo, blocco):
+    """
+    Valuta un blocco di coppie (lotto, opzione) sulle stesse n_stagioni stagioni.
+    Restituisce per ogni coppia (valore dell'obiettivo per stagione, ore attese).
+    Eseguita anche dai processi worker: dipende solo dagli argomenti.
+    """
+    stagioni, meteo_stagioni = _meteo_stagioni(seed, n_stagioni, meteo)
+    colonne = colonne_da_lotti([_variante(lotto, opzione) for lotto, opzione in blocco])
+    risultati = simula_blocco(colonne, meteo_stagioni, seed, stagioni)
+    valori = risultati[GRANDEZZE_OBIETTIVO[obiettivo]].astype(np.float32)
+    ore = risultati["ore_totali"].mean(axis=0)
+    return [(valori[:, j].copy(), float(ore[j])) for j in range(len(blocco))]
+
+
+def valuta_opzioni(lista_lotti, opzioni, seed, n_stagioni, obiettivo="bottiglie", meteo=None, max_worker=None):
+    """
+    Matrici delle valutazioni: valori (L, S, K) per stagione e ore attese (L, K), più il numero
+    di coppie calcolate e di quelle lette dalla cache. Le coppie già valutate non si ricalcolano.
+    """
+    n_lotti, n_opzioni = len(lista_lotti), len(opzioni)
+    valori = np.empty((n_lotti, n_stagioni, n_opzioni), dtype=np.float32)
+    ore = np.empty((n_lotti, n_opzioni))
+
+    mancanti = []
+    for i, lotto in enumerate(lista_lotti):
+        for k, opzione in enumerate(opzioni):
+            in_cache = CACHE_VALUTAZIONI.leggi(_chiave_valutazione(lotto, opzione, seed, n_stagioni, obiettivo, meteo))
+            if in_cache is None:
+                mancanti.append((i, k))
+            else:
+                valori[i, :, k], ore[i, k] = in_cache
+
+    # Blocchi di coppie consecutive (circa LOTTI_PER_BLOCCO lotti ciascuno)
+    passo = LOTTI_PER_BLOCCO * n_opzioni
+    blocchi = [mancanti[inizio:inizio + passo] for inizio in range(0, len(mancanti), passo)]
+    argomenti = (seed, n_stagioni, obiettivo, meteo)
+
+    if max_worker is None:
+        max_worker = 1 if len(mancanti) < SOGLIA_POOL else min(len(blocchi), os.cpu_count() or 1)
+    if max_worker <= 1:
+        calcolati = (valuta_blocco(*argomenti, [(lista_lotti[i], opzioni[k]) for i, k in b]) for b in blocchi)
+        calcolati = zip(blocchi, calcolati)
+    else:
+        from sweep_scenari import itera_in_pool
+        # Ogni blocco porta con sé gli indici, perché i risultati arrivano in ordine di completamento
+        blocchi_indicizzati = ([(i, k, lista_lotti[i], opzioni[k]) for i, k in b] for b in blocchi)
+        calcolati = itera_in_pool(_valuta_blocco_indicizzato, argomenti, blocchi_indicizzati, max_worker)
+
+    for indici, risultati in calcolati:
+        for (i, k), (vettore, ore_attese) in zip(indici, risultati):
+            valori[i, :, k], ore[i, k] = vettore, ore_attese
+            CACHE_VALUTAZIONI.scrivi(_chiave_valutazione(lista_lotti[i], opzioni[k], seed, n_stagioni, obiettivo, meteo),
+                                     (vettore, ore_attese), peso=n_stagioni)
+
+    return valori, ore, len(mancanti), n_lotti * n_opzioni - len(mancanti)
+
+
+def _valuta_blocco_indicizzato(seed, n_stagioni, obiettivo, meteo, blocco):
+    # Lavoro eseguito dal processo worker: restituisco anche gli indici (lotto, opzione)
+    indici = [(i, k) for i, k, _, _ in blocco]
+    return indici, valuta_blocco(seed, n_stagioni, obiettivo, meteo, [(lotto, opzione) for _, _, lotto, opzione in blocco])
+
+
+def _scelta_lagrangiana(medie, ore, prezzo):
+    return np.argmax(medie - prezzo * ore, axis=1)
+
+
+def rilassamento_lagrangiano(medie, ore, budget):
+    """
+    Scelta per lotto che massimizza il valore atteso con le ore attese entro il budget, a meno del
+    gap di dualità: bisezione sul prezzo λ dell'ora. Restituisce (scelte entro il budget, scelte
+    appena oltre il budget, λ): le due soluzioni che racchiudono il gap, da cui parte la ricerca locale.
+    """
+    righe = np.arange(len(medie))
+    scelte = _scelta_lagrangiana(medie, ore, 0.0)
+    if ore[righe, scelte].sum() <= budget:
+        return scelte, scelte, 0.0
+
+    # Trovo un prezzo abbastanza alto da rispettare il budget (o da minimizzare le ore)
+    alto = 1.0
+    while ore[righe, _scelta_lagrangiana(medie, ore, alto)].sum() > budget and alto < 1e12:
+        alto *= 4.0
+    basso = 0.0
+    for _ in range(ITERAZIONI_BISEZIONE):
+        medio = (basso + alto) / 2
+        if ore[righe, _scelta_lagrangiana(medie, ore, medio)].sum() > budget:
+            basso = medio
+        else:
+            alto = medio
+    return _scelta_lagrangiana(medie, ore, alto), _scelta_lagrangiana(medie, ore, basso), alto
+
+
+class _StatoRicerca:
+    """
+    Soluzione corrente della ricerca locale con i totali aggiornati in O(S) a ogni mossa.
+    Le K opzioni di un lotto vengono valutate insieme (una sola chiamata a np.percentile su (K, S)).
+    """
+    def __init__(self, valori, medie, ore, scelte, budget, percentile, minimo):
+        self.valori, self.medie, self.ore = valori, medie, ore
+        self.budget, self.percentile, self.minimo = budget, percentile, minimo
+        self.scelte = scelte.copy()
+        righe = np.arange(len(scelte))
+        self.totale_stagioni = valori[righe, :, scelte].sum(axis=0, dtype=np.float64)
+        self.valore = float(medie[righe, scelte].sum())
+        self.ore_totali = float(ore[righe, scelte].sum())
+
+    def _punteggi(self, valore, ore_totali, totali_stagioni):
+        # Ordine lessicografico: prima il budget, poi il vincolo di rischio, poi il valore atteso
+        sforamento = np.maximum(ore_totali - self.budget, 0.0)
+        if self.minimo is None:
+            deficit = np.zeros_like(valore)
+        else:
+            deficit = np.minimum(np.percentile(totali_stagioni, self.percentile, axis=-1) - self.minimo, 0.0)
+        return np.stack([-sforamento, deficit, valore], axis=-1)
+
+    def punteggio_attuale(self):
+        return tuple(self._punteggi(np.float64(self.valore), np.float64(self.ore_totali), self.totale_stagioni).tolist())
+
+    def migliora(self, max_passi=MAX_PASSI_RICERCA):
+        attuale = self.punteggio_attuale()
+        mosse = 0
+        for _ in range(max_passi):
+            migliorato = False
+            for i in range(len(self.scelte)):
+                k_attuale = self.scelte[i]
+                valori = self.valore + self.medie[i] - self.medie[i, k_attuale]
+                ore_totali = self.ore_totali + self.ore[i] - self.ore[i, k_attuale]
+                totali = None
+                if self.minimo is not None:
+                    totali = self.totale_stagioni + (self.valori[i].T - self.valori[i, :, k_attuale])
+                punteggi = [tuple(p) for p in self._punteggi(valori, ore_totali, totali).tolist()]
+                k = max(range(len(punteggi)), key=punteggi.__getitem__)
+                if punteggi[k] > attuale:
+                    self.scelte[i] = k
+                    self.valore, self.ore_totali = float(valori[k]), float(ore_totali[k])
+                    if totali is not None:
+                        self.totale_stagioni = totali[k]
+                    attuale = punteggi[k]
+                    migliorato = True
+                    mosse += 1
+            if not migliorato:
+                break
+        if self.minimo is None:
+            # Senza vincolo di rischio il totale per stagione non viene aggiornato durante la ricerca
+            righe = np.arange(len(self.scelte))
+            self.totale_stagioni = self.valori[righe, :, self.scelte].sum(axis=0, dtype=np.float64)
+        return mosse
+
+
+def ottimizza(lista_lotti, budget, seed=None, obiettivo="bottiglie", concimi=None, trattamenti=None, capacita=None,
+              minimo_rischio=None, percentile_rischio=PERCENTILE_RISCHIO, n_stagioni=N_STAGIONI_OTTIMIZZAZIONE,
+              meteo=None, max_worker=None):
+    """
+    Sceglie concime, trattamento (ed eventualmente capacità di raccolta, tra i valori 'capacita')
+    di ogni lotto massimizzando il valore atteso dell'obiettivo, con le ore attese entro 'budget'
+    e, se 'minimo_rischio' è indicato, il percentile 'percentile_rischio' del totale aziendale
+    almeno pari a 'minimo_rischio'. I valori attesi sono al 100% (prima del taglio di budget).
+    """
+    if obiettivo not in GRANDEZZE_OBIETTIVO:
+        raise ValueError(f"obiettivo sconosciuto: '{obiettivo}' (ammessi: {', '.join(GRANDEZZE_OBIETTIVO)})")
+    seed = nuovo_seed() if seed is None else seed
+    opzioni = opzioni_ricerca(concimi, trattamenti, capacita)
+
+    valori, ore, calcolate, dalla_cache = valuta_opzioni(lista_lotti, opzioni, seed, n_stagioni, obiettivo, meteo, max_worker)
+    medie = valori.mean(axis=1, dtype=np.float64)
+
+    entro_budget, oltre_budget, prezzo_ora = rilassamento_lagrangiano(medie, ore, budget)
+    stato = _StatoRicerca(valori, medie, ore, entro_budget, budget, percentile_rischio, minimo_rischio)
+    mosse = stato.migliora()
+    if oltre_budget is not entro_budget:
+        alternativo = _StatoRicerca(valori, medie, ore, oltre_budget, budget, percentile_rischio, minimo_rischio)
+        mosse_alternativo = alternativo.migliora()
+        if alternativo.punteggio_attuale() > stato.punteggio_attuale():
+            stato, mosse = alternativo, mosse_alternativo
+
+    valore_percentile = float(np.percentile(stato.totale_stagioni, percentile_rischio))
+    scelte_lotti = []
+    for i, (lotto, k) in enumerate(zip(lista_lotti, stato.scelte)):
+        concime, trattamento, cap = opzioni[k]
+        scelte_lotti.append({
+            "id": lotto.id,
+            "concime": concime,
+            "trattamento": trattamento,
+            "capacita_giornaliera": lotto.cap_max_raccolta_q if cap is None else cap,
+            "valore_atteso": round(float(medie[i, k]), 2),
+            "ore_attese": round(float(ore[i, k]), 2),
+        })
+
+    return {
+        "seed": seed,
+        "obiettivo": obiettivo,
+        "n_stagioni": n_stagioni,
+        "meteo_rilevato": meteo,
+        "budget_iniziale": budget,
+        "ammissibile": stato.ore_totali <= budget + 1e-9 and (minimo_rischio is None or valore_percentile >= minimo_rischio),
+        "valore_atteso": round(stato.valore, 2),
+        "ore_attese": round(stato.ore_totali, 2),
+        "rischio": {"percentile": percentile_rischio, "valore": round(valore_percentile, 2), "minimo": minimo_rischio},
+        "ricerca": {"opzioni_per_lotto": len(opzioni), "valutazioni_calcolate": calcolate, "valutazioni_dalla_cache": dalla_cache,
+                    "prezzo_ora": round(prezzo_ora, 6), "mosse_ricerca_locale": mosse},
+        "scelte": scelte_lotti,
+    }
+
+
+def ottimizza_da_payload(dati, seed=None, meteo=None, max_worker=None):
+    """
+    Ottimizzazione a partire da un payload già validato da valida_payload. La sezione
+    "ottimizzazione" (opzionale) accetta: "concimi", "trattamenti", "capacita_giornaliera"
+    (liste di valori ammessi), "n_stagioni" e "rischio": {"percentile": 10, "minimo": ...}.
+    Solleva ErrorePayload se la sezione non è valida.
+    """
+    sezione = dati.get("ottimizzazione") or {}
+    if not isinstance(sezione, dict):
+        raise ErrorePayload("atteso un oggetto", "ottimizzazione")
+
+    def lista(chiave, categoria):
+        valori = sezione.get(chiave)
+        if valori is None:
+            return None
+        if not isinstance(valori, list) or not valori:
+            raise ErrorePayload("attesa una lista non vuota", f"ottimizzazione.{chiave}")
+        try:
+            return [REGISTRO.nome_valido(categoria, v) for v in valori]
+        except NomeSconosciuto as e:
+            raise ErrorePayload(str(e), f"ottimizzazione.{chiave}") from None
+
+    def numero(valore, campo, minimo, massimo=None):
+        if isinstance(valore, bool) or not isinstance(valore, (int, float)) or not minimo <= valore <= (massimo or float("inf")):
+            limite = f"tra {minimo} e {massimo}" if massimo is not None else f"almeno {minimo}"
+            raise ErrorePayload(f"atteso un numero {limite}, ricevuto {valore!r}", f"ottimizzazione.{campo}")
+        return valore
+
+    capacita = sezione.get("capacita_giornaliera")
+    if capacita is not None:
+        if not isinstance(capacita, list) or not capacita:
+            raise ErrorePayload("attesa una lista non vuota", "ottimizzazione.capacita_giornaliera")
+        capacita = [float(numero(c, "capacita_giornaliera", 1e-9)) for c in capacita]
+
+    rischio = sezione.get("rischio") or {}
+    if not isinstance(rischio, dict):
+        raise ErrorePayload("atteso un oggetto con percentile e minimo", "ottimizzazione.rischio")
+    minimo = rischio.get("minimo")
+    n_stagioni = int(numero(sezione.get("n_stagioni", N_STAGIONI_OTTIMIZZAZIONE), "n_stagioni", 1, LIMITE_STAGIONI_OTTIMIZZAZIONE))
+
+    return ottimizza(
+        crea_lotti_da_payload(dati["lotti"]),
+        dati["ore_budget"],
+        dati["seed"] if seed is None else seed,
+        dati["obiettivo_allocazione"],
+        lista("concimi", "concime"),
+        lista("trattamenti", "trattamento"),
+        capacita,
+        None if minimo is None else numero(minimo, "rischio.minimo", 0),
+        numero(rischio.get("percentile", PERCENTILE_RISCHIO), "rischio.percentile", 0, 100),
+        n_stagioni,
+        dati["meteo"] if meteo is None else meteo,
+        max_worker,
+    )
+
+
+if __name__ == "__main__":
+    # Tempi su 300 lotti, seriale e in parallelo (il confronto con la ricerca esaustiva è in tests/test_ottimizzatore.py)
+    import time
+
+    from benchmark import genera_lotti_sintetici
+
+    lotti = crea_lotti_da_payload(genera_lotti_sintetici(300, seed=9))
+    budget = 300 * 160.0
+    for worker in (1, None):
+        CACHE_VALUTAZIONI.svuota()
+        inizio = time.perf_counter()
+        esito = ottimizza(lotti, budget, seed=1, minimo_rischio=0, max_worker=worker)
+        print(f"300 lotti x {esito['ricerca']['opzioni_per_lotto']} opzioni, max_worker={worker}: "
+              f"{time.perf_counter() - inizio:.2f} s, valore atteso {esito['valore_atteso']}, ore {esito['ore_attese']} / {budget}, "
+              f"ammissibile {esito['ammissibile']}")
+    inizio = time.perf_counter()
+    esito = ottimizza(lotti, budget * 0.8, seed=1)
+    print(f"Stesso inventario, budget diverso (tutto dalla cache): {time.perf_counter() - inizio:.2f} s")
@@ -0,0 +1,134 @@
+# - REGISTRO AGRONOMICO -
+# Cultivar, flussi di vinificazione, concimi e trattamenti non sono più scritti nel codice come
+# catene di if/elif sulle stringhe: sono letti da un file di configurazione (registro_agronomico.json,
+# oppure il file indicato dalla variabile d'ambiente TIMPE_REGISTRO_AGRONOMICO).
+# Al caricamento il registro viene "compilato": ogni nome riceve un codice intero (l'indice nella
+# tupla della sua categoria) e i parametri diventano tabelle dense indicizzate da quei codici.
+# Il percorso caldo del simulatore fa quindi solo accessi per indice, e il motore vettoriale
+# costruisce i suoi array direttamente dalle stesse tabelle.
+# Flussi, concimi e trattamenti sono insiemi chiusi: i nomi sconosciuti vengono rifiutati subito
+# (NomeSconosciuto), invece di valere come "Nessuno". Le cultivar invece restano libere: quelle
+# registrate forniscono solo tipologia e tempo di lavorazione di riferimento (riferimento_cultivar);
+# per le altre il payload deve indicarli esplicitamente.
+# Esami: Basi di Dati (INGINF05) - Ingegneria del Software (INGINF06)
+
+import json
+import os
+
+# Classi di rischio patogeni prodotte da classifica_rischio_patogeni (l'ordine è il loro codice)
+RISCHI = ("BASSO", "MEDIO", "ALTO")
+
+PERCORSO_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "registro_agronomico.json")
+
+# Come nominare ogni categoria nei messaggi d'errore
+_ERRORI_CATEGORIA = {"flusso": "tipologia sconosciuta", "cultivar": "cultivar sconosciuta", "concime": "concime sconosciuto",
+                     "trattamento": "trattamento sconosciuto", "rischio": "classe di rischio sconosciuta"}
+
+
+class NomeSconosciuto(ValueError):
+    """
+    Nome non presente nel registro (es. un concime mai definito).
+    """
+    def __init__(self, categoria, nome, ammessi):
+        super().__init__(f"{_ERRORI_CATEGORIA[categoria]} {nome!r} (ammessi: {', '.join(map(str, ammessi))})")
+        self.categoria = categoria
+        self.nome = nome
+
+
+def _intervallo(valore, dove):
+    minimo, massimo = (float(v) for v in valore)
+    if not 0 <= minimo <= massimo:
+        raise ValueError(f"registro agronomico non valido: intervallo {valore!r} in {dove}")
+    return minimo, massimo
+
+
+class RegistroAgronomico:
+    """
+    Registro compilato: per ogni categoria una tupla di nomi (il codice è l'indice), un
+    dizionario nome -> codice e le tabelle dei parametri indicizzate per codice.
+    """
+    def __init__(self, dati):
+        try:
+            flussi, cultivar = dati["flussi"], dati["cultivar"]
+            concimi, trattamenti = dati["concimi"], dati["trattamenti"]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"registro agronomico non valido: manca la sezione {e}") from None
+
+        # Flussi di vinificazione
+        self.flussi = tuple(flussi)
+        self.codici_flusso = {nome: i for i, nome in enumerate(self.flussi)}
+        rese_vino = [_intervallo(flussi[n]["resa_vino"], f"flussi.{n}.resa_vino") for n in self.flussi]
+        rese_vinaccia = [_intervallo(flussi[n]["resa_vinaccia"], f"flussi.{n}.resa_vinaccia") for n in self.flussi]
+        self.resa_vino_min = tuple(r[0] for r in rese_vino)
+        self.resa_vino_max = tuple(r[1] for r in rese_vino)
+        self.resa_vinaccia_min = tuple(r[0] for r in rese_vinaccia)
+        self.resa_vinaccia_max = tuple(r[1] for r in rese_vinaccia)
+        self.moltiplicatore_tempo = tuple(float(flussi[n]["moltiplicatore_tempo"]) for n in self.flussi)
+
+        # Concimi: fattore moltiplicativo della resa per pianta
+        self.concimi = tuple(concimi)
+        self.codici_concime = {nome: i for i, nome in enumerate(self.concimi)}
+        self.fattori_concime = tuple(float(concimi[n]["fattore_resa"]) for n in self.concimi)
+
+        # Trattamenti: matrice densa [trattamento][rischio] della resa residua
+        self.trattamenti = tuple(trattamenti)
+        self.codici_trattamento = {nome: i for i, nome in enumerate(self.trattamenti)}
+        self.codici_rischio = {nome: i for i, nome in enumerate(RISCHI)}
+        perdite = []
+        for nome in self.trattamenti:
+            resa_residua = trattamenti[nome]["resa_residua"]
+            estranei = set(resa_residua) - set(RISCHI)
+            if estranei or len(resa_residua) != len(RISCHI):
+                raise ValueError(f"registro agronomico non valido: trattamenti.{nome}.resa_residua deve avere le classi {', '.join(RISCHI)}")
+            perdite.append(tuple(float(resa_residua[r]) for r in RISCHI))
+        self.perdite = tuple(perdite)
+
+        # Cultivar: flusso e tempo di lavorazione di riferimento (valori di default, non un elenco chiuso)
+        self.nomi_cultivar = tuple(cultivar)
+        self.codici_cultivar = {nome: i for i, nome in enumerate(self.nomi_cultivar)}
+        self.cultivar = {}
+        for nome, voce in cultivar.items():
+            self.cultivar[nome] = {"tipologia": self.nome_valido("flusso", voce["tipologia"]),
+                                   "tempo_unitario": float(voce["tempo_unitario"])}
+
+    def _tabella(self, categoria):
+        tabelle = {"flusso": self.codici_flusso, "concime": self.codici_concime,
+                   "trattamento": self.codici_trattamento, "rischio": self.codici_rischio, "cultivar": self.codici_cultivar}
+        return tabelle[categoria]
+
+    def codice(self, categoria, nome):
+        """
+        Codice intero di un nome ('flusso', 'concime', 'trattamento', 'rischio' o 'cultivar');
+        solleva NomeSconosciuto.
+        """
+        tabella = self._tabella(categoria)
+        try:
+            return tabella[nome]
+        except (KeyError, TypeError):
+            raise NomeSconosciuto(categoria, nome, list(tabella)) from None
+
+    def riferimento_cultivar(self, nome):
+        """
+        Tipologia e tempo unitario di riferimento della cultivar, oppure None se non è registrata.
+        """
+        return self.cultivar.get(nome) if isinstance(nome, str) else None
+
+    def nome_valido(self, categoria, nome):
+        """
+        Restituisce il nome se è nel registro, altrimenti solleva NomeSconosciuto.
+        """
+        self.codice(categoria, nome)
+        return nome
+
+
+def carica_registro(percorso=None):
+    """
+    Carica e compila il registro dal file JSON indicato (default: TIMPE_REGISTRO_AGRONOMICO
+    oppure registro_agronomico.json accanto a questo modulo).
+    """
+    percorso = percorso or os.environ.get("TIMPE_REGISTRO_AGRONOMICO") or PERCORSO_DEFAULT
+    with open(percorso, encoding="utf-8") as f:
+        return RegistroAgronomico(json.load(f))
+
+
+REGISTRO = carica_registro()
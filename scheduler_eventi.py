@@ -0,0 +1,177 @@
+# - SCHEDULER A EVENTI DISCRETI (SQUADRE, PRESSE, VASCHE) -
+# Il budget ore di Simulatore.py è un'unica riserva condivisa; in cantina però il collo di bottiglia
+# sono le risorse fisiche. Qui ogni lotto avviato attraversa tre fasi in sequenza, ognuna su un
+# pool di risorse con un numero limitato di unità:
+#   vendemmia     -> una squadra di raccolta per le ore di vendemmia del lotto (già limitate dalla
+#                    capacità giornaliera di raccolta: 8 h per giornata)
+#   pressatura    -> una pressa per ore_pressatura_q ore per quintale d'uva
+#   fermentazione -> una vasca per le ore di cantina del lotto (i rossi la occupano il 20% in più
+#                    per la macerazione, vedi moltiplicatore_tempo nel registro agronomico)
+# Gli eventi (fine di una fase) stanno in una coda a priorità (heapq) ordinata per tempo; chi trova
+# il pool occupato entra nella coda d'attesa del pool, servita per (priorità, ID) come
+# l'allocazione greedy. Nessuna prelazione: una fase iniziata arriva sempre alla fine.
+# Il tempo è in ore lavorative dall'inizio della vendemmia. Costo O(n log n) con n lotti.
+# Esami: Algoritmi e strutture dati (INF01I) - Ricerca operativa - Strategia, organizzazione e marketing (INGIND35)
+
+import heapq
+
+from allocatori import chiave_ordinamento
+
+# Pool di risorse e fasi del processo, nell'ordine in cui vengono attraversate
+RISORSE = ("squadre", "presse", "vasche")
+FASI = ("vendemmia", "pressatura", "fermentazione")
+
+RISORSE_DEFAULT = {"squadre": 2, "presse": 1, "vasche": 4}
+ORE_PRESSATURA_Q = 0.25   # Ore di pressa per quintale d'uva
+ORE_GIORNATA = 8.0        # Ore lavorative in una giornata
+
+
+class PoolRisorse:
+    """
+    Pool di 'unita' risorse identiche con la sua coda d'attesa (heap per priorità) e le
+    statistiche di utilizzo: ore occupate, attese e lunghezza massima della coda.
+    """
+    __slots__ = ("nome", "unita", "libere", "coda", "ore_occupate", "somma_attese", "attesa_max", "serviti", "coda_max")
+
+    def __init__(self, nome, unita):
+        self.nome = nome
+        self.unita = unita
+        self.libere = unita
+        self.coda = []
+        self.ore_occupate = 0.0
+        self.somma_attese = 0.0
+        self.attesa_max = 0.0
+        self.serviti = 0
+        self.coda_max = 0
+
+    def accoda(self, chiave, arrivo, lavoro):
+        heapq.heappush(self.coda, (chiave, arrivo, lavoro))
+        if len(self.coda) > self.coda_max:
+            self.coda_max = len(self.coda)
+
+    def servi(self, attesa, durata):
+        self.libere -= 1
+        self.ore_occupate += durata
+        self.somma_attese += attesa
+        if attesa > self.attesa_max:
+            self.attesa_max = attesa
+        self.serviti += 1
+
+    def riepilogo(self, durata_totale):
+        capacita = self.unita * durata_totale
+        return {
+            "unita": self.unita,
+            "ore_occupate": round(self.ore_occupate, 2),
+            "utilizzo_pct": round(100.0 * self.ore_occupate / capacita, 1) if capacita > 0 else 0.0,
+            "lotti_serviti": self.serviti,
+            "attesa_media_ore": round(self.somma_attese / self.serviti, 2) if self.serviti else 0.0,
+            "attesa_max_ore": round(self.attesa_max, 2),
+            "coda_max": self.coda_max,
+        }
+
+
+def calendario(lavori, risorse=None):
+    """
+    Simulazione a eventi discreti. 'lavori' è una lista di (id, priorita, durate) con le ore delle
+    tre fasi; 'risorse' il numero di unità di ogni pool (default RISORSE_DEFAULT).
+    Restituisce (tempi, pool): per ogni lavoro la lista [inizio, fine, attesa] di ogni fase.
+    """
+    risorse = {**RISORSE_DEFAULT, **(risorse or {})}
+    pool = [PoolRisorse(nome, int(risorse[nome])) for nome in RISORSE]
+    chiavi = [chiave_ordinamento(priorita, id_lavoro) for id_lavoro, priorita, _ in lavori]
+    tempi = [[None] * len(FASI) for _ in lavori]
+    eventi = []   # (tempo di fine fase, progressivo, lavoro, fase)
+    progressivo = 0
+
+    def avvia(lavoro, fase, ora, arrivo):
+        nonlocal progressivo
+        durata = lavori[lavoro][2][fase]
+        pool[fase].servi(ora - arrivo, durata)
+        tempi[lavoro][fase] = [ora, ora + durata, ora - arrivo]
+        heapq.heappush(eventi, (ora + durata, progressivo, lavoro, fase))
+        progressivo += 1
+
+    def richiedi(lavoro, fase, ora):
+        p = pool[fase]
+        if p.libere and not p.coda:
+            avvia(lavoro, fase, ora, ora)
+        else:
+            p.accoda(chiavi[lavoro], ora, lavoro)
+
+    # Tutti i lotti sono pronti all'inizio della vendemmia: le squadre vanno prima ai più prioritari
+    for lavoro in sorted(range(len(lavori)), key=chiavi.__getitem__):
+        richiedi(lavoro, 0, 0.0)
+
+    while eventi:
+        ora, _, lavoro, fase = heapq.heappop(eventi)
+        p = pool[fase]
+        p.libere += 1
+        if p.coda:
+            _, arrivo, successivo = heapq.heappop(p.coda)
+            avvia(successivo, fase, ora, arrivo)
+        if fase + 1 < len(FASI):
+            richiedi(lavoro, fase + 1, ora)
+
+    return tempi, pool
+
+
+def pianifica_risorse(risultati, risorse=None):
+    """
+    Calendario delle risorse per i risultati già allocati di uno scenario (dettaglio_lotti):
+    i lotti non avviati non occupano risorse. Restituisce inizio, fine e attese per lotto e fase
+    (ore lavorative dall'inizio della vendemmia) e l'utilizzo di ogni pool.
+    """
+    risorse = {**RISORSE_DEFAULT, **(risorse or {})}
+    ore_pressatura_q = risorse.pop("ore_pressatura_q", ORE_PRESSATURA_Q)
+
+    avviati = [r for r in risultati if r.get("percentuale_elaborazione", 100) > 0]
+    lavori = [
+        (r["id"], r.get("priorita", 2), (r["output"]["dettaglio_ore"]["vendemmia"],
+                                         r["output"]["uva_kg"] / 100.0 * ore_pressatura_q,
+                                         r["output"]["dettaglio_ore"]["cantina"]))
+        for r in avviati
+    ]
+    tempi, pool = calendario(lavori, risorse)
+    durata_totale = max((t[-1][1] for t in tempi), default=0.0)
+
+    per_id = {}
+    for (id_lotto, priorita, _), fasi in zip(lavori, tempi):
+        per_id[id_lotto] = {
+            "id": id_lotto,
+            "priorita": priorita,
+            "inizio": round(fasi[0][0], 2),
+            "fine": round(fasi[-1][1], 2),
+            "attesa_ore": round(sum(f[2] for f in fasi), 2),
+            "fasi": {nome: {"inizio": round(f[0], 2), "fine": round(f[1], 2), "attesa_ore": round(f[2], 2)}
+                     for nome, f in zip(FASI, fasi)},
+        }
+
+    return {
+        "ore_pressatura_q": ore_pressatura_q,
+        "durata_ore": round(durata_totale, 2),
+        "durata_giornate": round(durata_totale / ORE_GIORNATA, 1),
+        "risorse": {p.nome: p.riepilogo(durata_totale) for p in pool},
+        "lotti": [per_id.get(r["id"], {"id": r["id"], "priorita": r.get("priorita", 2), "inizio": None, "fine": None})
+                  for r in risultati],
+    }
+
+
+if __name__ == "__main__":
+    # Esempio: 5.000 lotti sintetici, simulati e allocati con budget illimitato, poi calendarizzati
+    import time
+
+    from benchmark import genera_lotti_sintetici
+    from Simulatore import esegui_scenario, crea_lotti_da_payload
+
+    lista_lotti = crea_lotti_da_payload(genera_lotti_sintetici(5000, seed=1))
+    risultati = esegui_scenario(lista_lotti, float("inf"), seed=1, usa_cache=False)["dettaglio_lotti"]
+
+    inizio = time.perf_counter()
+    piano = pianifica_risorse(risultati, {"squadre": 40, "presse": 8, "vasche": 60})
+    durata = time.perf_counter() - inizio
+
+    print(f"5000 lotti calendarizzati in {durata * 1000:.1f} ms")
+    print(f"Durata della campagna: {piano['durata_ore']} h ({piano['durata_giornate']} giornate)")
+    for nome, riepilogo in piano["risorse"].items():
+        print(f"  {nome:<8} {riepilogo}")
+
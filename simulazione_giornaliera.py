@@ -0,0 +1,292 @@
+# - SIMULAZIONE DELLA STAGIONE GIORNO PER GIORNO -
+# Il modello di Simulatore.py lavora sul trend stagionale: un solo valore di pioggia e temperatura
+# e le ore di vendemmia calcolate in blocco (giorni_raccolta * 8). Qui la stagione viene invece
+# simulata un giorno alla volta, come una catena di generatori:
+#
+#   meteo_giornaliero -> rischio_giornaliero -> avanza_lotti -> (consumatore)
+#
+# Ogni stadio produce un giorno alla volta e tiene solo lo stato corrente (cumulati e stato dei
+# lotti), quindi la memoria non dipende dal numero di giorni; il consumatore può fermarsi quando
+# vuole o tenere solo gli aggregati (vedi esegui_stagione_giornaliera).
+#
+# Se a fine stagione qualche lotto è ancora in raccolta (lotti grandi o capacità giornaliera
+# bassa), la vendemmia prosegue oltre GIORNI_STAGIONE finché tutti i lotti sono raccolti: nei
+# giorni di prolungamento il meteo è quello di fine stagione (niente pioggia, rischio fermo) e le
+# ore di gestione sono già state tutte ripartite. Oltre GIORNI_MAX_PROLUNGAMENTO il lotto resta
+# segnato come non completato (raccolta_completata = False).
+#
+# Con varianza = 0 ogni giorno vale esattamente la media stagionale e i totali di ogni lotto
+# coincidono con quelli di SimulatoreLottoVigneto.esegui_simulazione (stesso seed e stessi stream).
+# Esami: Calcolo, Probabilità e Statistica (MAT06) - Algoritmi e strutture dati (INF01I)
+
+from Simulatore import (StreamCasuale, chiave_stream, classifica_rischio_patogeni, crea_stream_lotto,
+                        crea_stream_meteo, estrai_trend_stagionale, simula_lotti)
+from registro_agronomico import REGISTRO
+
+GIORNI_STAGIONE = 180          # Durata della stagione simulata
+GIORNO_INIZIO_VENDEMMIA = 150  # La vendemmia parte nell'ultimo mese, quando il trend è ormai delineato
+ORE_GIORNATA = 8.0             # Ore lavorative di una giornata di raccolta
+GIORNI_MAX_PROLUNGAMENTO = 3650  # Giorni di raccolta oltre la stagione dopo cui mi fermo comunque
+ESCURSIONE_TEMPERATURA = 6.0   # Scostamento massimo giornaliero (gradi) con varianza = 1
+
+
+def meteo_giornaliero(seed, stagione=0, giorni=GIORNI_STAGIONE, varianza=1.0):
+    """
+    Generatore del meteo giornaliero. Il trend stagionale viene estratto dallo stesso stream del
+    modello stagionale; ogni giorno oscilla attorno alla media con un rumore simmetrico:
+    pioggia * [1 - varianza, 1 + varianza], temperatura +/- varianza * ESCURSIONE_TEMPERATURA.
+    Il valore atteso dei totali resta quindi quello del trend. 'varianza' va da 0 a 1.
+    """
+    if not 0.0 <= varianza <= 1.0:
+        raise ValueError("La varianza giornaliera deve essere compresa tra 0 e 1")
+
+    pioggia_stagione, temperatura_stagione = estrai_trend_stagionale(crea_stream_meteo(seed, stagione))
+    rng = StreamCasuale(seed, stagione, chiave_stream("giornaliero", "meteo"))
+    pioggia_media = pioggia_stagione / giorni
+
+    for giorno in range(giorni):
+        yield {
+            "giorno": giorno,
+            "pioggia_mm": pioggia_media * (1.0 + varianza * (2.0 * rng.random() - 1.0)),
+            "temp": temperatura_stagione + varianza * ESCURSIONE_TEMPERATURA * (2.0 * rng.random() - 1.0),
+        }
+
+
+def rischio_giornaliero(giorni_meteo, giorni=GIORNI_STAGIONE):
+    """
+    Generatore dello stato di rischio patogeni: a ogni giorno proietto sull'intera stagione la
+    pioggia caduta finora e la temperatura media osservata, e applico la stessa classificazione
+    del modello stagionale. Arrotondo le proiezioni per non far scattare una soglia per un errore
+    di arrotondamento dei float (con varianza 0 la proiezione coincide col trend).
+    """
+    pioggia_cumulata = 0.0
+    somma_temperature = 0.0
+
+    for n, giorno in enumerate(giorni_meteo, start=1):
+        pioggia_cumulata += giorno["pioggia_mm"]
+        somma_temperature += giorno["temp"]
+        pioggia_proiettata = round(pioggia_cumulata * giorni / n, 6)
+        temp_media = round(somma_temperature / n, 9)
+
+        yield {
+            **giorno,
+            "pioggia_cumulata_mm": pioggia_cumulata,
+            "pioggia_proiettata_mm": pioggia_proiettata,
+            "temp_media": temp_media,
+            "rischio_patogeni": classifica_rischio_patogeni(pioggia_proiettata, temp_media),
+        }
+
+
+class StatoLottoGiornaliero:
+    """
+    Stato di avanzamento di un lotto durante la stagione. Le estrazioni casuali sono le stesse del
+    modello stagionale (stesso stream e stesso ordine: resa pianta, resa vino, resa vinaccia,
+    imprevisti); cambia solo il momento in cui vengono applicate.
+    Le grandezze di cantina sono calcolate sempre dall'uva raccolta cumulata (e non sommando i
+    giorni), così a fine raccolta coincidono con quelle del modello stagionale.
+    """
+    __slots__ = ("lotto", "resa_pianta_base", "resa_vino", "resa_vinaccia", "ore_gestione_stagione",
+                 "uva_raccolta", "uva_attesa", "ore_vendemmia", "ore_cantina", "ore_gestione", "completato")
+
+    def __init__(self, lotto, seed, stagione=0):
+        rng = crea_stream_lotto(seed, stagione, lotto.id)
+        self.lotto = lotto
+        self.resa_pianta_base = rng.uniform(2.5, 4.5) * lotto.fattore_concime()
+        flusso = lotto.codice_flusso
+        self.resa_vino = rng.uniform(REGISTRO.resa_vino_min[flusso], REGISTRO.resa_vino_max[flusso])
+        self.resa_vinaccia = rng.uniform(REGISTRO.resa_vinaccia_min[flusso], REGISTRO.resa_vinaccia_max[flusso])
+        self.ore_gestione_stagione = ((lotto.n_piante * 0.05) + (lotto.ettari * 20)) * rng.uniform(0.75, 1.25)
+
+        self.uva_raccolta = 0.0
+        self.uva_attesa = 0.0
+        self.ore_vendemmia = 0.0
+        self.ore_cantina = 0.0
+        self.ore_gestione = 0.0
+        self.completato = False
+
+    def _ore_cantina(self, kg_uva):
+        # Stessa formula di simula_flusso (il rosso ha la macerazione, +20%)
+        return (kg_uva / 100) * self.lotto.tempo_lavorazione_q * REGISTRO.moltiplicatore_tempo[self.lotto.codice_flusso]
+
+    def avanza(self, giorno, rischio_patogeni, in_vendemmia, giorni=GIORNI_STAGIONE):
+        """
+        Avanza il lotto di un giorno e restituisce (kg_raccolti, ore_vendemmia, ore_cantina, ore_gestione) del giorno.
+        La resa attesa dipende dal rischio del giorno: se il rischio sale, l'uva ancora in pianta diminuisce.
+        """
+        # Cumulati ricalcolati dal totale (non sommando i giorni), così a fine stagione sono esatti;
+        # nei giorni di prolungamento la gestione è già tutta ripartita
+        gestione_cumulata = self.ore_gestione_stagione * min(giorno + 1, giorni) / giorni
+        ore_gestione, self.ore_gestione = gestione_cumulata - self.ore_gestione, gestione_cumulata
+
+        if not in_vendemmia or self.completato:
+            return 0.0, 0.0, 0.0, ore_gestione
+
+        lotto = self.lotto
+        self.uva_attesa = self.resa_pianta_base * lotto.fattore_rischio(rischio_patogeni) * lotto.n_piante
+        capacita_kg = lotto.cap_max_raccolta_q * 100
+        precedente = self.uva_raccolta
+
+        if self.uva_attesa - precedente <= capacita_kg:
+            # Ultima giornata: chiudo il lotto esattamente sull'uva attesa
+            self.uva_raccolta = max(self.uva_attesa, precedente)
+            self.completato = True
+        else:
+            self.uva_raccolta = precedente + capacita_kg
+
+        # Ore di raccolta proporzionali alla capacità giornaliera, con il minimo di una giornata
+        giorni_raccolta = (self.uva_raccolta / 100.0) / lotto.cap_max_raccolta_q
+        if self.completato and giorni_raccolta < 1: giorni_raccolta = 1
+        vendemmia_cumulata = giorni_raccolta * ORE_GIORNATA
+        cantina_cumulata = self._ore_cantina(self.uva_raccolta)
+        ore_vendemmia, self.ore_vendemmia = vendemmia_cumulata - self.ore_vendemmia, vendemmia_cumulata
+        ore_cantina, self.ore_cantina = cantina_cumulata - self.ore_cantina, cantina_cumulata
+
+        return self.uva_raccolta - precedente, ore_vendemmia, ore_cantina, ore_gestione
+
+    def come_risultato(self):
+        """
+        Totali del lotto nel formato dell'output di esegui_simulazione.
+        """
+        vino = self.uva_raccolta * self.resa_vino
+        t_vend, t_cant, t_gest = round(self.ore_vendemmia, 1), round(self.ore_cantina, 1), round(self.ore_gestione, 1)
+        return {
+            "uva_kg": round(self.uva_raccolta, 2),
+            "vino_litri": round(vino, 2),
+            "vinaccia_kg": round(self.uva_raccolta * self.resa_vinaccia, 2),
+            "n_bottiglie": int(vino / 1.5),
+            "ore_totali": round(t_vend + t_cant + t_gest, 1),
+            "dettaglio_ore": {"vendemmia": t_vend, "cantina": t_cant, "gestione": t_gest},
+            "raccolta_completata": self.completato,
+        }
+
+
+def avanza_lotti(giorni_rischio, stati, giorni=GIORNI_STAGIONE, inizio_vendemmia=GIORNO_INIZIO_VENDEMMIA, dettaglio=False,
+                 max_prolungamento=GIORNI_MAX_PROLUNGAMENTO):
+    """
+    Generatore dell'avanzamento aziendale: per ogni giorno fa avanzare tutti i lotti e produce gli
+    aggregati della giornata (uva raccolta, ore per fase, lotti ancora in raccolta). Con
+    dettaglio=True aggiunge la lista degli avanzamenti dei singoli lotti di quel giorno.
+    Finita la stagione, se ci sono lotti ancora in raccolta, prosegue con i giorni di prolungamento
+    (al più max_prolungamento, segnati con "oltre_stagione": True).
+    """
+    ultimo = None
+    for ultimo in giorni_rischio:
+        yield _avanza_giornata(ultimo, stati, giorni, inizio_vendemmia, dettaglio)
+    if ultimo is None:
+        return
+
+    # Prolungamento della vendemmia con il meteo e il rischio dell'ultimo giorno della stagione
+    fine_stagione = ultimo["giorno"] + 1
+    for n in range(fine_stagione, fine_stagione + max_prolungamento):
+        if all(stato.completato for stato in stati):
+            return
+        yield _avanza_giornata({**ultimo, "giorno": n, "pioggia_mm": 0.0, "temp": ultimo["temp_media"]},
+                               stati, giorni, inizio_vendemmia, dettaglio)
+
+
+def _avanza_giornata(giorno, stati, giorni, inizio_vendemmia, dettaglio):
+    """
+    Fa avanzare tutti i lotti di un giorno e restituisce gli aggregati della giornata.
+    """
+    in_vendemmia = giorno["giorno"] >= inizio_vendemmia
+    uva = vendemmia = cantina = gestione = 0.0
+    lotti = [] if dettaglio else None
+
+    for stato in stati:
+        kg, ore_v, ore_c, ore_g = stato.avanza(giorno["giorno"], giorno["rischio_patogeni"], in_vendemmia, giorni)
+        uva += kg
+        vendemmia += ore_v
+        cantina += ore_c
+        gestione += ore_g
+        if dettaglio:
+            lotti.append({
+                "id": stato.lotto.id,
+                "uva_kg": kg,
+                "ore_vendemmia": ore_v,
+                "ore_cantina": ore_c,
+                "ore_gestione": ore_g,
+                "avanzamento_pct": 100.0 if stato.completato else (stato.uva_raccolta / stato.uva_attesa * 100 if stato.uva_attesa else 0.0),
+            })
+
+    return {
+        **giorno,
+        "uva_kg": uva,
+        "ore_vendemmia": vendemmia,
+        "ore_cantina": cantina,
+        "ore_gestione": gestione,
+        "lotti_in_raccolta": sum(1 for s in stati if in_vendemmia and not s.completato),
+        "oltre_stagione": giorno["giorno"] >= giorni,
+        "lotti": lotti,
+    }
+
+
+def stagione_giornaliera(lista_lotti, seed, stagione=0, giorni=GIORNI_STAGIONE, varianza=1.0,
+                         inizio_vendemmia=GIORNO_INIZIO_VENDEMMIA, dettaglio=False, stati=None):
+    """
+    Catena completa: generatore di un giorno alla volta per l'intera azienda.
+    'stati' (opzionale) è la lista in cui creare gli stati dei lotti, per leggerne i totali alla fine.
+    """
+    if stati is None:
+        stati = []
+    stati.extend(StatoLottoGiornaliero(lotto, seed, stagione) for lotto in lista_lotti)
+    giorni_meteo = meteo_giornaliero(seed, stagione, giorni, varianza)
+    return avanza_lotti(rischio_giornaliero(giorni_meteo, giorni), stati, giorni, inizio_vendemmia, dettaglio)
+
+
+def esegui_stagione_giornaliera(lista_lotti, seed, stagione=0, giorni=GIORNI_STAGIONE, varianza=1.0,
+                                inizio_vendemmia=GIORNO_INIZIO_VENDEMMIA):
+    """
+    Consuma l'intera stagione tenendo solo gli aggregati: restituisce i totali di ogni lotto
+    (formato 'output' di esegui_simulazione), l'ultimo stato meteo/rischio della stagione e i
+    giorni simulati (più di 'giorni' se la vendemmia è proseguita oltre la stagione).
+    """
+    stati = []
+    ultimo = None
+    pioggia_totale = 0.0
+    for ultimo in stagione_giornaliera(lista_lotti, seed, stagione, giorni, varianza, inizio_vendemmia, stati=stati):
+        pioggia_totale += ultimo["pioggia_mm"]
+
+    return {
+        "meteo_stagione": {
+            "pioggia_mm": round(pioggia_totale, 1),
+            "temp_avg": round(ultimo["temp_media"], 1) if ultimo else None,
+            "rischio_patogeni": ultimo["rischio_patogeni"] if ultimo else None,
+        },
+        "giorni_simulati": ultimo["giorno"] + 1 if ultimo else 0,
+        "lotti": [{"id": s.lotto.id, "output": s.come_risultato()} for s in stati],
+    }
+
+
+def verifica_contro_stagionale(lista_lotti, seed, stagione=0):
+    """
+    Verifica che con varianza 0 i totali giornalieri coincidano con il modello stagionale.
+    Restituisce la lista degli scostamenti trovati (vuota se tutto coincide).
+    """
+    meteo, attesi = simula_lotti(lista_lotti, seed, stagione, usa_cache=False)
+    ottenuti = esegui_stagione_giornaliera(lista_lotti, seed, stagione, varianza=0.0)
+
+    scostamenti = []
+    if ottenuti["meteo_stagione"]["rischio_patogeni"] != meteo["rischio_patogeni"]:
+        scostamenti.append(("meteo", "rischio_patogeni", meteo["rischio_patogeni"], ottenuti["meteo_stagione"]["rischio_patogeni"]))
+    for atteso, ottenuto in zip(attesi, ottenuti["lotti"]):
+        if not ottenuto["output"]["raccolta_completata"]:
+            scostamenti.append((atteso["id"], "raccolta_completata", True, False))
+        for chiave in ("uva_kg", "vino_litri", "vinaccia_kg", "n_bottiglie", "ore_totali", "dettaglio_ore"):
+            if atteso["output"][chiave] != ottenuto["output"][chiave]:
+                scostamenti.append((atteso["id"], chiave, atteso["output"][chiave], ottenuto["output"][chiave]))
+    return scostamenti
+
+
+if __name__ == "__main__":
+    # Esempio: una stagione di 200 lotti giorno per giorno (la verifica contro il modello stagionale
+    # è in tests/test_simulazione_giornaliera.py)
+    from Simulatore import crea_lotti_da_payload
+    from benchmark import genera_lotti_sintetici
+
+    lotti = crea_lotti_da_payload(genera_lotti_sintetici(200))
+    print(f"{'Giorno':>6} {'Pioggia':>8} {'Proiez.':>8} {'Rischio':>8} {'Uva kg':>10} {'In racc.':>8}")
+    for g in stagione_giornaliera(lotti, seed=2024):
+        if g["giorno"] % 15 == 0 or g["uva_kg"] > 0:
+            print(f"{g['giorno']:>6} {g['pioggia_mm']:>8.1f} {g['pioggia_proiettata_mm']:>8.0f} {g['rischio_patogeni']:>8} {g['uva_kg']:>10.0f} {g['lotti_in_raccolta']:>8}")
+        if g["giorno"] > GIORNO_INIZIO_VENDEMMIA and g["lotti_in_raccolta"] == 0:
+            break  # Posso fermare la catena in qualsiasi momento
@@ -0,0 +1,483 @@
+# - STATISTICHE ONLINE DEI RISULTATI MONTE CARLO -
+# Bande di rischio (P10 / P50 / P90) di molte stagioni simulate senza conservare i campioni:
+# ogni blocco di risultati aggiorna degli stati di dimensione fissa, e gli stati calcolati da
+# processi diversi si possono unire (merge) ottenendo lo stesso risultato di un unico passaggio.
+#
+#   - MomentiOnline:    media e varianza con l'algoritmo di Welford, aggiornato a blocchi e unito
+#                       con la formula di Chan; in più minimo e massimo.                O(k) memoria
+#   - SketchQuantili:   sketch dei quantili a bucket logaritmici (come DDSketch): ogni quantile ha
+#                       errore relativo al più 'errore_relativo' (default 1%); gli sketch si uniscono
+#                       sommando i conteggi. Se i valori coprono un intervallo troppo ampio, i bucket
+#                       più bassi vengono accorpati (l'errore resta garantito sui quantili alti).
+#   - IstogrammaFisso:  conteggi su limiti fissi (es. stato di produzione, classe di rischio).
+#
+# Tutte le classi lavorano su k serie in parallelo (una per lotto, più il totale aziendale):
+# i blocchi hanno forma (n_stagioni, k), come gli array del motore vettoriale.
+# Esami: Calcolo, Probabilità e Statistica (MAT06) - Algoritmi e strutture dati (INF01I)
+
+import math
+
+import numpy as np
+
+from allocatori import ALLOCATORI, chiave_ordinamento
+from motore_vettoriale import BLOCCO_STAGIONI, RISCHI, itera_blocchi_montecarlo, simula_blocco, colonne_da_lotti
+from Simulatore import nuovo_seed
+
+# Grandezze di cui calcolo le bande, per lotto e per il totale aziendale
+METRICHE_RISCHIO = ("uva_kg", "vino_litri", "vinaccia_kg", "n_bottiglie", "ore_totali", "ore_necessarie_100")
+
+# Limiti della percentuale di elaborazione: [0, 1e-9) Non Avviato, [1e-9, 99.9) Parziale, [99.9, ...) Completato
+LIMITI_STATI = (1e-9, 99.9)
+STATI_PRODUZIONE = ("Non Avviato", "Parziale", "Completato")
+
+ERRORE_RELATIVO_QUANTILI = 0.01
+MAX_BUCKET_SKETCH = 2048          # Bucket massimi per serie (con errore 1% coprono un rapporto di ~1e17)
+
+
+def _come_blocco(valori, n_serie):
+    """
+    Normalizzo l'ingresso a una matrice (n_campioni, n_serie) di float64.
+    """
+    blocco = np.asarray(valori, dtype=np.float64)
+    if blocco.ndim == 1:
+        blocco = blocco.reshape(-1, n_serie)
+    if blocco.shape[1] != n_serie:
+        raise ValueError(f"attese {n_serie} serie, ricevute {blocco.shape[1]}")
+    return blocco
+
+
+class MomentiOnline:
+    """
+    Media, varianza, minimo e massimo di k serie (Welford / Chan, numericamente stabile).
+    """
+    def __init__(self, n_serie):
+        self.n_serie = n_serie
+        self.n = 0
+        self.media = np.zeros(n_serie)
+        self.m2 = np.zeros(n_serie)
+        self.minimo = np.full(n_serie, np.inf)
+        self.massimo = np.full(n_serie, -np.inf)
+
+    def _unisci_momenti(self, n, media, m2):
+        # Formula di Chan et al.: unione esatta di due insiemi di momenti
+        totale = self.n + n
+        delta = media - self.media
+        self.media = self.media + delta * (n / totale)
+        self.m2 = self.m2 + m2 + delta * delta * (self.n * n / totale)
+        self.n = totale
+
+    def aggiorna(self, valori):
+        blocco = _come_blocco(valori, self.n_serie)
+        if len(blocco) == 0:
+            return self
+        media = blocco.mean(axis=0)
+        self._unisci_momenti(len(blocco), media, np.square(blocco - media).sum(axis=0))
+        np.minimum(self.minimo, blocco.min(axis=0), out=self.minimo)
+        np.maximum(self.massimo, blocco.max(axis=0), out=self.massimo)
+        return self
+
+    def unisci(self, altro):
+        if altro.n:
+            self._unisci_momenti(altro.n, altro.media, altro.m2)
+            np.minimum(self.minimo, altro.minimo, out=self.minimo)
+            np.maximum(self.massimo, altro.massimo, out=self.massimo)
+        return self
+
+    def varianza(self):
+        return self.m2 / self.n if self.n else np.zeros(self.n_serie)
+
+    def dev_std(self):
+        return np.sqrt(self.varianza())
+
+
+class SketchQuantili:
+    """
+    Sketch dei quantili a bucket logaritmici per k serie di valori non negativi.
+    Il bucket i contiene i valori in (gamma^(i-1), gamma^i], con gamma = (1 + a) / (1 - a):
+    restituendo 2 gamma^i / (gamma + 1) l'errore relativo è al più a. Gli zeri (e i valori
+    negativi, trattati come zero) hanno un contatore a parte.
+    """
+    def __init__(self, n_serie, errore_relativo=ERRORE_RELATIVO_QUANTILI, max_bucket=MAX_BUCKET_SKETCH):
+        if not 0 < errore_relativo < 1:
+            raise ValueError("errore_relativo deve essere compreso tra 0 e 1")
+        self.n_serie = n_serie
+        self.errore_relativo = errore_relativo
+        self.gamma = (1 + errore_relativo) / (1 - errore_relativo)
+        self.max_bucket = max_bucket
+        self.n = np.zeros(n_serie, dtype=np.int64)
+        self.zeri = np.zeros(n_serie, dtype=np.int64)
+        # Ogni riga ha il proprio indice di partenza: bastano pochi bucket per serie anche se
+        # i lotti hanno ordini di grandezza diversi
+        self.inizio = np.zeros(n_serie, dtype=np.int64)
+        self.conteggi = np.zeros((n_serie, 0), dtype=np.int64)
+
+    def _indici(self, valori):
+        return np.ceil(np.log(valori) / math.log(self.gamma)).astype(np.int64)
+
+    def _copri(self, minimi, massimi):
+        """
+        Riorganizzo la tabella perché ogni riga copra [minimi, massimi] (le righe senza nuovi
+        valori hanno minimi > massimi). Oltre max_bucket accorpo i bucket più bassi.
+        """
+        occupate = self.n - self.zeri > 0
+        nuove = minimi <= massimi
+        larghezza = self.conteggi.shape[1]
+        fine = self.inizio + larghezza - 1
+        basso = np.where(occupate, np.where(nuove, np.minimum(self.inizio, minimi), self.inizio), minimi)
+        alto = np.where(occupate, np.where(nuove, np.maximum(fine, massimi), fine), massimi)
+        basso = np.where(occupate | nuove, basso, self.inizio)
+        alto = np.where(occupate | nuove, alto, self.inizio)
+
+        nuova_larghezza = min(max(larghezza, int((alto - basso).max(initial=0)) + 1), self.max_bucket)
+        nuovo_inizio = np.maximum(basso, alto - nuova_larghezza + 1)
+        if nuova_larghezza == larghezza and np.array_equal(nuovo_inizio, self.inizio):
+            return
+
+        tabella = np.zeros((self.n_serie, nuova_larghezza), dtype=np.int64)
+        righe, colonne = np.nonzero(self.conteggi)
+        if len(righe):
+            spostate = np.clip(colonne + (self.inizio - nuovo_inizio)[righe], 0, nuova_larghezza - 1)
+            np.add.at(tabella, (righe, spostate), self.conteggi[righe, colonne])
+        self.conteggi = tabella
+        self.inizio = nuovo_inizio
+
+    def _aggiungi(self, righe, indici, pesi):
+        larghezza = self.conteggi.shape[1]
+        colonne = np.clip(indici - self.inizio[righe], 0, larghezza - 1)
+        piatti = np.bincount(righe * larghezza + colonne, weights=pesi, minlength=self.n_serie * larghezza)
+        self.conteggi += piatti.astype(np.int64).reshape(self.n_serie, larghezza)
+
+    def aggiorna(self, valori):
+        blocco = _come_blocco(valori, self.n_serie)
+        positivi = blocco > 0
+        if positivi.any():
+            indici = self._indici(np.where(positivi, blocco, 1.0))
+            grande = np.iinfo(np.int64).max
+            self._copri(np.where(positivi, indici, grande).min(axis=0), np.where(positivi, indici, -grande).max(axis=0))
+            righe = np.broadcast_to(np.arange(self.n_serie), blocco.shape)[positivi]
+            self._aggiungi(righe, indici[positivi], None)
+        self.n += len(blocco)
+        self.zeri += len(blocco) - positivi.sum(axis=0)
+        return self
+
+    def unisci(self, altro):
+        if altro.n_serie != self.n_serie or altro.gamma != self.gamma:
+            raise ValueError("si possono unire solo sketch con le stesse serie e lo stesso errore relativo")
+        righe, colonne = np.nonzero(altro.conteggi)
+        if len(righe):
+            indici = colonne + altro.inizio[righe]
+            grande = np.iinfo(np.int64).max
+            minimi, massimi = np.full(self.n_serie, grande), np.full(self.n_serie, -grande)
+            np.minimum.at(minimi, righe, indici)
+            np.maximum.at(massimi, righe, indici)
+            self._copri(minimi, massimi)
+            self._aggiungi(righe, indici, altro.conteggi[righe, colonne])
+        self.n += altro.n
+        self.zeri += altro.zeri
+        return self
+
+    def quantili(self, q):
+        """
+        Quantili q (in [0, 1]) di ogni serie: matrice (len(q), n_serie); NaN per le serie vuote.
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        cumulati = np.cumsum(self.conteggi, axis=1)
+        risultato = np.full((len(q), self.n_serie), np.nan)
+        for j, quantile in enumerate(q):
+            rango = np.floor(quantile * (self.n - 1))
+            bersaglio = rango - self.zeri
+            posizione = (cumulati <= bersaglio[:, None]).sum(axis=1)
+            posizione = np.minimum(posizione, max(self.conteggi.shape[1] - 1, 0))
+            valori = 2 * np.power(self.gamma, (self.inizio + posizione).astype(np.float64)) / (self.gamma + 1)
+            risultato[j] = np.where(bersaglio < 0, 0.0, valori)
+        risultato[:, self.n == 0] = np.nan
+        return risultato
+
+
+class IstogrammaFisso:
+    """
+    Conteggi di k serie su bin fissi: il bin j contiene i valori in [limiti[j-1], limiti[j]),
+    il primo tutto ciò che sta sotto limiti[0], l'ultimo tutto ciò che sta da limiti[-1] in su.
+    """
+    def __init__(self, limiti, n_serie):
+        self.limiti = np.asarray(limiti, dtype=np.float64)
+        self.n_serie = n_serie
+        self.conteggi = np.zeros((n_serie, len(self.limiti) + 1), dtype=np.int64)
+
+    def aggiorna(self, valori):
+        blocco = _come_blocco(valori, self.n_serie)
+        bin_ = np.searchsorted(self.limiti, blocco, side="right")
+        larghezza = self.conteggi.shape[1]
+        piatti = (np.arange(self.n_serie)[None, :] * larghezza + bin_).ravel()
+        self.conteggi += np.bincount(piatti, minlength=self.n_serie * larghezza).reshape(self.n_serie, larghezza)
+        return self
+
+    def unisci(self, altro):
+        if not np.array_equal(altro.limiti, self.limiti):
+            raise ValueError("si possono unire solo istogrammi con gli stessi limiti")
+        self.conteggi += altro.conteggi
+        return self
+
+    def frequenze(self):
+        totali = self.conteggi.sum(axis=1, keepdims=True)
+        return self.conteggi / np.maximum(totali, 1)
+
+
+class StatisticheRischio:
+    """
+    Stato completo delle bande di rischio di un insieme di lotti: momenti e sketch per ogni
+    grandezza di METRICHE_RISCHIO (una serie per lotto più il totale aziendale, in fondo),
+    istogramma degli stati di produzione per lotto e frequenza delle classi di rischio meteo.
+    """
+    def __init__(self, id_lotti, errore_relativo=ERRORE_RELATIVO_QUANTILI):
+        self.id_lotti = list(id_lotti)
+        serie = len(self.id_lotti) + 1
+        self.momenti = {k: MomentiOnline(serie) for k in METRICHE_RISCHIO}
+        self.sketch = {k: SketchQuantili(serie, errore_relativo) for k in METRICHE_RISCHIO}
+        self.stati = IstogrammaFisso(LIMITI_STATI, len(self.id_lotti))
+        self.rischio = IstogrammaFisso((1, 2), 1)
+
+    @property
+    def n_stagioni(self):
+        return self.momenti[METRICHE_RISCHIO[0]].n
+
+    def aggiorna_blocco(self, valori, percentuali, rischio):
+        """
+        valori: {metrica: matrice (n_stagioni, n_lotti)}; percentuali: percentuale di elaborazione
+        per stagione e lotto; rischio: indice della classe di rischio (in RISCHI) per stagione.
+        """
+        for k in METRICHE_RISCHIO:
+            blocco = np.asarray(valori[k], dtype=np.float64)
+            con_totale = np.column_stack([blocco, blocco.sum(axis=1)])
+            self.momenti[k].aggiorna(con_totale)
+            self.sketch[k].aggiorna(con_totale)
+        self.stati.aggiorna(percentuali)
+        self.rischio.aggiorna(np.asarray(rischio).reshape(-1, 1))
+        return self
+
+    def aggiorna(self, dati_finali):
+        """
+        Consuma un singolo scenario del simulatore scalare (output di esegui_scenario / simula).
+        """
+        lotti = dati_finali["dettaglio_lotti"]
+        valori = {k: [[r["output"][k] for r in lotti]] for k in METRICHE_RISCHIO if k != "ore_necessarie_100"}
+        valori["ore_necessarie_100"] = [[r["ore_necessarie_100"] for r in lotti]]
+        percentuali = [[r["percentuale_elaborazione"] for r in lotti]]
+        return self.aggiorna_blocco(valori, percentuali, [RISCHI.index(dati_finali["meteo_rilevato"]["rischio_patogeni"])])
+
+    def unisci(self, altro):
+        if altro.id_lotti != self.id_lotti:
+            raise ValueError("si possono unire solo statistiche degli stessi lotti")
+        for k in METRICHE_RISCHIO:
+            self.momenti[k].unisci(altro.momenti[k])
+            self.sketch[k].unisci(altro.sketch[k])
+        self.stati.unisci(altro.stati)
+        self.rischio.unisci(altro.rischio)
+        return self
+
+    def riepilogo(self, percentili=(10, 50, 90)):
+        """
+        Dizionario JSON-serializzabile con le bande di ogni lotto e dei totali aziendali.
+        """
+        bande = {}
+        for k in METRICHE_RISCHIO:
+            m = self.momenti[k]
+            quantili = self.sketch[k].quantili([p / 100 for p in percentili])
+            bande[k] = [
+                {
+                    "media": round(float(m.media[i]), 2),
+                    "dev_std": round(float(m.dev_std()[i]), 2),
+                    "min": round(float(m.minimo[i]), 2),
+                    "max": round(float(m.massimo[i]), 2),
+                    **{f"p{p}": round(float(quantili[j, i]), 2) for j, p in enumerate(percentili)},
+                }
+                for i in range(len(self.id_lotti) + 1)
+            ]
+
+        frequenze_stati = self.stati.frequenze()
+        dettaglio_lotti = [
+            {
+                "id": id_lotto,
+                "bande": {k: bande[k][i] for k in METRICHE_RISCHIO},
+                "stati_produzione": {s: round(float(f), 4) for s, f in zip(STATI_PRODUZIONE, frequenze_stati[i])},
+            }
+            for i, id_lotto in enumerate(self.id_lotti)
+        ]
+        return {
+            "n_stagioni": self.n_stagioni,
+            "errore_relativo_quantili": self.sketch[METRICHE_RISCHIO[0]].errore_relativo,
+            "frequenza_rischio": {r: round(float(f), 4) for r, f in zip(RISCHI, self.rischio.frequenze()[0])},
+            "dettaglio_lotti": dettaglio_lotti,
+            "totali_azienda": {k: bande[k][-1] for k in METRICHE_RISCHIO},
+        }
+
+
+# - BANDE DI RISCHIO CON IL MOTORE VETTORIALE -
+def _riempi_in_ordine(ore_ordinate, budget):
+    """
+    Riempimento sequenziale su tutte le stagioni insieme (righe): nell'ordine delle colonne ogni
+    lotto riceve il budget rimasto dopo i precedenti, il primo che sfora riceve il residuo.
+    Il residuo è calcolato sottraendo le ore una alla volta (come negli allocatori), non come
+    budget - somma cumulata, così gli arrotondamenti dei float sono gli stessi.
+    """
+    residuo = np.subtract.accumulate(
+        np.concatenate((np.full((len(ore_ordinate), 1), float(budget)), ore_ordinate[:, :-1]), axis=1), axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        parziale = np.where(ore_ordinate > 0, residuo / ore_ordinate * 100, 100.0)
+    return np.where(residuo <= 0, 0.0, np.where(residuo >= ore_ordinate, 100.0, parziale))
+
+
+def percentuali_greedy(ore, priorita, id_lotti, budget):
+    """
+    Politica 'greedy' su tutte le stagioni insieme: in ordine (priorità, ID) ogni lotto riceve
+    il budget rimasto dopo i precedenti. Stesso risultato di allocatori.alloca_greedy, stagione per stagione.
+    """
+    ordine = sorted(range(len(id_lotti)), key=lambda i: chiave_ordinamento(priorita[i], id_lotti[i]))
+    percentuali = np.empty_like(ore)
+    percentuali[:, ordine] = _riempi_in_ordine(ore[:, ordine], budget)
+    return percentuali
+
+
+def percentuali_frazionaria(ore, valore, priorita, id_lotti, budget):
+    """
+    Politica 'frazionaria' su tutte le stagioni insieme: dentro ogni fascia di priorità i lotti
+    senza ore vengono prima, poi quelli con resa oraria (valore / ore) più alta; a parità di resa
+    vale l'ordine (priorità, ID). L'ordine cambia da stagione a stagione, quindi ordino ogni riga
+    con un lexsort. Stesso risultato di allocatori.alloca_frazionaria, stagione per stagione.
+    """
+    n_stagioni, n_lotti = ore.shape
+    ordine_base = sorted(range(n_lotti), key=lambda i: chiave_ordinamento(priorita[i], id_lotti[i]))
+    rango = np.empty(n_lotti, dtype=np.int64)
+    rango[ordine_base] = np.arange(n_lotti)
+
+    a_pagamento = ore > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        resa = np.where(a_pagamento, valore / ore, 0.0)
+    # Chiavi del lexsort dall'ultima (primaria) alla prima: fascia, gratuiti prima, resa decrescente, rango
+    ordine = np.lexsort((np.broadcast_to(rango, ore.shape), -resa, a_pagamento,
+                         np.broadcast_to(np.asarray(priorita), ore.shape)), axis=1)
+    ore_ordinate = np.take_along_axis(ore, ordine, axis=1)
+
+    # I lotti senza ore sono sempre lavorati al 100%, anche a budget esaurito
+    ordinate = np.where(ore_ordinate <= 0, 100.0, _riempi_in_ordine(np.maximum(ore_ordinate, 0.0), budget))
+    percentuali = np.empty_like(ordinate)
+    np.put_along_axis(percentuali, ordine, ordinate, axis=1)
+    return percentuali
+
+
+def percentuali_stagioni(risultati, lista_lotti, budget, politica, obiettivo):
+    """
+    Percentuali di elaborazione (n_stagioni, n_lotti) per la politica scelta. Greedy e
+    frazionaria sono vettoriali; le altre politiche (la 'intera', con la programmazione dinamica)
+    vengono applicate stagione per stagione con allocatori.py.
+    """
+    ore = risultati["ore_totali"]
+    priorita = [l.priorita for l in lista_lotti]
+    id_lotti = [l.id for l in lista_lotti]
+    if politica == "greedy":
+        return percentuali_greedy(ore, priorita, id_lotti, budget)
+    if politica == "frazionaria":
+        valore = risultati["n_bottiglie"] if obiettivo == "bottiglie" else risultati["vino_litri"]
+        return percentuali_frazionaria(ore, valore.astype(np.float64), priorita, id_lotti, budget)
+
+    allocatore = ALLOCATORI[politica]
+    percentuali = np.empty_like(ore)
+    for s in range(len(ore)):
+        richieste = [
+            {"id": id_lotti[i], "priorita": priorita[i], "ore": float(ore[s, i]),
+             "bottiglie": float(risultati["n_bottiglie"][s, i]), "litri": float(risultati["vino_litri"][s, i]),
+             "frazionabile": l.frazionabile, "quote": l.quote_intere}
+            for i, l in enumerate(lista_lotti)
+        ]
+        percentuali[s] = allocatore(richieste, budget, obiettivo=obiettivo)
+    return percentuali
+
+
+def _blocchi_meteo_fisso(lista_lotti, seed, meteo, inizio, n_stagioni, blocco):
+    """
+    Come itera_blocchi_montecarlo, ma con il trend meteo misurato uguale per tutte le stagioni:
+    variano solo le estrazioni dei lotti.
+    """
+    colonne = colonne_da_lotti(lista_lotti)
+    for primo in range(inizio, inizio + n_stagioni, blocco):
+        stagioni = np.arange(primo, min(primo + blocco, inizio + n_stagioni), dtype=np.uint64)
+        meteo_blocco = {
+            "pioggia_mm": np.full(len(stagioni), meteo["pioggia_mm"]),
+            "temp_avg": np.full(len(stagioni), meteo["temp_avg"]),
+            "rischio": np.full(len(stagioni), RISCHI.index(meteo["rischio_patogeni"])),
+        }
+        yield meteo_blocco, simula_blocco(colonne, meteo_blocco, seed, stagioni)
+
+
+def statistiche_stagioni(lista_lotti, budget, seed, intervallo, politica="greedy", obiettivo="bottiglie",
+                         meteo=None, blocco=BLOCCO_STAGIONI, errore_relativo=ERRORE_RELATIVO_QUANTILI):
+    """
+    Statistiche delle stagioni [inizio, inizio + n) dopo l'allocazione del budget. Ogni
+    intervallo si calcola da solo (stream contatore): gli stati di intervalli diversi, anche
+    calcolati da processi diversi, si uniscono con StatisticheRischio.unisci.
+    """
+    inizio, n_stagioni = intervallo
+    statistiche = StatisticheRischio([l.id for l in lista_lotti], errore_relativo)
+    if meteo is None:
+        blocchi = itera_blocchi_montecarlo(lista_lotti, n_stagioni, seed, blocco, stagione_iniziale=inizio)
+    else:
+        blocchi = _blocchi_meteo_fisso(lista_lotti, seed, meteo, inizio, n_stagioni, blocco)
+
+    for meteo_blocco, risultati in blocchi:
+        percentuali = percentuali_stagioni(risultati, lista_lotti, budget, politica, obiettivo)
+        fattore = percentuali / 100.0
+        valori = {
+            "uva_kg": risultati["uva_kg"] * fattore,
+            "vino_litri": risultati["vino_litri"] * fattore,
+            "vinaccia_kg": risultati["vinaccia_kg"] * fattore,
+            "n_bottiglie": np.floor(risultati["n_bottiglie"] * fattore),
+            "ore_totali": risultati["ore_totali"] * fattore,
+            "ore_necessarie_100": risultati["ore_totali"],
+        }
+        statistiche.aggiorna_blocco(valori, percentuali, meteo_blocco["rischio"])
+    return statistiche
+
+
+def bande_rischio(lista_lotti, budget, n_stagioni, seed=None, politica="greedy", obiettivo="bottiglie", meteo=None,
+                  percentili=(10, 50, 90), max_worker=1, blocco=BLOCCO_STAGIONI):
+    """
+    Bande di rischio di n_stagioni stagioni simulate con il motore vettoriale. Con max_worker > 1
+    le stagioni vengono divise in intervalli calcolati su un pool di processi e gli stati parziali
+    vengono uniti man mano che arrivano.
+    """
+    if n_stagioni <= 0:
+        raise ValueError("n_stagioni deve essere positivo")
+    seed = nuovo_seed() if seed is None else seed
+
+    if max_worker <= 1:
+        statistiche = statistiche_stagioni(lista_lotti, budget, seed, (0, n_stagioni), politica, obiettivo, meteo, blocco)
+    else:
+        from sweep_scenari import itera_in_pool
+        passo = max(blocco, -(-n_stagioni // (4 * max_worker)))
+        intervalli = ((inizio, min(passo, n_stagioni - inizio)) for inizio in range(0, n_stagioni, passo))
+        statistiche = StatisticheRischio([l.id for l in lista_lotti])
+        for parziale in itera_in_pool(_statistiche_intervallo, (lista_lotti, budget, seed, politica, obiettivo, meteo, blocco),
+                                      intervalli, max_worker):
+            statistiche.unisci(parziale)
+
+    riepilogo = statistiche.riepilogo(percentili)
+    for lotto, dettaglio in zip(lista_lotti, riepilogo["dettaglio_lotti"]):
+        dettaglio.update({"cultivar": lotto.cultivar, "tipologia": lotto.tipologia, "priorita": lotto.priorita})
+    return {"seed": seed, "politica_allocazione": politica, "meteo_rilevato": meteo, "bande_rischio": riepilogo}
+
+
+def _statistiche_intervallo(lista_lotti, budget, seed, politica, obiettivo, meteo, blocco, intervallo):
+    # Lavoro eseguito dal processo worker: un intervallo di stagioni
+    return statistiche_stagioni(lista_lotti, budget, seed, intervallo, politica, obiettivo, meteo, blocco)
+
+
+if __name__ == "__main__":
+    # Esempio: bande di rischio di 20 lotti sintetici (le verifiche sono in tests/test_statistiche_online.py)
+    import json
+
+    from Simulatore import crea_lotti_da_payload
+    from benchmark import genera_lotti_sintetici
+
+    lotti = crea_lotti_da_payload(genera_lotti_sintetici(20))
+    esito = bande_rischio(lotti, 20 * 40.0, 20_000, seed=42)
+    print(json.dumps(esito["bande_rischio"]["totali_azienda"], indent=2))
@@ -0,0 +1,377 @@
+# - SWEEP DEGLI SCENARI "WHAT-IF" -
+# Esegue una griglia di scenari (concime x trattamento x budget x priorità, ...) partendo da
+# un payload base, distribuendo il lavoro su un pool di processi a blocchi e restituendo per
+# ogni scenario solo un riepilogo compatto. Nessun passaggio JSON: i worker chiamano
+# direttamente esegui_scenario su strutture Python.
+# Esami: Algoritmi e strutture dati (INF01I) - Ingegneria del Software (INGINF06)
+#
+# Formato della griglia: dizionario {parametro: [valori]}. Il parametro può essere:
+#   - "ore_budget"                    -> budget ore dell'intero scenario
+#   - "politica_allocazione", ...     -> opzioni di allocazione dell'intero scenario
+#   - "concime", "trattamento", ...   -> applicato a TUTTI i lotti
+#   - "L01.concime", "L02.priorita"   -> applicato solo al lotto con quell'ID
+# Esempio: {"ore_budget": [150, 200], "concime": ["Nessuno", "Urea"], "L02.trattamento": ["Zolfo", "Poltiglia Bordolese"]}
+#
+# Pool di processi: uno solo per processo, condiviso da sweep, batch, job, ottimizzatore e bande di
+# rischio. Richieste concorrenti si dividono gli stessi PROCESSI_POOL processi invece di crearne
+# cpu_count a testa; 'max_worker' limita solo la quota usata da una singola chiamata.
+
+import itertools
+import json
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from Simulatore import ErrorePayload, nuovo_seed, simula_validato, valida_payload
+
+PROCESSI_POOL = int(os.environ.get('TIMPE_PROCESSI_POOL', os.cpu_count() or 1))   # Processi del pool condiviso
+
+# Parametri che nel payload stanno dentro 'config' (gli altri sono al primo livello del lotto)
+PARAMETRI_CONFIG = ("capacita_giornaliera", "tempo_unitario", "concime", "trattamento")
+
+# Parametri che valgono per l'intero scenario (primo livello del payload)
+PARAMETRI_SCENARIO = ("ore_budget", "politica_allocazione", "obiettivo_allocazione")
+
+# Colonne numeriche del riepilogo con cui si può ordinare la tabella dello sweep
+COLONNE_ORDINAMENTO = ("totale_bottiglie", "totale_vino_litri", "totale_vinaccia_kg", "ore_effettive",
+                       "ore_necessarie_100", "completamento_pct", "lotti_completati", "lotti_parziali",
+                       "lotti_non_avviati")
+
+
+_pool = None
+_lock_pool = threading.Lock()
+
+
+def pool_condiviso():
+    """
+    Pool di processi condiviso, creato al primo uso (chi non lo usa non avvia processi).
+    """
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PROCESSI_POOL)
+        return _pool
+
+
+def _scarta_pool(pool):
+    # Un worker morto rende inutilizzabile il pool: lo scarto, la prossima chiamata ne crea uno nuovo
+    global _pool
+    with _lock_pool:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def conta_scenari(griglia):
+    """
+    Numero totale di combinazioni della griglia.
+    """
+    totale = 1
+    for valori in griglia.values():
+        totale *= len(valori)
+    return totale
+
+
+def espandi_griglia(griglia):
+    """
+    Generatore: produce ogni combinazione della griglia come dizionario {parametro: valore}.
+    """
+    nomi = list(griglia)
+    for combinazione in itertools.product(*(griglia[n] for n in nomi)):
+        yield dict(zip(nomi, combinazione))
+
+
+def applica_parametri(payload_base, parametri):
+    """
+    Restituisce un nuovo payload con i parametri dello scenario applicati.
+    Copio solo i dizionari che modifico: il payload base resta intatto.
+    """
+    payload = dict(payload_base)
+    lotti = [dict(l, config=dict(l.get('config', {}))) for l in payload_base.get('lotti', [])]
+
+    for chiave, valore in parametri.items():
+        if chiave in PARAMETRI_SCENARIO:
+            payload[chiave] = valore
+            continue
+
+        id_lotto, _, nome = chiave.rpartition('.')
+        bersagli = [l for l in lotti if not id_lotto or str(l['id']) == id_lotto]
+        if not bersagli:
+            raise KeyError(f"Lotto '{id_lotto}' non presente nel payload")
+        for lotto in bersagli:
+            if nome in PARAMETRI_CONFIG:
+                lotto['config'][nome] = valore
+            else:
+                lotto[nome] = valore
+
+    payload['lotti'] = lotti
+    return payload
+
+
+def valida_singola_stagione(dati, prefisso=""):
+    """
+    Il riepilogo dello scenario legge i risultati di una singola stagione: rifiuto subito, con un
+    errore sul campo, i payload (già validati) in modalità analitica o a bande di rischio.
+    """
+    if dati["modalita"] == "analitica":
+        raise ErrorePayload("sweep e riepiloghi confrontano scenari a singola stagione, non la modalità analitica", f"{prefisso}modalita")
+    if dati["n_stagioni"] is not None:
+        raise ErrorePayload("sweep e riepiloghi confrontano scenari a singola stagione, senza n_stagioni", f"{prefisso}n_stagioni")
+
+
+def valida_ordinamento(ordina_per, decrescente=True):
+    """
+    Controllo le opzioni di ordinamento della tabella (vedi ordina_tabella).
+    """
+    if ordina_per not in COLONNE_ORDINAMENTO:
+        raise ErrorePayload(f"colonna sconosciuta {ordina_per!r} (ammesse: {', '.join(COLONNE_ORDINAMENTO)})", "ordina_per")
+    if not isinstance(decrescente, bool):
+        raise ErrorePayload(f"atteso true o false, ricevuto {decrescente!r}", "decrescente")
+
+
+def valida_sweep(payload_base, griglia, ordina_per="totale_bottiglie", decrescente=True):
+    """
+    Controllo payload base, forma della griglia e ordinamento prima di avviare lo sweep, così gli
+    errori arrivano subito (es. come 400) invece che durante lo streaming dei risultati.
+    Restituisce il numero di scenari. I valori dei parametri vengono validati scenario per scenario.
+    """
+    valida_ordinamento(ordina_per, decrescente)
+    try:
+        dati = valida_payload(payload_base)
+    except ErrorePayload as e:
+        raise ErrorePayload(e.messaggio, "base" if e.campo is None else f"base.{e.campo}") from None
+    valida_singola_stagione(dati, "base.")
+
+    if not isinstance(griglia, dict) or not griglia:
+        raise ErrorePayload("atteso un oggetto non vuoto {parametro: [valori]}", "griglia")
+    id_lotti = {str(l["id"]) for l in dati["lotti"]}
+    for chiave, valori in griglia.items():
+        if not isinstance(valori, list) or not valori:
+            raise ErrorePayload("attesa una lista non vuota di valori", f"griglia.{chiave}")
+        id_lotto = chiave.rpartition('.')[0]
+        if chiave not in PARAMETRI_SCENARIO and id_lotto and id_lotto not in id_lotti:
+            raise ErrorePayload(f"lotto {id_lotto!r} non presente nel payload base", f"griglia.{chiave}")
+    return conta_scenari(griglia)
+
+
+def riepiloga_scenario(dati_finali):
+    """
+    Riduco il risultato completo di uno scenario ai soli indicatori utili al confronto.
+    """
+    totali = dati_finali["totali_azienda"]
+    stati = [r["stato_produzione"] for r in dati_finali["dettaglio_lotti"]]
+    ore_necessarie = totali["totale_ore_necessarie_100"]
+
+    return {
+        "totale_bottiglie": totali["totale_bottiglie_1_5L"],
+        "totale_vino_litri": totali["totale_vino_litri"],
+        "totale_vinaccia_kg": totali["totale_vinaccia_biomassa_kg"],
+        "ore_effettive": totali["totale_ore_effettive"],
+        "ore_necessarie_100": ore_necessarie,
+        "completamento_pct": round(totali["totale_ore_effettive"] / ore_necessarie * 100, 1) if ore_necessarie else 100.0,
+        "lotti_completati": stati.count("Completato"),
+        "lotti_parziali": stati.count("Parziale"),
+        "lotti_non_avviati": stati.count("Non Avviato"),
+        "rischio_patogeni": dati_finali["meteo_rilevato"]["rischio_patogeni"],
+    }
+
+
+def valuta_scenario(payload):
+    """
+    Esegue un singolo scenario in formato payload (dizionario) e ne restituisce il riepilogo.
+    """
+    dati = valida_payload(payload)
+    valida_singola_stagione(dati)
+    return riepiloga_scenario(simula_validato(dati))
+
+
+def _valuta_blocco(payload_base, blocco):
+    """
+    Lavoro eseguito dal processo worker: un blocco di (indice, parametri) sullo stesso payload base.
+    Un errore in uno scenario non interrompe gli altri: viene riportato nel suo riepilogo.
+    """
+    risultati = []
+    for indice, parametri in blocco:
+        try:
+            riepilogo = valuta_scenario(applica_parametri(payload_base, parametri))
+        except Exception as e:
+            riepilogo = {"errore": f"{type(e).__name__}: {e}"}
+        risultati.append({"indice": indice, "parametri": parametri, **riepilogo})
+    return risultati
+
+
+def _blocchi(iterabile, dimensione):
+    """
+    Raggruppa un iterabile in liste di 'dimensione' elementi (l'ultima può essere più corta).
+    """
+    iteratore = iter(iterabile)
+    while True:
+        blocco = list(itertools.islice(iteratore, dimensione))
+        if not blocco:
+            return
+        yield blocco
+
+
+def esegui_in_pool(funzione, *argomenti):
+    """
+    Esegue una singola chiamata sul pool condiviso e ne restituisce il risultato (per i calcoli
+    che non si dividono in blocchi, es. un job di simulazione).
+    """
+    pool = pool_condiviso()
+    try:
+        return pool.submit(funzione, *argomenti).result()
+    except BrokenProcessPool:
+        _scarta_pool(pool)
+        raise
+
+
+def itera_in_pool(funzione, argomenti_fissi, blocchi, max_worker=None, max_in_volo=None):
+    """
+    Esegue funzione(*argomenti_fissi, blocco) per ogni blocco sul pool condiviso e produce i
+    risultati dei blocchi appena sono pronti (ordine di completamento). Tengo in volo al massimo
+    'max_in_volo' blocchi (default 2 x max_worker, cioè la quota del pool usata da questa chiamata):
+    i nuovi blocchi vengono generati solo quando il consumatore legge i risultati, così la memoria
+    resta costante anche con griglie enormi.
+    """
+    max_worker = max_worker or PROCESSI_POOL
+    max_in_volo = max_in_volo or 2 * max_worker
+    blocchi = iter(blocchi)
+    pool = pool_condiviso()
+
+    in_volo = set()
+    try:
+        for blocco in itertools.islice(blocchi, max_in_volo):
+            in_volo.add(pool.submit(funzione, *argomenti_fissi, blocco))
+
+        while in_volo:
+            completati, in_volo = wait(in_volo, return_when=FIRST_COMPLETED)
+            for futuro in completati:
+                yield futuro.result()
+                for blocco in itertools.islice(blocchi, 1):
+                    in_volo.add(pool.submit(funzione, *argomenti_fissi, blocco))
+    except BrokenProcessPool:
+        _scarta_pool(pool)
+        raise
+    finally:
+        # Se il consumatore smette di leggere (es. client HTTP disconnesso) annullo i blocchi
+        # non ancora partiti invece di calcolarli per nessuno
+        for futuro in in_volo:
+            futuro.cancel()
+
+
+def _simula_blocco(riepilogo, blocco):
+    """
+    Lavoro eseguito dal processo worker per il batch: un blocco di (indice, payload, seed_riserva).
+    Il payload può arrivare come dizionario o come riga JSON ancora da decodificare (input NDJSON):
+    così anche la decodifica avviene nei worker. Gli errori di uno scenario restano nella sua riga.
+    """
+    risultati = []
+    for indice, payload, seed_riserva in blocco:
+        try:
+            if isinstance(payload, (str, bytes)):
+                try:
+                    payload = json.loads(payload)
+                except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                    risultati.append({"indice": indice, "errore": f"JSON non valido: {e}", "campo": None})
+                    continue
+            dati = valida_payload(payload)
+            if riepilogo:
+                valida_singola_stagione(dati)
+            seed = seed_riserva if dati['seed'] is None else None
+            # Con il seed di riserva lo scenario non si ripeterà: non lo memorizzo nella cache
+            dati_finali = simula_validato(dati, seed, usa_cache=seed is None)
+            riga = riepiloga_scenario(dati_finali) if riepilogo else dati_finali
+            risultati.append({"indice": indice, "seed": dati_finali["seed"], **riga})
+        except ErrorePayload as e:
+            risultati.append({"indice": indice, **e.come_dizionario()})
+        except Exception as e:
+            risultati.append({"indice": indice, "errore": f"{type(e).__name__}: {e}", "campo": None})
+    return risultati
+
+
+def itera_batch(payloads, riepilogo=False, max_worker=None, dimensione_blocco=8):
+    """
+    Generatore: esegue una sequenza (anche infinita o letta in streaming) di payload sul pool di
+    processi e produce una riga di risultato per scenario, in ordine di completamento e con il suo
+    'indice' nella sequenza. I payload vengono letti solo quando c'è posto nel pool, quindi la
+    memoria non cresce con la lunghezza del batch.
+    Il seed dei payload che non lo specificano viene estratto qui, nel processo principale: i
+    worker nati da fork condividono lo stato del generatore e produrrebbero seed uguali.
+    """
+    scenari = ((indice, payload, nuovo_seed()) for indice, payload in enumerate(payloads))
+    for risultati in itera_in_pool(_simula_blocco, (riepilogo,), _blocchi(scenari, dimensione_blocco), max_worker):
+        yield from risultati
+
+
+def itera_sweep(payload_base, griglia, max_worker=None, dimensione_blocco=None):
+    """
+    Generatore: esegue tutti gli scenari della griglia in parallelo e produce i riepiloghi
+    man mano che i blocchi vengono completati.
+    Tutti gli scenari usano lo stesso seed (numeri casuali comuni): le differenze tra scenari
+    dipendono quindi solo dai parametri e non dalla stagione estratta.
+    Payload base e griglia vanno controllati prima con valida_sweep.
+    """
+    payload_base = dict(payload_base)
+    if payload_base.get('seed') is None:
+        payload_base['seed'] = nuovo_seed()
+
+    max_worker = max_worker or PROCESSI_POOL
+    if dimensione_blocco is None:
+        # Circa 8 blocchi per worker: abbastanza grandi da ammortizzare l'IPC, abbastanza
+        # piccoli da bilanciare il carico e iniziare presto a restituire risultati
+        dimensione_blocco = max(1, min(512, conta_scenari(griglia) // (max_worker * 8)))
+
+    scenari = enumerate(espandi_griglia(griglia))
+    for risultati in itera_in_pool(_valuta_blocco, (payload_base,), _blocchi(scenari, dimensione_blocco), max_worker):
+        yield from risultati
+
+
+def esegui_sweep(payload_base, griglia, ordina_per="totale_bottiglie", decrescente=True, max_worker=None, dimensione_blocco=None):
+    """
+    Esegue lo sweep completo e restituisce la tabella degli scenari ordinata per 'ordina_per'
+    (gli scenari in errore finiscono in fondo). Ogni riga riporta la posizione in classifica.
+    Solleva ErrorePayload se payload base o griglia non sono validi.
+    """
+    valida_sweep(payload_base, griglia, ordina_per, decrescente)
+    righe = list(itera_sweep(payload_base, griglia, max_worker, dimensione_blocco))
+    return ordina_tabella(righe, ordina_per, decrescente)
+
+
+def ordina_tabella(righe, ordina_per="totale_bottiglie", decrescente=True):
+    """
+    Tabella dello sweep a partire dalle righe raccolte in ordine di completamento.
+    Solleva ErrorePayload se 'ordina_per' non è una colonna del riepilogo (vedi COLONNE_ORDINAMENTO).
+    """
+    valida_ordinamento(ordina_per, decrescente)
+    righe = sorted(righe, key=lambda r: r["indice"])
+    validi = [r for r in righe if "errore" not in r]
+    errori = [r for r in righe if "errore" in r]
+    # Ordinamento stabile: a parità di valore resta l'ordine della griglia
+    validi.sort(key=lambda r: r[ordina_per], reverse=decrescente)
+
+    for posizione, riga in enumerate(validi, start=1):
+        riga["posizione"] = posizione
+    return validi + errori
+
+
+if __name__ == "__main__":
+    # Esempio: 3 lotti della dashboard, griglia 3 x 3 x 4 budget = 36 scenari
+    from Simulatore import LOTTO_1, LOTTO_2, LOTTO_3
+
+    def lotto_api(id_lotto, conf):
+        return {"id": id_lotto, "cultivar": conf["nome"], "tipologia": conf["tipo"], "n_piante": conf["piante"],
+                "ettari": conf["ettari"], "priorita": conf["priorita"],
+                "config": {"capacita_giornaliera": conf["capacita_raccolta"], "tempo_unitario": conf["tempo_lavorazione"],
+                           "concime": conf["concime"], "trattamento": conf["trattamento"]}}
+
+    base = {"seed": 2024, "lotti": [lotto_api("L01", LOTTO_1), lotto_api("L02", LOTTO_2), lotto_api("L03", LOTTO_3)]}
+    griglia = {
+        "concime": ["Nessuno", "Zolfato", "Urea"],
+        "trattamento": ["Nessuno", "Zolfo", "Poltiglia Bordolese"],
+        "ore_budget": [150, 200, 300, 500],
+    }
+
+    print(f"{'#':>3} {'Bottiglie':>10} {'Ore':>8} {'Compl.%':>8}  Parametri")
+    for riga in esegui_sweep(base, griglia)[:10]:
+        print(f"{riga['posizione']:>3} {riga['totale_bottiglie']:>10} {riga['ore_effettive']:>8} {riga['completamento_pct']:>8}  {riga['parametri']}")
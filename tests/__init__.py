@@ -0,0 +1,4 @@
+# - TEST DEL SIMULATORE -
+# Verifiche di parità, determinismo e unione degli stati parziali tra i vari percorsi di calcolo
+# (oggetti, colonne NumPy, giorno per giorno, analitico). Si eseguono dalla radice del progetto:
+#   python -m pytest -q
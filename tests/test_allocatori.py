@@ -0,0 +1,109 @@
+# - TEST: POLITICHE DI ALLOCAZIONE DEL BUDGET ORE -
+
+import random
+import time
+from itertools import product
+
+import pytest
+
+from allocatori import ALLOCATORI, alloca_frazionaria, alloca_greedy, alloca_intera, chiave_ordinamento
+
+
+def richieste_casuali(n, seed, frazionabili=0, quote_max=1):
+    # Ore di ogni quota con un decimale: con la risoluzione di default (0,1 h) la DP non arrotonda nulla
+    rng = random.Random(seed)
+    richieste = []
+    for i in range(n):
+        quote = rng.randint(1, quote_max)
+        richieste.append({"id": f"L{i:02d}", "priorita": 2, "ore": rng.randint(10, 400) * quote / 10,
+                          "bottiglie": rng.randint(0, 900), "litri": rng.uniform(0, 1000),
+                          "frazionabile": i < frazionabili, "quote": quote})
+    return richieste
+
+
+def valore(richieste, percentuali, obiettivo="bottiglie"):
+    return sum(r[obiettivo] * p / 100 for r, p in zip(richieste, percentuali))
+
+
+def ore_usate(richieste, percentuali):
+    return sum(r["ore"] * p / 100 for r, p in zip(richieste, percentuali))
+
+
+def ottimo_frazionario(richieste, budget, obiettivo="bottiglie"):
+    # Valore ottimo del knapsack frazionario dal duale della programmazione lineare:
+    # min su lambda >= 0 di lambda * B + somma max(0, v - lambda * w), con lambda tra le rese orarie
+    candidati = [0.0] + [r[obiettivo] / r["ore"] for r in richieste]
+    return min(l * budget + sum(max(0.0, r[obiettivo] - l * r["ore"]) for r in richieste) for l in candidati)
+
+
+def ottimo_esaustivo(richieste, budget, obiettivo="bottiglie"):
+    # Tutte le combinazioni di quote dei lotti interi; le ore avanzate vanno ai frazionabili
+    interi = [r for r in richieste if not r["frazionabile"]]
+    frazionabili = [r for r in richieste if r["frazionabile"]]
+    migliore = 0.0
+    for quote in product(*(range(r["quote"] + 1) for r in interi)):
+        ore = sum(r["ore"] * q / r["quote"] for r, q in zip(interi, quote))
+        if ore <= budget + 1e-9:
+            resto = ottimo_frazionario(frazionabili, budget - ore, obiettivo) if frazionabili else 0.0
+            migliore = max(migliore, sum(r[obiettivo] * q / r["quote"] for r, q in zip(interi, quote)) + resto)
+    return migliore
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("frazionabili, quote_max", [(0, 1), (0, 3), (3, 1), (2, 2)])
+def test_intera_uguale_alla_ricerca_esaustiva(seed, frazionabili, quote_max):
+    richieste = richieste_casuali(7, seed, frazionabili, quote_max)
+    budget = sum(r["ore"] for r in richieste) * random.Random(seed).uniform(0.2, 0.8)
+    percentuali = alloca_intera(richieste, budget)
+    assert ore_usate(richieste, percentuali) <= budget + 1e-6
+    assert valore(richieste, percentuali) == pytest.approx(ottimo_esaustivo(richieste, budget), abs=1e-6)
+    for r, p in zip(richieste, percentuali):
+        if not r["frazionabile"]:
+            assert round(p / 100 * r["quote"], 9).is_integer()
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("obiettivo", ["bottiglie", "litri"])
+def test_frazionaria_uguale_all_ottimo(seed, obiettivo):
+    richieste = richieste_casuali(12, seed)
+    budget = sum(r["ore"] for r in richieste) * 0.4
+    percentuali = alloca_frazionaria(richieste, budget, obiettivo=obiettivo)
+    assert ore_usate(richieste, percentuali) == pytest.approx(budget)
+    assert valore(richieste, percentuali, obiettivo) == pytest.approx(ottimo_frazionario(richieste, budget, obiettivo))
+
+
+@pytest.mark.parametrize("politica", ["frazionaria", "intera"])
+def test_fasce_di_priorita(politica):
+    # Una fascia più importante viene servita per prima anche se rende meno all'ora
+    richieste = [
+        {"id": "A", "priorita": 2, "ore": 10.0, "bottiglie": 1000, "litri": 0, "frazionabile": False, "quote": 1},
+        {"id": "B", "priorita": 1, "ore": 10.0, "bottiglie": 10, "litri": 0, "frazionabile": False, "quote": 1},
+    ]
+    assert ALLOCATORI[politica](richieste, 10.0) == [0.0, 100.0]
+    assert ALLOCATORI[politica](richieste, 10.0, rispetta_priorita=False) == [100.0, 0.0]
+
+
+def test_ordine_a_parita_secondo_chiave_ordinamento():
+    # Stessa priorità e stessa resa oraria: decide l'ID, numerici prima (in ordine numerico), poi i testuali
+    id_lotti = ["b", 10, "a", 2, "10"]
+    richieste = [{"id": i, "priorita": 1, "ore": 10.0, "bottiglie": 50, "litri": 50, "frazionabile": True, "quote": 1}
+                 for i in id_lotti]
+    attesi = sorted(range(len(id_lotti)), key=lambda k: chiave_ordinamento(1, id_lotti[k]))
+    assert [id_lotti[k] for k in attesi] == [2, 10, "10", "a", "b"]
+    for politica in (alloca_greedy, alloca_frazionaria, alloca_intera):
+        percentuali = politica(richieste, 25.0)
+        assert [percentuali[k] for k in attesi] == [100.0, 100.0, 50.0, 0.0, 0.0], politica.__name__
+
+
+@pytest.mark.parametrize("interi", [0, 1, 20])
+def test_intera_veloce_con_budget_grandi(interi):
+    # Il numero di passi della DP non cresce con il budget, e senza lotti interi la DP non parte
+    richieste = richieste_casuali(1_000 + interi, seed=1, frazionabili=1_000)
+    inizio = time.perf_counter()
+    percentuali = alloca_intera(richieste, 1e6)
+    assert time.perf_counter() - inizio < 1.0
+    assert percentuali == [100.0] * len(richieste)
+    richieste = richieste_casuali(10 + interi, seed=2, frazionabili=10)
+    inizio = time.perf_counter()
+    assert alloca_intera(richieste, 1e6) == [100.0] * len(richieste)
+    assert time.perf_counter() - inizio < 1.0
@@ -0,0 +1,88 @@
+# - TEST: ROTTE DELLA DASHBOARD (CLIENT DI TEST DI FLASK) -
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from benchmark import client_flask, genera_lotti_sintetici
+
+
+@pytest.fixture(scope="module")
+def client():
+    return client_flask()
+
+
+def test_app_importabile_da_qualunque_cartella(tmp_path):
+    # Come "python 'Dashboard Web/app.py'": sul percorso c'è solo la cartella della dashboard
+    cartella_app = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Dashboard Web")
+    ambiente = {k: v for k, v in os.environ.items() if k != "PYTHONPATH"}
+    codice = f"import sys; sys.path[0] = {cartella_app!r}; import app, Simulatore; print(Simulatore.__file__)"
+    esito = subprocess.run([sys.executable, "-c", codice], check=True, env=ambiente, cwd=tmp_path,
+                           capture_output=True, text=True)
+    assert os.path.dirname(esito.stdout.strip()) == os.path.dirname(cartella_app)
+
+
+def test_simula(client):
+    risposta = client.post("/api/simula", json={"ore_budget": 120, "seed": 7, "lotti": genera_lotti_sintetici(3)})
+    assert risposta.status_code == 200
+    dati = risposta.get_json()
+    assert dati["seed"] == 7 and len(dati["dettaglio_lotti"]) == 3
+
+
+def test_simula_payload_non_valido(client):
+    risposta = client.post("/api/simula", json={"lotti": [{"id": "L1"}]})
+    assert risposta.status_code == 400
+    assert risposta.get_json()["campo"] == "lotti[0].cultivar"
+
+
+def attendi_job(client, id_job, timeout=60):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        job = client.get(f"/api/jobs/{id_job}").get_json()
+        if job["stato"] not in ("in_coda", "in_esecuzione"):
+            return job
+        time.sleep(0.05)
+    pytest.fail(f"job {id_job} non terminato entro {timeout} s")
+
+
+def test_job_simula_come_rotta_sincrona(client):
+    payload = {"ore_budget": 120, "seed": 7, "lotti": genera_lotti_sintetici(3)}
+    risposta = client.post("/api/jobs", json={"tipo": "simula", "payload": payload})
+    assert risposta.status_code == 202
+    job = attendi_job(client, risposta.get_json()["id"])
+    assert job["stato"] == "completato"
+    assert job["risultato"] == client.post("/api/simula", json=payload).get_json()
+
+
+def test_job_sweep_griglia_non_valida(client):
+    base = {"ore_budget": 120, "seed": 7, "lotti": genera_lotti_sintetici(3)}
+    risposta = client.post("/api/jobs", json={"tipo": "sweep", "payload": {"base": base, "griglia": {}}})
+    assert risposta.status_code == 400
+    assert risposta.get_json()["campo"].startswith("payload.griglia")
+
+
+def test_batch_ndjson(client):
+    payloads = [{"seed": 100 + i, "ore_budget": 80.0, "lotti": genera_lotti_sintetici(3, seed=i)} for i in range(6)]
+    corpo = "\n".join(json.dumps(p) for p in payloads[:3]) + "\n\n{non json\n" + "\n".join(json.dumps(p) for p in payloads[3:])
+    risposta = client.post("/api/simula/batch?riepilogo=1", data=corpo, content_type="application/x-ndjson")
+    assert risposta.status_code == 200 and risposta.mimetype == "application/x-ndjson"
+    righe = [json.loads(r) for r in risposta.get_data(as_text=True).splitlines()]
+
+    # L'ultima riga chiude lo stream; le altre arrivano in ordine di completamento con l'indice dell'input
+    assert righe[-1] == {"fine": True, "scenari": 7, "errori": 1}
+    per_indice = {r["indice"]: r for r in righe[:-1]}
+    assert sorted(per_indice) == list(range(7))
+    assert per_indice[3]["errore"].startswith("JSON non valido")
+    for indice, payload in zip([0, 1, 2, 4, 5, 6], payloads):
+        assert per_indice[indice]["seed"] == payload["seed"]
+        assert per_indice[indice]["totale_bottiglie"] == client.post("/api/simula", json=payload).get_json()["totali_azienda"]["totale_bottiglie_1_5L"]
+
+
+def test_batch_griglia_non_valida(client):
+    base = {"seed": 1, "lotti": genera_lotti_sintetici(2)}
+    risposta = client.post("/api/simula/batch", json={"base": base, "griglia": {"L999.concime": ["Urea"]}})
+    assert risposta.status_code == 400 and risposta.get_json()["campo"] == "griglia.L999.concime"
@@ -0,0 +1,72 @@
+# - TEST: CACHE LRU CON SCADENZA E PESO MASSIMO -
+
+import pytest
+
+from Simulatore import CACHE_SIMULAZIONI, CacheLRU, simula
+from benchmark import genera_lotti_sintetici
+
+
+@pytest.fixture
+def orologio(monkeypatch):
+    # Orologio monotono controllato dal test: orologio["t"] è l'istante corrente in secondi
+    orologio = {"t": 1000.0}
+    monkeypatch.setattr("Simulatore.time.monotonic", lambda: orologio["t"])
+    return orologio
+
+
+def test_scadenza(orologio):
+    cache = CacheLRU(10, 60.0, max_peso=10)
+    cache.scrivi("a", 1, peso=3)
+    orologio["t"] += 60.0
+    assert cache.leggi("a") == 1
+    orologio["t"] += 0.5
+    assert cache.leggi("a") is None
+    assert len(cache) == 0 and cache._peso == 0
+    assert (cache.hit, cache.miss) == (1, 1)
+
+
+def test_la_lettura_non_rinnova_la_scadenza(orologio):
+    cache = CacheLRU(10, 60.0)
+    cache.scrivi("a", 1)
+    orologio["t"] += 40.0
+    assert cache.leggi("a") == 1
+    orologio["t"] += 40.0
+    assert cache.leggi("a") is None
+
+
+def test_lru_per_numero_di_voci(orologio):
+    cache = CacheLRU(2, 60.0)
+    cache.scrivi("a", 1)
+    cache.scrivi("b", 2)
+    cache.leggi("a")
+    cache.scrivi("c", 3)
+    assert cache.leggi("b") is None
+    assert (cache.leggi("a"), cache.leggi("c")) == (1, 3)
+
+
+def test_espulsione_per_peso(orologio):
+    cache = CacheLRU(100, 60.0, max_peso=10)
+    for chiave in "abc":
+        assert cache.scrivi(chiave, chiave, peso=4)
+    assert cache.leggi("a") is None and len(cache) == 2 and cache._peso == 8
+    # Riscrivere una chiave ne aggiorna il peso invece di sommarlo
+    cache.scrivi("b", "b", peso=6)
+    assert cache._peso == 10 and (cache.leggi("b"), cache.leggi("c")) == ("b", "c")
+
+
+def test_voce_piu_pesante_della_cache(orologio):
+    cache = CacheLRU(100, 60.0, max_peso=10)
+    cache.scrivi("a", 1, peso=5)
+    assert cache.scrivi("grande", 2, peso=11) is False
+    assert cache.leggi("grande") is None
+    assert cache.leggi("a") == 1 and cache._peso == 5
+
+
+def test_solo_scenari_con_seed_in_cache():
+    CACHE_SIMULAZIONI.svuota()
+    payload = {"ore_budget": 100, "lotti": genera_lotti_sintetici(5)}
+    simula(payload)
+    assert len(CACHE_SIMULAZIONI) == 0
+    simula(dict(payload, seed=3))
+    assert len(CACHE_SIMULAZIONI) == 1 and CACHE_SIMULAZIONI._peso == 5
+    CACHE_SIMULAZIONI.svuota()
@@ -0,0 +1,138 @@
+# - TEST: CLI PER GRANDI INVENTARI CONTRO main_controller -
+
+import csv
+import io
+import json
+
+import pytest
+
+from Simulatore import main_controller
+from benchmark import genera_lotti_sintetici
+from cli_inventario import CAMPI_CONFIG, ErroreInventario, elabora_inventario, main
+
+SEED = 7
+COLONNE_CSV = ("id", "cultivar", "tipologia", "n_piante", "ettari", "priorita") + CAMPI_CONFIG
+
+
+def scrivi_jsonl(percorso, lotti):
+    percorso.write_text("".join(json.dumps(lotto) + "\n" for lotto in lotti), encoding="utf-8")
+    return str(percorso)
+
+
+def scrivi_csv(percorso, lotti):
+    with open(percorso, "w", encoding="utf-8", newline="") as f:
+        scrittore = csv.writer(f)
+        scrittore.writerow(COLONNE_CSV)
+        for lotto in lotti:
+            scrittore.writerow([lotto.get(c, lotto["config"].get(c, "")) for c in COLONNE_CSV])
+    return str(percorso)
+
+
+def esegui_cli(percorso, budget, **opzioni):
+    uscita = io.StringIO()
+    riepilogo = elabora_inventario(percorso, uscita, budget, seed=SEED, **opzioni)
+    return riepilogo, [json.loads(riga) for riga in uscita.getvalue().splitlines()]
+
+
+def esegui_controller(lotti, budget):
+    return json.loads(main_controller("json", json.dumps({"ore_budget": budget, "lotti": lotti, "seed": SEED})))
+
+
+@pytest.fixture(scope="module")
+def inventario():
+    # Inventario ordinato per ID (genera_lotti_sintetici numera i lotti L000000, L000001, ...)
+    lotti = genera_lotti_sintetici(500, seed=4)
+    ore_totali = esegui_controller(lotti, 0.0)["totali_azienda"]["totale_ore_necessarie_100"]
+    return lotti, ore_totali
+
+
+def confronta_con_controller(riepilogo, righe, atteso):
+    assert riepilogo["meteo_rilevato"] == atteso["meteo_rilevato"]
+    assert righe == atteso["dettaglio_lotti"]
+    totali = riepilogo["totali_azienda"]
+    for campo, valore in atteso["totali_azienda"].items():
+        # Le somme per blocco possono differire nell'ultima cifra prima dell'arrotondamento
+        assert totali[campo] == pytest.approx(valore, abs=0.011), campo
+
+
+@pytest.mark.parametrize("formato", ["jsonl", "csv"])
+@pytest.mark.parametrize("quota_budget", [0.3, 0.7])
+def test_due_passate_come_main_controller(tmp_path, inventario, formato, quota_budget):
+    # Con la quota 0,3 il residuo va alla prima fascia di priorità, con 0,7 alla terza
+    lotti, ore_totali = inventario
+    budget = round(ore_totali * quota_budget, 1)
+    scrivi = scrivi_csv if formato == "csv" else scrivi_jsonl
+    percorso = scrivi(tmp_path / f"inventario.{formato}", lotti)
+
+    riepilogo, righe = esegui_cli(percorso, budget, righe_per_blocco=37)
+    atteso = esegui_controller(lotti, budget)
+    assert riepilogo["allocazione"] == "due_passate"
+    assert {"Parziale", "Non Avviato"} <= set(riepilogo["totali_azienda"]["esiti"])
+    confronta_con_controller(riepilogo, righe, atteso)
+
+
+def test_una_passata_alloca_blocco_per_blocco(tmp_path, inventario):
+    # Ogni blocco è uno scenario a sé con il budget lasciato dai blocchi precedenti
+    lotti, ore_totali = inventario
+    budget = round(ore_totali * 0.4, 1)
+    percorso = scrivi_jsonl(tmp_path / "inventario.jsonl", lotti)
+    riepilogo, righe = esegui_cli(percorso, budget, righe_per_blocco=37, una_passata=True)
+    assert riepilogo["allocazione"] == "una_passata"
+
+    attese, residuo = [], budget
+    for inizio in range(0, len(lotti), 37):
+        atteso = esegui_controller(lotti[inizio:inizio + 37], residuo)
+        attese += atteso["dettaglio_lotti"]
+        residuo = max(0.0, residuo - atteso["totali_azienda"]["totale_ore_necessarie_100"])
+    assert righe == attese
+
+    # La priorità vale solo dentro il blocco: lotti di fascia 3 dei primi blocchi avviati prima di
+    # lotti di fascia 1 degli ultimi, che restano fermi
+    avviati = [r for r in righe if r["percentuale_elaborazione"] > 0]
+    assert any(r["priorita"] == 3 for r in avviati)
+    assert any(r["priorita"] == 1 and r["percentuale_elaborazione"] == 0 for r in righe)
+    assert riepilogo["totali_azienda"]["totale_ore_effettive"] <= budget + 0.01
+
+
+def test_standard_input_una_passata(monkeypatch, inventario):
+    lotti, _ = inventario
+    monkeypatch.setattr("sys.stdin", io.StringIO("".join(json.dumps(lotto) + "\n" for lotto in lotti[:50])))
+    riepilogo, righe = esegui_cli("-", 1000.0, righe_per_blocco=37)
+    assert riepilogo["allocazione"] == "una_passata" and len(righe) == 50
+
+
+@pytest.mark.parametrize("righe_per_blocco", [2, 100])
+def test_errore_csv_indica_file_riga_e_campo(tmp_path, righe_per_blocco):
+    # Riga 1 = intestazione: il quarto lotto sta sulla riga 5, anche se cade nel secondo blocco
+    lotti = genera_lotti_sintetici(6)
+    lotti[3]["n_piante"] = "molte"
+    percorso = scrivi_csv(tmp_path / "inventario.csv", lotti)
+    with pytest.raises(ErroreInventario) as errore:
+        esegui_cli(percorso, 1000.0, righe_per_blocco=righe_per_blocco)
+    messaggio = str(errore.value)
+    assert messaggio.startswith(f"{percorso}, riga 5: n_piante: ")
+
+
+def test_errore_csv_campo_di_config(tmp_path):
+    lotti = genera_lotti_sintetici(3)
+    lotti[1]["config"]["concime"] = "Letame lunare"
+    percorso = scrivi_csv(tmp_path / "inventario.csv", lotti)
+    with pytest.raises(ErroreInventario, match=r", riga 3: config\.concime: "):
+        esegui_cli(percorso, 1000.0)
+
+
+def test_errore_jsonl_non_valido(tmp_path):
+    percorso = tmp_path / "inventario.jsonl"
+    percorso.write_text(json.dumps(genera_lotti_sintetici(1)[0]) + "\n\n{non json\n", encoding="utf-8")
+    with pytest.raises(ErroreInventario, match=r", riga 3: JSON non valido"):
+        esegui_cli(str(percorso), 1000.0)
+
+
+def test_main_esce_con_codice_2(tmp_path, capsys):
+    lotti = genera_lotti_sintetici(3)
+    lotti[2]["ettari"] = "-1"
+    percorso = scrivi_csv(tmp_path / "inventario.csv", lotti)
+    with pytest.raises(SystemExit) as uscita:
+        main([percorso, "-o", str(tmp_path / "risultati.csv"), "--seed", "1"])
+    assert uscita.value.code == 2
+    assert f"errore: {percorso}, riga 4: ettari: " in capsys.readouterr().err
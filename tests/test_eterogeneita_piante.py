@@ -0,0 +1,63 @@
+# - TEST: MODALITÀ PER PIANTA CONTRO LA FORMULA CHIUSA -
+
+import math
+
+import numpy as np
+import pytest
+
+from Simulatore import LIMITE_PIANTE_ETEROGENEITA, ErrorePayload, valida_payload
+from benchmark import genera_lotti_sintetici
+from eterogeneita_piante import LIMITE_ZONE, RESA_PIANTA, resa_per_pianta, varianza_attesa
+
+N_PIANTE = 20_000
+CONCIME, RESA_RESIDUA = 1.1, 0.75
+
+
+@pytest.mark.parametrize("correlazioni", [(0.0, 0.0), (0.3, 0.1), (0.5, 0.5), (1.0, 1.0)])
+def test_media_e_varianza(correlazioni):
+    # Le chiavi 0..999 fanno da 1.000 stagioni diverse (campione fisso, test deterministico)
+    opzioni = {"piante_per_filare": 100, "filari_per_zona": 10,
+               "correlazione_filare": correlazioni[0], "correlazione_zona": correlazioni[1]}
+    campioni = np.array([resa_per_pianta(N_PIANTE, chiave, CONCIME, RESA_RESIDUA, **opzioni)[0] for chiave in range(1_000)])
+    fattore = CONCIME * RESA_RESIDUA
+    media_attesa = N_PIANTE * sum(RESA_PIANTA) / 2 * fattore
+    dev_attesa = math.sqrt(varianza_attesa(N_PIANTE, fattore, **opzioni))
+    assert abs(campioni.mean() - media_attesa) < 4 * dev_attesa / math.sqrt(len(campioni))
+    assert abs(campioni.std(ddof=1) / dev_attesa - 1) < 0.08
+
+
+def test_indipendente_dalla_dimensione_dei_blocchi():
+    opzioni = {"piante_per_filare": 37, "filari_per_zona": 3, "correlazione_filare": 0.3,
+               "correlazione_zona": 0.1, "variabilita_esposizione": 0.4}
+    kg, riepilogo = resa_per_pianta(50_000, 99, CONCIME, RESA_RESIDUA, **opzioni)
+    kg_blocchi, riepilogo_blocchi = resa_per_pianta(50_000, 99, CONCIME, RESA_RESIDUA, blocco=1_000, **opzioni)
+    assert kg_blocchi == pytest.approx(kg, rel=1e-12)
+    assert riepilogo_blocchi == riepilogo
+
+
+def test_limite_zone():
+    with pytest.raises(ValueError, match="zone"):
+        resa_per_pianta(LIMITE_ZONE + 1, 1, CONCIME, RESA_RESIDUA, piante_per_filare=1, filari_per_zona=1)
+
+
+def payload_per_pianta(n_piante, eterogeneita):
+    lotto = genera_lotti_sintetici(1)[0]
+    lotto.update({"n_piante": n_piante, "eterogeneita": eterogeneita})
+    return {"lotti": [lotto]}
+
+
+def test_payload_oltre_il_limite_di_piante():
+    with pytest.raises(ErrorePayload) as errore:
+        valida_payload(payload_per_pianta(LIMITE_PIANTE_ETEROGENEITA + 1, True))
+    assert errore.value.campo == "lotti[0].n_piante"
+    # Senza la modalità per pianta il numero di piante non è limitato
+    valida_payload(payload_per_pianta(LIMITE_PIANTE_ETEROGENEITA + 1, None))
+
+
+def test_payload_oltre_il_limite_di_zone():
+    # Una pianta per filare e un filare per zona: una zona per pianta
+    eterogeneita = {"piante_per_filare": 1, "filari_per_zona": 1}
+    with pytest.raises(ErrorePayload) as errore:
+        valida_payload(payload_per_pianta(LIMITE_ZONE + 1, eterogeneita))
+    assert errore.value.campo == "lotti[0].eterogeneita.filari_per_zona"
+    assert valida_payload(payload_per_pianta(LIMITE_ZONE, eterogeneita))["lotti"][0]["eterogeneita"]["filari_per_zona"] == 1
@@ -0,0 +1,97 @@
+# - TEST: FLOTTA LOTTI (COLONNE NUMPY) CONTRO main_controller -
+
+import json
+
+import pytest
+
+from Simulatore import SOGLIA_LOTTI_FLOTTA, crea_lotti_da_payload, esegui_scenario, main_controller, valida_payload
+from benchmark import genera_lotti_sintetici
+from flotta_lotti import LottoFleet
+
+
+def payload_misto(n_lotti):
+    # ID misti (interi e stringhe) e priorità ripetute, per esercitare l'ordinamento
+    lotti = genera_lotti_sintetici(n_lotti, seed=3)
+    for i, lotto in enumerate(lotti):
+        if i % 2:
+            lotto["id"] = i
+    return lotti
+
+
+def esegui_controller(lotti, budget, seed):
+    return json.loads(main_controller("json", json.dumps({"ore_budget": budget, "lotti": lotti, "seed": seed})))
+
+
+@pytest.mark.parametrize("budget", [0.0, 500.0, 1000.0, 100_000.0])
+def test_coincide_con_main_controller(budget):
+    lotti = payload_misto(40)
+    atteso = esegui_controller(lotti, budget, 11)
+    flotta = LottoFleet.da_payload(lotti).simula(atteso["meteo_rilevato"], seed=11).alloca(budget)
+    ottenuto = flotta.come_dati_finali(atteso["meteo_rilevato"], budget)
+    assert ottenuto["dettaglio_lotti"] == atteso["dettaglio_lotti"]
+    assert ottenuto["totali_azienda"] == atteso["totali_azienda"]
+
+
+@pytest.mark.parametrize("politica", ["frazionaria", "intera"])
+@pytest.mark.parametrize("budget", [500.0, 1000.0])
+def test_altre_politiche_come_main_controller(politica, budget):
+    lotti = payload_misto(40)
+    for lotto in lotti[::4]:
+        lotto["frazionabile"] = True
+    for lotto in lotti[1::4]:
+        lotto["quote_intere"] = 3
+    atteso = json.loads(main_controller("json", json.dumps(
+        {"ore_budget": budget, "lotti": lotti, "seed": 11, "politica_allocazione": politica, "obiettivo_allocazione": "litri"})))
+    flotta = LottoFleet.da_payload(lotti).simula(atteso["meteo_rilevato"], seed=11).alloca(budget, politica, "litri")
+    ottenuto = flotta.come_dati_finali(atteso["meteo_rilevato"], budget)
+    assert ottenuto["dettaglio_lotti"] == atteso["dettaglio_lotti"]
+    assert ottenuto["totali_azienda"] == atteso["totali_azienda"]
+
+
+def test_alloca_ripetibile():
+    # Una seconda allocazione riparte dai risultati grezzi, non da quelli già tagliati
+    lotti = payload_misto(40)
+    atteso = esegui_controller(lotti, 3000.0, 11)
+    flotta = LottoFleet.da_payload(lotti).simula(atteso["meteo_rilevato"], seed=11)
+    flotta.alloca(500.0).alloca(3000.0)
+    ottenuto = flotta.come_dati_finali(atteso["meteo_rilevato"], 3000.0)
+    assert ottenuto["dettaglio_lotti"] == atteso["dettaglio_lotti"]
+    assert ottenuto["totali_azienda"] == atteso["totali_azienda"]
+
+
+def test_id_mantengono_il_tipo():
+    lotti = payload_misto(6)
+    flotta = LottoFleet.da_payload(lotti)
+    assert [d["id"] for d in lotti] == flotta.id.tolist()
+    assert [type(d["id"]) for d in lotti] == [type(i) for i in flotta.id.tolist()]
+
+
+def test_alloca_senza_simula():
+    with pytest.raises(ValueError):
+        LottoFleet.da_payload(payload_misto(3)).alloca(100.0)
+
+
+def test_default_del_registro_e_priorita_grandi():
+    # Tipologia e tempo unitario mancanti valgono quelli della cultivar; la priorità non viene troncata
+    lotti = payload_misto(4)
+    del lotti[0]["tipologia"], lotti[1]["config"]["tempo_unitario"]
+    lotti[2]["priorita"], lotti[3]["priorita"] = 40_000, -40_000
+    flotta = LottoFleet.da_payload(lotti)
+    validati = valida_payload({"lotti": lotti})["lotti"]
+    assert flotta._decodifica("tipologia").tolist() == [d["tipologia"] for d in validati]
+    assert flotta.tempo_unitario.tolist() == [d["config"]["tempo_unitario"] for d in validati]
+    assert flotta.priorita.tolist()[2:] == [40_000, -40_000]
+
+
+def test_politica_sconosciuta():
+    flotta = LottoFleet.da_payload(payload_misto(3)).simula({"rischio_patogeni": "BASSO"}, seed=1)
+    with pytest.raises(ValueError):
+        flotta.alloca(100.0, "casuale")
+
+
+def test_grande_inventario_via_main_controller():
+    # Da SOGLIA_LOTTI_FLOTTA lotti main_controller passa da LottoFleet: stesso risultato del percorso a oggetti
+    lotti = payload_misto(SOGLIA_LOTTI_FLOTTA)
+    budget = SOGLIA_LOTTI_FLOTTA * 40.0
+    atteso = esegui_scenario(crea_lotti_da_payload(valida_payload({"lotti": lotti})["lotti"]), budget, 11, usa_cache=False)
+    assert esegui_controller(lotti, budget, 11) == atteso
@@ -0,0 +1,49 @@
+# - TEST: INGESTIONE DELLE CENTRALINE IoT -
+
+import json
+
+import numpy as np
+
+from ingestione_iot import DTYPE_LETTURA, ReteStazioni
+
+
+def scrivi_csv(percorso, n_righe, inizio=1_700_000_000):
+    with open(percorso, "w", encoding="utf-8") as f:
+        f.write("timestamp,pioggia_mm,temp\n")
+        for i in range(n_righe):
+            f.write(f"{inizio + i * 60},0.5,20\n")
+
+
+def letture(ts, pioggia=1.0, temp=np.nan):
+    blocco = np.zeros(len(ts), dtype=DTYPE_LETTURA)
+    blocco["ts"] = ts
+    blocco["pioggia"] = pioggia
+    blocco["temp"] = temp
+    return blocco
+
+
+def test_reingestione_non_raddoppia(tmp_path):
+    percorso = str(tmp_path / "S01.csv")
+    scrivi_csv(percorso, 1000)
+    rete = ReteStazioni(str(tmp_path / "buffer"))
+    rete.ingerisci_csv(percorso, righe_per_blocco=300)
+    prima = rete.trend_stagionale()
+    rete.ingerisci_csv(percorso)
+    assert rete.trend_stagionale() == prima
+    assert prima["n_letture"] == 1000 and prima["pioggia_mm"] == 500.0
+
+
+def test_letture_fuori_ordine_scartate(tmp_path):
+    buffer = ReteStazioni(str(tmp_path)).stazione("S01")
+    assert buffer.aggiungi(letture([5, 3, 7, 7])) == 2
+    assert buffer.aggiungi(letture([6, 8])) == 1
+    assert buffer.ultime(10)["ts"].tolist() == [5, 7, 8]
+    assert buffer.trend_stagionale()["n_letture"] == 3
+
+
+def test_stazione_senza_temperature(tmp_path):
+    rete = ReteStazioni(str(tmp_path))
+    rete.stazione("S01").aggiungi(letture([1, 2, 3]))
+    for trend in (rete.stazione("S01").trend_stagionale(), rete.trend_stagionale()):
+        assert trend["temp_avg"] is None and trend["rischio_patogeni"] is None
+        json.loads(json.dumps(trend, allow_nan=False))
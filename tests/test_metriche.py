@@ -0,0 +1,77 @@
+# - TEST: METRICHE DI ESERCIZIO E FORMATO PROMETHEUS -
+
+import os
+import re
+import subprocess
+import sys
+from contextlib import nullcontext
+
+import pytest
+
+import metriche
+from Simulatore import simula
+from benchmark import client_flask, genera_lotti_sintetici
+
+# Riga di un campione nel formato testuale di Prometheus: nome{etichette} valore
+RIGA_CAMPIONE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\\n]|\\.)*",?)*\})? [-+0-9.eEInfa]+$')
+
+
+@pytest.fixture
+def spente():
+    metriche.disattiva()
+    yield
+    metriche.attiva()
+
+
+def test_spente_da_variabile_d_ambiente():
+    codice = ("import metriche; from contextlib import nullcontext; "
+              "assert not metriche.attive(); assert isinstance(metriche.fase('x'), nullcontext)")
+    ambiente = dict(os.environ, TIMPE_METRICHE="0")
+    subprocess.run([sys.executable, "-c", codice], check=True, env=ambiente, cwd=os.path.dirname(metriche.__file__))
+
+
+def test_spente_nessuna_registrazione(spente):
+    assert metriche.fase("simulazione") is metriche.cronometro(metriche.DURATA_FASI, "x")
+    assert isinstance(metriche.fase("simulazione"), nullcontext)
+    prima = metriche.LOTTI_SIMULATI.valore(), metriche.DURATA_FASI.conteggio("simulazione")
+    simula({"ore_budget": 100, "lotti": genera_lotti_sintetici(5)})
+    assert (metriche.LOTTI_SIMULATI.valore(), metriche.DURATA_FASI.conteggio("simulazione")) == prima
+
+    risposta = client_flask().get("/metrics")
+    assert risposta.status_code == 404
+
+
+def test_formato_di_esposizione():
+    registro = metriche.Registro()
+    contatore = registro.contatore("prova_total", "Contatore di prova", ("stato",))
+    istogramma = registro.istogramma("prova_secondi", "Istogramma di prova", ("fase",), limiti=(0.1, 1.0))
+    contatore.incrementa(2, 'a"b\\c\nd')
+    for valore in (0.05, 0.1, 0.5, 3.0):
+        istogramma.osserva(valore, "simulazione")
+
+    righe = registro.esporta_prometheus().splitlines()
+    assert righe == [
+        "# HELP prova_total Contatore di prova",
+        "# TYPE prova_total counter",
+        'prova_total{stato="a\\"b\\\\c\\nd"} 2',
+        "# HELP prova_secondi Istogramma di prova",
+        "# TYPE prova_secondi histogram",
+        'prova_secondi_bucket{fase="simulazione",le="0.1"} 2',
+        'prova_secondi_bucket{fase="simulazione",le="1.0"} 3',
+        'prova_secondi_bucket{fase="simulazione",le="+Inf"} 4',
+        'prova_secondi_sum{fase="simulazione"} 3.65',
+        'prova_secondi_count{fase="simulazione"} 4',
+    ]
+    assert all(RIGA_CAMPIONE.match(r) for r in righe if not r.startswith("#"))
+
+
+def test_rotta_metrics():
+    client = client_flask()
+    client.post("/api/simula", json={"ore_budget": 100, "seed": 4, "lotti": genera_lotti_sintetici(3)})
+    risposta = client.get("/metrics")
+    assert risposta.status_code == 200
+    assert risposta.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    testo = risposta.get_data(as_text=True)
+    assert "# TYPE timpe_fase_secondi histogram" in testo
+    assert 'timpe_fase_secondi_count{fase="simulazione"}' in testo
+    assert all(RIGA_CAMPIONE.match(r) for r in testo.splitlines() if r and not r.startswith("#"))
@@ -0,0 +1,91 @@
+# - TEST: MODELLO ANALITICO CONTRO IL MONTE CARLO -
+# Medie e varianze in forma chiusa contro N_STAGIONI stagioni del motore vettoriale (seed fisso).
+
+from math import sqrt
+
+import numpy as np
+import pytest
+
+from Simulatore import LOTTO_1, LOTTO_2, LOTTO_3, SimulatoreLottoVigneto, crea_lotti_da_payload
+from benchmark import genera_lotti_sintetici
+from modello_analitico import GRANDEZZE, RISCHI, modello_analitico, verifica_contro_montecarlo
+from motore_vettoriale import simula_montecarlo
+
+N_STAGIONI = 200_000
+SEED = 0
+SOGLIA_Z = 5.0               # Scarto massimo delle medie, in errori standard del Monte Carlo
+TOLLERANZA_VARIANZA = 0.03   # Scarto relativo massimo delle varianze (l'errore di stima è ~0.5%)
+ARROTONDAMENTO = 0.005       # Il modello arrotonda media e deviazione standard al centesimo
+
+
+def lotto_da_config(id_lotto, conf):
+    lotto = SimulatoreLottoVigneto(id_lotto, conf["nome"], conf["tipo"], conf["piante"], conf["ettari"])
+    lotto.configura_parametri(conf["capacita_raccolta"], conf["tempo_lavorazione"], conf["concime"],
+                              conf["trattamento"], conf["priorita"])
+    return lotto
+
+
+def lotti_aziendali():
+    return [lotto_da_config("L01", LOTTO_1), lotto_da_config("L02", LOTTO_2), lotto_da_config("L03", LOTTO_3)]
+
+
+def lotti_sintetici():
+    # Capacità di raccolta alta su un lotto su tre, per attraversare il gomito di max(giorni, 1)
+    lotti = crea_lotti_da_payload(genera_lotti_sintetici(30, seed=3))
+    for lotto in lotti[::3]:
+        lotto.cap_max_raccolta_q = 30.0
+    return lotti
+
+
+@pytest.fixture(scope="module", params=[lotti_aziendali, lotti_sintetici], ids=["aziendali", "sintetici"])
+def confronto(request):
+    lotti = request.param()
+    return lotti, modello_analitico(lotti), simula_montecarlo(lotti, N_STAGIONI, SEED)
+
+
+def serie(confronto):
+    # (nome, statistiche analitiche, campioni) per ogni lotto e grandezza, più i totali aziendali
+    lotti, analitico, simulato = confronto
+    risultati = simulato["risultati"]
+    for i, lotto in enumerate(analitico["dettaglio_lotti"]):
+        for g in GRANDEZZE:
+            yield f"{lotto['id']}.{g}", lotto["atteso"][g], risultati[g][:, i]
+    for g in GRANDEZZE:
+        yield f"totali.{g}", analitico["totali_azienda"][g], risultati[g].sum(axis=1)
+
+
+def test_medie(confronto):
+    for nome, atteso, campioni in serie(confronto):
+        errore_standard = max(atteso["dev_std"], 1e-9) / sqrt(len(campioni))
+        assert abs(float(np.mean(campioni)) - atteso["media"]) <= SOGLIA_Z * errore_standard + ARROTONDAMENTO, nome
+
+
+def test_varianze(confronto):
+    for nome, atteso, campioni in serie(confronto):
+        varianza_attesa = atteso["dev_std"] ** 2
+        # Tolleranza relativa più quella dovuta all'arrotondamento della deviazione standard
+        tolleranza = TOLLERANZA_VARIANZA * varianza_attesa + 2 * ARROTONDAMENTO * atteso["dev_std"] + ARROTONDAMENTO ** 2
+        assert abs(float(np.var(campioni)) - varianza_attesa) <= tolleranza, nome
+
+
+def test_probabilita_classi_di_rischio(confronto):
+    _, analitico, simulato = confronto
+    frequenze = np.bincount(simulato["meteo"]["rischio"], minlength=len(RISCHI)) / N_STAGIONI
+    for rischio, frequenza in zip(RISCHI, frequenze):
+        p = analitico["probabilita_rischio"][rischio]
+        assert abs(frequenza - p) <= SOGLIA_Z * sqrt(p * (1 - p) / N_STAGIONI), rischio
+
+
+def test_bottiglie_approssimate_entro_mezza_bottiglia(confronto):
+    # n_bottiglie è l'unica grandezza approssimata (floor trattato come uniforme): oltre al rumore
+    # del Monte Carlo ammetto mezza bottiglia di scarto sulla media di ogni lotto
+    lotti, analitico, simulato = confronto
+    for i, lotto in enumerate(analitico["dettaglio_lotti"]):
+        campioni = simulato["risultati"]["n_bottiglie"][:, i]
+        atteso = lotto["atteso"]["n_bottiglie"]
+        errore_standard = atteso["dev_std"] / sqrt(len(campioni))
+        assert abs(float(np.mean(campioni)) - atteso["media"]) <= SOGLIA_Z * errore_standard + 0.5, lotto["id"]
+
+
+def test_verifica_contro_montecarlo():
+    assert verifica_contro_montecarlo(lotti_aziendali()) == []
@@ -0,0 +1,34 @@
+# - TEST: MOTORE VETTORIALE CONTRO IL PERCORSO A OGGETTI -
+# Con lo stesso seed ogni lotto estrae gli stessi numeri: i risultati devono coincidere al centesimo.
+
+import pytest
+
+from Simulatore import crea_lotti_da_payload, simula_lotti
+from benchmark import genera_lotti_sintetici
+from motore_vettoriale import RISCHI, simula_montecarlo
+
+GRANDEZZE = ("uva_kg", "vino_litri", "vinaccia_kg", "n_bottiglie", "ore_totali")
+FASI = ("vendemmia", "cantina", "gestione")
+
+
+@pytest.mark.parametrize("seed", [0, 9, 2024])
+def test_stesse_stagioni_del_percorso_a_oggetti(seed):
+    lotti = crea_lotti_da_payload(genera_lotti_sintetici(30, seed=4))
+    simulato = simula_montecarlo(lotti, 20, seed=seed)
+
+    for stagione in range(20):
+        meteo, risultati = simula_lotti(lotti, seed, stagione, usa_cache=False)
+        assert RISCHI[simulato["meteo"]["rischio"][stagione]] == meteo["rischio_patogeni"]
+        for i, risultato in enumerate(risultati):
+            for g in GRANDEZZE:
+                assert simulato["risultati"][g][stagione, i] == risultato["output"][g], (stagione, i, g)
+            for fase in FASI:
+                assert simulato["risultati"][f"ore_{fase}"][stagione, i] == risultato["output"]["dettaglio_ore"][fase], (stagione, i, fase)
+
+
+def test_stesso_seed_stessi_risultati():
+    lotti = crea_lotti_da_payload(genera_lotti_sintetici(10))
+    primo = simula_montecarlo(lotti, 500, seed=3)
+    secondo = simula_montecarlo(lotti, 500, seed=3, blocco=64)
+    for g in primo["risultati"]:
+        assert (primo["risultati"][g] == secondo["risultati"][g]).all(), g
@@ -0,0 +1,69 @@
+# - TEST: OTTIMIZZATORE CONTRO LA RICERCA ESAUSTIVA -
+
+from itertools import product
+
+import numpy as np
+import pytest
+
+from Simulatore import CacheLRU, crea_lotti_da_payload
+from benchmark import genera_lotti_sintetici
+import ottimizzatore
+from ottimizzatore import (GRANDEZZE_OBIETTIVO, OBIETTIVI_ALLOCAZIONE, PERCENTILE_RISCHIO, opzioni_ricerca,
+                           ottimizza, valuta_opzioni)
+
+
+@pytest.fixture(scope="module")
+def combinazioni():
+    lotti = crea_lotti_da_payload(genera_lotti_sintetici(3, seed=5))
+    opzioni = opzioni_ricerca(capacita=(8.0, 12.0))
+    valori, ore, _, _ = valuta_opzioni(lotti, opzioni, 42, 256)
+    medie = valori.mean(axis=1, dtype=np.float64)
+
+    def entro(budget):
+        # (valore atteso, P10 del totale) di tutte le combinazioni entro il budget
+        for c in product(range(len(opzioni)), repeat=len(lotti)):
+            if sum(ore[i, k] for i, k in enumerate(c)) <= budget:
+                totale = sum(valori[i, :, k].astype(np.float64) for i, k in enumerate(c))
+                yield sum(medie[i, k] for i, k in enumerate(c)), np.percentile(totale, PERCENTILE_RISCHIO)
+
+    return lotti, entro
+
+
+def test_obiettivi_coerenti():
+    assert set(OBIETTIVI_ALLOCAZIONE) == set(GRANDEZZE_OBIETTIVO)
+
+
+@pytest.mark.parametrize("budget", [330.0, 380.0, 450.0])
+def test_vicino_alla_ricerca_esaustiva(combinazioni, budget):
+    lotti, entro = combinazioni
+    migliore = max(valore for valore, _ in entro(budget))
+    trovato = ottimizza(lotti, budget, seed=42, capacita=(8.0, 12.0), n_stagioni=256)
+    # La ricerca è euristica (rilassamento lagrangiano + ricerca locale): ammetto l'1% di scarto
+    assert migliore * 0.99 <= trovato["valore_atteso"] <= migliore + 0.1
+
+
+def test_vincolo_di_rischio(combinazioni):
+    lotti, entro = combinazioni
+    tutte = list(entro(380.0))
+    libero = ottimizza(lotti, 380.0, seed=42, capacita=(8.0, 12.0), n_stagioni=256)
+    minimo = (libero["rischio"]["valore"] + max(p10 for _, p10 in tutte)) / 2
+    vincolato = ottimizza(lotti, 380.0, seed=42, capacita=(8.0, 12.0), n_stagioni=256, minimo_rischio=minimo)
+    migliore = max(v for v, p10 in tutte if p10 >= minimo)
+    assert vincolato["rischio"]["valore"] >= minimo
+    assert migliore * 0.99 <= vincolato["valore_atteso"] <= migliore + 0.1
+
+
+def test_cache_pesata_in_stagioni(monkeypatch):
+    # Limite di 3 voci da 256 stagioni: le valutazioni da 512 stagioni contano il doppio
+    cache = CacheLRU(1_000, 3600.0, 3 * 256)
+    monkeypatch.setattr(ottimizzatore, "CACHE_VALUTAZIONI", cache)
+    lotti = crea_lotti_da_payload(genera_lotti_sintetici(2, seed=5))
+    opzioni = opzioni_ricerca(concimi=("Nessuno",), trattamenti=("Nessuno",))
+
+    _, _, calcolate, _ = valuta_opzioni(lotti, opzioni, 42, 256)
+    assert calcolate == 2 and len(cache) == 2 and cache._peso == 2 * 256
+    assert valuta_opzioni(lotti, opzioni, 42, 256)[3] == 2
+
+    valuta_opzioni(lotti[:1], opzioni, 42, 512)
+    assert len(cache) == 2 and cache._peso == 256 + 512
+    assert cache.max_peso >= cache._peso
@@ -0,0 +1,30 @@
+# - TEST: STREAM CASUALI RIPRODUCIBILI PER (SEED, STAGIONE, LOTTO) -
+
+from Simulatore import (chiave_simulazione, chiave_stream, crea_lotti_da_payload, crea_stream_lotto, ricalcola_lotto,
+                        simula_lotti)
+from benchmark import genera_lotti_sintetici
+
+
+def test_un_lotto_ricalcolato_da_solo():
+    lotti = crea_lotti_da_payload(genera_lotti_sintetici(20))
+    _, risultati = simula_lotti(lotti, 7, stagione=3, usa_cache=False)
+    assert ricalcola_lotto(lotti[11], 7, stagione=3) == risultati[11]
+
+
+def test_ordine_dei_lotti_indifferente():
+    lotti = crea_lotti_da_payload(genera_lotti_sintetici(20))
+    _, avanti = simula_lotti(lotti, 7, usa_cache=False)
+    _, indietro = simula_lotti(lotti[::-1], 7, usa_cache=False)
+    assert indietro[::-1] == avanti
+
+
+def test_id_intero_e_testuale_distinti():
+    # 1 e "1" sono lotti diversi anche per l'allocazione: stream e chiave della cache devono distinguerli
+    assert chiave_stream(1, "lotto") != chiave_stream("1", "lotto")
+    assert crea_stream_lotto(5, 0, 1).random() != crea_stream_lotto(5, 0, "1").random()
+
+    payload = genera_lotti_sintetici(1)
+    testuale = crea_lotti_da_payload([dict(payload[0], id="1")])
+    intero = crea_lotti_da_payload([dict(payload[0], id=1)])
+    assert chiave_simulazione(testuale, 5) != chiave_simulazione(intero, 5)
+    assert simula_lotti(testuale, 5, usa_cache=False)[1][0]["output"] != simula_lotti(intero, 5, usa_cache=False)[1][0]["output"]
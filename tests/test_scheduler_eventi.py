@@ -0,0 +1,69 @@
+# - TEST: SCHEDULER A EVENTI DISCRETI -
+
+import pytest
+
+from Simulatore import crea_lotti_da_payload, esegui_scenario
+from benchmark import genera_lotti_sintetici
+from scheduler_eventi import FASI, RISORSE, calendario, pianifica_risorse
+
+RISORSE_TEST = {"squadre": 3, "presse": 1, "vasche": 5}
+
+
+def occupazione_massima(intervalli):
+    # A parità di tempo il rilascio (-1) viene prima dell'acquisizione (+1)
+    cambi = sorted([(i, 1) for i, f in intervalli if f > i] + [(f, -1) for i, f in intervalli if f > i])
+    occupate = massimo = 0
+    for _, delta in cambi:
+        occupate += delta
+        massimo = max(massimo, occupate)
+    return massimo
+
+
+@pytest.fixture(scope="module")
+def piano():
+    lista_lotti = crea_lotti_da_payload(genera_lotti_sintetici(400, seed=3))
+    risultati = esegui_scenario(lista_lotti, float("inf"), seed=3, usa_cache=False)["dettaglio_lotti"]
+    return pianifica_risorse(risultati, RISORSE_TEST)
+
+
+def test_nessun_pool_oltre_capacita(piano):
+    for indice, nome in enumerate(FASI):
+        intervalli = [(l["fasi"][nome]["inizio"], l["fasi"][nome]["fine"]) for l in piano["lotti"]]
+        assert occupazione_massima(intervalli) <= RISORSE_TEST[RISORSE[indice]], nome
+    for nome, riepilogo in piano["risorse"].items():
+        assert riepilogo["unita"] == RISORSE_TEST[nome]
+        assert 0.0 <= riepilogo["utilizzo_pct"] <= 100.0
+
+
+def test_fasi_in_sequenza(piano):
+    for lotto in piano["lotti"]:
+        fasi = [lotto["fasi"][f] for f in FASI]
+        assert all(f["inizio"] <= f["fine"] for f in fasi), lotto["id"]
+        assert all(a["fine"] <= b["inizio"] + 1e-9 for a, b in zip(fasi, fasi[1:])), lotto["id"]
+        assert lotto["inizio"] == fasi[0]["inizio"] and lotto["fine"] == fasi[-1]["fine"]
+
+
+def test_priorita_servite_prima():
+    # Una sola squadra e lotti tutti pronti all'inizio: la vendemmia segue l'ordine (priorità, ID)
+    lavori = [(5, 3, (4.0, 1.0, 2.0)), (2, 1, (4.0, 1.0, 2.0)), (9, 2, (4.0, 1.0, 2.0)), (1, 3, (4.0, 1.0, 2.0))]
+    tempi, pool = calendario(lavori, {"squadre": 1, "presse": 1, "vasche": 1})
+    ordine = sorted(range(len(lavori)), key=lambda i: tempi[i][0][0])
+    assert [lavori[i][0] for i in ordine] == [2, 9, 1, 5]
+    assert [tempi[i][0][0] for i in ordine] == [0.0, 4.0, 8.0, 12.0]
+    assert pool[0].coda_max == 3 and pool[0].serviti == 4
+
+
+def test_lotti_non_avviati_senza_calendario():
+    lista_lotti = crea_lotti_da_payload(genera_lotti_sintetici(50, seed=5))
+    scenario = esegui_scenario(lista_lotti, 300.0, seed=5, usa_cache=False)["dettaglio_lotti"]
+    fermi = {r["id"] for r in scenario if r["percentuale_elaborazione"] == 0}
+    assert fermi and len(fermi) < len(scenario)
+
+    piano = pianifica_risorse(scenario, RISORSE_TEST)
+    assert [l["id"] for l in piano["lotti"]] == [r["id"] for r in scenario]
+    for lotto in piano["lotti"]:
+        if lotto["id"] in fermi:
+            assert lotto["inizio"] is None and lotto["fine"] is None and "fasi" not in lotto
+        else:
+            assert lotto["inizio"] is not None
+    assert sum(r["lotti_serviti"] for r in piano["risorse"].values()) == 3 * (len(scenario) - len(fermi))
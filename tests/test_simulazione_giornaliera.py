@@ -0,0 +1,45 @@
+# - TEST: STAGIONE GIORNO PER GIORNO CONTRO IL MODELLO STAGIONALE -
+
+import pytest
+
+from Simulatore import crea_lotti_da_payload
+from benchmark import genera_lotti_sintetici
+from simulazione_giornaliera import (GIORNI_STAGIONE, esegui_stagione_giornaliera, stagione_giornaliera,
+                                     verifica_contro_stagionale)
+
+# 20.000 piante raccolte a 8 q al giorno: servono più dei 30 giorni di vendemmia della stagione
+LOTTO_GRANDE = {
+    "id": "GRANDE", "cultivar": "Barbera", "tipologia": "Rosso", "n_piante": 20_000, "ettari": 8.0,
+    "config": {"capacita_giornaliera": 8.0, "tempo_unitario": 1.5, "concime": "Nessuno", "trattamento": "Nessuno"},
+}
+
+
+@pytest.fixture(scope="module")
+def lotti():
+    return crea_lotti_da_payload(genera_lotti_sintetici(60) + [LOTTO_GRANDE])
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_varianza_zero_coincide_col_modello_stagionale(lotti, seed):
+    assert verifica_contro_stagionale(lotti, seed) == []
+
+
+def test_lotto_grande_non_troncato():
+    risultato = esegui_stagione_giornaliera(crea_lotti_da_payload([LOTTO_GRANDE]), seed=7)
+    output = risultato["lotti"][0]["output"]
+    assert output["raccolta_completata"]
+    assert risultato["giorni_simulati"] > GIORNI_STAGIONE
+    # L'uva raccolta non è limitata ai 30 giorni x 800 kg della finestra stagionale
+    assert output["uva_kg"] > 30 * 800
+
+
+def test_prolungamento_senza_pioggia_ne_gestione():
+    giorni = list(stagione_giornaliera(crea_lotti_da_payload([LOTTO_GRANDE]), seed=7, dettaglio=True))
+    oltre = [g for g in giorni if g["oltre_stagione"]]
+    assert oltre and all(g["pioggia_mm"] == 0.0 and g["ore_gestione"] == 0.0 for g in oltre)
+    assert len({g["rischio_patogeni"] for g in oltre}) == 1
+    assert giorni[-1]["lotti_in_raccolta"] == 0
+
+
+def test_stesso_seed_stessa_stagione(lotti):
+    assert esegui_stagione_giornaliera(lotti, seed=5) == esegui_stagione_giornaliera(lotti, seed=5)
@@ -0,0 +1,79 @@
+# - TEST: STATISTICHE ONLINE (MOMENTI E QUANTILI A BLOCCHI, BANDE DI RISCHIO) -
+
+import numpy as np
+import pytest
+
+from Simulatore import ErrorePayload, crea_lotti_da_payload, valida_payload
+from allocatori import ALLOCATORI
+from benchmark import genera_lotti_sintetici
+from motore_vettoriale import simula_montecarlo
+from statistiche_online import (ERRORE_RELATIVO_QUANTILI, MomentiOnline, SketchQuantili, bande_rischio,
+                                percentuali_stagioni)
+
+
+@pytest.fixture(scope="module")
+def campioni():
+    return np.random.default_rng(7).lognormal(6, 1.2, size=(50_000, 4))
+
+
+def test_momenti_uniti(campioni):
+    prima, seconda = MomentiOnline(4), MomentiOnline(4)
+    prima.aggiorna(campioni[:20_000])
+    seconda.aggiorna(campioni[20_000:])
+    prima.unisci(seconda)
+    assert np.allclose(prima.media, campioni.mean(axis=0), rtol=1e-12)
+    assert np.allclose(prima.dev_std(), campioni.std(axis=0), rtol=1e-9)
+
+
+def test_quantili_entro_errore_garantito(campioni):
+    sketch = SketchQuantili(4)
+    sketch.aggiorna(campioni)
+    esatti = np.quantile(campioni, [0.1, 0.5, 0.9], axis=0, method="lower")
+    assert np.abs(sketch.quantili([0.1, 0.5, 0.9]) / esatti - 1).max() <= ERRORE_RELATIVO_QUANTILI
+
+
+def test_sketch_a_blocchi_uguale_a_sketch_uniti(campioni):
+    interi, prima, seconda = SketchQuantili(4), SketchQuantili(4), SketchQuantili(4)
+    for parte in np.array_split(campioni, 37):
+        interi.aggiorna(parte)
+    prima.aggiorna(campioni[:20_000])
+    seconda.aggiorna(campioni[20_000:])
+    prima.unisci(seconda)
+    griglia = np.linspace(0, 1, 101)
+    assert np.array_equal(interi.quantili(griglia), prima.quantili(griglia))
+
+
+def test_bande_rischio_indipendenti_dai_processi():
+    lotti = crea_lotti_da_payload(genera_lotti_sintetici(20))
+    uno = bande_rischio(lotti, 800.0, 5_000, seed=42)
+    assert bande_rischio(lotti, 800.0, 5_000, seed=42, max_worker=2) == uno
+
+
+@pytest.mark.parametrize("politica", ["greedy", "frazionaria"])
+@pytest.mark.parametrize("obiettivo", ["bottiglie", "litri"])
+def test_politiche_vettoriali_uguali_agli_allocatori(politica, obiettivo):
+    payload = genera_lotti_sintetici(40, seed=1)
+    for i, lotto in enumerate(payload[::3]):
+        lotto["id"] = i
+    lotti = crea_lotti_da_payload(payload)
+    risultati = simula_montecarlo(lotti, 300, seed=3)["risultati"]
+    risultati["ore_totali"][:, 0] = 0.0   # Un lotto senza ore va lavorato al 100% anche a budget esaurito
+
+    for budget in (0.0, 800.0, 1600.0):
+        percentuali = percentuali_stagioni(risultati, lotti, budget, politica, obiettivo)
+        for s in range(len(percentuali)):
+            richieste = [
+                {"id": l.id, "priorita": l.priorita, "ore": float(risultati["ore_totali"][s, i]),
+                 "bottiglie": float(risultati["n_bottiglie"][s, i]), "litri": float(risultati["vino_litri"][s, i]),
+                 "frazionabile": l.frazionabile, "quote": l.quote_intere}
+                for i, l in enumerate(lotti)
+            ]
+            assert percentuali[s].tolist() == ALLOCATORI[politica](richieste, budget, obiettivo=obiettivo)
+
+
+def test_politica_intera_limitata_nelle_bande():
+    payload = {"lotti": genera_lotti_sintetici(50), "politica_allocazione": "intera", "n_stagioni": 1_000}
+    with pytest.raises(ErrorePayload) as errore:
+        valida_payload(payload)
+    assert errore.value.campo == "n_stagioni"
+    valida_payload({**payload, "n_stagioni": 100})
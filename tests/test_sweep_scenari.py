@@ -0,0 +1,109 @@
+# - TEST: SWEEP DEGLI SCENARI "WHAT-IF" E BATCH DI PAYLOAD -
+
+import copy
+
+import pytest
+
+from Simulatore import ErrorePayload, simula, valida_payload
+from benchmark import genera_lotti_sintetici
+from sweep_scenari import (applica_parametri, conta_scenari, espandi_griglia, esegui_sweep, itera_batch, itera_sweep,
+                           ordina_tabella, riepiloga_scenario, valida_sweep)
+
+
+@pytest.fixture
+def base():
+    lotti = genera_lotti_sintetici(4, seed=2)
+    lotti[1]["id"] = 7
+    return {"seed": 2024, "ore_budget": 300, "lotti": lotti}
+
+
+GRIGLIA = {"concime": ["Nessuno", "Urea"], "L000002.trattamento": ["Zolfo", "Nessuno", "Poltiglia Bordolese"], "ore_budget": [150, 400]}
+
+
+def test_espansione_della_griglia(base):
+    combinazioni = list(espandi_griglia(GRIGLIA))
+    assert len(combinazioni) == conta_scenari(GRIGLIA) == valida_sweep(base, GRIGLIA) == 12
+    assert len({tuple(c.items()) for c in combinazioni}) == 12
+
+    originale = copy.deepcopy(base)
+    payload = applica_parametri(base, {"concime": "Urea", "L000002.trattamento": "Zolfo", "7.priorita": 1, "ore_budget": 150})
+    assert [l["config"]["concime"] for l in payload["lotti"]] == ["Urea"] * 4
+    assert payload["lotti"][2]["config"]["trattamento"] == "Zolfo"
+    assert [l["config"]["trattamento"] for i, l in enumerate(payload["lotti"]) if i != 2] == \
+        [l["config"]["trattamento"] for i, l in enumerate(base["lotti"]) if i != 2]
+    assert payload["lotti"][1]["priorita"] == 1 and payload["ore_budget"] == 150
+    # Il payload base resta intatto
+    assert base == originale
+
+
+def test_scenari_con_seed_condiviso(base):
+    righe = esegui_sweep(base, GRIGLIA, max_worker=2)
+    assert sorted(r["indice"] for r in righe) == list(range(12))
+    for riga in righe:
+        atteso = riepiloga_scenario(simula(applica_parametri(base, riga["parametri"])))
+        assert {k: riga[k] for k in atteso} == atteso
+
+    # Senza seed nel payload base lo sweep ne estrae uno per tutti gli scenari: stessi parametri, stessi numeri
+    senza_seed = dict(base, seed=None)
+    uguali = list(itera_sweep(senza_seed, {"ore_budget": [300, 300, 300]}, max_worker=2))
+    assert len({r["totale_bottiglie"] for r in uguali}) == 1 and len({r["rischio_patogeni"] for r in uguali}) == 1
+
+
+def test_ordinamento_della_tabella(base):
+    righe = list(itera_sweep(base, GRIGLIA, max_worker=2)) + [{"indice": 12, "parametri": {}, "errore": "ValueError: x"}]
+    tabella = ordina_tabella(righe, "ore_effettive", decrescente=False)
+    valori = [r["ore_effettive"] for r in tabella[:-1]]
+    assert valori == sorted(valori) and [r["posizione"] for r in tabella[:-1]] == list(range(1, 13))
+    assert "errore" in tabella[-1]
+
+
+def test_ordinamento_sconosciuto(base):
+    with pytest.raises(ErrorePayload) as errore:
+        valida_sweep(base, GRIGLIA, ordina_per="bottiglie")
+    assert errore.value.campo == "ordina_per"
+    with pytest.raises(ErrorePayload):
+        ordina_tabella([], "bottiglie")
+    with pytest.raises(ErrorePayload) as errore:
+        valida_sweep(base, GRIGLIA, decrescente="no")
+    assert errore.value.campo == "decrescente"
+
+
+@pytest.mark.parametrize("griglia, campo", [
+    ({}, "griglia"),
+    ({"ore_budget": 200}, "griglia.ore_budget"),
+    ({"L999.concime": ["Urea"]}, "griglia.L999.concime"),
+])
+def test_griglia_non_valida(base, griglia, campo):
+    with pytest.raises(ErrorePayload) as errore:
+        valida_sweep(base, griglia)
+    assert errore.value.campo == campo
+
+
+def test_base_non_valida(base):
+    with pytest.raises(ErrorePayload) as errore:
+        valida_sweep(dict(base, n_stagioni=10), {"ore_budget": [100]})
+    assert errore.value.campo == "base.n_stagioni"
+    valida_payload(base)
+
+
+def payload_batch(n):
+    return [{"seed": 100 + i, "ore_budget": 50.0 * (i + 1), "lotti": genera_lotti_sintetici(3, seed=i)} for i in range(n)]
+
+
+def test_batch_indici_e_risultati():
+    payloads = payload_batch(20)
+    payloads[5] = {"lotti": [{"id": "X"}]}
+    righe = list(itera_batch(iter(payloads), max_worker=2, dimensione_blocco=3))
+    assert sorted(r["indice"] for r in righe) == list(range(20))
+    for riga in righe:
+        if riga["indice"] == 5:
+            assert riga["campo"] == "lotti[0].cultivar"
+            continue
+        atteso = simula(payloads[riga["indice"]])
+        assert {k: v for k, v in riga.items() if k != "indice"} == atteso
+
+
+def test_batch_seed_estratti_distinti():
+    # Senza seed nel payload ogni scenario riceve il suo, estratto nel processo principale
+    righe = list(itera_batch([{"lotti": genera_lotti_sintetici(2)}] * 8, riepilogo=True, max_worker=2, dimensione_blocco=1))
+    assert len({r["seed"] for r in righe}) == 8
@@ -0,0 +1,54 @@
+# - TEST: VALIDAZIONE DEL PAYLOAD -
+
+import copy
+
+import pytest
+
+from Simulatore import ErrorePayload, valida_payload
+
+LOTTO_MERLOT = {
+    "id": "M1", "cultivar": "Merlot", "tipologia": "Rosso", "n_piante": 1000, "ettari": 0.5,
+    "config": {"capacita_giornaliera": 10, "tempo_unitario": 1.3, "concime": "Nessuno", "trattamento": "Zolfo"},
+}
+
+
+def valida_lotto(lotto):
+    return valida_payload({"lotti": [lotto]})["lotti"][0]
+
+
+def test_cultivar_non_registrata_con_tipologia_e_tempo():
+    lotto = valida_lotto(LOTTO_MERLOT)
+    assert lotto["cultivar"] == "Merlot" and lotto["tipologia"] == "Rosso"
+    assert lotto["config"]["tempo_unitario"] == 1.3
+
+
+@pytest.mark.parametrize("campo", ["tipologia", "config.tempo_unitario"])
+def test_cultivar_non_registrata_senza_riferimenti(campo):
+    lotto = copy.deepcopy(LOTTO_MERLOT)
+    if campo == "tipologia":
+        del lotto["tipologia"]
+    else:
+        del lotto["config"]["tempo_unitario"]
+    with pytest.raises(ErrorePayload) as errore:
+        valida_lotto(lotto)
+    assert errore.value.campo == f"lotti[0].{campo}"
+
+
+def test_cultivar_registrata_fornisce_i_default():
+    lotto = copy.deepcopy(LOTTO_MERLOT)
+    lotto["cultivar"] = "Moscato"
+    del lotto["tipologia"], lotto["config"]["tempo_unitario"]
+    lotto = valida_lotto(lotto)
+    assert lotto["tipologia"] == "Bianco" and lotto["config"]["tempo_unitario"] == 1.0
+
+
+@pytest.mark.parametrize("campo, valore", [("config.concime", "Letame"), ("config.trattamento", "Rame"), ("tipologia", "Rosato")])
+def test_concimi_trattamenti_e_tipologie_chiusi(campo, valore):
+    lotto = copy.deepcopy(LOTTO_MERLOT)
+    if campo == "tipologia":
+        lotto["tipologia"] = valore
+    else:
+        lotto["config"][campo.split(".")[1]] = valore
+    with pytest.raises(ErrorePayload) as errore:
+        valida_lotto(lotto)
+    assert errore.value.campo == f"lotti[0].{campo}"